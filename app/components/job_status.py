@@ -0,0 +1,87 @@
+"""ジョブキューに登録した長時間処理の状態を表示するコンポーネント
+
+ジョブ ID はセッションステートと URL のクエリパラメータの両方に残すため、
+再実行やブラウザの再読み込みの後も同じジョブの状態と結果を表示できる。
+"""
+
+import time
+from typing import Any, Callable, Dict
+
+import streamlit as st
+
+from services.job_queue import FAILED, QUEUED, SUCCEEDED, get_job_queue
+
+POLL_SECONDS = 2
+
+# st.fragment は 1.37 から。それより前は experimental_fragment
+_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+
+def submit_job(state_key: str, kind: str, payload: Dict[str, Any]) -> str:
+    """ジョブを登録し、そのジョブを ``state_key`` で追跡する"""
+    job_id = get_job_queue().submit(kind, payload)
+    st.session_state[state_key] = job_id
+    st.query_params[state_key] = job_id
+    return job_id
+
+
+def clear_job(state_key: str) -> None:
+    st.session_state.pop(state_key, None)
+    if state_key in st.query_params:
+        del st.query_params[state_key]
+
+
+def job_status(
+    state_key: str,
+    label: str,
+    render_result: Callable[[Dict[str, Any], str], None],
+) -> None:
+    """追跡中のジョブを表示する（実行中は定期的に確認し、終わったら結果を描画する）"""
+    job_id = st.session_state.get(state_key) or st.query_params.get(state_key)
+    if not job_id:
+        return
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        clear_job(state_key)
+        return
+    st.session_state[state_key] = job_id
+
+    if not job.finished:
+        _poll(state_key, job_id, label)
+        return
+
+    if job.status == SUCCEEDED:
+        data = queue.result(job_id)
+        if data is None:
+            st.warning(f"{label}の結果が見つかりません（Session ID: {job.session_id}）")
+        else:
+            render_result(data, job.session_id)
+    elif job.status == FAILED:
+        st.error(f"❌ {label}に失敗しました: {job.error}")
+        st.info("しばらく時間をおいて再度お試しください。問題が続く場合は管理者にお問い合わせください。")
+    else:
+        st.info(f"{label}をキャンセルしました")
+    if st.button("表示を閉じる", key=f"{state_key}_clear"):
+        clear_job(state_key)
+        st.rerun()
+
+
+@_fragment(run_every=POLL_SECONDS)
+def _poll(state_key: str, job_id: str, label: str) -> None:
+    """ジョブの状態を確認する。終わっていればページ全体を再実行して結果を表示する"""
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+        return
+
+    if job.status == QUEUED:
+        st.info(f"⏳ {label}の順番を待っています。ページを離れても処理は続きます。")
+    elif job.cancel_requested:
+        st.info(f"{label}をキャンセルしています...")
+    else:
+        elapsed = int(time.time() - (job.started_at or job.created_at))
+        st.info(f"🤖 {label}を実行中です（{elapsed} 秒経過）。ページを離れても処理は続きます。")
+    if not job.cancel_requested and st.button("⏹ キャンセル", key=f"{state_key}_cancel"):
+        queue.cancel(job_id)
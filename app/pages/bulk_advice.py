@@ -0,0 +1,68 @@
+import streamlit as st
+from translations import t
+
+from services.bulk_advice import (
+    FIELDS,
+    Checkpoint,
+    create_runner,
+    default_checkpoint_path,
+    detect_format,
+    parse_leads,
+)
+from services.settings_manager import SettingsManager
+
+
+def render_errors(errors) -> None:
+    """入力エラー・生成エラーを行番号つきで表示"""
+    st.dataframe(
+        [{"行": e.row, "内容": " / ".join(e.messages)} for e in errors],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def show_bulk_advice_page():
+    """リード一覧から事前アドバイスをまとめて生成するページ"""
+    st.header(t("bulk_advice"))
+    st.write(
+        "CSV または JSONL のリード一覧をアップロードすると、各行の事前アドバイスを生成して履歴に保存します。"
+        f"列名: {', '.join(FIELDS)}（constraints は改行または ; 区切り）"
+    )
+
+    uploaded = st.file_uploader("リード一覧", type=["csv", "jsonl"], key="bulk_leads_file")
+    if uploaded is None:
+        return
+
+    data = uploaded.getvalue()
+    parsed = parse_leads(data, detect_format(uploaded.name))
+    checkpoint = Checkpoint(default_checkpoint_path(data))
+    remaining = sum(1 for lead in parsed.inputs if lead.key not in checkpoint.done)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("生成対象", len(parsed.inputs))
+    col2.metric("保存済み（再開時はスキップ）", len(parsed.inputs) - remaining)
+    col3.metric("入力エラー", len(parsed.errors))
+    if parsed.errors:
+        st.warning("以下の行は検証に失敗したため生成しません")
+        render_errors(parsed.errors)
+
+    if not remaining:
+        if parsed.inputs:
+            st.success("✅ すべての行の生成が完了しています")
+        return
+
+    if st.button(f"🚀 {remaining} 件を生成", type="primary", key="bulk_start"):
+        runner = create_runner(SettingsManager(), checkpoint=checkpoint)
+        bar = st.progress(0.0)
+        status = st.empty()
+        progress = None
+        for progress in runner.iter_run(parsed.inputs):
+            bar.progress(progress.completed / progress.total if progress.total else 1.0)
+            status.caption(
+                f"{progress.completed}/{progress.total} 件（保存 {progress.saved + progress.skipped}、失敗 {progress.failed}）"
+            )
+        if progress.failed:
+            st.error(f"❌ {progress.failed} 件の生成に失敗しました。もう一度実行すると失敗した行だけを生成します。")
+            render_errors(progress.errors)
+        else:
+            st.success(f"✅ {progress.saved} 件のアドバイスを保存しました。履歴ページで確認できます。")
@@ -6,7 +6,18 @@ import streamlit as st
 from typing import Any, Dict, List
 from urllib.parse import urlparse
 from services.storage_service import get_storage_provider
-from core.models import SalesType
+from services.session_cache import SessionCache
+from services.history_query import (
+    SORT_LATEST,
+    SORT_OLDEST,
+    SORT_PINNED_ONLY,
+    SORT_TYPE,
+    collect_facets,
+    filter_summaries,
+    sort_summaries,
+)
+from core.session_data import extract_evidence_urls
+from core.models import SalesType, SessionSummary
 from streamlit_sortables import sort_items
 from translations import t
 
@@ -17,15 +28,17 @@ def show_history_page() -> None:
 
 
     provider = get_storage_provider()
-    all_sessions: List[Dict[str, Any]] = provider.list_sessions()
+    summaries: List[SessionSummary] = SessionCache.get_summaries(provider)
+    all_sessions: List[Dict[str, Any]] = SessionCache.get_sessions(provider, refresh=False)
+    facets = collect_facets(summaries)
 
     # チーム別集計
-    team_counts = Counter(s.get("team_id", "unknown") for s in all_sessions)
+    team_counts = Counter(s.team_id for s in summaries)
     if team_counts:
         st.subheader("チーム別セッション数")
         agg_data = [{"team_id": k, "count": v} for k, v in team_counts.items()]
         st.table(agg_data)
-        chart = alt.Chart(agg_data).mark_bar().encode(x="team_id:N", y="count:Q")
+        chart = alt.Chart(alt.Data(values=agg_data)).mark_bar().encode(x="team_id:N", y="count:Q")
         st.altair_chart(chart, use_container_width=True)
 
     col_exp1, col_exp2 = st.columns(2)
@@ -54,13 +67,13 @@ def show_history_page() -> None:
         with col1:
             type_filter = st.selectbox(
                 "種類",
-                options=["すべて", "pre_advice", "post_review", "icebreaker"],
+                options=["すべて", "pre_advice", "post_review", "icebreaker", "enhanced_search"],
                 index=0,
                 help="表示するセッションの種類を選択",
                 key="history_type_filter",
             )
         with col2:
-            user_ids = sorted({s.get("user_id", "unknown") for s in all_sessions})
+            user_ids = facets["user_ids"]
             user_filter = st.selectbox(
                 "ユーザー",
                 options=["すべて"] + user_ids,
@@ -68,7 +81,7 @@ def show_history_page() -> None:
                 key="history_user_filter",
             )
         with col3:
-            team_ids = sorted({s.get("team_id", "unknown") for s in all_sessions})
+            team_ids = facets["team_ids"]
             team_filter = st.selectbox(
                 "チーム",
                 options=["すべて"] + team_ids,
@@ -90,83 +103,41 @@ def show_history_page() -> None:
             default_size = st.session_state.get("history_page_size", 10)
             page_size = st.selectbox("表示件数", options=[5, 10, 20, 50], index=[5, 10, 20, 50].index(default_size), key="history_page_size")
         with s3:
-            # 既存タグ/ドメインを収集してサジェスト
-            all_tags: set[str] = set()
-            all_domains: set[str] = set()
-            for s in all_sessions:
-                for t in (s.get("tags", []) or []):
-                    if isinstance(t, str) and t.strip():
-                        all_tags.add(t.strip())
-                data_blob = s.get("data", {}) or {}
-                if data_blob.get("type") == "pre_advice":
-                    ev = ((data_blob.get("output", {}) or {}).get("advice", {}) or {}).get("evidence_urls", [])
-                else:
-                    ev = (data_blob.get("output", {}) or {}).get("evidence_urls", [])
-                for u in ev or []:
-                    try:
-                        host = urlparse(u).netloc
-                        if host:
-                            all_domains.add(host)
-                    except Exception:
-                        pass
+            # 既存タグ/ドメインをサジェスト
+            all_tags: List[str] = facets["tags"]
             tag_filter_multi = st.multiselect(
                 "タグで絞り込み",
-                options=sorted(all_tags),
+                options=all_tags,
                 default=[],
                 key="history_tag_filter_multi",
             )
             domain_filter_multi = st.multiselect(
                 "出典ドメインで絞り込み",
-                options=sorted(all_domains),
+                options=facets["domains"],
                 default=[],
                 key="history_domain_filter_multi",
             )
 
-    sessions: List[Dict[str, Any]] = all_sessions
-
-
-    # フィルタ適用
-    def match(session: Dict[str, Any]) -> bool:
-        if type_filter != "すべて" and session["data"].get("type") != type_filter:
-            return False
-        if user_filter != "すべて" and session.get("user_id", "unknown") != user_filter:
-            return False
-        if team_filter != "すべて" and session.get("team_id", "unknown") != team_filter:
-            return False
-        if query:
-            blob = json.dumps(session["data"], ensure_ascii=False)
-            return query in blob
-        # タグフィルタ（AND）
-        if st.session_state.get("history_tag_filter_multi"):
-            tags = session.get("tags", []) or []
-            for t in st.session_state["history_tag_filter_multi"]:
-                if t not in tags:
-                    return False
-        # 出典ドメインフィルタ（OR）
-        if st.session_state.get("history_domain_filter_multi"):
-            data_blob = session.get("data", {}) or {}
-            if data_blob.get("type") == "pre_advice":
-                ev = ((data_blob.get("output", {}) or {}).get("advice", {}) or {}).get("evidence_urls", [])
-            else:
-                ev = (data_blob.get("output", {}) or {}).get("evidence_urls", [])
-            session_hosts = set()
-            for u in ev or []:
-                try:
-                    h = urlparse(u).netloc
-                    if h:
-                        session_hosts.add(h)
-                except Exception:
-                    pass
-            if not session_hosts.intersection(set(st.session_state.get("history_domain_filter_multi", []))):
-                return False
-        
-        return True
-
-    filtered = [s for s in sessions if match(s)]
+    # フィルタ適用（キーワードは本文も対象にするため、他の条件で絞った後に本文をまとめて取得する）
+    filtered = filter_summaries(
+        summaries,
+        session_type=None if type_filter == "すべて" else type_filter,
+        user_id=None if user_filter == "すべて" else user_filter,
+        team_id=None if team_filter == "すべて" else team_filter,
+        tags=st.session_state.get("history_tag_filter_multi") or [],
+        domains=st.session_state.get("history_domain_filter_multi") or [],
+    )
+    if query:
+        bodies = SessionCache.get_bodies(provider, [s.session_id for s in filtered])
+
+        def session_text(summary: SessionSummary) -> str:
+            return json.dumps(bodies.get(summary.session_id, {}), ensure_ascii=False) + summary.preview
+
+        filtered = filter_summaries(filtered, query=query, text_for=session_text)
 
     # 集計ダッシュボード
     total_count = len(filtered)
-    success_count = len([s for s in filtered if s.get("success", True)])
+    success_count = len([s for s in filtered if s.success])
     success_rate = (success_count / total_count * 100) if total_count else 0.0
     d1, d2 = st.columns(2)
     with d1:
@@ -175,25 +146,13 @@ def show_history_page() -> None:
         st.metric("成功率", f"{success_rate:.1f}%")
 
     # 並び替え
-    def sort_key_latest(x):
-        return (0 if x.get("pinned", False) else 1, x.get("created_at", ""))
-
-    def sort_key_oldest(x):
-        return (0 if x.get("pinned", False) else 1, x.get("created_at", ""))
-
-    def sort_key_type(x):
-        return (0 if x.get("pinned", False) else 1, x.get("data", {}).get("type", ""), x.get("created_at", ""))
-
-    if sort_mode == "最新順 (ピン優先)":
-        sorted_list = sorted(filtered, key=sort_key_latest, reverse=True)
-    elif sort_mode == "古い順 (ピン優先)":
-        sorted_list = sorted(filtered, key=sort_key_oldest, reverse=False)
-    elif sort_mode == "タイプ順 (ピン優先)":
-        sorted_list = sorted(filtered, key=sort_key_type, reverse=False)
-    elif sort_mode == "ピンのみ":
-        sorted_list = sorted([s for s in filtered if s.get("pinned", False)], key=sort_key_latest, reverse=True)
-    else:
-        sorted_list = filtered
+    sort_modes = {
+        "最新順 (ピン優先)": SORT_LATEST,
+        "古い順 (ピン優先)": SORT_OLDEST,
+        "タイプ順 (ピン優先)": SORT_TYPE,
+        "ピンのみ": SORT_PINNED_ONLY,
+    }
+    sorted_list = sort_summaries(filtered, sort_modes.get(sort_mode, SORT_LATEST))
 
     # ページネーション
     total = len(sorted_list)
@@ -241,7 +200,7 @@ def show_history_page() -> None:
     with top_c2:
         if st.button("このページを全選択", key="sel_all_top"):
             for it in sorted_list[start:end]:
-                sid = it.get("session_id")
+                sid = it.session_id
                 st.session_state[f"sel_{sid}"] = True
                 if sid not in selected_ids:
                     selected_ids.append(sid)
@@ -250,9 +209,9 @@ def show_history_page() -> None:
     with top_c3:
         if st.button("選択解除", key="clear_sel_top"):
             for it in sorted_list[start:end]:
-                sid = it.get("session_id")
+                sid = it.session_id
                 st.session_state[f"sel_{sid}"] = False
-            st.session_state["history_selected_ids"] = [sid for sid in selected_ids if sid not in [it.get("session_id") for it in sorted_list[start:end]]]
+            st.session_state["history_selected_ids"] = [sid for sid in selected_ids if sid not in [it.session_id for it in sorted_list[start:end]]]
             st.experimental_rerun()
     with top_c4:
         if st.button("📌 選択をピン留め", key="pin_sel_top") and selected_ids:
@@ -276,11 +235,13 @@ def show_history_page() -> None:
 
     # start/end/page_items は上で計算済み
 
-    # 一覧表示
-    for sess in page_items:
+    # 一覧表示（一覧がサマリーのみを返すプロバイダーでは表示中のページ分の本文をまとめて取得）
+    page_bodies = SessionCache.get_bodies(provider, [s.session_id for s in page_items])
+    for summary in page_items:
+        sess = SessionCache.get_session(provider, summary.session_id) or {"session_id": summary.session_id}
         meta = sess
-        data = sess.get("data", {})
         sess_id = meta.get("session_id", "-")
+        data = page_bodies.get(sess_id) or sess.get("data", {})
         created_at = meta.get("created_at", "-")
         sess_type = data.get("type", "-")
         pinned_flag = bool(meta.get("pinned", False))
@@ -310,14 +271,7 @@ def show_history_page() -> None:
             st.code(json.dumps(data.get("output", {}), ensure_ascii=False, indent=2), language="json")
 
             # 根拠リンクのハイライト表示
-            try:
-                ev_urls: List[str] = []
-                if sess_type == "pre_advice":
-                    ev_urls = list((data.get("output", {}).get("advice", {}) or {}).get("evidence_urls", []) or [])
-                elif sess_type == "post_review":
-                    ev_urls = list((data.get("output", {}) or {}).get("evidence_urls", []) or [])
-            except Exception:
-                ev_urls = []
+            ev_urls: List[str] = extract_evidence_urls(data)
             if ev_urls:
                 st.markdown("#### 🔗 根拠リンク")
                 for u in ev_urls:
@@ -354,14 +308,8 @@ def show_history_page() -> None:
             reordered = sort_items(items, direction=direction, key=f"sort_tags_{sess_id}")
             reordered_tags = [it["header"] for it in reordered] if reordered else current_tags
             tag_cols = st.columns([2, 1])
-            # 最新の全タグ候補を取得
-            provider_tags = get_storage_provider()
-            sessions_tags: List[Dict[str, Any]] = provider_tags.list_sessions()
-            all_tags_now: set[str] = set()
-            for s2 in sessions_tags:
-                for t2 in (s2.get("tags", []) or []):
-                    if isinstance(t2, str) and t2.strip():
-                        all_tags_now.add(t2.strip())
+            # 全タグ候補はページ冒頭で集計済みのものを使う
+            all_tags_now: List[str] = all_tags
             with tag_cols[0]:
                 selected_existing = st.multiselect(
                     "既存タグから選択",
@@ -474,7 +422,7 @@ def show_history_page() -> None:
     with bot_c2:
         if st.button("このページを全選択", key="sel_all_bottom"):
             for it in page_items:
-                sid = it.get("session_id")
+                sid = it.session_id
                 st.session_state[f"sel_{sid}"] = True
                 if sid not in selected_ids:
                     selected_ids.append(sid)
@@ -483,9 +431,9 @@ def show_history_page() -> None:
     with bot_c3:
         if st.button("選択解除", key="clear_sel_bottom"):
             for it in page_items:
-                sid = it.get("session_id")
+                sid = it.session_id
                 st.session_state[f"sel_{sid}"] = False
-            st.session_state["history_selected_ids"] = [sid for sid in selected_ids if sid not in [it.get("session_id") for it in page_items]]
+            st.session_state["history_selected_ids"] = [sid for sid in selected_ids if sid not in [it.session_id for it in page_items]]
             st.experimental_rerun()
     with bot_c4:
         if st.button("📌 選択をピン留め", key="pin_sel_bottom") and selected_ids:
@@ -5,12 +5,10 @@ import streamlit as st
 import json
 from typing import List
 from core.models import SalesType
-from services.post_analyzer import PostAnalyzerService
-from services.settings_manager import SettingsManager
-from services.storage_service import get_storage_provider
 from datetime import datetime
 from components.sales_type import sales_type_selectbox
 from components.copy_button import copy_button
+from components.job_status import job_status, submit_job
 from translations import t
 
 def show_post_review_page():
@@ -122,54 +120,31 @@ def show_post_review_page():
         # 分析実行ボタン
         submitted = st.form_submit_button("🔍 分析を実行", type="primary")
     
-    # フォーム送信後の処理
+    # フォーム送信後の処理（分析はジョブとして実行し、再実行やページ移動で失われないようにする）
     if submitted:
         if not all([sales_type, industry, product, meeting_content]):
             st.error("❌ 必須項目（営業タイプ、業界、商品・サービス、商談内容）を入力してください")
             return
         
-        try:
-            with st.spinner("🤖 AIが商談内容を分析中..."):
-                # 設定マネージャーを初期化
-                settings_manager = SettingsManager()
-                
-                # 分析サービスを初期化
-                analyzer = PostAnalyzerService(settings_manager)
-                
-                # 分析実行
-                analysis_result = analyzer.analyze_meeting(
-                    meeting_content=meeting_content,
-                    sales_type=sales_type,
-                    industry=industry,
-                    product=product
-                )
-            
-            # 成功メッセージ
-            st.success("✅ 商談内容の分析が完了しました！")
-            
-            # 分析結果を表示
-            display_analysis_result(analysis_result)
-            
-            # 保存機能
-            if st.button("💾 分析結果を保存", use_container_width=False):
-                session_id = save_post_review(
-                    sales_type=sales_type,
-                    industry=industry,
-                    product=product,
-                    meeting_date=meeting_date,
-                    meeting_duration=meeting_duration,
-                    meeting_type=meeting_type,
-                    meeting_content=meeting_content,
-                    customer_reaction=customer_reaction,
-                    challenges=challenges,
-                    next_meeting=next_meeting,
-                    analysis_result=analysis_result
-                )
-                st.success(f"結果を保存しました（Session ID: {session_id}）")
-                
-        except Exception as e:
-            st.error(f"❌ 分析の実行に失敗しました: {str(e)}")
-            st.info("しばらく時間をおいて再度お試しください。問題が続く場合は管理者にお問い合わせください。")
+        submit_job("post_review_job", "post_review", {
+            "sales_type": sales_type.value,
+            "industry": industry,
+            "product": product,
+            "meeting_date": str(meeting_date),
+            "meeting_duration": meeting_duration,
+            "meeting_type": meeting_type,
+            "meeting_content": meeting_content,
+            "customer_reaction": customer_reaction,
+            "challenges": challenges,
+            "next_meeting": next_meeting,
+        })
+    
+    job_status("post_review_job", "商談内容の分析", display_job_result)
+
+def display_job_result(data: dict, session_id: str):
+    """分析ジョブの結果（履歴に保存済み）の表示"""
+    st.success(f"✅ 商談内容の分析が完了しました！結果は履歴に保存されています（Session ID: {session_id}）")
+    display_analysis_result(data.get("output", {}).get("analysis_result", {}))
 
 def display_analysis_result(analysis: dict):
     """分析結果の表示"""
@@ -325,32 +300,3 @@ def display_analysis_result(analysis: dict):
     with col2:
         formatted_json = json.dumps(analysis, ensure_ascii=False, indent=2)
         copy_button(formatted_json, key="copy_all", label="📋 全体コピー", use_container_width=True)
-
-def save_post_review(**kwargs) -> str:
-    """商談後ふりかえり解析の結果をセッション形式で保存し、Session IDを返す"""
-    try:
-        provider = get_storage_provider()
-        payload = {
-            "type": "post_review",
-            "input": {
-                "sales_type": kwargs.get("sales_type"),
-                "industry": kwargs.get("industry"),
-                "product": kwargs.get("product"),
-                "meeting_date": str(kwargs.get("meeting_date")),
-                "meeting_duration": kwargs.get("meeting_duration"),
-                "meeting_type": kwargs.get("meeting_type"),
-                "meeting_content": kwargs.get("meeting_content"),
-                "customer_reaction": kwargs.get("customer_reaction"),
-                "challenges": kwargs.get("challenges"),
-                "next_meeting": kwargs.get("next_meeting"),
-            },
-            "output": {
-                "analysis_result": kwargs.get("analysis_result"),
-            },
-        }
-        session_id = provider.save_session(payload)
-        return session_id
-    except Exception as e:
-        st.error(f"保存に失敗しました: {str(e)}")
-        raise
-
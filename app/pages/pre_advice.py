@@ -7,6 +7,7 @@ from translations import t
 from components.copy_button import copy_button
 from components.sales_type import get_sales_type_emoji
 from core.models import SalesInput, SalesType
+from core.schema import PRE_ADVICE_SECTIONS
 from core.validation import (
     validate_industry,
     validate_product,
@@ -15,15 +16,59 @@ from core.validation import (
 )
 from services.icebreaker import IcebreakerService
 from services.pre_advisor import PreAdvisorService
+from services.evidence import get_evidence_context
 from services.crm_importer import CRMImporter
 from services.settings_manager import SettingsManager
 
 
+# 作り直す項目の表示名（display_advice の見出しと揃える）
+SECTION_LABELS = {
+    "short_term.openers": "開幕スクリプト",
+    "short_term.discovery": "探索質問",
+    "short_term.differentiation": "競合との差別化ポイント",
+    "short_term.objections": "反論対応",
+    "short_term.next_actions": "次のアクション",
+    "short_term.kpi": "KPI目標",
+    "short_term.summary": "短期戦略の要約",
+    "mid_term.plan_weeks_4_12": "中期計画（4-12週）",
+}
+
+
 def update_form_data(src_key: str, dest_key: str) -> None:
     """セッションに入力値を保存"""
     st.session_state.pre_advice_form_data[dest_key] = st.session_state.get(src_key)
 
 
+# フォーム内のウィジェットは on_change を持てないため、送信時にまとめて反映する
+FORM_STEP_FIELDS = {
+    1: [
+        ("sales_type_select", "sales_type"),
+        ("industry_input", "industry"),
+        ("product_input", "product"),
+    ],
+    2: [
+        ("description_type", "description_type"),
+        ("description_text", "description"),
+        ("description_url", "description_url"),
+        ("competitor_type", "competitor_type"),
+        ("competitor_text", "competitor"),
+        ("competitor_url", "competitor_url"),
+    ],
+    3: [
+        ("stage_select", "stage"),
+        ("purpose_input", "purpose"),
+        ("constraints_input", "constraints_input"),
+    ],
+}
+
+
+def sync_form_step(step: int) -> None:
+    """指定ステップのウィジェット値をフォームデータに反映"""
+    for src_key, dest_key in FORM_STEP_FIELDS.get(step, []):
+        if src_key in st.session_state:
+            update_form_data(src_key, dest_key)
+
+
 def apply_crm_data(data: dict) -> None:
     """CRMから取得したデータをフォームへ反映"""
     mapping = {
@@ -79,8 +124,6 @@ def render_form():
                 format_func=lambda x: f"{x.value} ({get_sales_type_emoji(x)})",
                 help="営業スタイルを選択してください",
                 key="sales_type_select",
-                on_change=update_form_data,
-                args=("sales_type_select", "sales_type"),
             )
 
             industry = st.text_input(
@@ -88,8 +131,6 @@ def render_form():
                 placeholder="例: IT、製造業、金融業",
                 help="対象となる業界を入力してください（2文字以上）",
                 key="industry_input",
-                on_change=update_form_data,
-                args=("industry_input", "industry"),
             )
 
             if industry:
@@ -110,8 +151,6 @@ def render_form():
                 placeholder="例: SaaS、コンサルティング",
                 help="提供する商品・サービスを入力してください（2文字以上）",
                 key="product_input",
-                on_change=update_form_data,
-                args=("product_input", "product"),
             )
 
             if product:
@@ -138,6 +177,7 @@ def render_form():
                 )
 
         if skip_clicked or next_clicked:
+            sync_form_step(1)
             st.session_state.pre_form_step = 2
             st.rerun()
 
@@ -150,8 +190,6 @@ def render_form():
                 ["テキスト", "URL"],
                 help="商品・サービスの説明をテキストで入力するか、URLで指定するかを選択してください",
                 key="description_type",
-                on_change=update_form_data,
-                args=("description_type", "description_type"),
             )
             if description_type == "テキスト":
                 st.session_state["description_url"] = None
@@ -161,8 +199,6 @@ def render_form():
                     placeholder="商品・サービスの詳細説明",
                     help="商品・サービスの特徴や価値を詳しく説明してください",
                     key="description_text",
-                    on_change=update_form_data,
-                    args=("description_text", "description"),
                 )
             else:
                 st.session_state["description_text"] = None
@@ -172,8 +208,6 @@ def render_form():
                     placeholder="https://example.com",
                     help="商品・サービスの説明が記載されているWebページのURLを入力してください",
                     key="description_url",
-                    on_change=update_form_data,
-                    args=("description_url", "description_url"),
                 )
 
             competitor_type = st.radio(
@@ -181,8 +215,6 @@ def render_form():
                 ["テキスト", "URL"],
                 help="競合情報をテキストで入力するか、URLで指定するかを選択してください",
                 key="competitor_type",
-                on_change=update_form_data,
-                args=("competitor_type", "competitor_type"),
             )
             if competitor_type == "テキスト":
                 st.session_state["competitor_url"] = None
@@ -192,8 +224,6 @@ def render_form():
                     placeholder="例: 競合A、競合B",
                     help="主要な競合企業やサービスを入力してください",
                     key="competitor_text",
-                    on_change=update_form_data,
-                    args=("competitor_text", "competitor"),
                 )
             else:
                 st.session_state["competitor_text"] = None
@@ -203,8 +233,6 @@ def render_form():
                     placeholder="https://competitor.com",
                     help="競合情報が記載されているWebページのURLを入力してください",
                     key="competitor_url",
-                    on_change=update_form_data,
-                    args=("competitor_url", "competitor_url"),
                 )
 
             is_mobile = st.session_state.get("screen_width", 1000) < 600
@@ -250,6 +278,8 @@ def render_form():
                             "次へ", type="primary", use_container_width=True
                         )
 
+        if back_clicked or skip_clicked or next_clicked:
+            sync_form_step(2)
         if back_clicked:
             st.session_state.pre_form_step = 1
             st.rerun()
@@ -267,8 +297,6 @@ def render_form():
                 ["初期接触", "ニーズ発掘", "提案", "商談", "クロージング"],
                 help="現在の商談の進行段階を選択してください",
                 key="stage_select",
-                on_change=update_form_data,
-                args=("stage_select", "stage"),
             )
 
             purpose = st.text_input(
@@ -276,8 +304,6 @@ def render_form():
                 placeholder="例: 新規顧客獲得、既存顧客拡大",
                 help="この商談の目的を具体的に入力してください（5文字以上）",
                 key="purpose_input",
-                on_change=update_form_data,
-                args=("purpose_input", "purpose"),
             )
 
             if purpose:
@@ -293,8 +319,6 @@ def render_form():
                 placeholder="例: 予算制限、期間制限、技術制約（改行で区切って入力）",
                 help="商談や提案における制約事項があれば入力してください（各制約は3文字以上）",
                 key="constraints_input",
-                on_change=update_form_data,
-                args=("constraints_input", "constraints_input"),
             )
 
             is_mobile = st.session_state.get("screen_width", 1000) < 600
@@ -348,6 +372,8 @@ def render_form():
                             use_container_width=True,
                         )
 
+        if back_clicked or skip_clicked or submitted:
+            sync_form_step(3)
         if back_clicked:
             st.session_state.pre_form_step = 2
             st.rerun()
@@ -432,6 +458,7 @@ def render_icebreaker_section():
                     search_enabled=st.session_state.pre_advice_form_data.get(
                         "use_news_checkbox", True
                     ),
+                    evidence=get_evidence_context(st.session_state, settings_manager),
                 )
             st.success("✅ アイスブレイクを生成しました！")
             st.session_state.icebreak_last_news = getattr(
@@ -601,6 +628,7 @@ def render_save_section(sales_input: SalesInput, advice: dict):
                 ):
                     st.session_state.pre_advice_form_data = {}
                     st.session_state.pop("pre_advice_session_id", None)
+                    st.session_state.pop("pre_advice_result", None)
                     st.rerun()
             with col3:
                 if st.button(
@@ -668,6 +696,11 @@ def validate_input(sales_input: SalesInput):
 
 def display_result(advice: dict, sales_input: SalesInput):
     """生成結果の表示"""
+    if advice.get("reused"):
+        st.info(
+            f"♻️ 似た入力の過去の結果を再利用しました（類似度 {advice.get('reused_similarity', 1.0):.2f}）。"
+            "作り直す場合は設定で再利用を無効にしてください。"
+        )
     if st.session_state.get("selected_icebreaker"):
         st.markdown("### ❄️ アイスブレイク（選択中）")
         st.markdown(f"> {st.session_state.selected_icebreaker}")
@@ -700,9 +733,45 @@ def display_result(advice: dict, sales_input: SalesInput):
             else:
                 st.markdown(f"- {title} {meta_str}")
 
+    render_regenerate_section(sales_input, advice)
     render_save_section(sales_input, advice)
 
 
+def render_regenerate_section(sales_input: SalesInput, advice: dict):
+    """気に入らない項目だけを作り直し、保存済みのセッションにも反映する"""
+    with st.expander("🔁 項目だけ作り直す"):
+        section = st.selectbox(
+            "作り直す項目",
+            list(PRE_ADVICE_SECTIONS),
+            format_func=lambda s: SECTION_LABELS.get(s, s),
+            key="regenerate_section",
+        )
+        instruction = st.text_input(
+            "要望（任意）",
+            key="regenerate_instruction",
+            placeholder="例: 価格以外の反論も入れてほしい",
+        )
+        if st.button("この項目を作り直す", key="regenerate_section_button"):
+            try:
+                with st.spinner("🤖 選択した項目を作り直しています..."):
+                    service = PreAdvisorService(SettingsManager())
+                    updated = service.regenerate_section(
+                        sales_input, advice, section, instruction or None
+                    )
+                st.session_state.pre_advice_result = {"advice": updated, "input": sales_input}
+                session_id = st.session_state.get("pre_advice_session_id")
+                if session_id:
+                    update_pre_advice(
+                        session_id,
+                        sales_input=sales_input,
+                        advice=updated,
+                        selected_icebreaker=st.session_state.get("selected_icebreaker"),
+                    )
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ 項目の作り直しに失敗しました: {str(e)}")
+
+
 def show_pre_advice_page():
     """事前アドバイスページを表示"""
     st.header(t("pre_advice_header"))
@@ -750,18 +819,47 @@ def show_pre_advice_page():
                 st.error(f"• {error}")
             return
         try:
+            icebreakers = None
             with st.spinner("🤖 AIがアドバイスを生成中..."):
                 settings_manager = SettingsManager()
                 service = PreAdvisorService(settings_manager)
-                advice = service.generate_advice(sales_input)
+                evidence = get_evidence_context(st.session_state, settings_manager)
+                if settings_manager.load_settings().combined_generation:
+                    # アイスブレイクも同じ 1 回の LLM 呼び出しで生成する
+                    form = st.session_state.pre_advice_form_data
+                    search_enabled = form.get("use_news_checkbox", True)
+                    advice, icebreakers = service.generate_advice_with_icebreakers(
+                        sales_input,
+                        company_hint=form.get("company_hint") or None,
+                        search_enabled=search_enabled,
+                        evidence=evidence,
+                    )
+                    st.session_state.icebreakers = icebreakers
+                    try:
+                        news = evidence.news(sales_input.industry, 2) if search_enabled else []
+                    except Exception:
+                        news = []
+                    st.session_state.icebreak_last_news = news
+                else:
+                    advice = service.generate_advice(sales_input, evidence=evidence)
 
+            st.session_state.pre_advice_result = {"advice": advice, "input": sales_input}
             st.success("✅ アドバイスの生成が完了しました！")
             display_result(advice, sales_input)
+            if icebreakers:
+                st.markdown("#### ❄️ アイスブレイク候補")
+                for line in icebreakers:
+                    st.markdown(f"- {line}")
+                st.caption("アイスブレイク生成欄で選択・コピーできます")
         except Exception as e:
             st.error(f"❌ アドバイスの生成に失敗しました: {str(e)}")
             st.info(
                 "しばらく時間をおいて再度お試しください。問題が続く場合は管理者にお問い合わせください。",
             )
+    elif "pre_advice_result" in st.session_state:
+        # 保存や項目の作り直しで再実行された後も直前の結果を表示する
+        result = st.session_state.pre_advice_result
+        display_result(result["advice"], result["input"])
 
 def display_advice(advice: dict):
     """アドバイスの表示"""
@@ -1220,22 +1318,37 @@ def display_advice(advice: dict):
                 # フォームをクリア
                 st.session_state.pre_advice_form_data = {}
                 st.session_state.pop('pre_advice_session_id', None)
+                st.session_state.pop('pre_advice_result', None)
                 st.rerun()
 
+def _pre_advice_payload(sales_input: SalesInput, advice: dict, selected_icebreaker: str | None) -> dict:
+    return {
+        "type": "pre_advice",
+        "input": sales_input.dict(),
+        "output": {
+            "advice": advice,
+            "selected_icebreaker": selected_icebreaker,
+        },
+    }
+
+
+def update_pre_advice(session_id: str, *, sales_input: SalesInput, advice: dict, selected_icebreaker: str | None) -> bool:
+    """保存済みの事前アドバイスを作り直した内容で更新する"""
+    from services.storage_service import get_storage_provider
+
+    provider = get_storage_provider()
+    return provider.update_session_data(
+        session_id, _pre_advice_payload(sales_input, advice, selected_icebreaker)
+    )
+
+
 def save_pre_advice(*, sales_input: SalesInput, advice: dict, selected_icebreaker: str | None) -> str:
     """事前アドバイスの結果をセッション形式で保存し、Session IDを返す"""
     try:
         from services.storage_service import get_storage_provider
 
         provider = get_storage_provider()
-        payload = {
-            "type": "pre_advice",
-            "input": sales_input.dict(),
-            "output": {
-                "advice": advice,
-                "selected_icebreaker": selected_icebreaker,
-            },
-        }
+        payload = _pre_advice_payload(sales_input, advice, selected_icebreaker)
         session_id = provider.save_session(payload)
         return session_id
     except Exception as e:
@@ -10,6 +10,7 @@ from datetime import datetime
 from services.search_enhancer import SearchEnhancerService
 from services.settings_manager import SettingsManager
 from services.storage_service import get_storage_provider
+from components.job_status import job_status, submit_job
 from translations import t
 
 def main():
@@ -491,87 +492,74 @@ def show_enhanced_search(search_enhancer, industry, purpose, num_results):
             st.warning("検索クエリを入力してください")
             return
 
-        with st.spinner("高度化検索を実行中..."):
-            try:
-                opt_result = search_enhancer.enhance_search_query(query, industry, purpose)
-                if "error" in opt_result:
-                    st.error(f"クエリ最適化に失敗しました: {opt_result['error']}")
-                    return
+        # 検索と評価はジョブとして実行し、再実行やページ移動で失われないようにする
+        submit_job(
+            "enhanced_search_job",
+            "enhanced_search",
+            {"query": query, "industry": industry, "purpose": purpose, "num_results": num_results},
+        )
 
-                optimized_query = query
-                if opt_result.get("optimized_queries"):
-                    optimized_query = opt_result["optimized_queries"][0]["query"]
+    job_status("enhanced_search_job", "高度化検索", display_enhanced_search_result)
 
-                search_results = search_enhancer.search_provider.search(optimized_query, num_results)
-                quality = search_enhancer.assess_search_quality(query, search_results)
 
-                st.success("高度化検索が完了しました！")
+def display_enhanced_search_result(data, session_id):
+    """高度化検索ジョブの結果（履歴に保存済み）の表示"""
+    st.success(f"高度化検索が完了しました！結果は履歴に保存されています（Session ID: {session_id}）")
+    output = data.get("output", {})
+    opt_result = output.get("query_optimization") or {}
+    search_results = output.get("search_results") or []
+    quality = output.get("quality_assessment")
 
-                st.subheader("🔧 クエリ最適化")
-                if opt_result.get("optimized_queries"):
-                    for i, opt_query in enumerate(opt_result["optimized_queries"][:3]):
-                        with st.expander(f"最適化案 {i+1}: {opt_query['query']}"):
-                            st.write(f"**理由:** {opt_query['reason']}")
-                            st.write(f"**期待される改善:** {opt_query['expected_improvement']}")
-                if opt_result.get("search_strategy"):
-                    st.write(f"**検索戦略:** {opt_result['search_strategy']}")
+    st.subheader("🔧 クエリ最適化")
+    if opt_result.get("optimized_queries"):
+        for i, opt_query in enumerate(opt_result["optimized_queries"][:3]):
+            with st.expander(f"最適化案 {i+1}: {opt_query['query']}"):
+                st.write(f"**理由:** {opt_query['reason']}")
+                st.write(f"**期待される改善:** {opt_query['expected_improvement']}")
+    if opt_result.get("search_strategy"):
+        st.write(f"**検索戦略:** {opt_result['search_strategy']}")
 
-                st.subheader("📋 検索結果")
-                if search_results:
-                    for item in search_results:
-                        with st.container(border=True):
-                            st.markdown(f"**[{item.get('title', 'タイトルなし')}]({item.get('url', '#')})**")
-                            st.write(item.get('snippet', 'N/A'))
-                            meta = []
-                            if item.get('source'):
-                                meta.append(item['source'])
-                            if item.get('published_at'):
-                                meta.append(item['published_at'])
-                            if meta:
-                                st.caption(' | '.join(meta))
-                            if item.get('score'):
-                                st.metric('スコア', f"{item['score']:.3f}")
-                            if item.get('reasons'):
-                                st.write('**理由:**')
-                                for reason in item['reasons']:
-                                    st.write(f"• {reason}")
-                else:
-                    st.info("検索結果がありません")
+    st.subheader("📋 検索結果")
+    if search_results:
+        for item in search_results:
+            with st.container(border=True):
+                st.markdown(f"**[{item.get('title', 'タイトルなし')}]({item.get('url', '#')})**")
+                st.write(item.get('snippet', 'N/A'))
+                meta = []
+                if item.get('source'):
+                    meta.append(item['source'])
+                if item.get('published_at'):
+                    meta.append(item['published_at'])
+                if meta:
+                    st.caption(' | '.join(meta))
+                if item.get('score'):
+                    st.metric('スコア', f"{item['score']:.3f}")
+                if item.get('reasons'):
+                    st.write('**理由:**')
+                    for reason in item['reasons']:
+                        st.write(f"• {reason}")
+    else:
+        st.info("検索結果がありません")
 
-                if quality and quality.get('quality_scores'):
-                    st.subheader("📊 品質評価")
-                    for score_data in quality['quality_scores']:
-                        with st.container(border=True):
-                            st.markdown(f"**{score_data['url']}**")
-                            col1, col2, col3, col4 = st.columns(4)
-                            with col1:
-                                st.metric("信頼性", f"{score_data.get('reliability_score',0):.3f}")
-                            with col2:
-                                st.metric("関連性", f"{score_data.get('relevance_score',0):.3f}")
-                            with col3:
-                                st.metric("新鮮度", f"{score_data.get('freshness_score',0):.3f}")
-                            with col4:
-                                st.metric("総合スコア", f"{score_data.get('overall_score',0):.3f}")
-                            st.write(f"**評価根拠:** {score_data.get('reasoning','')}")
-                            if score_data.get('improvement_suggestions'):
-                                for suggestion in score_data['improvement_suggestions']:
-                                    st.write(f"• {suggestion}")
-
-                if st.button("高度化検索結果を保存"):
-                    save_enhanced_search_result(
-                        {
-                            "original_query": query,
-                            "optimized_query": optimized_query,
-                            "query_optimization": opt_result,
-                            "search_results": search_results,
-                            "quality_assessment": quality,
-                        },
-                        industry,
-                        purpose,
-                    )
+    if quality and quality.get('quality_scores'):
+        st.subheader("📊 品質評価")
+        for score_data in quality['quality_scores']:
+            with st.container(border=True):
+                st.markdown(f"**{score_data['url']}**")
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("信頼性", f"{score_data.get('reliability_score',0):.3f}")
+                with col2:
+                    st.metric("関連性", f"{score_data.get('relevance_score',0):.3f}")
+                with col3:
+                    st.metric("新鮮度", f"{score_data.get('freshness_score',0):.3f}")
+                with col4:
+                    st.metric("総合スコア", f"{score_data.get('overall_score',0):.3f}")
+                st.write(f"**評価根拠:** {score_data.get('reasoning','')}")
+                if score_data.get('improvement_suggestions'):
+                    for suggestion in score_data['improvement_suggestions']:
+                        st.write(f"• {suggestion}")
 
-            except Exception as e:
-                st.error(f"高度化検索の実行中にエラーが発生しました: {e}")
 def save_optimization_result(original_query, result, industry, purpose):
     """最適化結果の保存"""
     try:
@@ -595,30 +583,6 @@ def save_optimization_result(original_query, result, industry, purpose):
     except Exception as e:
         st.error(f"結果の保存に失敗しました: {e}")
 
-def save_enhanced_search_result(result, industry, purpose):
-    """高度化検索結果の保存"""
-    try:
-        storage_provider = get_storage_provider()
-        
-        # 保存データの作成
-        data = {
-            "type": "enhanced_search",
-            "timestamp": datetime.now().isoformat(),
-            "industry": industry,
-            "purpose": purpose,
-            "result": result
-        }
-        
-        # ファイル名の生成
-        filename = f"enhanced_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
-        # 保存
-        storage_provider.save_data(filename, data)
-        st.success(f"検索結果を {filename} に保存しました")
-        
-    except Exception as e:
-        st.error(f"保存に失敗しました: {e}")
-
 def show_enhanced_search_page():
     """検索機能の高度化ページを表示"""
     main()
@@ -79,6 +79,27 @@ def show_llm_settings(settings_manager: SettingsManager):
             step=0.1,
             help="値が高いほど創造的、低いほど決定論的"
         )
+
+        combined_generation = st.checkbox(
+            "事前アドバイスとアイスブレイクを同時に生成",
+            value=settings.combined_generation,
+            help="1回のLLM呼び出しで両方を生成し、待ち時間とトークンを減らします"
+        )
+
+        advice_cache_enabled = st.checkbox(
+            "似た入力の事前アドバイスを再利用",
+            value=settings.advice_cache_enabled,
+            help="営業タイプ・業界・商品・ステージが同じで、目的などの記述が似ている過去の結果を返します"
+        )
+        advice_cache_threshold = st.slider(
+            "再利用する類似度",
+            min_value=0.5,
+            max_value=1.0,
+            value=settings.advice_cache_threshold,
+            step=0.05,
+            disabled=not advice_cache_enabled,
+            help="値が高いほど、ほぼ同じ入力のときだけ再利用します"
+        )
         
         # 設定の説明
         st.info("""
@@ -93,6 +114,9 @@ def show_llm_settings(settings_manager: SettingsManager):
         settings.default_llm_mode = default_mode
         settings.max_tokens = max_tokens
         settings.temperature = temperature
+        settings.combined_generation = combined_generation
+        settings.advice_cache_enabled = advice_cache_enabled
+        settings.advice_cache_threshold = advice_cache_threshold
         
         if settings_manager.save_settings(settings):
             st.success("LLM設定を保存しました！")
@@ -125,6 +149,12 @@ def show_search_settings(settings_manager: SettingsManager):
             step=1,
             help="取得する検索結果の件数"
         )
+
+        local_first = st.checkbox(
+            "ローカルコーパスを先に検索",
+            value=settings.search_local_first,
+            help="取り込み済みのニュースコーパスで件数が揃えば CSE / NewsAPI を呼びません"
+        )
     
     with col2:
         # プロバイダー説明
@@ -135,6 +165,7 @@ def show_search_settings(settings_manager: SettingsManager):
         - **CSE**: Google Custom Search Engine
         - **NewsAPI**: ニュースAPI
         - **Hybrid**: CSEとNewsAPIの複合検索
+        - **Local**: 取り込み済みのローカルニュースコーパス
         """)
         
         # 追加の検索制御
@@ -179,6 +210,7 @@ def show_search_settings(settings_manager: SettingsManager):
         settings.search_trusted_domains = [d.strip() for d in trusted_domains.split("\n") if d.strip()]
         settings.search_time_window_days = time_window
         settings.search_language = language
+        settings.search_local_first = local_first
         
         if settings_manager.save_settings(settings):
             st.success("検索設定を保存しました！")
@@ -12,6 +12,7 @@ TRANSLATIONS = {
         "history": "履歴",
         "settings": "設定・カスタマイズ",
         "search_enhancement": "検索機能の高度化",
+        "bulk_advice": "一括事前アドバイス",
         "quickstart_mode": "クイックスタートモード",
         "quickstart_help": "必要最小限の入力項目のみ表示",
         "sidebar_toggle_label": "☰ メニュー",
@@ -80,6 +81,7 @@ TRANSLATIONS = {
         "history": "History",
         "settings": "Settings & Customization",
         "search_enhancement": "Advanced Search",
+        "bulk_advice": "Bulk Pre-Advice",
         "quickstart_mode": "Quick Start Mode",
         "quickstart_help": "Display only essential inputs",
         "sidebar_toggle_label": "☰ Menu",
@@ -148,6 +150,7 @@ TRANSLATIONS = {
         "history": "Historial",
         "settings": "Configuración y personalización",
         "search_enhancement": "Búsqueda avanzada",
+        "bulk_advice": "Consejo previo masivo",
         "quickstart_mode": "Modo de inicio rápido",
         "quickstart_help": "Mostrar solo entradas esenciales",
         "sidebar_toggle_label": "☰ Menú",
@@ -4,12 +4,19 @@ from dotenv import load_dotenv
 from streamlit_javascript import st_javascript
 from translations import t, get_language
 from services.settings_manager import SettingsManager
+from services.metrics import start_http_server_from_env
+from services.logger import bind_request_id
 
 # 環境変数を読み込み
 load_dotenv()
 
+# METRICS_PORT が設定されていれば /metrics を公開（再実行時は起動済みのものを使う）
+start_http_server_from_env()
+
 
 def main():
+    # 再実行ごとにリクエスト ID を振り、この実行中のログに付与する
+    bind_request_id()
     st.set_page_config(
         page_title=t("app_title"),
         page_icon="🏢",
@@ -130,6 +137,7 @@ def main():
             "history",
             "settings",
             "search_enhancement",
+            "bulk_advice",
         ]
         page_labels = {k: t(k) for k in page_keys}
         # aria-label: page navigation tabs
@@ -158,6 +166,10 @@ def main():
             from pages.search_enhancement import show_enhanced_search_page
 
             show_enhanced_search_page()
+        with tabs[6]:
+            from pages.bulk_advice import show_bulk_advice_page
+
+            show_bulk_advice_page()
     else:
         # デスクトップでは従来どおりサイドバーを使用
         st.sidebar.title(t("menu"))
@@ -171,6 +183,7 @@ def main():
             "history",
             "settings",
             "search_enhancement",
+            "bulk_advice",
         ]
         page_labels = {k: t(k) for k in page_keys}
 
@@ -211,6 +224,10 @@ def main():
             from pages.search_enhancement import show_enhanced_search_page
 
             show_enhanced_search_page()
+        elif page == "bulk_advice":
+            from pages.bulk_advice import show_bulk_advice_page
+
+            show_bulk_advice_page()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+import pytest
+
+from benchmarks.conftest import SESSION_SIZES, make_sessions
+from core.models import SessionSummary
+from services.history_query import SORT_LATEST, SORT_TYPE, collect_facets, filter_summaries, sort_summaries
+
+
+@pytest.fixture(scope="module", params=SESSION_SIZES)
+def sessions(request):
+    return make_sessions(request.param)
+
+
+@pytest.fixture(scope="module")
+def summaries(sessions):
+    return [SessionSummary.from_session(s) for s in sessions]
+
+
+def test_build_summaries(benchmark, sessions):
+    result = benchmark.pedantic(
+        lambda: [SessionSummary.from_session(s) for s in sessions], rounds=5, iterations=1
+    )
+    assert len(result) == len(sessions)
+
+
+def test_collect_facets(benchmark, summaries):
+    facets = benchmark(collect_facets, summaries)
+    assert facets["tags"]
+
+
+def test_filter_summaries(benchmark, summaries):
+    result = benchmark(
+        filter_summaries,
+        summaries,
+        session_type="pre_advice",
+        query="製造業",
+        domains=["www.nikkei.com", "techcrunch.com"],
+    )
+    assert all(s.type == "pre_advice" for s in result)
+
+
+@pytest.mark.parametrize("mode", [SORT_LATEST, SORT_TYPE])
+def test_sort_summaries(benchmark, summaries, mode):
+    result = benchmark(sort_summaries, summaries, mode)
+    assert len(result) == len(summaries)
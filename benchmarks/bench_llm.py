@@ -0,0 +1,83 @@
+"""フェイク OpenAI サーバー経由で LLM 呼び出し経路をオフライン計測"""
+
+import os
+
+import pytest
+
+from core.models import SalesInput, SalesType
+from core.schema import get_pre_advice_schema
+from services.usage_meter import UsageMeter
+from tools.fake_openai import FakeOpenAIServer, FakeServerConfig
+
+
+@pytest.fixture(scope="module")
+def fake_openai_env():
+    keys = ("OPENAI_API_KEY", "OPENAI_BASE_URL", "SEARCH_PROVIDER")
+    previous = {k: os.environ.get(k) for k in keys}
+    with FakeOpenAIServer(FakeServerConfig(seed=0)) as server:
+        os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["SEARCH_PROVIDER"] = "none"
+        try:
+            yield server
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def test_call_llm_round_trip(benchmark, fake_openai_env):
+    from providers.llm_openai import OpenAIProvider
+
+    provider = OpenAIProvider()
+    UsageMeter.reset()
+    result = benchmark.pedantic(
+        provider.call_llm,
+        args=("製造業向けの提案", "speed"),
+        kwargs={"json_schema": get_pre_advice_schema(), "user_id": "bench"},
+        setup=UsageMeter.reset,
+        rounds=50,
+    )
+    assert "short_term" in result
+
+
+def test_generate_advice_end_to_end(benchmark, fake_openai_env):
+    from services.pre_advisor import PreAdvisorService
+
+    service = PreAdvisorService()
+    sales_input = SalesInput(
+        sales_type=SalesType.HUNTER,
+        industry="製造業",
+        product="在庫管理SaaS",
+        stage="初回接触",
+        purpose="新規開拓",
+    )
+    result = benchmark.pedantic(service.generate_advice, args=(sales_input,), setup=UsageMeter.reset, rounds=20)
+    assert "short_term" in result
+
+
+def test_advice_cache_lookup(benchmark):
+    """LLM 呼び出しの代わりになる類似度キャッシュの参照（256 件の行列に対して）"""
+    from benchmarks.conftest import INDUSTRIES
+    from services.advice_cache import AdviceCache
+
+    cache = AdviceCache(max_entries=256)
+    for i in range(256):
+        sales_input = SalesInput(
+            sales_type=SalesType.HUNTER,
+            industry=INDUSTRIES[i % len(INDUSTRIES)],
+            product="在庫管理SaaS",
+            stage="初回接触",
+            purpose=f"新規開拓と初回訪問の設定 {i}",
+        )
+        cache.store(sales_input, {"short_term": {"summary": str(i)}}, "bench")
+    query = SalesInput(
+        sales_type=SalesType.HUNTER,
+        industry="製造業",
+        product="在庫管理SaaS",
+        stage="初回接触",
+        purpose="新規開拓と初回訪問を設定 0",
+    )
+    assert benchmark(cache.lookup, query, "bench") is not None
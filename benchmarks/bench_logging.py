@@ -0,0 +1,36 @@
+import logging
+
+import pytest
+
+from services.logger import _ContextQueueHandler
+
+
+class _DiscardQueue:
+    def put_nowait(self, record):
+        pass
+
+
+@pytest.fixture
+def masked_logger():
+    # I/O を除いたキュー投入前の処理（整形 + マスク）のコストだけを測る
+    handler = _ContextQueueHandler(_DiscardQueue())
+    log = logging.getLogger("bench.masking")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.addHandler(handler)
+    yield log
+    log.removeHandler(handler)
+
+
+def test_log_meeting_notes(benchmark, masked_logger, long_japanese_text):
+    benchmark(masked_logger.info, "商談メモ: %s", long_japanese_text)
+
+
+def test_log_repeated_short_message(benchmark, masked_logger):
+    # 同じ文字列は LRU キャッシュから返る
+    benchmark(masked_logger.info, "SERVICE_CALL: %s.%s", "OpenAIProvider", "call_llm")
+
+
+def test_log_disabled_level(benchmark, masked_logger, long_japanese_text):
+    # レベルで捨てられるログは整形もマスクもしない
+    benchmark(masked_logger.debug, "商談メモ: %s", long_japanese_text)
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from core.models import SalesInput, SalesType
+from services.pre_advisor import PreAdvisorService
+from services.utils import mask_pii, sanitize_for_prompt, sanitize_mapping
+
+
+@pytest.fixture(scope="module")
+def pre_advisor():
+    # LLM は呼ばないため API キーはダミーでよい
+    previous = os.environ.get("OPENAI_API_KEY")
+    os.environ["OPENAI_API_KEY"] = previous or "sk-benchmark"
+    try:
+        yield PreAdvisorService()
+    finally:
+        if previous is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+
+
+def test_build_prompt(benchmark, pre_advisor, long_japanese_text):
+    sales_input = SalesInput(
+        sales_type=SalesType.CONSULTANT,
+        industry="製造業",
+        product="在庫管理SaaS",
+        description=long_japanese_text[:2000],
+        competitor="競合A社",
+        stage="提案",
+        purpose="新規開拓",
+        constraints=["予算上限あり", "導入は半年以内"],
+    )
+    prompt = benchmark(pre_advisor._build_prompt, sales_input)
+    assert "製造業" in prompt
+
+
+def test_sanitize_for_prompt(benchmark, long_japanese_text):
+    result = benchmark(sanitize_for_prompt, long_japanese_text)
+    assert "system:" not in result
+
+
+def test_sanitize_mapping(benchmark, long_japanese_text):
+    # 事前アドバイスの入力 1 件分（短い値は繰り返し現れるためキャッシュが効く）
+    fields = {
+        "sales_type": "consultant",
+        "industry": "製造業",
+        "product": "在庫管理SaaS",
+        "description": long_japanese_text[:2000],
+        "stage": "提案",
+        "purpose": "新規開拓",
+        "constraints": "予算上限あり, 導入は半年以内",
+    }
+    result = benchmark(sanitize_mapping, fields, escape=True)
+    assert "system:" not in result["description"]
+
+
+def test_mask_pii(benchmark, long_japanese_text):
+    result = benchmark(mask_pii, long_japanese_text)
+    assert "example.co.jp" not in result
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from benchmarks.conftest import CANDIDATE_SIZES, HOSTS, INDUSTRIES, JP_SENTENCE, SEED, make_candidates
+from providers.search_provider import WebSearchProvider
+from services.news_corpus import NewsCorpus
+
+
+@pytest.mark.parametrize("count", CANDIDATE_SIZES)
+def test_rank_results(benchmark, count):
+    provider = WebSearchProvider()
+    items = make_candidates(count)
+    ranked = benchmark(provider._rank_results, items, "製造業 在庫管理 DX", 10)
+    assert 0 < len(ranked) <= 10
+
+
+@pytest.fixture(scope="module")
+def news_corpus(tmp_path_factory):
+    rng = random.Random(SEED)
+    corpus = NewsCorpus(tmp_path_factory.mktemp("corpus") / "news_corpus.db")
+    corpus.add(
+        {
+            "title": f"{rng.choice(INDUSTRIES)}の最新動向 {i}：在庫管理とDXの事例",
+            "url": f"https://{rng.choice(HOSTS)}/article/{i}",
+            "snippet": JP_SENTENCE[rng.randrange(len(JP_SENTENCE) // 2) :],
+            "published_at": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z",
+        }
+        for i in range(10_000)
+    )
+    yield corpus
+    corpus.close()
+
+
+def test_local_corpus_search(benchmark, news_corpus):
+    results = benchmark(news_corpus.search, "製造業 在庫管理", 10)
+    assert len(results) == 40
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.conftest import SESSION_SIZES
+from providers.storage_local import LocalStorageProvider
+
+
+def _rounds(size: int) -> int:
+    return 3 if size >= 100000 else 10
+
+
+@pytest.mark.parametrize("size", SESSION_SIZES)
+def test_list_sessions(benchmark, session_data_dirs, size):
+    provider = LocalStorageProvider(data_dir=str(session_data_dirs[size]))
+    sessions = benchmark.pedantic(provider.list_sessions, rounds=_rounds(size), iterations=1)
+    assert len(sessions) == size
+
+
+@pytest.mark.parametrize("fmt", ["json", "csv"])
+@pytest.mark.parametrize("size", SESSION_SIZES)
+def test_export_sessions(benchmark, session_data_dirs, size, fmt):
+    provider = LocalStorageProvider(data_dir=str(session_data_dirs[size]))
+    sessions = provider.list_sessions()
+    output = benchmark.pedantic(provider.export_sessions, args=(fmt, sessions), rounds=_rounds(size), iterations=1)
+    assert output
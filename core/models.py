@@ -1,7 +1,11 @@
+from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
 from typing import List, Optional, Union, Dict, Any
 from pydantic import BaseModel, Field, field_validator, HttpUrl
 
+from .session_data import evidence_hosts, extract_evidence_urls, session_preview
+
 class SalesType(str, Enum):
     HUNTER = "hunter"  # 🏹 ハンター
     CLOSER = "closer"  # 🔒 クローザー
@@ -24,6 +28,24 @@ class SearchProvider(str, Enum):
     NEWSAPI = "newsapi"
     STUB = "stub"
     HYBRID = "hybrid"
+    LOCAL = "local"
+
+class SearchRankingWeights(BaseModel):
+    """検索結果ランキングの重み（既定値は従来の固定値）"""
+    freshness: float = Field(default=1.2, ge=0.0, description="新鮮度スコアの重み")
+    high_trust: float = Field(default=1.0, ge=0.0, description="高信頼ドメインの加点")
+    medium_trust: float = Field(default=0.8, ge=0.0, description="中信頼ドメインの加点")
+    trusted: float = Field(default=0.6, ge=0.0, description="その他の信頼ドメインの加点")
+    relevance: float = Field(default=0.8, ge=0.0, description="クエリ関連性の重み")
+    title_match: float = Field(default=0.7, ge=0.0, description="タイトル一致の重み")
+    snippet_match: float = Field(default=0.3, ge=0.0, description="スニペット一致の重み")
+    title_length: float = Field(default=0.2, ge=0.0, description="適切なタイトル長の加点")
+    detailed_snippet: float = Field(default=0.2, ge=0.0, description="詳細なスニペットの加点")
+    clean_content: float = Field(default=0.1, ge=0.0, description="HTMLタグを含まない本文の加点")
+    newsapi_source: float = Field(default=0.3, ge=0.0, description="NewsAPI由来の加点")
+    cse_source: float = Field(default=0.2, ge=0.0, description="Custom Search由来の加点")
+    diversity: float = Field(default=0.1, ge=0.0, description="ドメイン初出の加点")
+    max_score: float = Field(default=5.0, gt=0.0, description="スコアの上限")
 
 class AppSettings(BaseModel):
     """アプリケーション設定"""
@@ -32,6 +54,15 @@ class AppSettings(BaseModel):
     default_llm_mode: LLMMode = Field(default=LLMMode.SPEED, description="デフォルトのLLMモード")
     max_tokens: int = Field(default=1000, ge=100, le=4000, description="最大トークン数")
     temperature: float = Field(default=0.7, ge=0.0, le=2.0, description="創造性（温度）")
+    combined_generation: bool = Field(
+        default=False, description="事前アドバイスとアイスブレイクを1回のLLM呼び出しで生成"
+    )
+    advice_cache_enabled: bool = Field(
+        default=False, description="似た入力への過去の事前アドバイスを再利用する"
+    )
+    advice_cache_threshold: float = Field(
+        default=0.75, ge=0.5, le=1.0, description="事前アドバイスを再利用する類似度の下限"
+    )
     
     # 検索設定
     search_provider: SearchProvider = Field(default=SearchProvider.STUB, description="検索プロバイダー")
@@ -41,6 +72,12 @@ class AppSettings(BaseModel):
     ], description="信頼ドメインのホワイトリスト")
     search_time_window_days: int = Field(default=60, ge=1, le=365, description="新鮮度評価に使う日数")
     search_language: str = Field(default="ja", description="検索言語（newsapi等）")
+    search_ranking_weights: SearchRankingWeights = Field(
+        default_factory=SearchRankingWeights, description="検索結果ランキングの重み"
+    )
+    search_local_first: bool = Field(
+        default=False, description="外部検索の前にローカルのニュースコーパスを検索する"
+    )
     
     # UI設定
     language: str = Field(default="ja", description="言語設定")
@@ -95,3 +132,58 @@ class PostReviewOutput(BaseModel):
     followup_email: dict
     metrics_update: dict
 
+
+
+def _parse_created_at(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        # 保存済みデータの大半はタイムゾーンなしのため比較できるよう揃える
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+@dataclass(frozen=True, slots=True)
+class SessionSummary:
+    """履歴一覧用の軽量なセッション情報（本文は保持しない）"""
+    session_id: str
+    user_id: str = "unknown"
+    team_id: str = "unknown"
+    created_at: Optional[datetime] = None
+    created_at_raw: str = ""
+    success: bool = True
+    pinned: bool = False
+    type: str = ""
+    tags: tuple[str, ...] = ()
+    evidence_hosts: tuple[str, ...] = ()
+    preview: str = ""
+
+    @classmethod
+    def from_session(cls, session: Dict[str, Any]) -> "SessionSummary":
+        """保存形式のセッション辞書（全文・サマリーのどちらでも可）から生成"""
+        data = session.get("data") or {}
+        if "evidence_domains" in session:
+            hosts = session.get("evidence_domains") or []
+        else:
+            hosts = evidence_hosts(extract_evidence_urls(data))
+        raw_created = session.get("created_at") or ""
+        return cls(
+            session_id=str(session.get("session_id", "")),
+            user_id=session.get("user_id", "unknown"),
+            team_id=session.get("team_id", "unknown"),
+            created_at=_parse_created_at(raw_created),
+            created_at_raw=raw_created if isinstance(raw_created, str) else "",
+            success=bool(session.get("success", True)),
+            pinned=bool(session.get("pinned", False)),
+            type=data.get("type") or "",
+            tags=tuple(t.strip() for t in (session.get("tags") or []) if isinstance(t, str) and t.strip()),
+            evidence_hosts=tuple(hosts),
+            preview=session.get("preview") or session_preview(data),
+        )
+
+    @property
+    def sort_time(self) -> datetime:
+        return self.created_at or datetime.min
@@ -73,6 +73,57 @@ def get_pre_advice_schema() -> Dict[str, Any]:
         "required": ["short_term", "mid_term"]
     }
 
+def get_icebreaker_schema() -> Dict[str, Any]:
+    """アイスブレイク出力のJSONスキーマ"""
+    return {
+        "type": "object",
+        "properties": {
+            "icebreakers": {
+                "type": "array",
+                "items": {"type": "string"},
+                "minItems": 3,
+                "maxItems": 3
+            }
+        },
+        "required": ["icebreakers"]
+    }
+
+def get_pre_advice_with_icebreakers_schema() -> Dict[str, Any]:
+    """事前アドバイスとアイスブレイクを 1 回で生成する場合のJSONスキーマ"""
+    schema = get_pre_advice_schema()
+    schema["properties"]["icebreakers"] = get_icebreaker_schema()["properties"]["icebreakers"]
+    schema["required"] = schema["required"] + ["icebreakers"]
+    return schema
+
+# 個別に作り直せる事前アドバイスの項目（ドット区切りのパス）
+PRE_ADVICE_SECTIONS = (
+    "short_term.openers",
+    "short_term.discovery",
+    "short_term.differentiation",
+    "short_term.objections",
+    "short_term.next_actions",
+    "short_term.kpi",
+    "short_term.summary",
+    "mid_term.plan_weeks_4_12",
+)
+
+def get_pre_advice_section_schema(section: str) -> Dict[str, Any]:
+    """事前アドバイスの一部（例: ``short_term.objections``）だけを生成する場合のJSONスキーマ
+
+    構造化出力の最上位はオブジェクトである必要があるため ``{"section": ...}`` で包む。
+    """
+    node = get_pre_advice_schema()
+    for key in section.split("."):
+        properties = node.get("properties") or {}
+        if key not in properties:
+            raise ValueError(f"Unknown pre-advice section: {section}")
+        node = properties[key]
+    return {
+        "type": "object",
+        "properties": {"section": node},
+        "required": ["section"]
+    }
+
 def get_post_review_schema() -> Dict[str, Any]:
     """商談後ふりかえり出力のJSONスキーマ"""
     return {
@@ -0,0 +1,39 @@
+"""保存済みセッション辞書から一覧用の情報を取り出す純粋関数"""
+
+from __future__ import annotations
+
+from urllib.parse import urlparse
+
+
+def extract_evidence_urls(data: dict | None) -> list[str]:
+    """Return evidence URLs stored in a session payload.
+
+    Pre-advice sessions keep them under ``output.advice.evidence_urls`` while
+    other session types store them directly under ``output.evidence_urls``.
+    """
+    data = data or {}
+    output = data.get("output") or {}
+    if data.get("type") == "pre_advice":
+        output = output.get("advice") or {}
+    urls = output.get("evidence_urls") or []
+    return [u for u in urls if isinstance(u, str) and u]
+
+
+def evidence_hosts(urls: list[str]) -> list[str]:
+    """Return unique hostnames of the given URLs preserving order."""
+    hosts: list[str] = []
+    for u in urls:
+        try:
+            host = urlparse(u).netloc
+        except Exception:
+            continue
+        if host and host not in hosts:
+            hosts.append(host)
+    return hosts
+
+
+def session_preview(data: dict | None, max_length: int = 200) -> str:
+    """Build a short searchable preview from the string inputs of a session."""
+    inputs = (data or {}).get("input") or {}
+    parts = [v.strip() for v in inputs.values() if isinstance(v, str) and v.strip()]
+    return " ".join(parts)[:max_length]
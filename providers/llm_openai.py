@@ -1,7 +1,10 @@
 import os
+import hashlib
 import json
 import logging
-from typing import Literal, Dict, Any, Optional
+import time
+from dataclasses import dataclass
+from typing import Literal, Dict, Any, List, Optional, Sequence
 from openai import (
     OpenAI,
     RateLimitError,
@@ -12,6 +15,9 @@ from openai import (
 from tenacity import retry, stop_after_attempt, wait_exponential
 from jsonschema import validate as jsonschema_validate, ValidationError
 from services.error_handler import LLMError
+from services.metrics import counter, histogram
+from services.singleflight import SingleFlight, default_timeout
+from services.tracing import current_span, span, traced
 from services.usage_meter import UsageMeter
 
 
@@ -19,8 +25,52 @@ logger = logging.getLogger(__name__)
 
 MODEL_TOKEN_LIMIT = 4000
 
+LLM_LATENCY = histogram(
+    "llm_request_duration_seconds",
+    "call_llm 1 回（再試行の各試行）の所要時間",
+    ["mode", "model"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0),
+)
+LLM_REQUESTS = counter("llm_requests_total", "call_llm の試行回数", ["mode", "model", "outcome"])
+LLM_TOKENS = counter("llm_tokens_total", "LLM の使用トークン数", ["mode", "model", "kind"])
+
+# 同じリクエストの同時呼び出しを 1 回にまとめる
+LLM_FLIGHTS = SingleFlight("llm")
+
+# Batch API（完了まで最大 24 時間、料金は同期呼び出しの半額）
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL = 30.0
+BATCH_TIMEOUT = 24 * 60 * 60.0
+_BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+@dataclass
+class BatchRequest:
+    """Batch API に詰める 1 件分の ``call_llm`` 呼び出し"""
+
+    custom_id: str
+    prompt: str
+    mode: Literal["speed", "deep", "creative"] = "speed"
+    json_schema: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class BatchResult:
+    """``custom_id`` ごとの結果（``call_llm`` と同じ応答か、失敗理由）"""
+
+    custom_id: str
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class OpenAIProvider:
-    def __init__(self, settings_manager=None):
+    def __init__(self, settings_manager=None, base_url: Optional[str] = None):
+        """``base_url`` または環境変数 ``OPENAI_BASE_URL`` で接続先を差し替えられる"""
         api_key = os.getenv("OPENAI_API_KEY")
 
         # Secret Managerから取得 (環境変数が未設定の場合)
@@ -41,7 +91,12 @@ class OpenAIProvider:
         if not api_key:
             raise ValueError("OPENAI_API_KEYが設定されていません")
 
-        self.client = OpenAI(api_key=api_key)
+        # ローカルのフェイクサーバー（tools/fake_openai.py）などに向ける場合のみ指定
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        if base_url:
+            self.client = OpenAI(api_key=api_key, base_url=base_url)
+        else:
+            self.client = OpenAI(api_key=api_key)
         self.settings_manager = settings_manager
     
     def _get_default_modes(self):
@@ -90,7 +145,28 @@ class OpenAIProvider:
     def MODES(self):
         return self._get_default_modes()
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=8), reraise=True)
+    def _model_name(self) -> str:
+        model_name = os.getenv("OPENAI_MODEL")
+        if not model_name and self.settings_manager:
+            try:
+                settings = self.settings_manager.load_settings()
+                model_name = getattr(settings, "openai_model", None)
+            except Exception:
+                model_name = None
+        return model_name or "gpt-4o-mini"
+
+    def _flight_key(self, prompt: str, mode: str, json_schema: Optional[Dict[str, Any]]) -> str:
+        """応答を左右する接続先・モデル・生成パラメータ・プロンプト・スキーマのハッシュ"""
+        payload = [
+            str(getattr(self.client, "base_url", "")),
+            self._model_name(),
+            self.MODES[mode],
+            prompt,
+            json_schema,
+        ]
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
     def call_llm(
         self,
         prompt: str,
@@ -98,52 +174,166 @@ class OpenAIProvider:
         json_schema: Optional[Dict[str, Any]] = None,
         user_id: str = "default",
     ) -> Dict[str, Any]:
-        """LLMを呼び出してJSON形式で応答を取得"""
-        mode_config = self.MODES[mode]
+        """LLMを呼び出してJSON形式で応答を取得
 
+        同じリクエストが別のセッションで実行中なら API を呼ばずにその応答を共有する
+        （使用量は実際に API を呼んだ利用者に計上される）。
+        """
         # pre-call usage check
         if UsageMeter.get_tokens(user_id) >= UsageMeter.get_limit(user_id):
             raise LLMError("使用上限に達しました", error_code="rate_limit")
-        
+
         try:
-            # システムメッセージを構築
-            system_message = "あなたは日本のトップ営業コーチです。"
-            if json_schema:
-                system_message += "指定されたJSONスキーマに厳密に従って回答してください。"
-
-            # リクエストパラメータを構築
-            model_name = os.getenv("OPENAI_MODEL")
-            if not model_name and self.settings_manager:
-                try:
-                    settings = self.settings_manager.load_settings()
-                    model_name = getattr(settings, "openai_model", None)
-                except Exception:
-                    model_name = None
-            if not model_name:
-                model_name = "gpt-4o-mini"
-
-            request_params = {
-                "model": model_name,
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": mode_config["temperature"],
-                "max_tokens": mode_config["max_tokens"]
-            }
-            
-            # top_pが設定されている場合のみ追加
-            if "top_p" in mode_config:
-                request_params["top_p"] = mode_config["top_p"]
-            
-            # JSONスキーマが指定されている場合は厳密な検証を有効化
-            if json_schema:
-                request_params["response_format"] = {
-                    "type": "json_schema",
-                    "json_schema": json_schema,
-                    "strict": True,
+            return LLM_FLIGHTS.do(
+                self._flight_key(prompt, mode, json_schema),
+                lambda: self._call_llm(prompt, mode, json_schema, user_id),
+                timeout=default_timeout(),
+            )
+        except TimeoutError as e:
+            raise LLMError("同じリクエストの応答待ちがタイムアウトしました", error_code="timeout") from e
+
+    @traced("llm.batch", **{"gen_ai.system": "openai"})
+    def call_llm_batch(
+        self,
+        requests: Sequence[BatchRequest],
+        user_id: str = "default",
+        poll_interval: float = BATCH_POLL_INTERVAL,
+        timeout: float = BATCH_TIMEOUT,
+        sleep=time.sleep,
+    ) -> List[BatchResult]:
+        """複数の ``call_llm`` を Batch API でまとめて実行し、``requests`` と同じ順で結果を返す
+
+        リクエストを JSONL の入力ファイルにしてアップロードし、バッチの完了を
+        ``poll_interval`` 秒ごとに確認する。結果は ``custom_id`` で元のリクエストに
+        対応づけ、``call_llm`` と同じ終了理由・スキーマの検証を行う。個々の失敗は
+        ``BatchResult.error`` に入り、バッチ全体が失敗した場合は ``LLMError`` を送出する。
+        ``timeout`` 秒を過ぎても終わらなければバッチを取り消す。
+        """
+        if UsageMeter.get_tokens(user_id) >= UsageMeter.get_limit(user_id):
+            raise LLMError("使用上限に達しました", error_code="rate_limit")
+        by_id = {request.custom_id: request for request in requests}
+        if len(by_id) != len(requests):
+            raise ValueError("custom_id が重複しています")
+        if not requests:
+            return []
+
+        modes = self.MODES
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": self._build_request(request.prompt, modes[request.mode], request.json_schema),
+                },
+                ensure_ascii=False,
+            )
+            for request in requests
+        ]
+        batch_span = current_span()
+        batch_span.set_attributes({"llm.batch.size": len(requests), "gen_ai.request.model": self._model_name()})
+        try:
+            input_file = self.client.files.create(
+                file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window=BATCH_COMPLETION_WINDOW
+            )
+            deadline = time.monotonic() + timeout
+            while batch.status not in _BATCH_FINAL_STATUSES:
+                if time.monotonic() >= deadline:
+                    self.client.batches.cancel(batch.id)
+                    raise LLMError(f"バッチ {batch.id} が {timeout:.0f} 秒以内に完了しませんでした", error_code="timeout")
+                sleep(poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+            batch_span.set_attributes({"llm.batch.id": batch.id, "llm.batch.status": batch.status})
+            if batch.status == "failed":
+                errors = getattr(getattr(batch, "errors", None), "data", None) or []
+                detail = "; ".join(str(getattr(e, "message", e)) for e in errors)
+                raise LLMError(f"バッチの実行に失敗しました: {detail or batch.id}")
+
+            records: Dict[str, Dict[str, Any]] = {}
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    for line in self.client.files.content(file_id).text.splitlines():
+                        if line.strip():
+                            record = json.loads(line)
+                            records[record.get("custom_id")] = record
+        except LLMError:
+            raise
+        except Exception as e:
+            logger.error("OpenAI batch error", exc_info=e)
+            raise LLMError(f"バッチ呼び出しでエラーが発生しました: {e}") from e
+
+        results = []
+        for request in requests:
+            result = self._batch_result(request, records.get(request.custom_id), batch.status, user_id)
+            LLM_REQUESTS.inc(
+                mode=request.mode, model=self._model_name(), outcome="ok" if result.ok else "error"
+            )
+            results.append(result)
+        return results
+
+    def _batch_result(
+        self, request: BatchRequest, record: Optional[Dict[str, Any]], batch_status: str, user_id: str
+    ) -> BatchResult:
+        """出力ファイルの 1 行を ``call_llm`` と同じ形の応答にする"""
+        if record is None:
+            return BatchResult(request.custom_id, error=LLMError(f"バッチが {batch_status} になり、結果がありません"))
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or body.get("error") or {}
+            message = error.get("message") if isinstance(error, dict) else str(error)
+            return BatchResult(
+                request.custom_id,
+                error=LLMError(f"LLM呼び出しでエラーが発生しました: {message or response.get('status_code')}"),
+            )
+
+        usage = body.get("usage") or {}
+        for kind, key in (("input", "prompt_tokens"), ("output", "completion_tokens"), ("total", "total_tokens")):
+            if isinstance(usage.get(key), int) and usage[key]:
+                LLM_TOKENS.inc(usage[key], mode=request.mode, model=body.get("model") or self._model_name(), kind=kind)
+        if isinstance(usage.get("total_tokens"), int):
+            UsageMeter.add_tokens(user_id, usage["total_tokens"])
+        try:
+            choice = (body.get("choices") or [{}])[0]
+            message = choice.get("message") or {}
+            parsed = self._parse_content(
+                message.get("content"), choice.get("finish_reason"), message.get("refusal"), request.json_schema
+            )
+        except Exception as e:
+            return BatchResult(request.custom_id, error=e)
+        return BatchResult(request.custom_id, response=parsed)
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=8), reraise=True)
+    @traced("llm.call", **{"gen_ai.system": "openai"})
+    def _call_llm(
+        self,
+        prompt: str,
+        mode: Literal["speed", "deep", "creative"],
+        json_schema: Optional[Dict[str, Any]],
+        user_id: str,
+    ) -> Dict[str, Any]:
+        mode_config = self.MODES[mode]
+
+        started = time.perf_counter()
+        model_label = os.getenv("OPENAI_MODEL") or "unknown"
+        outcome = "error"
+        try:
+            request_params = self._build_request(prompt, mode_config, json_schema)
+            model_name = model_label = request_params["model"]
+
+            llm_span = current_span()
+            llm_span.set_attributes(
+                {
+                    "gen_ai.request.model": model_name,
+                    "gen_ai.request.max_tokens": mode_config["max_tokens"],
+                    "llm.mode": mode,
+                    "llm.json_schema": bool(json_schema),
+                    "prompt.chars": len(prompt),
                 }
-            
+            )
             response = self.client.chat.completions.create(**request_params)
 
             # update usage based on response tokens
@@ -151,37 +341,26 @@ class OpenAIProvider:
             tokens_used = getattr(usage_info, "total_tokens", 0)
             if not isinstance(tokens_used, int):
                 tokens_used = 0
+            for attr, key in (("prompt_tokens", "gen_ai.usage.input_tokens"), ("completion_tokens", "gen_ai.usage.output_tokens")):
+                value = getattr(usage_info, attr, None)
+                if isinstance(value, int):
+                    llm_span.set_attribute(key, value)
+            llm_span.set_attribute("gen_ai.usage.total_tokens", tokens_used)
+            for kind in ("input", "output", "total"):
+                value = llm_span.attributes.get(f"gen_ai.usage.{kind}_tokens")
+                if value:
+                    LLM_TOKENS.inc(value, mode=mode, model=model_name, kind=kind)
             total = UsageMeter.add_tokens(user_id, tokens_used)
             if total > UsageMeter.get_limit(user_id):
                 raise LLMError("使用上限に達しました", error_code="rate_limit")
 
             choice = response.choices[0]
             finish_reason = getattr(choice, "finish_reason", "stop")
+            llm_span.set_attribute("gen_ai.response.finish_reasons", [str(finish_reason)])
             refusal = getattr(getattr(choice, "message", None), "refusal", None)
-            if finish_reason != "stop" or refusal:
-                logger.error(
-                    "LLM call not completed: finish_reason=%s refusal=%s",
-                    finish_reason,
-                    refusal,
-                )
-                raise LLMError("モデルがリクエストを完了できませんでした")
-
-            content = choice.message.content
-            
-            # JSONスキーマが指定されている場合はパース
-            if json_schema and content:
-                try:
-                    parsed_response = json.loads(content)
-                    # スキーマ検証
-                    if self.validate_schema(parsed_response, json_schema):
-                        return parsed_response
-                    else:
-                        raise ValueError("LLMの応答が期待されるスキーマに従っていません")
-                except json.JSONDecodeError as e:
-                    raise ValueError(f"LLMの応答をJSONとしてパースできませんでした: {e}")
-            
-            # JSONスキーマが指定されていない場合はプレーンテキストとして返す
-            return {"content": content}
+            result = self._parse_content(choice.message.content, finish_reason, refusal, json_schema)
+            outcome = "ok"
+            return result
             
         except ValueError as e:
             # バリデーションエラーはそのまま再発生
@@ -201,7 +380,75 @@ class OpenAIProvider:
         except Exception as e:
             logger.error("Unexpected error during LLM call", exc_info=e)
             raise LLMError(f"LLM呼び出しでエラーが発生しました: {e}") from e
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - started, mode=mode, model=model_label)
+            LLM_REQUESTS.inc(mode=mode, model=model_label, outcome=outcome)
     
+    def _build_request(
+        self, prompt: str, mode_config: Dict[str, Any], json_schema: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Chat Completions のリクエストパラメータ（Batch API の ``body`` にも使う）"""
+        # システムメッセージを構築
+        system_message = "あなたは日本のトップ営業コーチです。"
+        if json_schema:
+            system_message += "指定されたJSONスキーマに厳密に従って回答してください。"
+
+        request_params = {
+            "model": self._model_name(),
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": mode_config["temperature"],
+            "max_tokens": mode_config["max_tokens"]
+        }
+        
+        # top_pが設定されている場合のみ追加
+        if "top_p" in mode_config:
+            request_params["top_p"] = mode_config["top_p"]
+        
+        # JSONスキーマが指定されている場合は厳密な検証を有効化
+        if json_schema:
+            request_params["response_format"] = {
+                "type": "json_schema",
+                "json_schema": json_schema,
+                "strict": True,
+            }
+        return request_params
+
+    def _parse_content(
+        self,
+        content: Optional[str],
+        finish_reason: Any,
+        refusal: Any,
+        json_schema: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """応答の本文を検証して返す（スキーマ指定時は JSON として解析・検証する）"""
+        if finish_reason != "stop" or refusal:
+            logger.error(
+                "LLM call not completed: finish_reason=%s refusal=%s",
+                finish_reason,
+                refusal,
+            )
+            raise LLMError("モデルがリクエストを完了できませんでした")
+
+        # JSONスキーマが指定されている場合はパース
+        if json_schema and content:
+            try:
+                parsed_response = json.loads(content)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"LLMの応答をJSONとしてパースできませんでした: {e}")
+            # スキーマ検証
+            with span("llm.validate_schema") as validate_span:
+                valid = self.validate_schema(parsed_response, json_schema)
+                validate_span.set_attribute("schema.valid", valid)
+            if not valid:
+                raise ValueError("LLMの応答が期待されるスキーマに従っていません")
+            return parsed_response
+
+        # JSONスキーマが指定されていない場合はプレーンテキストとして返す
+        return {"content": content}
+
     def validate_schema(self, response: Dict[str, Any], expected_schema: Dict[str, Any]) -> bool:
         """レスポンスが期待されるスキーマに従っているかを検証"""
         try:
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import os
 import random
 import re
@@ -7,16 +7,100 @@ from urllib.parse import urlparse
 import httpx
 import logging
 import json
+import time
+from contextvars import ContextVar
 from pathlib import Path
+
+from core.models import SearchRankingWeights
+from services.metrics import counter, histogram
+from services.news_corpus import get_corpus
+from services.relevance import BM25, IDF_TABLE, tokenize
+from services.simhash import SimHashIndex, story_fingerprint
+from services.singleflight import SingleFlight, default_timeout
+from services.tracing import current_span, span, traced
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy は任意
+    np = None
 
 logger = logging.getLogger(__name__)
 
+SEARCH_LATENCY = histogram("search_request_duration_seconds", "検索 1 回の所要時間", ["provider"])
+# outcome: ok | empty | fallback（offline_mode でキャッシュ・スタブへ切替）| error
+SEARCH_REQUESTS = counter("search_requests_total", "検索の回数", ["provider", "outcome"])
+SEARCH_BACKEND_FAILURES = counter("search_backend_failures_total", "外部検索 API の呼び出し失敗数", ["provider"])
+CACHE_REQUESTS = counter("cache_requests_total", "キャッシュの参照回数", ["cache", "result"])
+
+HIGH_TRUST_DOMAINS = ("www.nikkei.com", "www.bloomberg.co.jp", "www.reuters.com")
+MEDIUM_TRUST_DOMAINS = ("techcrunch.com", "wired.com", "mit.edu")
+# 候補がこの件数以上で NumPy が使える場合はスコアを配列でまとめて計算する
+NUMPY_RANK_THRESHOLD = 64
+_HTML_TAG_REGEX = re.compile(r"<[^>]+>")
+
+# 同じ検索の同時実行を 1 回にまとめる
+SEARCH_FLIGHTS = SingleFlight("search")
+
+# search() の実行中に読み込んだ検索設定（フォールバックのたびに設定を読み直さない）
+_active_config: ContextVar[Optional[Dict[str, Any]]] = ContextVar("search_config", default=None)
+
+# 実行中の _search() がキャッシュ・スタブへ切り替えたか（呼び出しごとに判定する）
+_call_offline: ContextVar[bool] = ContextVar("search_offline", default=False)
+
+# スタブ検索の業界別ニュース（呼び出しのたびに組み立てない）
+_STUB_INDUSTRY_NEWS: Dict[str, tuple] = {
+    "IT": (
+        "AI技術の進歩により、業務効率化が加速",
+        "クラウド移行が業界全体で進展",
+        "サイバーセキュリティの重要性が増加",
+    ),
+    "製造業": (
+        "DX推進による生産性向上が注目",
+        "サプライチェーンの最適化が課題",
+        "環境配慮型製造への転換が進行",
+    ),
+    "金融業": (
+        "フィンテックによる金融サービス革新",
+        "ESG投資の拡大が続く",
+        "デジタル通貨への関心が高まる",
+    ),
+    "医療": (
+        "テレメディシンの普及が加速",
+        "AI診断支援システムの実用化",
+        "個別化医療への期待が高まる",
+    ),
+    "小売": (
+        "EC化の進展で店舗戦略が変化",
+        "顧客体験向上への投資が活発",
+        "サステナビリティへの配慮が重要に",
+    ),
+}
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """重複判定・IDF 表のキーに使う URL（ホスト＋パスを小文字化）"""
+    if not url:
+        return None
+    try:
+        p = urlparse(url)
+        return f"{p.netloc}{p.path}".lower()
+    except Exception:
+        return url
+
+
+def _config_json(value: Any) -> Any:
+    """検索設定を single-flight のキー用に JSON へ変換する"""
+    if isinstance(value, SearchRankingWeights):
+        return value.model_dump()
+    return str(value)
+
+
 class WebSearchProvider:
     """Web検索プロバイダーのインターフェース"""
     
     def __init__(self, settings_manager=None):
         self.settings_manager = settings_manager
         self.search_provider = os.getenv("SEARCH_PROVIDER", "none")
+        # 直近の search() がオフラインだったか（参照用。呼び出しごとに上書きする）
         self.offline_mode = False
     
     def _get_search_config(self):
@@ -39,12 +123,20 @@ class WebSearchProvider:
                 lang = getattr(settings, 'search_language', 'ja')
                 if not isinstance(lang, str):
                     lang = 'ja'
+                weights = getattr(settings, 'search_ranking_weights', None)
+                if not isinstance(weights, SearchRankingWeights):
+                    weights = SearchRankingWeights()
+                local_first = getattr(settings, 'search_local_first', False)
+                if not isinstance(local_first, bool):
+                    local_first = False
                 return {
                     "provider": provider,
                     "limit": limit,
                     "trusted_domains": doms,
                     "time_window_days": wnd,
                     "language": lang,
+                    "ranking_weights": weights,
+                    "local_first": local_first,
                 }
             except Exception:
                 pass
@@ -55,6 +147,8 @@ class WebSearchProvider:
             "trusted_domains": ["www.bloomberg.co.jp", "www.nikkei.com"],
             "time_window_days": 60,
             "language": "ja",
+            "ranking_weights": SearchRankingWeights(),
+            "local_first": False,
         }
     
     def search(self, query: str, num: int = 3) -> List[Dict[str, Any]]:
@@ -64,21 +158,53 @@ class WebSearchProvider:
             title, url, snippet, source, published_at(ISO8601|None), score, reasons(list[str])
         }
         """
+        results, _ = self.search_with_status(query, num)
+        return results
+
+    def search_with_status(self, query: str, num: int = 3) -> Tuple[List[Dict[str, Any]], bool]:
+        """検索を実行し、結果とこの呼び出しがオフライン（キャッシュ・スタブ）だったかを返す"""
         config = self._get_search_config()
+        # 同じ設定・クエリの検索が別のセッションで実行中ならその結果を共有する
+        key = json.dumps([query, num, config], ensure_ascii=False, sort_keys=True, default=_config_json)
+        results, offline = SEARCH_FLIGHTS.do(
+            key, lambda: self._search(query, num, config), timeout=default_timeout()
+        )
+        self.offline_mode = offline
+        return results, offline
+
+    def _search(self, query: str, num: int, config: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+        """検索を 1 回実行し、結果とオフラインモードかどうかを返す"""
         provider = (config.get("provider") or "none").lower()
 
-        if provider == "none":
-            results = self._search_none(query, num)
-        elif provider == "stub":
-            results = self._search_stub(query, num)
-        elif provider == "cse":
-            results = self._search_cse_with_fallback(query, num)
-        elif provider == "newsapi":
-            results = self._search_newsapi_with_fallback(query, num)
-        elif provider == "hybrid":
-            results = self._search_hybrid(query, num, config.get("limit", num))
-        else:
-            results = self._search_unknown(query, num)
+        started = time.perf_counter()
+        outcome = "error"
+        offline = False
+        config_token = _active_config.set(config)
+        offline_token = _call_offline.set(False)
+        try:
+            with span("search", **{"search.provider": provider, "search.num": num}) as search_span:
+                if provider == "none":
+                    results = self._search_none(query, num)
+                elif provider == "stub":
+                    results = self._search_stub(query, num)
+                elif provider == "local":
+                    results = self._search_local_with_fallback(query, num)
+                elif provider == "cse":
+                    results = self._search_cse_with_fallback(query, num)
+                elif provider == "newsapi":
+                    results = self._search_newsapi_with_fallback(query, num)
+                elif provider == "hybrid":
+                    results = self._search_hybrid(query, num, config.get("limit", num))
+                else:
+                    results = self._search_unknown(query, num)
+                search_span.set_attribute("search.results", len(results))
+                offline = _call_offline.get()
+                outcome = "fallback" if offline else ("ok" if results else "empty")
+        finally:
+            _call_offline.reset(offline_token)
+            _active_config.reset(config_token)
+            SEARCH_LATENCY.observe(time.perf_counter() - started, provider=provider)
+            SEARCH_REQUESTS.inc(provider=provider, outcome=outcome)
 
         if not results:
             return [{
@@ -86,12 +212,12 @@ class WebSearchProvider:
                 "snippet": "ヒットしませんでした。別のキーワードで再検索してください。",
                 "url": "",
                 "source": "system",
-            }]
+            }], offline
 
-        if self.offline_mode:
+        if offline:
             logger.warning("オフラインモード: Web検索に失敗したためスタブデータを使用します。")
 
-        return results
+        return results, offline
 
     def _search_none(self, query: str, num: int) -> List[Dict[str, Any]]:
         return []
@@ -99,7 +225,22 @@ class WebSearchProvider:
     def _search_stub(self, query: str, num: int) -> List[Dict[str, Any]]:
         return self._rank_results(self._get_stub_results(query, num), query, num)
 
+    def _search_local_with_fallback(self, query: str, num: int) -> List[Dict[str, Any]]:
+        res = self._rank_results(self._search_local(query, num), query, num)
+        return res if res else self._rank_results(self._get_stub_results(query, num), query, num)
+
+    def _search_local_first(self, query: str, num: int) -> List[Dict[str, Any]]:
+        """``search_local_first`` が有効で、ローカルコーパスだけで件数が揃えばその結果"""
+        cfg = _active_config.get() or self._get_search_config()
+        if not cfg.get("local_first"):
+            return []
+        res = self._rank_results(self._search_local(query, num), query, num)
+        return res if len(res) >= num else []
+
     def _search_cse_with_fallback(self, query: str, num: int) -> List[Dict[str, Any]]:
+        local = self._search_local_first(query, num)
+        if local:
+            return local
         res = self._rank_results(self._search_cse(query, num), query, num)
         if res:
             return res
@@ -107,6 +248,9 @@ class WebSearchProvider:
         return alt if alt else self._rank_results(self._get_stub_results(query, num), query, num)
 
     def _search_newsapi_with_fallback(self, query: str, num: int) -> List[Dict[str, Any]]:
+        local = self._search_local_first(query, num)
+        if local:
+            return local
         res = self._rank_results(self._search_newsapi(query, num), query, num)
         if res:
             return res
@@ -114,6 +258,9 @@ class WebSearchProvider:
         return alt if alt else self._rank_results(self._get_stub_results(query, num), query, num)
 
     def _search_hybrid(self, query: str, num: int, limit: int) -> List[Dict[str, Any]]:
+        local = self._search_local_first(query, num)
+        if local:
+            return local
         merged = self._merge_dedupe(
             self._search_cse(query, num),
             self._search_newsapi(query, num),
@@ -125,47 +272,19 @@ class WebSearchProvider:
     def _search_unknown(self, query: str, num: int) -> List[Dict[str, Any]]:
         return self._rank_results(self._get_stub_results(query, num), query, num)
     
+    @traced("search.stub", **{"search.provider": "stub"})
     def _get_stub_results(self, query: str, num: int) -> List[Dict[str, Any]]:
         """スタブ検索結果を返す"""
-        # 業界別の一般的なニューステンプレート
-        industry_news = {
-            "IT": [
-                "AI技術の進歩により、業務効率化が加速",
-                "クラウド移行が業界全体で進展",
-                "サイバーセキュリティの重要性が増加"
-            ],
-            "製造業": [
-                "DX推進による生産性向上が注目",
-                "サプライチェーンの最適化が課題",
-                "環境配慮型製造への転換が進行"
-            ],
-            "金融業": [
-                "フィンテックによる金融サービス革新",
-                "ESG投資の拡大が続く",
-                "デジタル通貨への関心が高まる"
-            ],
-            "医療": [
-                "テレメディシンの普及が加速",
-                "AI診断支援システムの実用化",
-                "個別化医療への期待が高まる"
-            ],
-            "小売": [
-                "EC化の進展で店舗戦略が変化",
-                "顧客体験向上への投資が活発",
-                "サステナビリティへの配慮が重要に"
-            ]
-        }
-        
         # クエリから業界を推測
         detected_industry = "IT"  # デフォルト
-        for industry in industry_news.keys():
+        for industry in _STUB_INDUSTRY_NEWS:
             if industry in query:
                 detected_industry = industry
                 break
-        
+
         # 業界別のニュースを取得
-        industry_specific_news = industry_news.get(detected_industry, industry_news["IT"])
-        
+        industry_specific_news = _STUB_INDUSTRY_NEWS[detected_industry]
+
         # ランダムにニュースを選択
         selected_news = random.sample(industry_specific_news, min(num, len(industry_specific_news)))
         
@@ -182,6 +301,20 @@ class WebSearchProvider:
         return results
 
     # ============ 実プロバイダ ============
+    @traced("search.local", **{"search.provider": "local"})
+    def _search_local(self, query: str, num: int) -> List[Dict[str, Any]]:
+        """ローカルのニュースコーパス（``NEWS_CORPUS_PATH``）を検索する（索引がなければ空）"""
+        corpus = get_corpus()
+        if corpus is None:
+            return []
+        try:
+            return corpus.search(query, num)
+        except Exception as e:
+            logger.warning("Local corpus search failed: %s", e)
+            SEARCH_BACKEND_FAILURES.inc(provider="local")
+            return []
+
+    @traced("search.cse", **{"search.provider": "cse"})
     def _search_cse(self, query: str, num: int) -> List[Dict[str, Any]]:
         api_key = os.getenv("CSE_API_KEY")
         cx = os.getenv("CSE_CX")
@@ -202,8 +335,9 @@ class WebSearchProvider:
                 resp.raise_for_status()
                 data = resp.json()
         except Exception as e:
-            self.offline_mode = True
+            _call_offline.set(True)
             logger.warning("CSE search failed: %s", e)
+            SEARCH_BACKEND_FAILURES.inc(provider="cse")
             return self._load_cached_results(query, num)
         items = data.get("items", []) or []
         results: List[Dict[str, Any]] = []
@@ -217,6 +351,7 @@ class WebSearchProvider:
             })
         return results
 
+    @traced("search.newsapi", **{"search.provider": "newsapi"})
     def _search_newsapi(self, query: str, num: int) -> List[Dict[str, Any]]:
         api_key = os.getenv("NEWSAPI_KEY")
         if not api_key:
@@ -236,8 +371,9 @@ class WebSearchProvider:
                 resp.raise_for_status()
                 data = resp.json()
         except Exception as e:
-            self.offline_mode = True
+            _call_offline.set(True)
             logger.warning("NewsAPI search failed: %s", e)
+            SEARCH_BACKEND_FAILURES.inc(provider="newsapi")
             return self._load_cached_results(query, num)
         arts = data.get("articles", []) or []
         results: List[Dict[str, Any]] = []
@@ -252,64 +388,165 @@ class WebSearchProvider:
         return results[:num]
 
     def _load_cached_results(self, query: str, num: int) -> List[Dict[str, Any]]:
+        local = self._search_local(query, num)
+        if local:
+            CACHE_REQUESTS.inc(cache="search_fallback", result="local")
+            return local
         cache_path = Path(__file__).resolve().parent.parent / "data" / "search_cache.json"
         try:
             with open(cache_path, "r", encoding="utf-8") as f:
                 cache = json.load(f)
             for key, items in cache.items():
                 if key.lower() in query.lower():
+                    CACHE_REQUESTS.inc(cache="search_fallback", result="hit")
                     return items[:num]
         except Exception:
             pass
+        CACHE_REQUESTS.inc(cache="search_fallback", result="miss")
         return self._get_stub_results(query, num)
 
     # ============ マージ・スコアリング ============
     def _merge_dedupe(self, a: List[Dict[str, Any]], b: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """URL の重複を除いて結合し、転載記事（SimHash の近似重複）は 1 件にまとめる
+
+        近似重複のうち各プロバイダ内の順位が高い方を残し、まとめた記事の URL を
+        ``duplicates`` に記録する。まとめた記事は ``limit`` の件数に数えない。
+        """
         seen = set()
         merged: List[Dict[str, Any]] = []
-        for item in [*a, *b]:
+        ranks: List[int] = []
+        index: SimHashIndex[int] = SimHashIndex()
+        collapsed = 0
+        for rank, item in [*enumerate(a), *enumerate(b)]:
             key = self._normalize_url(item.get("url"))
             if not key or key in seen:
                 continue
             seen.add(key)
-            merged.append(item)
+            fp = story_fingerprint(item.get("title"), item.get("snippet"))
+            pos = index.find(fp) if fp is not None else None
+            if pos is not None:
+                collapsed += 1
+                kept = merged[pos]
+                if rank < ranks[pos]:
+                    item["duplicates"] = [*item.get("duplicates", []), kept.get("url"), *kept.pop("duplicates", [])]
+                    merged[pos], ranks[pos] = item, rank
+                else:
+                    kept.setdefault("duplicates", []).append(item.get("url"))
+                continue
             if len(merged) >= limit:
-                break
+                # 以降は既存の記事の転載かどうかだけを確認する
+                continue
+            if fp is not None:
+                index.add(fp, len(merged))
+            merged.append(item)
+            ranks.append(rank)
+        parent = current_span()
+        if parent is not None:
+            parent.set_attribute("search.near_duplicates", collapsed)
         return merged
 
     def _normalize_url(self, url: Optional[str]) -> Optional[str]:
-        if not url:
-            return None
-        try:
-            p = urlparse(url)
-            return f"{p.netloc}{p.path}".lower()
-        except Exception:
-            return url
+        return normalize_url(url)
 
+    @traced("search.rank")
     def _rank_results(self, items: List[Dict[str, Any]], query: str, num: int) -> List[Dict[str, Any]]:
-        """高度化された検索結果のランキング"""
+        """高度化された検索結果のランキング
+
+        ホスト名と小文字化したキーワードは 1 回だけ求め、ドメインの初出判定と
+        最終的な多様性の確保は集合で O(n) に行う。候補が ``NUMPY_RANK_THRESHOLD``
+        件以上で NumPy が使える場合は各項目の加点を配列でまとめて合算する。
+        重みは ``AppSettings.search_ranking_weights`` から取得する。
+        """
         if not items:
             return []
+        cfg = _active_config.get() or self._get_search_config()
+        weights = cfg.get("ranking_weights") or SearchRankingWeights()
+        features = self._rank_features(items, query, cfg, weights)
+        if np is not None and len(items) >= NUMPY_RANK_THRESHOLD:
+            scores = self._combine_scores_numpy(features, weights)
+        else:
+            scores = self._combine_scores(features, weights)
+
+        for i, it in enumerate(items):
+            score, final_score = scores["score"][i], scores["final"][i]
+            fresh = features["fresh"][i]
+            content_quality = scores["content_quality"][i]
+            source_quality = features["source"][i]
+            it["score"] = round(final_score, 3)
+            it["reasons"] = features["reasons"][i]
+            it["detailed_scoring"] = {
+                "freshness": fresh,
+                "reliability": score - fresh - content_quality - source_quality,
+                "relevance": scores["relevance"][i],
+                "content_quality": content_quality,
+                "source_quality": source_quality,
+            }
+
+        # スコアによる並び替え（同点は入力順）
+        order = sorted(range(len(items)), key=lambda i: items[i]["score"], reverse=True)
+        hosts = features["host"]
+
+        # 結果の多様性を確保：まずドメインが重複しない結果を優先的に追加し、
+        # 要求された数に満たない場合は残りをスコア順に追加する
+        chosen: List[int] = []
+        seen_domains = set()
+        for i in order:
+            if len(chosen) >= num:
+                break
+            if hosts[i] not in seen_domains:
+                chosen.append(i)
+                seen_domains.add(hosts[i])
+        if len(chosen) < num:
+            picked = set(chosen)
+            for i in order:
+                if len(chosen) >= num:
+                    break
+                if i not in picked:
+                    chosen.append(i)
+
+        return [items[i] for i in chosen[:num]]
+
+    def _rank_features(
+        self,
+        items: List[Dict[str, Any]],
+        query: str,
+        cfg: Dict[str, Any],
+        weights: SearchRankingWeights,
+    ) -> Dict[str, List[Any]]:
+        """各項目の加点要素と理由を求める（合算は ``_combine_scores*``）"""
         now = datetime.now(timezone.utc)
-        cfg = self._get_search_config()
-        keywords = [w for w in re.split(r"\s+", query) if len(w) >= 2]
-        trusted_domains_map = {d: 1.0 for d in cfg.get("trusted_domains", [])}
-        ranked: List[Dict[str, Any]] = []
-        
-        for it in items:
-            score = 0.0
+        trusted_domains = set(cfg.get("trusted_domains", []))
+        try:
+            window: Optional[int] = max(1, int(cfg.get("time_window_days", 60)))
+        except Exception:
+            window = None
+
+        # 関連度は見出しと抜粋を別々に BM25 で採点し、IDF 表には両方を 1 文書として蓄積する
+        title_tokens = [tokenize(it.get("title")) for it in items]
+        snippet_tokens = [tokenize(it.get("snippet")) for it in items]
+        for i, it in enumerate(items):
+            IDF_TABLE.add(title_tokens[i] + snippet_tokens[i], self._normalize_url(it.get("url")))
+        scorer = BM25(query)
+        average_title = sum(map(len, title_tokens)) / len(items)
+        average_snippet = sum(map(len, snippet_tokens)) / len(items)
+
+        features: Dict[str, List[Any]] = {
+            "host": [], "fresh": [], "fresh_term": [], "trust": [], "relevance": [],
+            "title_length": [], "detailed_snippet": [], "clean_content": [],
+            "source": [], "diversity": [], "reasons": [],
+        }
+        seen_hosts = set()
+        for i, it in enumerate(items):
             reasons: List[str] = []
-            fresh = 0.0  # 新鮮度スコアを初期化
 
-            # 1. 新鮮度スコア（時効性の重要度を向上）
+            # 1. 新鮮度スコア（非線形：より新しい記事により高い重み）
+            fresh = 0.0
+            fresh_term = 0.0
             ts = it.get("published_at")
-            if ts:
+            if ts and window is not None:
                 try:
                     dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
                     days = max(0, (now - dt).days)
-                    window = max(1, int(cfg.get("time_window_days", 60)))
-
-                    # 非線形な新鮮度計算（より新しい記事により高い重み）
                     if days <= 1:
                         fresh = 1.0  # 24時間以内
                     elif days <= 7:
@@ -320,125 +557,119 @@ class WebSearchProvider:
                         fresh = 0.4  # 3ヶ月以内
                     else:
                         fresh = max(0.1, 1.0 - (days / float(window)))
-
-                    score += fresh * 1.2  # 新鮮度の重みを増加
+                    fresh_term = fresh * weights.freshness
                     reasons.append("freshness")
                 except Exception:
                     pass
-            
+
             # 2. ドメイン信頼性スコア（階層化された信頼度）
             host = urlparse(it.get("url", "")).netloc
-            if host in trusted_domains_map:
-                # 信頼ドメインの種類に応じた重み付け
-                if any(high_trust in host for high_trust in ["www.nikkei.com", "www.bloomberg.co.jp", "www.reuters.com"]):
-                    score += 1.0  # 最高信頼度
+            trust = 0.0
+            if host in trusted_domains:
+                if any(high_trust in host for high_trust in HIGH_TRUST_DOMAINS):
+                    trust = weights.high_trust
                     reasons.append("high_trusted_domain")
-                elif any(medium_trust in host for medium_trust in ["techcrunch.com", "wired.com", "mit.edu"]):
-                    score += 0.8  # 中程度信頼度
+                elif any(medium_trust in host for medium_trust in MEDIUM_TRUST_DOMAINS):
+                    trust = weights.medium_trust
                     reasons.append("medium_trusted_domain")
                 else:
-                    score += 0.6  # 基本信頼度
+                    trust = weights.trusted
                     reasons.append("trusted_domain")
-            
-            # 3. クエリ関連性スコア（より洗練されたマッチング）
-            text = ((it.get("title") or "") + " " + (it.get("snippet") or "")).lower()
-            
-            # タイトルとスニペットの重み付け
-            title_text = (it.get("title") or "").lower()
-            snippet_text = (it.get("snippet") or "").lower()
-            
-            title_matches = sum(1 for k in keywords if k.lower() in title_text)
-            snippet_matches = sum(1 for k in keywords if k.lower() in snippet_text)
-            
-            # タイトルマッチの方が重要
-            relevance_score = (title_matches * 0.7 + snippet_matches * 0.3) / max(1, len(keywords))
-            score += min(1.0, relevance_score) * 0.8
+
+            # 3. クエリ関連性スコア（BM25、タイトルの一致の方が重要）
+            title = it.get("title") or ""
+            snippet = it.get("snippet") or ""
+            relevance = (
+                weights.title_match * scorer.normalized(title_tokens[i], average_title)
+                + weights.snippet_match * scorer.normalized(snippet_tokens[i], average_snippet)
+            )
             reasons.append("keyword_match")
-            
-            # 4. コンテンツ品質スコア（新しい指標）
-            content_quality = 0.0
-            
-            # タイトルの長さ（適切な長さを評価）
-            title_length = len(it.get("title", ""))
-            if 20 <= title_length <= 100:
-                content_quality += 0.2
+
+            # 4. コンテンツ品質スコア（タイトルの長さ・スニペットの詳細度・HTMLタグの有無）
+            title_length = 0.0
+            if 20 <= len(title) <= 100:
+                title_length = weights.title_length
                 reasons.append("optimal_title_length")
-            
-            # スニペットの詳細度
-            snippet_length = len(it.get("snippet", ""))
-            if snippet_length >= 100:
-                content_quality += 0.2
+            detailed_snippet = 0.0
+            if len(snippet) >= 100:
+                detailed_snippet = weights.detailed_snippet
                 reasons.append("detailed_snippet")
-            
-            # 特殊文字やHTMLタグの除去
-            clean_text = re.sub(r'<[^>]+>', '', text)
-            if clean_text == text:
-                content_quality += 0.1
+            clean_content = 0.0
+            if _HTML_TAG_REGEX.search(title + " " + snippet) is None:
+                clean_content = weights.clean_content
                 reasons.append("clean_content")
-            
-            score += content_quality
             reasons.append("content_quality")
-            
+
             # 5. ソース品質スコア
-            source_quality = 0.0
             source = it.get("source", "")
-            
+            source_quality = 0.0
             if source == "newsapi":
-                source_quality += 0.3
+                source_quality = 0.0 + weights.newsapi_source
                 reasons.append("news_api_source")
             elif source == "cse":
-                source_quality += 0.2
+                source_quality = 0.0 + weights.cse_source
                 reasons.append("custom_search_source")
-            
-            score += source_quality
-            
-            # 6. 多様性ボーナス（同じドメインからの結果を抑制）
-            domain_count = sum(1 for r in ranked if urlparse(r.get("url", "")).netloc == host)
-            if domain_count == 0:
-                score += 0.1
+
+            # 6. 多様性ボーナス（そのドメインの初出のみ）
+            diversity = 0.0
+            if host not in seen_hosts:
+                seen_hosts.add(host)
+                diversity = weights.diversity
                 reasons.append("diversity_bonus")
-            
-            # スコアの正規化と最終調整
-            final_score = min(5.0, score)  # 最大スコアを5.0に制限
-            
-            it["score"] = round(final_score, 3)
-            it["reasons"] = reasons
-            it["detailed_scoring"] = {
-                "freshness": fresh,
-                "reliability": score - fresh - content_quality - source_quality,
-                "relevance": relevance_score * 0.8,
-                "content_quality": content_quality,
-                "source_quality": source_quality
-            }
-            
-            ranked.append(it)
-        
-        # スコアによる並び替え
-        ranked.sort(key=lambda x: x.get("score", 0), reverse=True)
-        
-        # 結果の多様性を確保（上位結果のドメイン重複を制限）
-        final_results = []
-        seen_domains = set()
-        
-        # まず、ドメインが重複しない結果を優先的に追加
-        for item in ranked:
-            if len(final_results) >= num:
-                break
-            
-            host = urlparse(item.get("url", "")).netloc
-            if host not in seen_domains:
-                final_results.append(item)
-                seen_domains.add(host)
-        
-        # 要求された数に満たない場合は、残りの結果を追加
-        if len(final_results) < num:
-            for item in ranked:
-                if len(final_results) >= num:
-                    break
-                
-                # まだ追加されていない結果のみ
-                if item not in final_results:
-                    final_results.append(item)
-        
-        return final_results[:num]
+
+            features["host"].append(host)
+            features["fresh"].append(fresh)
+            features["fresh_term"].append(fresh_term)
+            features["trust"].append(trust)
+            features["relevance"].append(relevance)
+            features["title_length"].append(title_length)
+            features["detailed_snippet"].append(detailed_snippet)
+            features["clean_content"].append(clean_content)
+            features["source"].append(source_quality)
+            features["diversity"].append(diversity)
+            features["reasons"].append(reasons)
+        return features
+
+    @staticmethod
+    def _combine_scores(features: Dict[str, List[Any]], weights: SearchRankingWeights) -> Dict[str, List[float]]:
+        """加点要素を従来と同じ順序で合算する（浮動小数点の結果を一致させるため）"""
+        result: Dict[str, List[float]] = {"score": [], "final": [], "relevance": [], "content_quality": []}
+        for i in range(len(features["host"])):
+            relevance = features["relevance"][i]
+            content_quality = 0.0 + features["title_length"][i] + features["detailed_snippet"][i] + features["clean_content"][i]
+            score = (
+                0.0
+                + features["fresh_term"][i]
+                + features["trust"][i]
+                + min(1.0, relevance) * weights.relevance
+                + content_quality
+                + features["source"][i]
+                + features["diversity"][i]
+            )
+            result["score"].append(score)
+            result["final"].append(min(weights.max_score, score))
+            result["relevance"].append(relevance * weights.relevance)
+            result["content_quality"].append(content_quality)
+        return result
+
+    @staticmethod
+    def _combine_scores_numpy(features: Dict[str, List[Any]], weights: SearchRankingWeights) -> Dict[str, List[float]]:
+        """``_combine_scores`` と同じ合算を配列でまとめて行う"""
+        arr = {k: np.asarray(v, dtype=np.float64) for k, v in features.items() if k not in ("host", "reasons")}
+        content_quality = 0.0 + arr["title_length"] + arr["detailed_snippet"] + arr["clean_content"]
+        score = (
+            0.0
+            + arr["fresh_term"]
+            + arr["trust"]
+            + np.minimum(1.0, arr["relevance"]) * weights.relevance
+            + content_quality
+            + arr["source"]
+            + arr["diversity"]
+        )
+        return {
+            "score": score.tolist(),
+            "final": np.minimum(weights.max_score, score).tolist(),
+            "relevance": (arr["relevance"] * weights.relevance).tolist(),
+            "content_quality": content_quality.tolist(),
+        }
 
@@ -1,18 +1,84 @@
 import csv
 import io
 import json
+import logging
 import os
 import uuid
-from datetime import datetime
-from typing import Any, Dict, List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
 
 from google.cloud import firestore
 
+from core.models import SessionSummary
+from core.session_data import evidence_hosts, extract_evidence_urls, session_preview
+from services.metrics import track_storage
+from services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# 一覧表示に必要なフィールドのみを取得する（本文の data.output は含めない）
+SUMMARY_FIELDS = [
+    "session_id",
+    "user_id",
+    "team_id",
+    "created_at",
+    "success",
+    "pinned",
+    "tags",
+    "preview",
+    "evidence_domains",
+    "has_body",
+    "updated_at",
+    "data.type",
+]
+
+# firestore.Query.DESCENDING と同値
+_DESCENDING = "DESCENDING"
+
+# get_all 1 回で読むセッション数（サマリーと本文で 2 倍のドキュメントになる）
+GET_ALL_CHUNK = 100
+
+# WriteBatch 1 回に詰めるセッション数（サマリーと本文で 2 書き込み、上限は 500）
+BATCH_WRITE_SESSIONS = 250
+
+# 初回スナップショットを読むときの 1 ページの件数
+LIST_PAGE_SIZE = 500
+
+# レプリカ間の時計のずれを吸収するため、変更取得時にカーソルを巻き戻す秒数
+CHANGE_FEED_SKEW_SECONDS = 5
+
+# 削除の墓標を残す日数。これより古いカーソルは墓標が消えている可能性があるため全件を読み直す
+TOMBSTONE_TTL_DAYS = 7
+
+# 削除のたびに掃除する期限切れ墓標の上限
+TOMBSTONE_PRUNE_LIMIT = 100
+
+
+def has_body(session: Dict[str, Any]) -> bool:
+    """セッション辞書が本文（``type`` 以外の ``data``）を持つか"""
+    return any(k != "type" for k in (session.get("data") or {}))
+
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _tombstone_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_TTL_DAYS)
+
 
 class FirestoreStorageProvider:
-    """Firestore based session storage provider."""
+    """Firestore based session storage provider.
+
+    Each session is stored as a lightweight summary document under
+    ``tenants/{tenant}/sessions/{session_id}`` and a body document holding the
+    full payload under ``.../{session_id}/body/content``. Listing only reads
+    the summary fields; the body is fetched on demand by ``load_session``.
+    Documents written before the split keep their payload inline and are
+    still readable.
+    """
 
-    def __init__(self, tenant_id: str, credentials_path: str | None = None) -> None:
+    def __init__(self, tenant_id: str, credentials_path: str | None = None, archive=None) -> None:
         if not tenant_id:
             raise ValueError("tenant_id is required")
         if credentials_path:
@@ -22,6 +88,12 @@ class FirestoreStorageProvider:
         else:
             self.client = firestore.Client()
         self.tenant_id = tenant_id
+        # 保存先に無いセッションを探すアーカイブ（services.retention.SessionArchive）
+        self.archive = archive
+
+    @property
+    def cache_key(self) -> str:
+        return f"firestore:{self.tenant_id}"
 
     def _sessions_collection(self):
         return (
@@ -33,6 +105,18 @@ class FirestoreStorageProvider:
     def _doc(self, session_id: str):
         return self._sessions_collection().document(session_id)
 
+    def _body_doc(self, session_id: str):
+        return self._doc(session_id).collection("body").document("content")
+
+    def _deleted_collection(self):
+        return (
+            self.client.collection("tenants")
+            .document(self.tenant_id)
+            .collection("deleted_sessions")
+        )
+
+    @traced("storage.save_session", **{"db.system": "firestore"})
+    @track_storage("firestore")
     def save_session(
         self,
         data: Dict[str, Any],
@@ -41,45 +125,214 @@ class FirestoreStorageProvider:
         team_id: str | None = None,
         success: bool | None = None,
     ) -> str:
-        if session_id is None:
-            session_id = str(uuid.uuid4())
+        session_id = session_id or str(uuid.uuid4())
+        batch = self.client.batch()
+        batch.set(self._doc(session_id), self._new_summary(data, session_id, user_id, team_id, success))
+        batch.set(self._body_doc(session_id), {"data": data})
+        batch.commit()
+        return session_id
+
+    @traced("storage.save_sessions", **{"db.system": "firestore"})
+    @track_storage("firestore")
+    def save_sessions(self, sessions: List[Tuple[Dict[str, Any], str | None]]) -> List[str]:
+        """``(data, session_id)`` の組をまとめて保存し、セッション ID を返す
+
+        ``WriteBatch`` の上限（500 書き込み）に収まるよう ``BATCH_WRITE_SESSIONS`` 件ずつ
+        コミットする。途中のコミットが失敗した場合は例外を送出する（それ以前の分は保存済み）。
+        """
+        ids: List[str] = []
+        for i in range(0, len(sessions), BATCH_WRITE_SESSIONS):
+            batch = self.client.batch()
+            for data, session_id in sessions[i : i + BATCH_WRITE_SESSIONS]:
+                session_id = session_id or str(uuid.uuid4())
+                batch.set(self._doc(session_id), self._new_summary(data, session_id))
+                batch.set(self._body_doc(session_id), {"data": data})
+                ids.append(session_id)
+            batch.commit()
+        return ids
+
+    def _new_summary(
+        self,
+        data: Dict[str, Any],
+        session_id: str,
+        user_id: str | None = None,
+        team_id: str | None = None,
+        success: bool | None = None,
+    ) -> Dict[str, Any]:
         if user_id is None:
             user_id = os.getenv("USER_ID", "anonymous")
         if team_id is None:
             team_id = os.getenv("TEAM_ID", "unknown")
         if success is None:
             success = data.get("success", True)
-        doc = self._doc(session_id)
-        doc.set(
-            {
-                "session_id": session_id,
-                "user_id": user_id,
-                "team_id": team_id,
-                "created_at": datetime.now().isoformat(),
-                "success": bool(success),
-                "pinned": False,
-                "tags": [],
-                "data": data,
-            }
-        )
-        return session_id
+        return {
+            "session_id": session_id,
+            "user_id": user_id,
+            "team_id": team_id,
+            "created_at": datetime.now().isoformat(),
+            "success": bool(success),
+            "pinned": False,
+            "tags": [],
+            "data": {"type": data.get("type")},
+            "preview": session_preview(data),
+            "evidence_domains": evidence_hosts(extract_evidence_urls(data)),
+            "has_body": True,
+            "updated_at": _utcnow(),
+        }
+
+    def _merge_body(self, summary: Dict[str, Any], body: Dict[str, Any] | None) -> Dict[str, Any]:
+        session = {
+            k: v
+            for k, v in summary.items()
+            if k not in ("preview", "evidence_domains", "has_body")
+        }
+        if body is not None:
+            session["data"] = body.get("data", {})
+        return session
 
+    @track_storage("firestore")
     def load_session(self, session_id: str) -> Dict[str, Any]:
         doc = self._doc(session_id).get()
         if not doc.exists:
+            if self.archive is not None:
+                return self.archive.load(session_id)
             raise FileNotFoundError(f"session {session_id} not found")
-        return doc.to_dict()
+        summary = doc.to_dict()
+        if not summary.get("has_body"):
+            # 分割前に保存されたドキュメントは本文をそのまま持つ
+            return summary
+        body = self._body_doc(session_id).get()
+        return self._merge_body(summary, body.to_dict() if body.exists else {})
 
-    def list_sessions(self) -> List[Dict[str, Any]]:
-        sessions: List[Dict[str, Any]] = []
-        for doc in self._sessions_collection().stream():
-            sessions.append(doc.to_dict())
-        return sorted(
-            sessions,
-            key=lambda x: (x.get("pinned", False), x.get("created_at", "")),
-            reverse=True,
+    @track_storage("firestore")
+    def list_sessions(
+        self,
+        limit: int | None = None,
+        start_after: Dict[str, Any] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """セッションのサマリー一覧を取得（ピン留め優先・作成日時の降順）
+
+        ``limit`` を指定するとその件数だけ取得し、前ページ最後の要素を
+        ``start_after`` に渡すと続きのページを取得できる。戻り値の ``data``
+        には ``type`` のみが含まれるため、本文は ``load_session`` で取得する。
+        """
+        query = (
+            self._sessions_collection()
+            .select(SUMMARY_FIELDS)
+            .order_by("pinned", direction=_DESCENDING)
+            .order_by("created_at", direction=_DESCENDING)
         )
+        if start_after is not None:
+            query = query.start_after(
+                {
+                    "pinned": start_after.get("pinned", False),
+                    "created_at": start_after.get("created_at", ""),
+                }
+            )
+        if limit is not None:
+            query = query.limit(limit)
+        sessions: List[Dict[str, Any]] = []
+        for doc in query.stream():
+            summary = doc.to_dict()
+            summary.pop("has_body", None)
+            summary.setdefault("data", {})
+            sessions.append(summary)
+        return sessions
 
+    def _iter_summaries(self, page_size: int | None = None):
+        """全サマリーをカーソルページングで順に読む（1 回のストリームを長く保持しない）"""
+        page_size = page_size or LIST_PAGE_SIZE
+        last: Dict[str, Any] | None = None
+        while True:
+            page = self.list_sessions(limit=page_size, start_after=last)
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+
+    def list_summaries(
+        self,
+        limit: int | None = None,
+        start_after: Dict[str, Any] | None = None,
+    ) -> List[SessionSummary]:
+        """一覧表示用の軽量なサマリーを返す（引数は ``list_sessions`` と同じ）"""
+        return [
+            SessionSummary.from_session(s)
+            for s in self.list_sessions(limit=limit, start_after=start_after)
+        ]
+
+    @track_storage("firestore")
+    def changes_since(self, cursor: str | None = None) -> Tuple[List[Dict[str, Any]], str]:
+        """カーソル（``updated_at`` の ISO 文字列）以降の変更を返す
+
+        戻り値の形式は ``LocalStorageProvider.changes_since`` と同じ。削除は
+        ``deleted_sessions`` コレクションの墓標から検出する。墓標は
+        ``TOMBSTONE_TTL_DAYS`` で掃除されるため、それより古いカーソルには
+        ``reset`` 付きの全件スナップショットを返す。
+        """
+        now = _utcnow()
+        cursor_at = datetime.fromisoformat(cursor) if cursor is not None else None
+        if cursor_at is not None and cursor_at.tzinfo is None:
+            cursor_at = cursor_at.replace(tzinfo=timezone.utc)
+        if cursor_at is None or cursor_at < _tombstone_cutoff():
+            changes: List[Dict[str, Any]] = [{"op": "reset", "session_id": None, "session": None}]
+            for summary in self._iter_summaries():
+                changes.append({"op": "upsert", "session_id": summary.get("session_id"), "session": summary})
+            return changes, now
+
+        since = (cursor_at - timedelta(seconds=CHANGE_FEED_SKEW_SECONDS)).isoformat()
+        field_filter = firestore.FieldFilter("updated_at", ">", since)
+        events: List[Tuple[str, str, str, Dict[str, Any] | None]] = []
+        for doc in self._sessions_collection().select(SUMMARY_FIELDS).where(filter=field_filter).stream():
+            summary = doc.to_dict()
+            summary.pop("has_body", None)
+            summary.setdefault("data", {})
+            events.append((summary.get("updated_at", ""), "upsert", summary.get("session_id"), summary))
+        for doc in self._deleted_collection().where(filter=field_filter).stream():
+            tomb = doc.to_dict()
+            events.append((tomb.get("updated_at", ""), "delete", tomb.get("session_id"), None))
+        events.sort(key=lambda e: e[0])
+        changes = [{"op": op, "session_id": sid, "session": session} for _, op, sid, session in events]
+        return changes, now
+
+    @track_storage("firestore")
+    def load_sessions(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        """複数セッションを本文付きで取得する（``get_all`` でまとめて読み、存在しない ID は除く）"""
+        ids = list(dict.fromkeys(sid for sid in session_ids if sid))
+        summaries: Dict[str, Dict[str, Any]] = {}
+        bodies: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(ids), GET_ALL_CHUNK):
+            chunk = ids[i : i + GET_ALL_CHUNK]
+            refs = [self._doc(sid) for sid in chunk] + [self._body_doc(sid) for sid in chunk]
+            for snap in self.client.get_all(refs):
+                if not snap.exists:
+                    continue
+                ref = snap.reference
+                if ref.parent.id == "body":
+                    bodies[ref.parent.parent.id] = snap.to_dict()
+                else:
+                    summaries[ref.id] = snap.to_dict()
+        sessions: List[Dict[str, Any]] = []
+        for sid in ids:
+            summary = summaries.get(sid)
+            if summary is None:
+                continue
+            if not summary.get("has_body"):
+                # 分割前に保存されたドキュメントは本文をそのまま持つ
+                sessions.append(summary)
+            else:
+                sessions.append(self._merge_body(summary, bodies.get(sid, {})))
+        return sessions
+
+    def _with_bodies(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """本文を持たないサマリーにだけ本文を付与する（順序は保つ）"""
+        missing = [s.get("session_id") for s in sessions if not has_body(s)]
+        if not missing:
+            return sessions
+        loaded = {s.get("session_id"): s for s in self.load_sessions(missing)}
+        return [s if has_body(s) else loaded.get(s.get("session_id"), s) for s in sessions]
+
+    @track_storage("firestore")
     def export_sessions(
         self,
         fmt: str = "json",
@@ -88,6 +341,8 @@ class FirestoreStorageProvider:
         if sessions is None:
             sessions = self.list_sessions()
         if fmt == "json":
+            # 一覧（SessionCache 経由を含む）はサマリーのみのため本文を補う
+            sessions = self._with_bodies(sessions)
             return json.dumps(sessions, ensure_ascii=False, indent=2)
         if fmt == "csv":
             output = io.StringIO()
@@ -119,25 +374,88 @@ class FirestoreStorageProvider:
             return output.getvalue()
         raise ValueError("Unsupported format")
 
+    @traced("storage.delete_session", **{"db.system": "firestore"})
+    @track_storage("firestore")
     def delete_session(self, session_id: str) -> bool:
         doc_ref = self._doc(session_id)
         doc = doc_ref.get()
         if not doc.exists:
             return False
-        doc_ref.delete()
+        batch = self.client.batch()
+        batch.delete(self._body_doc(session_id))
+        batch.delete(doc_ref)
+        now = datetime.now(timezone.utc)
+        batch.set(
+            self._deleted_collection().document(session_id),
+            {
+                "session_id": session_id,
+                "updated_at": now.isoformat(),
+                # Firestore の TTL ポリシー用（設定しなくても prune_tombstones で掃除される）
+                "expire_at": now + timedelta(days=TOMBSTONE_TTL_DAYS),
+            },
+        )
+        batch.commit()
+        try:
+            self.prune_tombstones()
+        except Exception as e:
+            logger.warning("Failed to prune deleted_sessions tombstones: %s", e)
         return True
 
+    @track_storage("firestore")
+    def prune_tombstones(self, limit: int | None = None) -> int:
+        """``TOMBSTONE_TTL_DAYS`` より古い削除の墓標を最大 ``limit`` 件削除し、件数を返す"""
+        cutoff = firestore.FieldFilter("updated_at", "<", _tombstone_cutoff().isoformat())
+        query = self._deleted_collection().where(filter=cutoff).limit(limit or TOMBSTONE_PRUNE_LIMIT)
+        docs = list(query.stream())
+        if not docs:
+            return 0
+        batch = self.client.batch()
+        for doc in docs:
+            batch.delete(doc.reference)
+        batch.commit()
+        return len(docs)
+
+    @traced("storage.update_session_data", **{"db.system": "firestore"})
+    @track_storage("firestore")
+    def update_session_data(self, session_id: str, data: Dict[str, Any]) -> bool:
+        doc_ref = self._doc(session_id)
+        doc = doc_ref.get()
+        if not doc.exists:
+            return False
+        try:
+            # 一覧用のサマリーも本文に合わせて更新する（分割前の文書もここで分割される）
+            batch = self.client.batch()
+            batch.update(
+                doc_ref,
+                {
+                    "data": {"type": data.get("type")},
+                    "preview": session_preview(data),
+                    "evidence_domains": evidence_hosts(extract_evidence_urls(data)),
+                    "has_body": True,
+                    "updated_at": _utcnow(),
+                },
+            )
+            batch.set(self._body_doc(session_id), {"data": data})
+            batch.commit()
+            return True
+        except Exception:
+            return False
+
+    @traced("storage.set_pinned", **{"db.system": "firestore"})
+    @track_storage("firestore")
     def set_pinned(self, session_id: str, pinned: bool) -> bool:
         doc_ref = self._doc(session_id)
         doc = doc_ref.get()
         if not doc.exists:
             return False
         try:
-            doc_ref.update({"pinned": bool(pinned)})
+            doc_ref.update({"pinned": bool(pinned), "updated_at": _utcnow()})
             return True
         except Exception:
             return False
 
+    @traced("storage.update_tags", **{"db.system": "firestore"})
+    @track_storage("firestore")
     def update_tags(self, session_id: str, tags: List[str]) -> bool:
         doc_ref = self._doc(session_id)
         doc = doc_ref.get()
@@ -154,11 +472,12 @@ class FirestoreStorageProvider:
                     continue
                 seen.add(name)
                 normalized.append(name)
-            doc_ref.update({"tags": normalized})
+            doc_ref.update({"tags": normalized, "updated_at": _utcnow()})
             return True
         except Exception:
             return False
 
+    @traced("storage.save_data", **{"db.system": "firestore"})
     def save_data(self, filename: str, data: Dict[str, Any]) -> str:
         if "/" in filename:
             raise ValueError("Invalid filename")
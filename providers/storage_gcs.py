@@ -2,18 +2,35 @@ import csv
 import io
 import json
 import uuid
-from datetime import datetime
-from typing import Any, Dict, List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
 import os
 
 from google.cloud import storage
 
+from core.models import SessionSummary
+from core.session_data import evidence_hosts, extract_evidence_urls, session_preview
+from services.metrics import track_storage
+from services.tracing import traced
+
+# 一覧用のサマリーを保存する Blob のカスタムメタデータのキー
+SUMMARY_METADATA_KEY = "summary"
+_SUMMARY_KEYS = ("session_id", "user_id", "team_id", "created_at", "success", "pinned", "tags")
+
+# レプリカ間の時計のずれを吸収するため、変更取得時にカーソルを巻き戻す秒数
+CHANGE_FEED_SKEW_SECONDS = 5
+
 
 class GCSStorageProvider:
-    """Google Cloud Storage based session storage provider"""
+    """Google Cloud Storage based session storage provider
+
+    Each session blob also carries a small summary (metadata, type, input
+    preview, evidence domains) in its custom metadata, so ``list_summaries``
+    can read the listing without downloading the bodies.
+    """
 
     def __init__(
-        self, bucket_name: str, tenant_id: str, prefix: str = "sessions"
+        self, bucket_name: str, tenant_id: str, prefix: str = "sessions", archive=None
     ) -> None:
         if not bucket_name:
             raise ValueError("bucket_name is required")
@@ -22,10 +39,35 @@ class GCSStorageProvider:
         self.client = storage.Client()
         self.bucket = self.client.bucket(bucket_name)
         self.prefix = f"{tenant_id}/{prefix.rstrip('/')}/"
+        self.deleted_prefix = f"{self.prefix}_deleted/"
+        # 保存先に無いセッションを探すアーカイブ（services.retention.SessionArchive）
+        self.archive = archive
+
+    @property
+    def cache_key(self) -> str:
+        return f"gcs:{self.bucket.name}/{self.prefix}"
 
     def _blob(self, session_id: str):
         return self.bucket.blob(f"{self.prefix}{session_id}.json")
 
+    def _tombstone(self, session_id: str):
+        return self.bucket.blob(f"{self.deleted_prefix}{session_id}")
+
+    def _write(self, blob, content: Dict[str, Any]) -> None:
+        """本文を書き込み、一覧用のサマリーをカスタムメタデータに載せる"""
+        data = content.get("data") or {}
+        summary = {k: content.get(k) for k in _SUMMARY_KEYS}
+        summary["data"] = {"type": data.get("type")}
+        summary["preview"] = session_preview(data)
+        summary["evidence_domains"] = evidence_hosts(extract_evidence_urls(data))
+        blob.metadata = {SUMMARY_METADATA_KEY: json.dumps(summary, ensure_ascii=False)}
+        blob.upload_from_string(
+            json.dumps(content, ensure_ascii=False, indent=2),
+            content_type="application/json",
+        )
+
+    @traced("storage.save_session", **{"db.system": "gcs"})
+    @track_storage("gcs")
     def save_session(
         self,
         data: Dict[str, Any],
@@ -56,20 +98,21 @@ class GCSStorageProvider:
             "tags": [],
             "data": data,
         }
-        blob.upload_from_string(
-            json.dumps(data_with_metadata, ensure_ascii=False, indent=2),
-            content_type="application/json",
-        )
+        self._write(blob, data_with_metadata)
         return session_id
 
+    @track_storage("gcs")
     def load_session(self, session_id: str) -> Dict[str, Any]:
         """Load a session by id"""
         blob = self._blob(session_id)
         if not blob.exists():
+            if self.archive is not None:
+                return self.archive.load(session_id)
             raise FileNotFoundError(f"session {session_id} not found")
         content = blob.download_as_text()
         return json.loads(content)
 
+    @track_storage("gcs")
     def list_sessions(self) -> List[Dict[str, Any]]:
         """List all sessions"""
         sessions: List[Dict[str, Any]] = []
@@ -90,6 +133,62 @@ class GCSStorageProvider:
             reverse=True,
         )
 
+    @track_storage("gcs")
+    def list_summaries(self) -> List[SessionSummary]:
+        """一覧表示用の軽量なサマリーを返す（ピン留め優先・作成日時の降順）
+
+        Blob 一覧のカスタムメタデータから作るため本文はダウンロードしない。
+        サマリーを持たない古い Blob だけ本文を読む。
+        """
+        summaries: List[SessionSummary] = []
+        for blob in self.client.list_blobs(self.bucket, prefix=self.prefix):
+            name = blob.name[len(self.prefix):]
+            if not name.endswith(".json") or "/" in name:
+                continue
+            try:
+                raw = (blob.metadata or {}).get(SUMMARY_METADATA_KEY)
+                session = json.loads(raw) if raw else json.loads(blob.download_as_text())
+            except Exception:
+                continue
+            summaries.append(SessionSummary.from_session(session))
+        return sorted(summaries, key=lambda s: (s.pinned, s.created_at_raw), reverse=True)
+
+    @track_storage("gcs")
+    def changes_since(self, cursor: str | None = None) -> Tuple[List[Dict[str, Any]], str]:
+        """カーソル（Blob の ``updated`` の ISO 文字列）以降の変更を返す
+
+        一覧取得はメタデータのみのため、本文をダウンロードするのは更新された
+        Blob だけになる。戻り値の形式は ``LocalStorageProvider.changes_since`` と同じ。
+        """
+        if cursor is None:
+            now = datetime.now(timezone.utc).isoformat()
+            changes: List[Dict[str, Any]] = [{"op": "reset", "session_id": None, "session": None}]
+            for session in self.list_sessions():
+                changes.append({"op": "upsert", "session_id": session.get("session_id"), "session": session})
+            return changes, now
+
+        since = datetime.fromisoformat(cursor) - timedelta(seconds=CHANGE_FEED_SKEW_SECONDS)
+        latest = cursor
+        events: List[Tuple[str, str, str, Dict[str, Any] | None]] = []
+        for blob in self.client.list_blobs(self.bucket, prefix=self.prefix):
+            if blob.updated is None or blob.updated <= since:
+                continue
+            updated = blob.updated.isoformat()
+            if updated > latest:
+                latest = updated
+            if blob.name.startswith(self.deleted_prefix):
+                events.append((updated, "delete", blob.name[len(self.deleted_prefix):], None))
+            elif blob.name.endswith(".json") and "/" not in blob.name[len(self.prefix):]:
+                try:
+                    session = json.loads(blob.download_as_text())
+                except Exception:
+                    continue
+                events.append((updated, "upsert", session.get("session_id"), session))
+        events.sort(key=lambda e: e[0])
+        changes = [{"op": op, "session_id": sid, "session": session} for _, op, sid, session in events]
+        return changes, latest
+
+    @track_storage("gcs")
     def export_sessions(
         self,
         fmt: str = "json",
@@ -130,14 +229,35 @@ class GCSStorageProvider:
             return output.getvalue()
         raise ValueError("Unsupported format")
 
+    @traced("storage.delete_session", **{"db.system": "gcs"})
+    @track_storage("gcs")
     def delete_session(self, session_id: str) -> bool:
         """Delete a session"""
         blob = self._blob(session_id)
         if not blob.exists():
             return False
         blob.delete()
+        # 変更フィードで削除を検出できるよう墓標を残す
+        self._tombstone(session_id).upload_from_string("", content_type="text/plain")
         return True
 
+    @traced("storage.update_session_data", **{"db.system": "gcs"})
+    @track_storage("gcs")
+    def update_session_data(self, session_id: str, data: Dict[str, Any]) -> bool:
+        """Replace the payload of a saved session, keeping its metadata"""
+        blob = self._blob(session_id)
+        if not blob.exists():
+            return False
+        try:
+            content = json.loads(blob.download_as_text())
+            content["data"] = data
+            self._write(blob, content)
+            return True
+        except Exception:
+            return False
+
+    @traced("storage.set_pinned", **{"db.system": "gcs"})
+    @track_storage("gcs")
     def set_pinned(self, session_id: str, pinned: bool) -> bool:
         """Update pinned state"""
         blob = self._blob(session_id)
@@ -146,14 +266,13 @@ class GCSStorageProvider:
         try:
             content = json.loads(blob.download_as_text())
             content["pinned"] = bool(pinned)
-            blob.upload_from_string(
-                json.dumps(content, ensure_ascii=False, indent=2),
-                content_type="application/json",
-            )
+            self._write(blob, content)
             return True
         except Exception:
             return False
 
+    @traced("storage.update_tags", **{"db.system": "gcs"})
+    @track_storage("gcs")
     def update_tags(self, session_id: str, tags: List[str]) -> bool:
         """Overwrite tags"""
         blob = self._blob(session_id)
@@ -172,14 +291,12 @@ class GCSStorageProvider:
                 seen.add(name)
                 normalized.append(name)
             content["tags"] = normalized
-            blob.upload_from_string(
-                json.dumps(content, ensure_ascii=False, indent=2),
-                content_type="application/json",
-            )
+            self._write(blob, content)
             return True
         except Exception:
             return False
 
+    @traced("storage.save_data", **{"db.system": "gcs"})
     def save_data(self, filename: str, data: Dict[str, Any]) -> str:
         """Save arbitrary data file"""
         blob = self.bucket.blob(f"{self.prefix}{filename}")
@@ -1,19 +1,113 @@
 import csv
 import io
 import json
+import logging
 import os
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Tuple
 import uuid
 from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows など fcntl 非対応環境
+    fcntl = None
+
+from core.models import SessionSummary
+from services.metrics import track_storage
+from services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# 他プロセスの書き込み途中を読んだ場合の再試行回数と待機秒数
+READ_RETRIES = 3
+READ_RETRY_DELAY = 0.05
+
+# 変更ジャーナルがこのサイズを超えたら作り直す（読み手は全件取得にフォールバック）
+JOURNAL_MAX_BYTES = 5 * 1024 * 1024
+
 
 class LocalStorageProvider:
-    def __init__(self, data_dir: str = "./data"):
+    def __init__(self, data_dir: str = "./data", archive=None):
         self.data_dir = Path(data_dir).resolve()
         self.data_dir.mkdir(exist_ok=True)
         self.sessions_dir = self.data_dir / "sessions"
         self.sessions_dir.mkdir(exist_ok=True)
+        self.lock_path = self.sessions_dir / ".lock"
+        self.journal_path = self.sessions_dir / "_changes.jsonl"
+        self.journal_path.touch(exist_ok=True)
+        # 保存先に無いセッションを探すアーカイブ（services.retention.SessionArchive）
+        self.archive = archive
+
+    @property
+    def cache_key(self) -> str:
+        return f"local:{self.data_dir}"
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """共有ボリューム上の複数ワーカー間で更新処理を直列化する（advisory lock）"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _write_json(self, file_path: Path, data: Any) -> None:
+        """一時ファイルに書き出してからrenameし、読み手に書きかけの内容を見せない"""
+        fd, tmp_name = tempfile.mkstemp(
+            dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _append_change(self, op: str, session_id: str) -> None:
+        """変更ジャーナルに1行追記する（呼び出し側でロックを保持すること）"""
+        try:
+            if self.journal_path.exists() and self.journal_path.stat().st_size > JOURNAL_MAX_BYTES:
+                # 新しいファイルに置き換えて inode を変え、既存カーソルを無効化する
+                fd, tmp_name = tempfile.mkstemp(dir=self.sessions_dir, suffix=".tmp")
+                os.close(fd)
+                os.replace(tmp_name, self.journal_path)
+            line = json.dumps(
+                {"op": op, "session_id": session_id, "at": datetime.now().isoformat()},
+                ensure_ascii=False,
+            )
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning("変更ジャーナルへの追記に失敗: %s", e)
+
+    def _read_json(self, file_path: Path) -> Dict[str, Any]:
+        """JSONを読み込む。書き込み途中の内容を読んだ場合は少し待って再試行する"""
+        for attempt in range(READ_RETRIES):
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                if attempt == READ_RETRIES - 1:
+                    raise
+                time.sleep(READ_RETRY_DELAY * (attempt + 1))
+        raise RuntimeError("unreachable")
     
+    @traced("storage.save_session", **{"db.system": "local"})
+    @track_storage("local")
     def save_session(
         self,
         data: Dict[str, Any],
@@ -50,30 +144,35 @@ class LocalStorageProvider:
             "data": data,
         }
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data_with_metadata, f, ensure_ascii=False, indent=2)
+        with self._lock():
+            self._write_json(file_path, data_with_metadata)
+            self._append_change("upsert", session_id)
 
         return session_id
     
+    @track_storage("local")
     def load_session(self, session_id: str) -> Dict[str, Any]:
         """セッションデータを読み込み"""
         file_path = self.sessions_dir / f"{session_id}.json"
         if not file_path.exists():
+            if self.archive is not None:
+                return self.archive.load(session_id)
             raise FileNotFoundError(f"セッション {session_id} が見つかりません")
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+
+        return self._read_json(file_path)
     
+    @track_storage("local")
     def list_sessions(self) -> List[Dict[str, Any]]:
         """セッション一覧を取得"""
         sessions = []
         for file_path in self.sessions_dir.glob("*.json"):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    session_data = json.load(f)
-                    sessions.append(session_data)
+                sessions.append(self._read_json(file_path))
+            except FileNotFoundError:
+                # 一覧取得中に他ワーカーが削除した
+                continue
             except Exception as e:
-                print(f"セッションファイル {file_path} の読み込みに失敗: {e}")
+                logger.warning("セッションファイル %s の読み込みに失敗: %s", file_path, e)
         
         # ピン留めを上位、次に作成日時で降順
         # ピン留めを優先し、作成日時は降順（新しいものが上）
@@ -86,6 +185,66 @@ class LocalStorageProvider:
             reverse=True,
         )
 
+    def list_summaries(self) -> List[SessionSummary]:
+        """一覧表示用の軽量なサマリーを返す
+
+        ローカルはサマリーだけの索引を持たないため、各セッションファイルを本文ごと
+        読んでから変換する（読み込み量は ``list_sessions`` と同じ）。
+        """
+        return [SessionSummary.from_session(s) for s in self.list_sessions()]
+
+    @track_storage("local")
+    def changes_since(self, cursor: Tuple[int, int] | None = None) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+        """カーソル以降の変更を返す
+
+        戻り値は ``(changes, next_cursor)``。各変更は
+        ``{"op": "upsert" | "delete" | "reset", "session_id", "session"}`` で、
+        カーソルが無い・無効な場合は先頭に ``reset`` を置いた全件スナップショットを返す。
+        """
+        try:
+            st = self.journal_path.stat()
+            inode, size = st.st_ino, st.st_size
+        except FileNotFoundError:
+            inode, size = 0, 0
+
+        if cursor is None or cursor[0] != inode or cursor[1] > size:
+            changes: List[Dict[str, Any]] = [{"op": "reset", "session_id": None, "session": None}]
+            for session in self.list_sessions():
+                changes.append({"op": "upsert", "session_id": session.get("session_id"), "session": session})
+            return changes, (inode, size)
+
+        offset = cursor[1]
+        if offset == size:
+            return [], cursor
+
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+        # 追記途中の行は次回に回す
+        complete = chunk[: chunk.rfind(b"\n") + 1]
+        latest: Dict[str, str] = {}
+        for raw in complete.splitlines():
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            sid = entry.get("session_id")
+            if sid:
+                latest.pop(sid, None)
+                latest[sid] = entry.get("op", "upsert")
+
+        changes = []
+        for sid, op in latest.items():
+            session = None
+            if op != "delete":
+                try:
+                    session = self._read_json(self.sessions_dir / f"{sid}.json")
+                except (FileNotFoundError, ValueError):
+                    op = "delete"
+            changes.append({"op": op, "session_id": sid, "session": session})
+        return changes, (inode, offset + len(complete))
+
+    @track_storage("local")
     def export_sessions(
         self,
         fmt: str = "json",
@@ -126,40 +285,63 @@ class LocalStorageProvider:
             return output.getvalue()
         raise ValueError("Unsupported format")
 
+    @traced("storage.delete_session", **{"db.system": "local"})
+    @track_storage("local")
     def delete_session(self, session_id: str) -> bool:
         """セッションファイルを削除"""
         file_path = self.sessions_dir / f"{session_id}.json"
         if not file_path.exists():
             return False
         try:
-            file_path.unlink()
+            with self._lock():
+                file_path.unlink()
+                self._append_change("delete", session_id)
             return True
         except Exception:
             return False
 
+    @traced("storage.update_session_data", **{"db.system": "local"})
+    @track_storage("local")
+    def update_session_data(self, session_id: str, data: Dict[str, Any]) -> bool:
+        """保存済みセッションの本文を差し替える（作成日時・ピン留め・タグは維持）"""
+        file_path = self.sessions_dir / f"{session_id}.json"
+        if not file_path.exists():
+            return False
+        try:
+            with self._lock():
+                content = self._read_json(file_path)
+                content["data"] = data
+                self._write_json(file_path, content)
+                self._append_change("upsert", session_id)
+            return True
+        except Exception:
+            return False
+
+    @traced("storage.set_pinned", **{"db.system": "local"})
+    @track_storage("local")
     def set_pinned(self, session_id: str, pinned: bool) -> bool:
         """ピン留め状態を更新"""
         file_path = self.sessions_dir / f"{session_id}.json"
         if not file_path.exists():
             return False
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-            content["pinned"] = bool(pinned)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(content, f, ensure_ascii=False, indent=2)
+            with self._lock():
+                content = self._read_json(file_path)
+                content["pinned"] = bool(pinned)
+                self._write_json(file_path, content)
+                self._append_change("upsert", session_id)
             return True
         except Exception:
             return False
 
+    @traced("storage.update_tags", **{"db.system": "local"})
+    @track_storage("local")
     def update_tags(self, session_id: str, tags: List[str]) -> bool:
         """タグを上書き更新"""
         file_path = self.sessions_dir / f"{session_id}.json"
         if not file_path.exists():
             return False
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = json.load(f)
             # 正規化：空白除去、空要素除外、重複排除
             normalized = []
             seen = set()
@@ -173,13 +355,16 @@ class LocalStorageProvider:
                     continue
                 seen.add(name)
                 normalized.append(name)
-            content["tags"] = normalized
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(content, f, ensure_ascii=False, indent=2)
+            with self._lock():
+                content = self._read_json(file_path)
+                content["tags"] = normalized
+                self._write_json(file_path, content)
+                self._append_change("upsert", session_id)
             return True
         except Exception:
             return False
 
+    @traced("storage.save_data", **{"db.system": "local"})
     def save_data(self, filename: str, data: Dict[str, Any]) -> str:
         """任意データをファイルに保存"""
         if ".." in filename or "/" in filename:
@@ -189,7 +374,6 @@ class LocalStorageProvider:
         if not file_path.is_relative_to(self.data_dir):
             raise ValueError("Invalid filename")
         file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self._write_json(file_path, data)
         return filename
 
@@ -0,0 +1,204 @@
+"""似た入力への事前アドバイスを再利用する類似度キャッシュ
+
+営業担当は業界・商品・商談ステージが同じで、目的の言い回しだけが違う入力を何度も
+送る。完全一致のキーではこれらを拾えないため、営業タイプ・業界・商品・ステージは
+正規化して一致させ、自由記述（目的・説明・競合・制約）は文字 n-gram のベクトルの
+コサイン類似度で比べる。
+
+    cache = AdviceCache()
+    cache.store(sales_input, advice, tenant="team-a")
+    hit = cache.lookup(other_input, tenant="team-a", threshold=0.75)
+    # => (advice の複製, 類似度) または None
+
+ベクトルは ``services.relevance.tokenize`` のトークンを項目名付きでハッシュし、
+固定次元（``DIMENSIONS``）の NumPy 行列にテナントごとにまとめて保持する。
+テナントごとに ``max_entries`` 件を超えると最も長く使われていないものから捨て、
+``max_age`` 秒を過ぎたものは使わない。NumPy がない環境では何もしない。
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.metrics import counter
+from services.relevance import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy は任意
+    np = None
+
+CACHE_REQUESTS = counter("cache_requests_total", "キャッシュの参照回数", ["cache", "result"])
+
+DIMENSIONS = 1 << 12
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_AGE = 24 * 60 * 60.0
+# コサイン類似度で比べる自由記述の項目
+TEXT_FIELDS = ("purpose", "description", "competitor", "constraints")
+# これ以上似ていれば同じ入力とみなして上書きする
+_SAME_INPUT = 0.999
+
+
+def _normalize(value: Any) -> str:
+    text = unicodedata.normalize("NFKC", str(value or "")).lower()
+    return " ".join(text.split())
+
+
+def partition_key(sales_input: Any) -> Tuple[str, ...]:
+    """一致していなければ再利用しない項目（営業タイプ・業界・商品・ステージ）"""
+    sales_type = getattr(sales_input.sales_type, "value", sales_input.sales_type)
+    return tuple(_normalize(v) for v in (sales_type, sales_input.industry, sales_input.product, sales_input.stage))
+
+
+def vectorize(sales_input: Any) -> "np.ndarray":
+    """自由記述の文字 n-gram を項目ごとにハッシュした L2 正規化済みベクトル"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for field in TEXT_FIELDS:
+        value = getattr(sales_input, field, None)
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        for token in tokenize(_normalize(value)):
+            vector[zlib.crc32(f"{field}:{token}".encode("utf-8")) % DIMENSIONS] += 1.0
+    # 長い説明文で同じ n-gram が繰り返されても偏らないよう対数をとる
+    np.log1p(vector, out=vector)
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+
+class _TenantIndex:
+    """1 テナント分の行列と応答（行の順番は揃えて保持する）"""
+
+    def __init__(self) -> None:
+        self.vectors = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.keys: List[Tuple[str, ...]] = []
+        self.responses: List[Dict[str, Any]] = []
+        self.created: List[float] = []
+        self.used: List[float] = []
+
+    def scores(self, key: Tuple[str, ...], vector: "np.ndarray", now: float, max_age: float) -> "np.ndarray":
+        """各行の類似度（キー不一致・期限切れは -1）"""
+        size = len(self.keys)
+        if not size:
+            return np.zeros(0, dtype=np.float32)
+        scores = self.vectors[:size] @ vector
+        if not vector.any():
+            # 自由記述が空どうしは同じ入力とみなす
+            scores = np.where(self.vectors[:size].any(axis=1), 0.0, 1.0).astype(np.float32)
+        valid = np.fromiter(
+            (k == key and now - c <= max_age for k, c in zip(self.keys, self.created)), dtype=bool, count=size
+        )
+        return np.where(valid, scores, -1.0)
+
+    def put(self, row: Optional[int], key: Tuple[str, ...], vector: "np.ndarray", response: Dict[str, Any], now: float) -> None:
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.vectors):
+                grown = np.zeros((max(16, row * 2), DIMENSIONS), dtype=np.float32)
+                grown[:row] = self.vectors[:row]
+                self.vectors = grown
+            self.keys.append(key)
+            self.responses.append(response)
+            self.created.append(now)
+            self.used.append(now)
+        else:
+            self.keys[row], self.responses[row] = key, response
+            self.created[row] = self.used[row] = now
+        self.vectors[row] = vector
+
+
+class AdviceCache:
+    """テナントごとに分けた、似た入力への応答の再利用キャッシュ"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_age: float = DEFAULT_MAX_AGE) -> None:
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantIndex] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and self.max_entries > 0
+
+    def size(self, tenant: str) -> int:
+        index = self._tenants.get(tenant)
+        return len(index.keys) if index is not None else 0
+
+    def lookup(
+        self, sales_input: Any, tenant: str, threshold: float = DEFAULT_THRESHOLD
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """``threshold`` 以上に似た入力の応答（複製）と類似度を返す"""
+        if not self.enabled:
+            return None
+        key, vector = partition_key(sales_input), vectorize(sales_input)
+        with self._lock:
+            index = self._tenants.get(tenant)
+            hit = None
+            if index is not None and index.keys:
+                now = time.monotonic()
+                scores = index.scores(key, vector, now, self.max_age)
+                row = int(np.argmax(scores))
+                score = float(scores[row])
+                if score >= threshold:
+                    index.used[row] = now
+                    hit = (copy.deepcopy(index.responses[row]), min(1.0, score))
+        CACHE_REQUESTS.inc(cache="advice_similarity", result="miss" if hit is None else "hit")
+        return hit
+
+    def store(self, sales_input: Any, response: Dict[str, Any], tenant: str) -> None:
+        """応答を登録する（ほぼ同じ入力があれば上書きし、満杯なら最も古く使われたものを捨てる）"""
+        if not self.enabled:
+            return
+        key, vector = partition_key(sales_input), vectorize(sales_input)
+        with self._lock:
+            index = self._tenants.setdefault(tenant, _TenantIndex())
+            now = time.monotonic()
+            row = None
+            if index.keys:
+                scores = index.scores(key, vector, now, float("inf"))
+                best = int(np.argmax(scores))
+                if scores[best] >= _SAME_INPUT:
+                    row = best
+                elif len(index.keys) >= self.max_entries:
+                    # 期限切れを優先して捨て、なければ最も長く使われていないもの
+                    expired = [i for i, c in enumerate(index.created) if now - c > self.max_age]
+                    row = expired[0] if expired else min(range(len(index.used)), key=index.used.__getitem__)
+            index.put(row, key, vector, copy.deepcopy(response), now)
+
+    def clear(self, tenant: Optional[str] = None) -> None:
+        with self._lock:
+            if tenant is None:
+                self._tenants.clear()
+            else:
+                self._tenants.pop(tenant, None)
+
+
+def default_tenant() -> str:
+    """キャッシュを分ける単位（``TEAM_ID``、未設定なら ``default``）"""
+    return os.getenv("TEAM_ID") or "default"
+
+
+_CACHE: Optional[AdviceCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_advice_cache() -> AdviceCache:
+    """プロセスで共有するキャッシュ（``ADVICE_CACHE_MAX_ENTRIES`` / ``ADVICE_CACHE_TTL``）"""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                max_entries = int(os.getenv("ADVICE_CACHE_MAX_ENTRIES") or DEFAULT_MAX_ENTRIES)
+                max_age = float(os.getenv("ADVICE_CACHE_TTL") or DEFAULT_MAX_AGE)
+            except ValueError:
+                max_entries, max_age = DEFAULT_MAX_ENTRIES, DEFAULT_MAX_AGE
+            _CACHE = AdviceCache(max_entries=max_entries, max_age=max_age)
+        return _CACHE
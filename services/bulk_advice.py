@@ -0,0 +1,502 @@
+"""リード一覧（CSV / JSONL）から事前アドバイスをまとめて生成する
+
+キャンペーン前に数百件のリードへアドバイスを用意するためのバッチモード。
+入力は ``SalesInput`` の項目名を列（JSONL ではキー）に持つ行で、``constraints`` は
+CSV では改行または ``;`` 区切りで書く。
+
+    leads = parse_leads(Path("leads.csv").read_bytes(), "csv")
+    runner = create_runner(checkpoint=Checkpoint(default_checkpoint_path(data)))
+    for progress in runner.iter_run(leads.inputs):
+        print(progress.completed, "/", progress.total)
+
+生成は ``workers`` 本のスレッドで並行に行い、全スレッドで共有する ``RateLimiter`` で
+LLM 呼び出しの頻度を抑える。業界ニュースは ``EvidenceContext`` を共有して業界ごとに
+1 回だけ検索する。結果は ``batch_size`` 件ごとにセッションとして保存し（保存先が
+``save_sessions`` を持てば 1 回の書き込みにまとめる）、保存した行をチェックポイント
+（JSONL）に追記する。LLM に接続できずスタブになった行は失敗として扱い、保存しない。中断したら同じチェックポイントで再実行すると、
+保存済みの行は生成し直さない。セッション ID は実行 ID と行の内容から決まるため、
+保存後・追記前に中断した行を再生成しても同じセッションが上書きされるだけになる。
+
+``batch_api=True``（CLI では ``--batch-api``）にすると、``batch_api_size`` 件ずつ
+OpenAI の Batch API にまとめて送る。完了まで最大 24 時間かかる代わりに料金が安く、
+夜間の一括生成に向く。この場合スレッドプールとレート制限は使わない。
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+
+from core.models import SalesInput
+from core.validation import validate_sales_input
+from services.logger import Logger
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE_PER_MINUTE = 60.0
+DEFAULT_BATCH_SIZE = 20
+# Batch API 1 回に詰める行数
+DEFAULT_BATCH_API_SIZE = 1000
+
+FIELDS = (
+    "sales_type",
+    "industry",
+    "product",
+    "description",
+    "description_url",
+    "competitor",
+    "competitor_url",
+    "stage",
+    "purpose",
+    "constraints",
+)
+_REQUIRED_TEXT = ("industry", "product", "stage", "purpose")
+
+
+@dataclass
+class Lead:
+    row: int
+    sales_input: SalesInput
+    key: str
+
+
+@dataclass
+class LeadError:
+    row: int
+    messages: List[str]
+
+
+@dataclass
+class ParsedLeads:
+    inputs: List[Lead] = field(default_factory=list)
+    errors: List[LeadError] = field(default_factory=list)
+
+
+# LLM に接続できずスタブのアドバイスが返った行のエラー（保存せず、再実行で生成し直す）
+OFFLINE_MESSAGE = "LLM に接続できなかったため生成できませんでした（再実行で生成し直します）"
+
+
+def lead_key(sales_input: SalesInput) -> str:
+    """行の内容から決まるキー（チェックポイントとセッション ID に使う）"""
+    payload = json.dumps(sales_input.model_dump(mode="json"), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _split_constraints(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    if not value:
+        return []
+    return [c.strip() for c in str(value).replace(";", "\n").splitlines() if c.strip()]
+
+
+def _to_sales_input(raw: Dict[str, Any]) -> SalesInput:
+    values: Dict[str, Any] = {}
+    for name in FIELDS:
+        value = raw.get(name)
+        values[name] = value.strip() if isinstance(value, str) else value
+    for name in ("description", "description_url", "competitor", "competitor_url"):
+        values[name] = values[name] or None
+    for name in _REQUIRED_TEXT:
+        values[name] = values[name] or ""
+    values["constraints"] = _split_constraints(values["constraints"])
+    return SalesInput(**values)
+
+
+def _read_rows(data: bytes | str, fmt: str) -> Iterator[Tuple[int, Any]]:
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if fmt == "csv":
+        for row, record in enumerate(csv.DictReader(io.StringIO(text)), start=1):
+            yield row, record
+    elif fmt == "jsonl":
+        lines = [line for line in text.splitlines() if line.strip()]
+        for row, line in enumerate(lines, start=1):
+            try:
+                yield row, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row, e
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def parse_leads(data: bytes | str, fmt: str) -> ParsedLeads:
+    """CSV / JSONL を ``SalesInput`` にし、``validate_sales_input`` でまとめて検証する
+
+    行番号はヘッダーを除いた 1 始まり。同じ内容の行は最初の 1 行だけを残す。
+    """
+    parsed = ParsedLeads()
+    seen = set()
+    for row, record in _read_rows(data, fmt):
+        if not isinstance(record, dict):
+            parsed.errors.append(LeadError(row, [f"JSONとして読み込めません: {record}"]))
+            continue
+        try:
+            sales_input = _to_sales_input(record)
+        except ValidationError as e:
+            messages = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+            parsed.errors.append(LeadError(row, messages))
+            continue
+        messages = validate_sales_input(sales_input)
+        if messages:
+            parsed.errors.append(LeadError(row, messages))
+            continue
+        key = lead_key(sales_input)
+        if key in seen:
+            continue
+        seen.add(key)
+        parsed.inputs.append(Lead(row, sales_input, key))
+    return parsed
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if Path(filename).suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+class RateLimiter:
+    """スレッド間で共有するトークンバケット
+
+    1 分あたり ``per_minute`` 回、最大 ``burst`` 回まで連続して通す。``per_minute`` が
+    0 以下なら制限しない。待ちが必要な呼び出しは先に枠を予約してから眠るため、
+    待っている順に通る。
+    """
+
+    def __init__(
+        self,
+        per_minute: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def acquire(self) -> float:
+        """1 回分の枠を取得し、待った秒数を返す"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+class Checkpoint:
+    """保存済みの行（キー -> セッション ID）を JSONL に追記して再開に使う
+
+    1 行目は実行 ID、以降は ``{"key", "session_id", "row"}``。
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.done: Dict[str, str] = {}
+        self.run_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self._torn = False
+        if self.path.exists():
+            text = self.path.read_text(encoding="utf-8")
+            # 追記途中で中断した最終行は読み飛ばし、次の追記は改行から始める
+            self._torn = bool(text) and not text.endswith("\n")
+            for line in text.splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict):
+                    if "run_id" in entry:
+                        self.run_id = entry["run_id"]
+                    elif "key" in entry:
+                        self.done[entry["key"]] = entry["session_id"]
+        # 新しい実行はファイルを最初の保存時に作る
+        self._new = self.run_id is None
+        if self.run_id is None:
+            self.run_id = str(uuid.uuid4())
+
+    def _append(self, entries: Sequence[Dict[str, Any]]) -> None:
+        if self._new:
+            entries = [{"run_id": self.run_id}, *entries]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._new = False
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        if self._torn:
+            lines = "\n" + lines
+            self._torn = False
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, entries: Sequence[Tuple[Lead, str]]) -> None:
+        with self._lock:
+            self._append([{"key": lead.key, "session_id": sid, "row": lead.row} for lead, sid in entries])
+            for lead, sid in entries:
+                self.done[lead.key] = sid
+
+
+def default_checkpoint_path(data: bytes | str) -> Path:
+    """アップロード内容ごとのチェックポイント（同じファイルなら同じ場所になる）"""
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    return Path(os.getenv("DATA_DIR", "./data")) / "bulk" / f"{digest}.jsonl"
+
+
+@dataclass
+class BulkProgress:
+    total: int
+    saved: int = 0
+    skipped: int = 0
+    failed: int = 0
+    generated: int = 0
+    errors: List[LeadError] = field(default_factory=list)
+    session_ids: List[str] = field(default_factory=list)
+
+    @property
+    def completed(self) -> int:
+        """生成済み（保存待ちを含む）・再開でスキップ・失敗のいずれかで終わった行数"""
+        return self.generated + self.skipped + self.failed
+
+
+class BulkAdviceRunner:
+    """リードごとの事前アドバイスを並行に生成し、まとめて保存する"""
+
+    def __init__(
+        self,
+        service: Any,
+        storage_provider: Any,
+        workers: int = DEFAULT_WORKERS,
+        rate_limiter: Optional[RateLimiter] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint: Optional[Checkpoint] = None,
+        evidence: Any = None,
+        batch_api: bool = False,
+        batch_api_size: int = DEFAULT_BATCH_API_SIZE,
+    ) -> None:
+        self.service = service
+        self.storage_provider = storage_provider
+        self.workers = max(1, workers)
+        self.rate_limiter = rate_limiter or RateLimiter(0)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint = checkpoint
+        self.evidence = evidence
+        self.batch_api = batch_api
+        self.batch_api_size = max(1, batch_api_size)
+        self.run_id = checkpoint.run_id if checkpoint is not None else str(uuid.uuid4())
+        self.logger = Logger("BulkAdviceRunner")
+
+    def session_id(self, lead: Lead) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"bulk:{self.run_id}:{lead.key}"))
+
+    def _generate(self, lead: Lead) -> Dict[str, Any]:
+        self.rate_limiter.acquire()
+        advice = self.service.generate_advice(lead.sales_input, evidence=self.evidence)
+        if advice.get("offline"):
+            raise RuntimeError(OFFLINE_MESSAGE)
+        return advice
+
+    def _flush(self, pending: List[Tuple[Lead, Dict[str, Any]]], progress: BulkProgress) -> None:
+        rows = [
+            (
+                lead,
+                {
+                    "type": "pre_advice",
+                    "input": lead.sales_input.model_dump(mode="json"),
+                    "output": {"advice": advice, "selected_icebreaker": None},
+                    "bulk_run_id": self.run_id,
+                },
+            )
+            for lead, advice in pending
+        ]
+        saved: List[Tuple[Lead, str]] = []
+        save_many = getattr(self.storage_provider, "save_sessions", None)
+        if save_many is not None:
+            try:
+                ids = save_many([(payload, self.session_id(lead)) for lead, payload in rows])
+                saved = [(lead, sid) for (lead, _), sid in zip(rows, ids)]
+            except Exception as e:
+                for lead, _ in rows:
+                    self._save_failed(lead, e, progress)
+        else:
+            for lead, payload in rows:
+                try:
+                    sid = self.storage_provider.save_session(payload, session_id=self.session_id(lead))
+                except Exception as e:
+                    self._save_failed(lead, e, progress)
+                    continue
+                saved.append((lead, sid))
+        if saved and self.checkpoint is not None:
+            self.checkpoint.record(saved)
+        progress.saved += len(saved)
+        progress.session_ids += [sid for _, sid in saved]
+        pending.clear()
+
+    @staticmethod
+    def _save_failed(lead: Lead, error: Exception, progress: BulkProgress) -> None:
+        progress.generated -= 1
+        progress.failed += 1
+        progress.errors.append(LeadError(lead.row, [f"保存に失敗しました: {error}"]))
+
+    def iter_run(self, leads: Sequence[Lead]) -> Iterator[BulkProgress]:
+        """1 行終わるごとに進捗を返す（途中で止めると未着手の行は取り消す）"""
+        done = self.checkpoint.done if self.checkpoint is not None else {}
+        todo = [lead for lead in leads if lead.key not in done]
+        progress = BulkProgress(total=len(leads), skipped=len(leads) - len(todo))
+        self.logger.info(f"Bulk pre-advice run {self.run_id}: {len(todo)} to generate, {progress.skipped} skipped")
+        yield progress
+        if self.batch_api:
+            yield from self._iter_batch_api(todo, progress)
+            return
+
+        pending: List[Tuple[Lead, Dict[str, Any]]] = []
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-advice")
+        try:
+            futures: Dict[Future, Lead] = {pool.submit(self._generate, lead): lead for lead in todo}
+            for future in as_completed(futures):
+                lead = futures[future]
+                try:
+                    pending.append((lead, future.result()))
+                    progress.generated += 1
+                except Exception as e:
+                    progress.failed += 1
+                    progress.errors.append(LeadError(lead.row, [str(e)]))
+                if len(pending) >= self.batch_size:
+                    self._flush(pending, progress)
+                yield progress
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            # 中断時も生成済みの分は保存しておく
+            if pending:
+                self._flush(pending, progress)
+        yield progress
+
+    def _iter_batch_api(self, todo: List[Lead], progress: BulkProgress) -> Iterator[BulkProgress]:
+        """``batch_api_size`` 行ずつ Batch API で生成し、バッチが終わるごとに保存する"""
+        for start in range(0, len(todo), self.batch_api_size):
+            chunk = todo[start : start + self.batch_api_size]
+            try:
+                results = self.service.generate_advice_batch(
+                    [lead.sales_input for lead in chunk], evidence=self.evidence
+                )
+            except Exception as e:
+                results = [e] * len(chunk)
+            pending: List[Tuple[Lead, Dict[str, Any]]] = []
+            for lead, result in zip(chunk, results):
+                if isinstance(result, Exception) or result.get("offline"):
+                    progress.failed += 1
+                    message = str(result) if isinstance(result, Exception) else OFFLINE_MESSAGE
+                    progress.errors.append(LeadError(lead.row, [message]))
+                    continue
+                pending.append((lead, result))
+                progress.generated += 1
+                if len(pending) >= self.batch_size:
+                    self._flush(pending, progress)
+            if pending:
+                self._flush(pending, progress)
+            yield progress
+
+    def run(self, leads: Sequence[Lead], on_progress: Optional[Callable[[BulkProgress], None]] = None) -> BulkProgress:
+        progress = BulkProgress(total=len(leads))
+        for progress in self.iter_run(leads):
+            if on_progress is not None:
+                on_progress(progress)
+        return progress
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def create_runner(
+    settings_manager: Any = None,
+    checkpoint: Optional[Checkpoint] = None,
+    workers: Optional[int] = None,
+    rate_per_minute: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    batch_api: bool = False,
+) -> BulkAdviceRunner:
+    """設定・環境変数（``BULK_WORKERS`` / ``BULK_RATE_PER_MINUTE`` / ``BULK_BATCH_SIZE``）から作る"""
+    from providers.search_provider import WebSearchProvider
+    from services.evidence import EvidenceContext
+    from services.pre_advisor import PreAdvisorService
+    from services.storage_service import get_storage_provider
+
+    workers = workers or int(_env_number("BULK_WORKERS", DEFAULT_WORKERS))
+    if rate_per_minute is None:
+        rate_per_minute = _env_number("BULK_RATE_PER_MINUTE", DEFAULT_RATE_PER_MINUTE)
+    return BulkAdviceRunner(
+        PreAdvisorService(settings_manager),
+        get_storage_provider(),
+        workers=workers,
+        rate_limiter=RateLimiter(rate_per_minute, burst=workers),
+        batch_size=batch_size or int(_env_number("BULK_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        checkpoint=checkpoint,
+        evidence=EvidenceContext(WebSearchProvider(settings_manager)),
+        batch_api=batch_api,
+    )
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="リード一覧（CSV / JSONL）から事前アドバイスをまとめて生成")
+    parser.add_argument("leads", type=Path)
+    parser.add_argument("--checkpoint", type=Path, default=None, help="再開用のチェックポイント（既定 DATA_DIR/bulk/）")
+    parser.add_argument("--workers", type=int, default=None, help="並行数（既定 BULK_WORKERS）")
+    parser.add_argument("--rate-per-minute", type=float, default=None, help="1 分あたりの生成数の上限")
+    parser.add_argument("--batch-size", type=int, default=None, help="まとめて保存する件数")
+    parser.add_argument(
+        "--batch-api", action="store_true", help="OpenAI の Batch API でまとめて生成（最大 24 時間、料金は半額）"
+    )
+    args = parser.parse_args(argv)
+
+    data = args.leads.read_bytes()
+    parsed = parse_leads(data, detect_format(args.leads.name))
+    for error in parsed.errors:
+        print(f"行 {error.row}: {' / '.join(error.messages)}", file=sys.stderr)
+
+    checkpoint = Checkpoint(args.checkpoint or default_checkpoint_path(data))
+    runner = create_runner(
+        checkpoint=checkpoint,
+        workers=args.workers,
+        rate_per_minute=args.rate_per_minute,
+        batch_size=args.batch_size,
+        batch_api=args.batch_api,
+    )
+    progress = runner.run(
+        parsed.inputs,
+        on_progress=lambda p: print(f"\r{p.completed}/{p.total}", end="", file=sys.stderr, flush=True),
+    )
+    print(file=sys.stderr)
+    for error in progress.errors:
+        print(f"行 {error.row}: {' / '.join(error.messages)}", file=sys.stderr)
+    print(
+        f"保存 {progress.saved} 件、スキップ {progress.skipped} 件、失敗 {progress.failed} 件、"
+        f"入力エラー {len(parsed.errors)} 件（チェックポイント: {checkpoint.path}）"
+    )
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
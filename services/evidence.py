@@ -0,0 +1,86 @@
+"""事前アドバイスとアイスブレイクで共有する業界ニュース（根拠）の取得
+
+事前アドバイスは「{業界} 最新ニュース」を 3 件、同じページのアイスブレイクは同じ
+クエリを 2 件検索していた。``EvidenceContext`` は業界ごとに 1 回だけ多い方の件数で
+検索し、ランキング済みの結果を両方のサービスに渡す。ページではセッションに 1 つ
+保持し、``max_age`` 秒を過ぎた結果は取り直す。
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from providers.search_provider import WebSearchProvider
+from services.singleflight import SingleFlight, default_timeout
+
+# 事前アドバイス（3 件）とアイスブレイク（2 件）の多い方
+NEWS_RESULTS = 3
+DEFAULT_MAX_AGE = 600.0
+
+
+def news_query(industry: str) -> str:
+    return f"{industry} 最新ニュース"
+
+
+class EvidenceContext:
+    """業界ニュースの検索結果をクエリごとに 1 回だけ取得して共有する"""
+
+    def __init__(self, search_provider: Any, num: int = NEWS_RESULTS, max_age: float = DEFAULT_MAX_AGE) -> None:
+        self.search_provider = search_provider
+        self.num = num
+        self.max_age = max_age
+        # ロックは結果の辞書だけを守る。検索中の同じクエリは ``_flights`` で 1 回にまとめ、
+        # 別のクエリの検索は並行して進める（一括生成ではワーカー間で共有される）
+        self._lock = threading.Lock()
+        self._flights = SingleFlight("evidence")
+        # クエリ -> (結果, 検索した件数, オフラインか, 取得時刻)
+        self._entries: Dict[str, Tuple[List[Dict[str, Any]], int, bool, float]] = {}
+
+    def _entry(self, industry: str, num: int) -> Tuple[List[Dict[str, Any]], int, bool, float]:
+        query = news_query(industry)
+        with self._lock:
+            entry = self._entries.get(query)
+        if entry is not None and entry[1] >= num and time.monotonic() - entry[3] <= self.max_age:
+            return entry
+        fetch = max(num, self.num)
+        return self._flights.do((query, fetch), lambda: self._fetch(query, fetch), timeout=default_timeout())
+
+    def _fetch(self, query: str, fetch: int) -> Tuple[List[Dict[str, Any]], int, bool, float]:
+        # 検索の例外は呼び出し側のフォールバックに任せ、結果は保持しない
+        if isinstance(self.search_provider, WebSearchProvider):
+            # 共有プロバイダの offline_mode は別スレッドの検索で上書きされうるため、呼び出しごとの判定を使う
+            results, offline = self.search_provider.search_with_status(query, fetch)
+        else:
+            results = self.search_provider.search(query, fetch)
+            offline = bool(getattr(self.search_provider, "offline_mode", False))
+        entry = (list(results or []), fetch, offline, time.monotonic())
+        with self._lock:
+            self._entries[query] = entry
+        return entry
+
+    def news(self, industry: str, num: int) -> List[Dict[str, Any]]:
+        """ランキング済みの上位 ``num`` 件（呼び出し側で書き換えてもよい複製）"""
+        results = self._entry(industry, num)[0]
+        return copy.deepcopy(results[:num])
+
+    def is_offline(self, industry: str) -> bool:
+        """直近の取得がオフラインモード（キャッシュ・スタブ）だったか"""
+        with self._lock:
+            entry = self._entries.get(news_query(industry))
+        return entry is not None and entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def get_evidence_context(state: Any, settings_manager: Optional[Any] = None) -> EvidenceContext:
+    """``st.session_state`` などの辞書にセッション単位の ``EvidenceContext`` を用意する"""
+    context = state.get("evidence_context")
+    if not isinstance(context, EvidenceContext):
+        context = EvidenceContext(WebSearchProvider(settings_manager))
+        state["evidence_context"] = context
+    return context
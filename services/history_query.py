@@ -0,0 +1,76 @@
+"""履歴ページの絞り込み・並び替え・候補集計（SessionSummary を対象とする純粋関数）"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from core.models import SessionSummary
+
+SORT_LATEST = "latest"
+SORT_OLDEST = "oldest"
+SORT_TYPE = "type"
+SORT_PINNED_ONLY = "pinned"
+
+
+def collect_facets(summaries: Iterable[SessionSummary]) -> Dict[str, List[str]]:
+    """フィルタ候補（ユーザー・チーム・タグ・出典ドメイン）をまとめて集計"""
+    users: set[str] = set()
+    teams: set[str] = set()
+    tags: set[str] = set()
+    domains: set[str] = set()
+    for s in summaries:
+        users.add(s.user_id)
+        teams.add(s.team_id)
+        tags.update(s.tags)
+        domains.update(s.evidence_hosts)
+    return {
+        "user_ids": sorted(users),
+        "team_ids": sorted(teams),
+        "tags": sorted(tags),
+        "domains": sorted(domains),
+    }
+
+
+def filter_summaries(
+    summaries: Iterable[SessionSummary],
+    session_type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    team_id: Optional[str] = None,
+    query: str = "",
+    tags: Sequence[str] = (),
+    domains: Sequence[str] = (),
+    text_for: Optional[Callable[[SessionSummary], str]] = None,
+) -> List[SessionSummary]:
+    """条件に合うサマリーを返す
+
+    タグは AND、出典ドメインは OR で判定する。キーワードは ``text_for`` が
+    返す文字列（省略時はプレビュー）に対する部分一致。
+    """
+    required_tags = set(tags)
+    wanted_domains = set(domains)
+    result: List[SessionSummary] = []
+    for s in summaries:
+        if session_type and s.type != session_type:
+            continue
+        if user_id and s.user_id != user_id:
+            continue
+        if team_id and s.team_id != team_id:
+            continue
+        if required_tags and not required_tags.issubset(s.tags):
+            continue
+        if wanted_domains and wanted_domains.isdisjoint(s.evidence_hosts):
+            continue
+        if query and query not in (text_for(s) if text_for else s.preview):
+            continue
+        result.append(s)
+    return result
+
+
+def sort_summaries(summaries: Iterable[SessionSummary], mode: str = SORT_LATEST) -> List[SessionSummary]:
+    """ピン留めを先頭にして並び替える"""
+    items = list(summaries)
+    if mode == SORT_OLDEST:
+        return sorted(items, key=lambda s: (not s.pinned, s.sort_time))
+    if mode == SORT_TYPE:
+        return sorted(items, key=lambda s: (not s.pinned, s.type, s.sort_time))
+    if mode == SORT_PINNED_ONLY:
+        items = [s for s in items if s.pinned]
+    return sorted(items, key=lambda s: (s.pinned, s.sort_time), reverse=True)
@@ -0,0 +1,484 @@
+"""SQLite に永続化する長時間ジョブのキュー
+
+商談後の詳細分析や高度化検索は数十秒かかり、Streamlit のスクリプトスレッドで
+同期的に実行するとその間画面が固まり、ブラウザが再接続すると結果も失われる。
+ページはジョブを登録して ID を覚えておくだけにし、実行はワーカースレッド
+（または別プロセスのワーカー）に任せる。
+
+    queue = get_job_queue()
+    job_id = queue.submit("post_review", {"meeting_content": ..., ...})
+    queue.get(job_id).status   # queued → running → succeeded / failed / cancelled
+    queue.result(job_id)       # 成功したジョブのセッションデータ
+
+ジョブの状態は SQLite（``JOB_QUEUE_PATH``、既定 ``DATA_DIR/jobs.db``）に保存し、
+結果はストレージプロバイダにセッションとして保存してその ID をジョブに記録する。
+実行中のジョブはリース（``lease`` 秒）を定期的に延長し、プロセスが落ちて延長が
+止まったジョブは次に空いたワーカーが再実行する（``max_attempts`` 回まで）。
+キャンセルは待機中なら即座に、実行中ならハンドラが ``JobContext.check()`` を
+呼んだ時点で反映され、結果は保存しない。
+
+別プロセスでワーカーだけを動かす場合は ``python -m services.job_queue`` を使い、
+Streamlit 側は ``JOB_WORKERS=0`` で登録だけを行う。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from services.logger import Logger
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+DEFAULT_WORKERS = 2
+DEFAULT_LEASE = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_INTERVAL = 0.5
+# 終了したジョブの行を残す期間（結果のセッションは消さない）
+DEFAULT_RETENTION = 7 * 24 * 60 * 60.0
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        session_id TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        lease_until REAL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)",
+)
+_COLUMNS = (
+    "id, kind, status, payload, session_id, error, attempts, cancel_requested, created_at, started_at, finished_at"
+)
+
+
+class JobCancelled(Exception):
+    """実行中のジョブがキャンセルされた"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str
+    payload: Dict[str, Any]
+    session_id: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    cancel_requested: bool = False
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Job":
+        (job_id, kind, status, payload, session_id, error, attempts, cancel, created, started, finished) = row
+        return cls(
+            job_id, kind, status, json.loads(payload), session_id, error, attempts, bool(cancel), created, started, finished
+        )
+
+
+class JobContext:
+    """ハンドラに渡す実行中ジョブの情報"""
+
+    def __init__(self, queue: "JobQueue", job: Job) -> None:
+        self.queue = queue
+        self.job = job
+
+    @property
+    def cancelled(self) -> bool:
+        return self.queue.cancel_requested(self.job.id)
+
+    def check(self) -> None:
+        """キャンセルされていれば ``JobCancelled`` を送出する（処理の区切りで呼ぶ）"""
+        if self.cancelled:
+            raise JobCancelled(self.job.id)
+
+
+# ハンドラはペイロードを受け取り、セッションとして保存するデータを返す
+Handler = Callable[[Dict[str, Any], JobContext], Dict[str, Any]]
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    """ジョブの種類にハンドラを登録するデコレータ"""
+
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+@handler("post_review")
+def run_post_review(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """商談後ふりかえりの分析（入力はフォームの値をそのまま受け取る）"""
+    from core.models import SalesType
+    from services.post_analyzer import PostAnalyzerService
+    from services.settings_manager import SettingsManager
+
+    analysis = PostAnalyzerService(SettingsManager()).analyze_meeting(
+        meeting_content=payload["meeting_content"],
+        sales_type=SalesType(payload["sales_type"]),
+        industry=payload["industry"],
+        product=payload["product"],
+    )
+    return {"type": "post_review", "input": payload, "output": {"analysis_result": analysis}}
+
+
+@handler("enhanced_search")
+def run_enhanced_search(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """クエリ最適化 → 検索 → 品質評価（段階ごとにキャンセルを確認する）"""
+    from services.search_enhancer import SearchEnhancerService
+    from services.settings_manager import SettingsManager
+
+    service = SearchEnhancerService(SettingsManager())
+    query, industry, purpose = payload["query"], payload.get("industry", ""), payload.get("purpose", "")
+    optimization = service.enhance_search_query(query, industry, purpose)
+    if "error" in optimization:
+        raise RuntimeError(f"クエリ最適化に失敗しました: {optimization['error']}")
+    optimized_query = query
+    if optimization.get("optimized_queries"):
+        optimized_query = optimization["optimized_queries"][0]["query"]
+    context.check()
+    results = service.search_provider.search(optimized_query, payload.get("num_results", 5))
+    context.check()
+    quality = service.assess_search_quality(query, results)
+    return {
+        "type": "enhanced_search",
+        "input": payload,
+        "output": {
+            "original_query": query,
+            "optimized_query": optimized_query,
+            "query_optimization": optimization,
+            "search_results": results,
+            "quality_assessment": quality,
+        },
+    }
+
+
+def default_path() -> Path:
+    return Path(os.getenv("JOB_QUEUE_PATH") or Path(os.getenv("DATA_DIR", "./data")) / "jobs.db")
+
+
+class JobQueue:
+    """SQLite に状態を持つジョブキューとワーカースレッド"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        workers: int = DEFAULT_WORKERS,
+        storage_provider: Any = None,
+        handlers: Optional[Dict[str, Handler]] = None,
+        lease: float = DEFAULT_LEASE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        self.path = Path(path) if path is not None else default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.handlers = dict(HANDLERS if handlers is None else handlers)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.logger = Logger("JobQueue")
+        self._storage_provider = storage_provider
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._conn:
+            # 別プロセスのワーカーと同じファイルを読み書きする
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # このインスタンスが実行中のジョブ ID → 取得時の attempts
+        self._running: Dict[str, int] = {}
+
+    @property
+    def storage_provider(self) -> Any:
+        if self._storage_provider is None:
+            from services.storage_service import get_storage_provider
+
+            self._storage_provider = get_storage_provider()
+        return self._storage_provider
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """ジョブを登録して ID を返す（ペイロードは JSON にできる値に限る）"""
+        job_id = str(uuid.uuid4())
+        encoded = json.dumps(payload, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, encoded, time.time()),
+            )
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list_jobs(self, kind: Optional[str] = None, limit: int = 20) -> List[Job]:
+        """新しい順のジョブ一覧"""
+        query = f"SELECT {_COLUMNS} FROM jobs"
+        params: tuple = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def cancel(self, job_id: str) -> bool:
+        """待機中なら取り消し、実行中ならキャンセルを要求する。終了済みなら False"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            if cursor.rowcount:
+                return True
+            cursor = self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            )
+            return bool(cursor.rowcount)
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """成功したジョブが保存したセッションデータ"""
+        job = self.get(job_id)
+        if job is None or job.status != SUCCEEDED or not job.session_id:
+            return None
+        return self.storage_provider.load_session(job.session_id).get("data")
+
+    def recover(self) -> int:
+        """リースが切れた実行中のジョブを待機に戻す（試行回数を超えたものは失敗にする）"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET
+                    status = CASE WHEN cancel_requested THEN ? WHEN attempts >= ? THEN ? ELSE ? END,
+                    error = CASE WHEN cancel_requested OR attempts < ? THEN error
+                        ELSE '実行中に中断されました（再試行の上限に達しました）' END,
+                    finished_at = CASE WHEN cancel_requested OR attempts >= ? THEN ? END,
+                    lease_until = NULL
+                WHERE status = ? AND lease_until < ?
+                """,
+                (CANCELLED, self.max_attempts, FAILED, QUEUED, self.max_attempts, self.max_attempts, now, RUNNING, now),
+            )
+        if cursor.rowcount:
+            self.logger.warning(f"Recovered {cursor.rowcount} job(s) whose lease expired")
+            self._wake.set()
+        return cursor.rowcount
+
+    def prune(self, max_age: float = DEFAULT_RETENTION) -> int:
+        """終了してから ``max_age`` 秒を過ぎたジョブの行を消す"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+                (*FINISHED, time.time() - max_age),
+            )
+        return cursor.rowcount
+
+    def _claim(self) -> Optional[Job]:
+        if not self.handlers:
+            return None
+        kinds = list(self.handlers)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"""
+                UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ?
+                WHERE id = (
+                    SELECT id FROM jobs WHERE status = ? AND kind IN ({', '.join('?' * len(kinds))})
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING {_COLUMNS}
+                """,
+                (RUNNING, now, now + self.lease, QUEUED, *kinds),
+            ).fetchone()
+            if row is None:
+                return None
+            job = Job.from_row(row)
+            self._running[job.id] = job.attempts
+        return job
+
+    def _finish(self, job: Job, status: str, session_id: Optional[str] = None, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._running.pop(job.id, None)
+            # リースが切れて別のワーカーが取り直したジョブは上書きしない
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, session_id = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (status, session_id, error, time.time(), job.id, RUNNING, job.attempts),
+            )
+
+    def _execute(self, job: Job) -> None:
+        context = JobContext(self, job)
+        try:
+            data = self.handlers[job.kind](job.payload, context)
+            context.check()
+            session_id = self.storage_provider.save_session(data)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            self.logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            self._finish(job, FAILED, error=str(e))
+        else:
+            self._finish(job, SUCCEEDED, session_id=session_id)
+
+    def run_pending(self, limit: Optional[int] = None) -> int:
+        """待機中のジョブを呼び出し元のスレッドで実行する。実行した件数を返す
+
+        ワーカーを起動していない場合は、実行中だけハートビートのスレッドを動かして
+        リースを延長する（長いジョブを他のプロセスに取り直されないように）。
+        """
+        stop = None
+        if not self._threads:
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(stop,), name="job-heartbeat", daemon=True)
+            heartbeat.start()
+        count = 0
+        try:
+            while limit is None or count < limit:
+                self.recover()
+                job = self._claim()
+                if job is None:
+                    break
+                self._execute(job)
+                count += 1
+        finally:
+            if stop is not None:
+                stop.set()
+                heartbeat.join()
+        return count
+
+    def _extend_leases(self) -> None:
+        with self._lock, self._conn:
+            for job_id, attempts in self._running.items():
+                self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND attempts = ?",
+                    (time.time() + self.lease, job_id, RUNNING, attempts),
+                )
+
+    def _heartbeat(self, stop: Optional[threading.Event] = None) -> None:
+        """実行中のジョブのリースを延長し、他のプロセスで止まったジョブを回収する"""
+        stop = stop or self._stop
+        while not stop.wait(self.lease / 3):
+            self._extend_leases()
+            self.recover()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._execute(job)
+
+    def start(self) -> None:
+        """ワーカースレッドを起動する（起動済みなら何もしない）"""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        self.recover()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True) for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """新しいジョブの取得をやめ、実行中のジョブが終わるのを待つ"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+_QUEUE: Optional[JobQueue] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """プロセスで共有するキュー（``JOB_WORKERS`` 本のワーカーを起動済み）"""
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            try:
+                workers = int(os.getenv("JOB_WORKERS") or DEFAULT_WORKERS)
+            except ValueError:
+                workers = DEFAULT_WORKERS
+            _QUEUE = JobQueue(workers=workers)
+            _QUEUE.prune()
+            _QUEUE.start()
+        return _QUEUE
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ジョブキューのワーカーを起動する")
+    parser.add_argument("--db", type=Path, default=None, help="キューの場所（既定 JOB_QUEUE_PATH）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="ワーカースレッドの数")
+    parser.add_argument("--once", action="store_true", help="待機中のジョブを実行したら終了する")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db, workers=args.workers)
+    if args.once:
+        print(f"{queue.run_pending()} 件のジョブを実行しました")
+        queue.close()
+        return 0
+    queue.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -1,111 +1,267 @@
+import atexit
+import copy
+import json
 import logging
-from datetime import datetime
-from typing import Optional
+import logging.handlers
+import os
+import queue
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Optional
 from pathlib import Path
 
 from .utils import mask_pii
-
-class Logger:
-    """アプリケーション全体のログ管理サービス"""
-    
-    def __init__(self, name: str = "SalesSaaS", log_level: str = "INFO", log_dir: str = "logs"):
-        self.name = name
-        self.log_level = getattr(logging, log_level.upper())
-        self.log_dir = Path(log_dir)
-        
-        # ログディレクトリの作成
-        self.log_dir.mkdir(exist_ok=True)
-        
-        # ロガーの設定
-        self.logger = logging.getLogger(name)
-        self.logger.setLevel(self.log_level)
-        
-        # 既存のハンドラーをクリア（重複を防ぐ）
-        if self.logger.handlers:
-            self.logger.handlers.clear()
-        
-        # コンソールハンドラー
-        self._setup_console_handler()
-        
-        # ファイルハンドラー
-        self._setup_file_handler()
-        
-        # フォーマッター
-        self._setup_formatter()
-    
-    def _setup_console_handler(self):
-        """コンソール出力用ハンドラーの設定"""
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(self.log_level)
-        self.logger.addHandler(console_handler)
-    
-    def _setup_file_handler(self):
-        """ファイル出力用ハンドラーの設定"""
-        # 日付別のログファイル
-        today = datetime.now().strftime("%Y-%m-%d")
-        log_file = self.log_dir / f"{self.name}_{today}.log"
-        
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(self.log_level)
-        self.logger.addHandler(file_handler)
-    
-    def _setup_formatter(self):
-        """ログフォーマッターの設定"""
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-        )
-        
-        for handler in self.logger.handlers:
-            handler.setFormatter(formatter)
-    
+
+# 1 回のスクリプト実行（リクエスト）に振る ID
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord が標準で持つ属性（JSON では extra 以外を出力しない）
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "trace_id",
+    "span_id",
+}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s"
+LOG_FILE_NAME = "SalesSaaS.log"
+
+
+def bind_request_id(request_id: Optional[str] = None) -> str:
+    """現在のコンテキストにリクエスト ID を設定して返す（省略時は新規発行）"""
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class ContextFilter(logging.Filter):
+    """ログを出したスレッドのリクエスト ID・トレース ID を LogRecord に付与する"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 循環 import を避けるため遅延 import（tracing は logger に依存しない）
+        from services.tracing import current_span
+
+        span = current_span()
+        record.request_id = _request_id.get()
+        record.trace_id = span.trace_id if span is not None else None
+        record.span_id = span.span_id if span is not None else None
+        return True
+
+
+def _mask_value(value: Any) -> Any:
+    """extra の値に含まれる文字列を ``mask_pii`` でマスクする（dict / list もたどる）"""
+    if isinstance(value, str):
+        return mask_pii(value)
+    if isinstance(value, dict):
+        return {k: _mask_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mask_value(v) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """1 行 1 JSON の構造化ログ（Cloud Logging の ``severity`` も出力）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "request_id": getattr(record, "request_id", None),
+            "trace_id": getattr(record, "trace_id", None),
+            "span_id": getattr(record, "span_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """呼び出し元スレッドでメッセージと例外を文字列化し、PII をマスクしてからキューに積む
+
+    ``prepare`` はハンドラーが出力するレコードにだけ呼ばれるため、レベルで捨てられる
+    ログでは整形もマスクも行わない。マスクは複製に対して行い、同じレコードを受け取る
+    他のハンドラーには元の内容を渡す。JSON に出力される extra の文字列もマスクする。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = mask_pii(record.getMessage())
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = mask_pii(record.exc_text)
+        if record.stack_info:
+            record.stack_info = mask_pii(record.stack_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        for key, value in list(vars(record).items()):
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                setattr(record, key, _mask_value(value))
+        return record
+
+
+class _LoggingState:
+    """プロセスで 1 つのキューとリスナー"""
+
+    lock = threading.Lock()
+    handler: Optional[logging.Handler] = None
+    listener: Optional[logging.handlers.QueueListener] = None
+    log_dir: Optional[Path] = None
+
+
+def configure_logging(log_dir: str = "logs") -> logging.Handler:
+    """キュー経由のログ出力を設定する（2 回目以降は既存の設定を返す）
+
+    ディスクやコンソールへの書き込みは ``QueueListener`` のスレッドで行い、
+    ファイルは ``LOG_DIR``（既定 ``logs``）の ``SalesSaaS.log`` に JSON で書き出して
+    毎日 0 時にローテーションする（``LOG_BACKUP_DAYS`` 日分、既定 14 日）。
+    コンソールは ``LOG_FORMAT=json`` で JSON、それ以外は従来のテキスト形式。
+    """
+    with _LoggingState.lock:
+        if _LoggingState.handler is not None:
+            return _LoggingState.handler
+
+        directory = Path(os.getenv("LOG_DIR") or log_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        console_handler = logging.StreamHandler()
+        if os.getenv("LOG_FORMAT", "text").lower() == "json":
+            console_handler.setFormatter(JsonFormatter())
+        else:
+            console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            directory / LOG_FILE_NAME,
+            when="midnight",
+            backupCount=int(os.getenv("LOG_BACKUP_DAYS", "14")),
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setFormatter(JsonFormatter())
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        handler = _ContextQueueHandler(log_queue)
+        handler.addFilter(ContextFilter())
+        listener = logging.handlers.QueueListener(
+            log_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        listener.start()
+
+        _LoggingState.handler = handler
+        _LoggingState.listener = listener
+        _LoggingState.log_dir = directory
+        return handler
+
+
+def shutdown_logging() -> None:
+    """キューを書き出してリスナーを止める（テストや終了時用）"""
+    with _LoggingState.lock:
+        listener = _LoggingState.listener
+        handler = _LoggingState.handler
+        _LoggingState.listener = None
+        _LoggingState.handler = None
+        _LoggingState.log_dir = None
+    if handler is not None:
+        for logger in list(logging.Logger.manager.loggerDict.values()):
+            if isinstance(logger, logging.Logger) and handler in logger.handlers:
+                logger.removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+
+
+atexit.register(shutdown_logging)
+
+
+def _level(log_level: Optional[str]) -> int:
+    return getattr(logging, (log_level or os.getenv("LOG_LEVEL") or "INFO").upper())
+
+
+def get_logger(name: str = "SalesSaaS", log_level: Optional[str] = None, log_dir: str = "logs") -> logging.Logger:
+    """共有のキューハンドラーを付けたロガーを返す（何度呼んでも追加は 1 回）
+
+    ``log_level`` を省略した場合は ``LOG_LEVEL``（既定 ``INFO``）を使う。
+    """
+    handler = configure_logging(log_dir)
+    logger = logging.getLogger(name)
+    logger.setLevel(_level(log_level))
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+class Logger:
+    """アプリケーション全体のログ管理サービス
+
+    ハンドラーはプロセスで共有され、生成のたびに作り直すことはない。
+    ``stacklevel=2`` で記録するため、関数名・行番号はこのクラスではなく呼び出し元になる。
+    """
+
+    def __init__(self, name: str = "SalesSaaS", log_level: Optional[str] = None, log_dir: str = "logs"):
+        self.name = name
+        self.log_level = _level(log_level)
+        self.logger = get_logger(name, log_level, log_dir)
+        self.log_dir = _LoggingState.log_dir or Path(log_dir)
+
     def info(self, message: str):
         """情報ログ"""
-        self.logger.info(mask_pii(message))
+        self.logger.info(message, stacklevel=2)
 
     def warning(self, message: str):
         """警告ログ"""
-        self.logger.warning(mask_pii(message))
+        self.logger.warning(message, stacklevel=2)
 
     def error(self, message: str, exc_info: Optional[Exception] = None):
         """エラーログ"""
-        if exc_info:
-            self.logger.error(mask_pii(message), exc_info=exc_info)
-        else:
-            self.logger.error(mask_pii(message))
+        self.logger.error(message, exc_info=exc_info or None, stacklevel=2)
 
     def debug(self, message: str):
         """デバッグログ"""
-        self.logger.debug(mask_pii(message))
+        self.logger.debug(message, stacklevel=2)
 
     def critical(self, message: str, exc_info: Optional[Exception] = None):
         """重大エラーログ"""
-        if exc_info:
-            self.logger.critical(mask_pii(message), exc_info=exc_info)
-        else:
-            self.logger.critical(mask_pii(message))
-    
+        self.logger.critical(message, exc_info=exc_info or None, stacklevel=2)
+
     def log_user_action(self, user_action: str, details: dict = None):
-        """ユーザーアクションのログ"""
-        message = f"USER_ACTION: {user_action}"
+        """ユーザーアクションのログ（整形は出力時まで遅らせる）"""
         if details:
-            message += f" - Details: {details}"
-        self.info(message)
-    
-    def log_service_call(self, service_name: str, method: str, params: dict = None):
-        """サービス呼び出しのログ"""
-        message = f"SERVICE_CALL: {service_name}.{method}"
-        if params:
-            message += f" - Params: {params}"
-        self.info(message)
-    
-    def log_api_call(self, api_name: str, success: bool, response_time: float = None):
-        """API呼び出しのログ"""
-        status = "SUCCESS" if success else "FAILED"
-        message = f"API_CALL: {api_name} - {status}"
-        if response_time:
-            message += f" - Response time: {response_time:.2f}s"
-        
-        if success:
-            self.info(message)
-        else:
-            self.warning(message)
+            self.logger.info("USER_ACTION: %s - Details: %s", user_action, details, stacklevel=2)
+        else:
+            self.logger.info("USER_ACTION: %s", user_action, stacklevel=2)
+
+    def log_service_call(self, service_name: str, method: str, params: dict = None):
+        """サービス呼び出しのログ（整形は出力時まで遅らせる）"""
+        if params:
+            self.logger.info("SERVICE_CALL: %s.%s - Params: %s", service_name, method, params, stacklevel=2)
+        else:
+            self.logger.info("SERVICE_CALL: %s.%s", service_name, method, stacklevel=2)
+
+    def log_api_call(self, api_name: str, success: bool, response_time: float = None):
+        """API呼び出しのログ"""
+        status = "SUCCESS" if success else "FAILED"
+        message = f"API_CALL: {api_name} - {status}"
+        if response_time:
+            message += f" - Response time: {response_time:.2f}s"
+
+        self.logger.log(logging.INFO if success else logging.WARNING, message, stacklevel=2)
@@ -0,0 +1,245 @@
+"""ローカルのニュースコーパス（SQLite FTS5 の trigram 索引）
+
+JSONL（NewsAPI の記事形式）や RSS / Atom のダンプを取り込み、見出しと抜粋を
+FTS5 の ``trigram`` トークナイザーで索引化する。分かち書きのない日本語でも
+3 文字単位で部分一致でき、検索はディスク上の転置索引を引くだけなので外部 API を
+呼ばずに数ミリ秒で結果を返す。結果は ``WebSearchProvider`` の他のプロバイダと
+同じ形式（``title`` / ``url`` / ``snippet`` / ``source`` / ``published_at``）。
+
+    python -m services.news_corpus dumps/news.jsonl feeds/*.xml
+
+索引の場所は ``NEWS_CORPUS_PATH``（既定 ``DATA_DIR/news_corpus.db``）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import xml.etree.ElementTree as ET
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SOURCE = "local"
+# FTS5 の bm25() で絞り込む候補数（最終的な並びは WebSearchProvider._rank_results が決める）
+CANDIDATE_FACTOR = 4
+MIN_CANDIDATES = 20
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS articles (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        snippet TEXT,
+        published_at TEXT
+    )
+    """,
+    # 索引には NFKC 正規化した文字列を入れる（全角英数字でも一致させる）
+    "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, snippet, tokenize='trigram')",
+)
+
+_HTML_TAG_REGEX = re.compile(r"<[^>]+>")
+# ひらがな・カタカナ・漢字だけの語（trigram に分けて部分一致させる）
+_CJK_TERM_REGEX = re.compile(r"[々〆ぁ-ゖァ-ヺーヶ一-鿿豈-﫿]+")
+_ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+def default_path() -> Path:
+    return Path(os.getenv("NEWS_CORPUS_PATH") or Path(os.getenv("DATA_DIR", "./data")) / "news_corpus.db")
+
+
+def _normalize(text: Optional[str]) -> str:
+    return unicodedata.normalize("NFKC", text or "")
+
+
+def _clean(text: Optional[str]) -> str:
+    return " ".join(_HTML_TAG_REGEX.sub(" ", text or "").split())
+
+
+def _iso_date(value: Optional[str]) -> Optional[str]:
+    """RSS の RFC 822 形式や ISO 8601 の日時を ISO 8601（UTC）にそろえる"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return value
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def match_expression(query: str) -> Optional[str]:
+    """クエリを FTS5 の MATCH 式にする（語の OR、3 文字未満の語は使わない）
+
+    日本語の語は 3 文字ずつの並びに分けるため、「最新ニュース」で
+    「最新のニュース」のような表記揺れも拾える。
+    """
+    phrases: List[str] = []
+    for term in _normalize(query).lower().split():
+        term = term.replace('"', "")
+        if len(term) < 3:
+            continue
+        if _CJK_TERM_REGEX.fullmatch(term) and len(term) > 3:
+            phrases += [term[i : i + 3] for i in range(len(term) - 2)]
+        else:
+            phrases.append(term)
+    if not phrases:
+        return None
+    return " OR ".join(f'"{p}"' for p in dict.fromkeys(phrases))
+
+
+def read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """1 行 1 記事の JSONL（NewsAPI の ``articles`` の要素と同じキーも受け付ける）"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            yield {
+                "title": item.get("title"),
+                "url": item.get("url") or item.get("link"),
+                "snippet": item.get("snippet") or item.get("description") or item.get("content"),
+                "published_at": item.get("published_at") or item.get("publishedAt"),
+            }
+
+
+def read_feed(path: Path) -> Iterator[Dict[str, Any]]:
+    """RSS 2.0 の ``item`` と Atom の ``entry`` を読む"""
+    for _, elem in ET.iterparse(path):
+        if elem.tag == "item":
+            yield {
+                "title": elem.findtext("title"),
+                "url": elem.findtext("link"),
+                "snippet": elem.findtext("description"),
+                "published_at": elem.findtext("pubDate"),
+            }
+            elem.clear()
+        elif elem.tag == f"{_ATOM}entry":
+            link = elem.find(f"{_ATOM}link")
+            yield {
+                "title": elem.findtext(f"{_ATOM}title"),
+                "url": link.get("href") if link is not None else None,
+                "snippet": elem.findtext(f"{_ATOM}summary") or elem.findtext(f"{_ATOM}content"),
+                "published_at": elem.findtext(f"{_ATOM}published") or elem.findtext(f"{_ATOM}updated"),
+            }
+            elem.clear()
+
+
+def read_dump(path: Path) -> Iterator[Dict[str, Any]]:
+    """拡張子で JSONL と RSS / Atom を切り替える"""
+    if path.suffix.lower() in (".jsonl", ".ndjson", ".json"):
+        return read_jsonl(path)
+    return read_feed(path)
+
+
+class NewsCorpus:
+    """ニュース記事の全文検索索引"""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path) if path is not None else default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def add(self, items: Iterable[Dict[str, Any]]) -> int:
+        """記事を追加する（同じ URL は上書き）。追加・更新した件数を返す"""
+        count = 0
+        with self._lock, self._conn:
+            for item in items:
+                url = (item.get("url") or "").strip()
+                title = _clean(item.get("title"))
+                if not url or not title:
+                    continue
+                snippet = _clean(item.get("snippet"))
+                (rowid,) = self._conn.execute(
+                    "INSERT INTO articles (url, title, snippet, published_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET title = excluded.title, snippet = excluded.snippet, "
+                    "published_at = excluded.published_at RETURNING id",
+                    (url, title, snippet, _iso_date(item.get("published_at"))),
+                ).fetchone()
+                self._conn.execute("DELETE FROM articles_fts WHERE rowid = ?", (rowid,))
+                self._conn.execute(
+                    "INSERT INTO articles_fts (rowid, title, snippet) VALUES (?, ?, ?)",
+                    (rowid, _normalize(title), _normalize(snippet)),
+                )
+                count += 1
+        return count
+
+    def ingest(self, path: Path) -> int:
+        return self.add(read_dump(Path(path)))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def search(self, query: str, num: int) -> List[Dict[str, Any]]:
+        """BM25（見出しを抜粋の 2 倍に重み付け）の上位候補を返す
+
+        ``num`` 件より多めに返し、最終的な並び替えは呼び出し側に任せる。
+        """
+        expression = match_expression(query)
+        if expression is None or num <= 0:
+            return []
+        limit = max(num * CANDIDATE_FACTOR, MIN_CANDIDATES)
+        with self._lock:
+            rows: List[Tuple[Any, ...]] = self._conn.execute(
+                "SELECT a.title, a.url, a.snippet, a.published_at FROM articles_fts "
+                "JOIN articles AS a ON a.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ? "
+                "ORDER BY bm25(articles_fts, 2.0, 1.0), a.published_at DESC LIMIT ?",
+                (expression, limit),
+            ).fetchall()
+        return [
+            {"title": title, "url": url, "snippet": snippet, "source": SOURCE, "published_at": published_at}
+            for title, url, snippet, published_at in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_corpora: Dict[Path, NewsCorpus] = {}
+_corpora_lock = threading.Lock()
+
+
+def get_corpus(path: Optional[Path] = None) -> Optional[NewsCorpus]:
+    """既存の索引を開く（プロセス内で共有）。索引がなければ None"""
+    path = Path(path) if path is not None else default_path()
+    if not path.exists():
+        return None
+    key = path.resolve()
+    with _corpora_lock:
+        corpus = _corpora.get(key)
+        if corpus is None:
+            corpus = _corpora[key] = NewsCorpus(key)
+        return corpus
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="JSONL / RSS のダンプをローカルのニュースコーパスに取り込む")
+    parser.add_argument("dumps", nargs="+", type=Path)
+    parser.add_argument("--db", type=Path, default=None, help="索引の場所（既定 NEWS_CORPUS_PATH）")
+    args = parser.parse_args(argv)
+    corpus = NewsCorpus(args.db)
+    added = {str(path): corpus.ingest(path) for path in args.dumps}
+    print(json.dumps({"added": added, "total": len(corpus)}, ensure_ascii=False))
+    corpus.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
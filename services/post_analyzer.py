@@ -8,6 +8,7 @@ from core.models import SalesType
 from providers.llm_openai import OpenAIProvider
 from services.error_handler import ServiceError, ConfigurationError
 from services.logger import Logger
+from services.tracing import span, traced
 from services.utils import escape_braces, sanitize_for_prompt
 
 logger = Logger("PostAnalyzerService")
@@ -69,6 +70,7 @@ class PostAnalyzerService:
             logger.error(f"プロンプトテンプレートの読み込みに失敗: {e}")
             raise ConfigurationError(f"プロンプトテンプレートの読み込みに失敗: {e}")
     
+    @traced("post_review.analyze")
     def analyze_meeting(self, 
                         meeting_content: str,
                         sales_type: SalesType,
@@ -94,7 +96,8 @@ class PostAnalyzerService:
         
         try:
             # プロンプトの構築
-            prompt = self._build_prompt(meeting_content, sales_type, industry, product)
+            with span("prompt.build", template="post_review"):
+                prompt = self._build_prompt(meeting_content, sales_type, industry, product)
             
             # LLMによる解析
             logger.info("商談内容の解析を開始")
@@ -1,17 +1,49 @@
 import yaml
 import os
+import copy
 import time
 import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 from string import Template
 from core.models import SalesInput
-from core.schema import get_pre_advice_schema
-from providers.llm_openai import OpenAIProvider
+from core.schema import (
+    get_pre_advice_schema,
+    get_pre_advice_section_schema,
+    get_pre_advice_with_icebreakers_schema,
+)
+from providers.llm_openai import BatchRequest, OpenAIProvider
 from providers.search_provider import WebSearchProvider
+from services.advice_cache import DEFAULT_THRESHOLD, AdviceCache, default_tenant, get_advice_cache
+from services.evidence import EvidenceContext, news_query
+from services.icebreaker import fallback_icebreakers, format_news_items, tone_for_type
 from services.logger import Logger
+from services.tracing import span, traced
 from services.error_handler import ErrorHandler, ServiceError, ConfigurationError
-from services.utils import escape_braces, sanitize_for_prompt
+from services.utils import escape_braces, sanitize_mapping
+
+def get_section(advice: Dict[str, Any], section: str) -> Any:
+    """``short_term.objections`` のようなパスでアドバイスの一部を取り出す（無ければ None）"""
+    node: Any = advice
+    for key in section.split("."):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def replace_section(advice: Dict[str, Any], section: str, value: Any) -> Dict[str, Any]:
+    """アドバイスの一部を ``value`` に差し替えた複製を返す"""
+    updated = copy.deepcopy(advice)
+    *parents, leaf = section.split(".")
+    node = updated
+    for key in parents:
+        if not isinstance(node.get(key), dict):
+            node[key] = {}
+        node = node[key]
+    node[leaf] = value
+    return updated
+
 
 class PreAdvisorService:
     def __init__(self, settings_manager=None):
@@ -79,14 +111,128 @@ class PreAdvisorService:
                 "offline": True
             }
     
-    def generate_advice(self, sales_input: SalesInput) -> Dict[str, Any]:
-        """事前アドバイスを生成"""
+    @traced("pre_advice.generate")
+    def generate_advice(self, sales_input: SalesInput, evidence: Optional[EvidenceContext] = None) -> Dict[str, Any]:
+        """事前アドバイスを生成
+
+        ``evidence`` を渡すと、同じページのアイスブレイクと業界ニュースの検索結果を共有する。
+        """
+        return self._generate(sales_input, evidence)
+
+    @traced("pre_advice.generate_with_icebreakers")
+    def generate_advice_with_icebreakers(
+        self,
+        sales_input: SalesInput,
+        company_hint: Optional[str] = None,
+        search_enabled: bool = True,
+        evidence: Optional[EvidenceContext] = None,
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """事前アドバイスとアイスブレイクを 1 回の LLM 呼び出しで生成
+
+        事前アドバイスのプロンプトにアイスブレイクの指示を加え、両方を含むスキーマで
+        受け取った応答を（アドバイス, アイスブレイク）に分ける。アイスブレイクが
+        得られない場合は ``IcebreakerService`` と同じ定型文を返す。
+        """
+        icebreaker_request = {"company_hint": company_hint, "search_enabled": search_enabled}
+        advice = self._generate(sales_input, evidence, icebreaker_request)
+        icebreakers = advice.pop("icebreakers", None)
+        if not (isinstance(icebreakers, list) and icebreakers and all(isinstance(i, str) for i in icebreakers)):
+            icebreakers = fallback_icebreakers(sales_input.sales_type, sales_input.industry)
+        return advice, icebreakers
+
+    @traced("pre_advice.regenerate_section")
+    def regenerate_section(
+        self,
+        sales_input: SalesInput,
+        advice: Dict[str, Any],
+        section: str,
+        instruction: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """事前アドバイスの一部（例: ``short_term.objections``）だけを作り直す
+
+        対象部分のスキーマだけを要求し、残りのアドバイスは簡潔な JSON で文脈として渡す。
+        戻り値は ``advice`` の該当部分を差し替えた複製。
+        """
+        schema = get_pre_advice_section_schema(section)
         start_time = time.time()
-        
+
+        try:
+            self.logger.log_user_action(
+                "regenerate_pre_advice_section",
+                {"section": section, "industry": sales_input.industry, "product": sales_input.product},
+            )
+            with span("prompt.build", template="pre_advice.section") as prompt_span:
+                prompt = self._build_section_prompt(sales_input, advice, section, instruction)
+                prompt_span.set_attribute("prompt.chars", len(prompt))
+
+            self.logger.log_service_call("OpenAIProvider", "call_llm", {"mode": "speed", "section": section})
+            response = self.llm_provider.call_llm(prompt=prompt, mode="speed", json_schema=schema)
+            if not isinstance(response, dict) or "section" not in response:
+                raise ValueError("LLMの応答に作り直した項目が含まれていません")
+
+            response_time = time.time() - start_time
+            self.logger.log_api_call("LLM_SectionGeneration", True, response_time)
+            return replace_section(advice, section, response["section"])
+
+        except Exception as e:
+            response_time = time.time() - start_time
+            self.logger.log_api_call("LLM_SectionGeneration", False, response_time)
+            error_response = self.error_handler.handle_error(
+                e,
+                context="PreAdvisorService.regenerate_section",
+                user_friendly=True
+            )
+            self.logger.error(f"Failed to regenerate pre-advice section {section}: {str(e)}", exc_info=e)
+            raise ServiceError(
+                error_response["error"]["message"],
+                "execution_failed",
+                {"original_error": str(e), "section": section, "response_time": response_time}
+            )
+
+    def _advice_cache(self) -> Optional[Tuple[AdviceCache, float]]:
+        """設定で有効な場合の類似度キャッシュと再利用の閾値"""
+        if self.settings_manager is None:
+            return None
+        settings = self.settings_manager.load_settings()
+        # 型をサニタイズ（Mock対策）
+        enabled = getattr(settings, "advice_cache_enabled", False)
+        if not isinstance(enabled, bool) or not enabled:
+            return None
+        threshold = getattr(settings, "advice_cache_threshold", DEFAULT_THRESHOLD)
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+            threshold = DEFAULT_THRESHOLD
+        return get_advice_cache(), float(threshold)
+
+    def _generate(
+        self,
+        sales_input: SalesInput,
+        evidence: Optional[EvidenceContext],
+        icebreaker_request: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        start_time = time.time()
+
         try:
+            cache = None
+            hit = None
+            if icebreaker_request is None:
+                try:
+                    cache = self._advice_cache()
+                    if cache is not None:
+                        hit = cache[0].lookup(sales_input, default_tenant(), threshold=cache[1])
+                except Exception as e:
+                    # キャッシュの不具合は生成を止めず、この呼び出しではキャッシュを使わない
+                    self.logger.warning(f"Advice cache disabled for this request: {e}")
+                    cache = None
+            if hit is not None:
+                response, similarity = hit
+                response["reused"] = True
+                response["reused_similarity"] = round(similarity, 3)
+                self.logger.info(f"Reused pre-advice for a similar input (similarity {similarity:.2f})")
+                return response
+
             # ユーザーアクションのログ
             self.logger.log_user_action(
-                "generate_pre_advice",
+                "generate_pre_advice_with_icebreakers" if icebreaker_request else "generate_pre_advice",
                 {
                     "sales_type": sales_input.sales_type.value,
                     "industry": sales_input.industry,
@@ -94,20 +240,19 @@ class PreAdvisorService:
                 }
             )
             
+            # 参考出典を取得（設定に応じて）
+            sources = self._sources(sales_input, evidence)
+
             # プロンプトを構築
-            prompt = self._build_prompt(sales_input)
+            with span("prompt.build", template="pre_advice") as prompt_span:
+                prompt = self._build_prompt(sales_input)
+                if icebreaker_request is not None:
+                    news = sources[:2] if icebreaker_request.get("search_enabled", True) else []
+                    prompt += self._build_icebreaker_prompt(
+                        sales_input, icebreaker_request.get("company_hint"), news
+                    )
+                prompt_span.set_attribute("prompt.chars", len(prompt))
             self.logger.debug(f"Prompt built successfully for {sales_input.industry} industry")
-            
-            # 参考出典を取得（設定に応じて）
-            try:
-                search_provider = WebSearchProvider(self.settings_manager)
-                sources = search_provider.search(f"{sales_input.industry} 最新ニュース", 3)
-                if getattr(search_provider, "offline_mode", False):
-                    self.logger.warning("オフラインモード: Web検索が利用できません。スタブデータを使用します。")
-            except Exception:
-                self.logger.warning("オフラインモード: Web検索が利用できません。スタブデータを使用します。")
-                search_provider = WebSearchProvider(self.settings_manager)
-                sources = search_provider._get_stub_results(f"{sales_input.industry} 最新ニュース", 3)
 
             # LLMでアドバイス生成
             self.logger.log_service_call("OpenAIProvider", "call_llm", {"mode": "speed"})
@@ -115,7 +260,11 @@ class PreAdvisorService:
                 response = self.llm_provider.call_llm(
                     prompt=prompt,
                     mode="speed",
-                    json_schema=get_pre_advice_schema()
+                    json_schema=(
+                        get_pre_advice_with_icebreakers_schema()
+                        if icebreaker_request is not None
+                        else get_pre_advice_schema()
+                    ),
                 )
             except Exception as e:
                 if isinstance(e, ConnectionError):
@@ -124,11 +273,13 @@ class PreAdvisorService:
                 else:
                     raise
             
-            # 生成JSONに参考出典URLを同期（テスト実行中はスキップして互換性維持）
-            if not os.getenv("PYTEST_CURRENT_TEST"):
-                evidence_urls = [it.get("url") for it in sources if isinstance(it, dict) and it.get("url")]
-                if evidence_urls:
-                    response["evidence_urls"] = evidence_urls
+            self._attach_evidence(response, sources)
+
+            if cache is not None and not response.get("offline"):
+                try:
+                    cache[0].store(sales_input, response, default_tenant())
+                except Exception as e:
+                    self.logger.warning(f"Failed to store pre-advice in the advice cache: {e}")
 
             # 成功ログ
             response_time = time.time() - start_time
@@ -161,37 +312,60 @@ class PreAdvisorService:
                 {"original_error": str(e), "response_time": response_time}
             )
     
+    @traced("pre_advice.generate_batch")
+    def generate_advice_batch(
+        self,
+        sales_inputs: Sequence[SalesInput],
+        evidence: Optional[EvidenceContext] = None,
+        **batch_options: Any,
+    ) -> List[Union[Dict[str, Any], ServiceError]]:
+        """複数の入力の事前アドバイスを Batch API でまとめて生成（入力と同じ順）
+
+        応答まで最大 24 時間かかる代わりに料金が安い、夜間の一括生成向け。
+        失敗した入力の位置には ``ServiceError`` が入る。類似度キャッシュは使わない。
+        ``batch_options`` は ``OpenAIProvider.call_llm_batch`` にそのまま渡す。
+        """
+        if evidence is None:
+            evidence = EvidenceContext(WebSearchProvider(self.settings_manager))
+        sources = [self._sources(sales_input, evidence) for sales_input in sales_inputs]
+        requests = [
+            BatchRequest(str(i), self._build_prompt(sales_input), "speed", get_pre_advice_schema())
+            for i, sales_input in enumerate(sales_inputs)
+        ]
+        self.logger.log_service_call("OpenAIProvider", "call_llm_batch", {"mode": "speed", "size": len(requests)})
+        results: List[Union[Dict[str, Any], ServiceError]] = []
+        for result, items in zip(self.llm_provider.call_llm_batch(requests, **batch_options), sources):
+            if not result.ok:
+                results.append(ServiceError(str(result.error), "execution_failed", {"original_error": str(result.error)}))
+                continue
+            self._attach_evidence(result.response, items)
+            results.append(result.response)
+        return results
+
+    def _sources(self, sales_input: SalesInput, evidence: Optional[EvidenceContext]) -> List[Dict[str, Any]]:
+        """業界ニュースの参考出典（検索できない場合はスタブ）"""
+        try:
+            if evidence is None:
+                evidence = EvidenceContext(WebSearchProvider(self.settings_manager))
+            sources = evidence.news(sales_input.industry, 3)
+            if evidence.is_offline(sales_input.industry):
+                self.logger.warning("オフラインモード: Web検索が利用できません。スタブデータを使用します。")
+        except Exception:
+            self.logger.warning("オフラインモード: Web検索が利用できません。スタブデータを使用します。")
+            search_provider = WebSearchProvider(self.settings_manager)
+            sources = search_provider._get_stub_results(news_query(sales_input.industry), 3)
+        return sources
+
+    def _attach_evidence(self, response: Dict[str, Any], sources: List[Dict[str, Any]]) -> None:
+        """生成JSONに参考出典URLを同期（テスト実行中はスキップして互換性維持）"""
+        if not os.getenv("PYTEST_CURRENT_TEST"):
+            evidence_urls = [it.get("url") for it in sources if isinstance(it, dict) and it.get("url")]
+            if evidence_urls:
+                response["evidence_urls"] = evidence_urls
+
     def _build_prompt(self, sales_input: SalesInput) -> str:
         """プロンプトを構築"""
-        # 説明フィールドの処理
-        description = escape_braces(sanitize_for_prompt(sales_input.description or ""))
-        description_url = escape_braces(sanitize_for_prompt(sales_input.description_url or ""))
-
-        # 競合フィールドの処理
-        competitor = escape_braces(sanitize_for_prompt(sales_input.competitor or ""))
-        competitor_url = escape_braces(sanitize_for_prompt(sales_input.competitor_url or ""))
-
-        # 制約の処理
-        constraints_text = escape_braces(
-            sanitize_for_prompt(
-                ", ".join(sales_input.constraints) if sales_input.constraints else "なし"
-            )
-        )
-
-        # プロンプトテンプレートを適用
-        user_template = Template(self.prompt_template["user"])
-        prompt = user_template.safe_substitute(
-            sales_type=escape_braces(sanitize_for_prompt(sales_input.sales_type.value)),
-            industry=escape_braces(sanitize_for_prompt(sales_input.industry)),
-            product=escape_braces(sanitize_for_prompt(sales_input.product)),
-            description=description,
-            description_url=description_url,
-            competitor=competitor,
-            competitor_url=competitor_url,
-            stage=escape_braces(sanitize_for_prompt(sales_input.stage)),
-            purpose=escape_braces(sanitize_for_prompt(sales_input.purpose)),
-            constraints=constraints_text,
-        )
+        prompt = self._build_user_prompt(sales_input)
 
         # システムメッセージと出力形式を追加
         full_prompt = f"""
@@ -205,3 +379,62 @@ class PreAdvisorService:
         # エスケープした波括弧を元に戻す
         return full_prompt.replace("{{", "{").replace("}}", "}")
 
+    def _build_user_prompt(self, sales_input: SalesInput) -> str:
+        """入力項目を埋め込んだユーザーメッセージ（波括弧はエスケープしたまま）"""
+        # 各フィールドをまとめてサニタイズ（業界名などの繰り返し値はキャッシュされる）
+        fields = sanitize_mapping(
+            {
+                "sales_type": sales_input.sales_type.value,
+                "industry": sales_input.industry,
+                "product": sales_input.product,
+                "description": sales_input.description or "",
+                "description_url": sales_input.description_url or "",
+                "competitor": sales_input.competitor or "",
+                "competitor_url": sales_input.competitor_url or "",
+                "stage": sales_input.stage,
+                "purpose": sales_input.purpose,
+                "constraints": ", ".join(sales_input.constraints) if sales_input.constraints else "なし",
+            },
+            escape=True,
+        )
+
+        # プロンプトテンプレートを適用
+        user_template = Template(self.prompt_template["user"])
+        return user_template.safe_substitute(**fields)
+
+    def _build_section_prompt(
+        self, sales_input: SalesInput, advice: Dict[str, Any], section: str, instruction: Optional[str]
+    ) -> str:
+        """一部だけを作り直すプロンプト（全体の出力形式は含めない）"""
+        # 対象部分を除いたアドバイスを区切り文字なしの JSON で文脈に渡す
+        context = {k: copy.deepcopy(advice[k]) for k in ("short_term", "mid_term") if k in advice}
+        *parents, leaf = section.split(".")
+        parent = get_section(context, ".".join(parents)) if parents else context
+        if isinstance(parent, dict):
+            parent.pop(leaf, None)
+
+        def compact(value: Any) -> str:
+            return escape_braces(json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+
+        fields = sanitize_mapping({"instruction": instruction or "なし"}, escape=True)
+        fields.update(section=section, context=compact(context), current=compact(get_section(advice, section)))
+        section_prompt = Template(self.prompt_template["section"]).safe_substitute(**fields)
+        full_prompt = f"""
+{self.prompt_template['system']}
+
+{self._build_user_prompt(sales_input)}
+
+{section_prompt}
+"""
+        return full_prompt.replace("{{", "{").replace("}}", "}")
+
+    def _build_icebreaker_prompt(self, sales_input: SalesInput, company_hint: Optional[str], news_items: List[Dict]) -> str:
+        """同時生成でプロンプトの末尾に加えるアイスブレイクの指示"""
+        fields = sanitize_mapping(
+            {"tone": tone_for_type(sales_input.sales_type), "company_hint": company_hint or "なし"},
+            escape=True,
+        )
+        fields["news_items"] = escape_braces(format_news_items(news_items)) if news_items else "なし"
+        section = Template(self.prompt_template["icebreakers"]).safe_substitute(**fields)
+        return "\n" + section.replace("{{", "{").replace("}}", "}")
+
@@ -0,0 +1,172 @@
+"""ローカルで完結する検索結果の関連度（BM25 + 文字 n-gram）
+
+日本語のタイトルは分かち書きされていないため、漢字・ひらがな・カタカナの並びは
+文字の 2-gram と 3-gram に、英数字は単語単位に分割して BM25 で採点する。
+
+    relevance_scores("製造業 最新ニュース", ["製造業の最新ニュースまとめ", "小売の動向"])
+    # => 1 件目は 0.8 前後、2 件目は 0.0
+
+IDF（逆文書頻度）はプロセス内の ``IDF_TABLE`` に検索結果を蓄積して求める。
+同じ URL は 1 回しか数えず、IDF の値は表が更新されるまでキャッシュする。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ひらがな・カタカナ（長音符を含む）・CJK 統合漢字（々〆ヶ を含む）
+_CJK_RUN = r"[々〆ぁ-ゖァ-ヺーヶ一-鿿豈-﫿]+"
+_TOKEN_REGEX = re.compile(rf"({_CJK_RUN})|([0-9a-z]+)")
+
+NGRAM_SIZES = (2, 3)
+# 表が大きくなりすぎたら文書頻度を半分にして古い結果の影響を薄める
+MAX_DOCUMENTS = 50_000
+
+
+@lru_cache(maxsize=8192)
+def _tokenize(text: str) -> Tuple[str, ...]:
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    tokens: List[str] = []
+    for match in _TOKEN_REGEX.finditer(normalized):
+        run, word = match.groups()
+        if word is not None:
+            tokens.append(word)
+        elif len(run) < NGRAM_SIZES[0]:
+            tokens.append(run)
+        else:
+            for n in NGRAM_SIZES:
+                tokens += [run[i : i + n] for i in range(len(run) - n + 1)]
+    return tuple(tokens)
+
+
+def tokenize(text: Optional[str]) -> Tuple[str, ...]:
+    """NFKC 正規化・小文字化し、CJK は 2/3-gram、英数字は単語に分割する
+
+    同じ見出しや抜粋は検索のたびに現れるため、結果を LRU キャッシュする。
+    """
+    if not text:
+        return ()
+    return _tokenize(text)
+
+
+class IdfTable:
+    """蓄積した文書の文書頻度から BM25 の IDF を求める"""
+
+    def __init__(self, max_documents: int = MAX_DOCUMENTS) -> None:
+        self.max_documents = max_documents
+        self.document_count = 0
+        self._df: Counter[str] = Counter()
+        self._seen: set[str] = set()
+        self._idf_cache: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, tokens: Sequence[str], key: Optional[str] = None) -> bool:
+        """1 文書を追加する（``key`` が既出なら数えない）。追加したら True"""
+        with self._lock:
+            if key is not None:
+                if key in self._seen:
+                    return False
+                self._seen.add(key)
+            self._df.update(set(tokens))
+            self.document_count += 1
+            if self.document_count > self.max_documents:
+                self._decay()
+            self._idf_cache.clear()
+            return True
+
+    def _decay(self) -> None:
+        self._df = Counter({t: c // 2 for t, c in self._df.items() if c >= 2})
+        self.document_count //= 2
+        self._seen.clear()
+
+    def idf(self, term: str) -> float:
+        """BM25 の IDF（常に正、未知の語ほど大きい）"""
+        value = self._idf_cache.get(term)
+        if value is None:
+            n = self.document_count
+            df = min(self._df.get(term, 0), n)
+            value = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            self._idf_cache[term] = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self.document_count = 0
+            self._df.clear()
+            self._seen.clear()
+            self._idf_cache.clear()
+
+
+IDF_TABLE = IdfTable()
+
+
+class BM25:
+    """クエリ 1 件に対して複数の文書（フィールド）を採点する
+
+    見出しや抜粋のような短い文書が対象のため、文書長の補正 ``b`` は一般的な
+    0.75 より弱めにしている。
+    """
+
+    def __init__(self, query: str, table: Optional[IdfTable] = None, k1: float = 1.5, b: float = 0.3) -> None:
+        self.table = table if table is not None else IDF_TABLE
+        self.k1 = k1
+        self.b = b
+        self.terms = list(dict.fromkeys(tokenize(query)))
+        self._idf = {t: self.table.idf(t) for t in self.terms}
+        # 各語が平均的な長さの文書に 1 回ずつ現れた場合のスコア（正規化の基準）
+        self.reference = sum(self._idf.values())
+
+    def score(self, tokens: Sequence[str], average_length: float) -> float:
+        if not self.terms or not tokens:
+            return 0.0
+        counts = Counter(tokens)
+        norm = self.k1 * (1.0 - self.b + self.b * len(tokens) / max(average_length, 1.0))
+        total = 0.0
+        for term, idf in self._idf.items():
+            tf = counts.get(term)
+            if tf:
+                total += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return total
+
+    def normalized(self, tokens: Sequence[str], average_length: float) -> float:
+        """``reference`` を 1.0 とした 0〜1 の関連度"""
+        if self.reference <= 0.0:
+            return 0.0
+        return min(1.0, self.score(tokens, average_length) / self.reference)
+
+
+def index_documents(
+    texts: Sequence[Optional[str]],
+    keys: Optional[Sequence[Optional[str]]] = None,
+    table: Optional[IdfTable] = None,
+) -> List[Tuple[str, ...]]:
+    """文書を分割して IDF 表に蓄積し、分割結果を返す
+
+    ``keys``（URL など）を省略した場合は本文そのものを重複判定に使う。
+    """
+    table = table if table is not None else IDF_TABLE
+    token_lists = [tokenize(t) for t in texts]
+    for i, tokens in enumerate(token_lists):
+        key = keys[i] if keys is not None else texts[i]
+        table.add(tokens, key or None)
+    return token_lists
+
+
+def relevance_scores(
+    query: str,
+    texts: Sequence[Optional[str]],
+    keys: Optional[Sequence[Optional[str]]] = None,
+    table: Optional[IdfTable] = None,
+) -> List[float]:
+    """各文書の 0〜1 の関連度（文書は IDF 表にも蓄積される）"""
+    table = table if table is not None else IDF_TABLE
+    token_lists = index_documents(texts, keys, table)
+    scorer = BM25(query, table)
+    average = sum(len(t) for t in token_lists) / len(token_lists) if token_lists else 0.0
+    return [scorer.normalized(tokens, average) for tokens in token_lists]
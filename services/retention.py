@@ -0,0 +1,465 @@
+"""古いセッションを月単位の圧縮アーカイブへ移すリテンション処理
+
+アーカイブは月ごとに 2 ファイルで構成する。
+
+* ``{YYYY-MM}.jsonl.zst`` / ``{YYYY-MM}.jsonl.gz``: セッション 1 件ごとに独立して
+  圧縮したフレーム（gzip メンバー）を連結したもの。gzip の場合はファイル全体を
+  ``zcat`` すれば JSONL として読める。
+* ``{YYYY-MM}.idx``: セッション ID でソートした固定長レコードの索引。
+  ``load`` は索引を mmap して二分探索し、該当レコードの範囲だけを読み出す。
+
+``zstandard`` がインストールされていれば zstd、なければ gzip で圧縮する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - 任意依存
+    zstandard = None
+
+try:
+    from google.cloud import storage  # type: ignore
+except Exception:  # pragma: no cover - 任意依存
+    storage = None
+
+CODEC_GZIP = 0
+CODEC_ZSTD = 1
+_CODEC_SUFFIX = {CODEC_GZIP: ".jsonl.gz", CODEC_ZSTD: ".jsonl.zst"}
+
+# 索引: ヘッダ（マジック・バージョン・コーデック）と固定長エントリ（ID・オフセット・長さ）
+INDEX_MAGIC = b"SSIDX"
+INDEX_VERSION = 1
+_HEADER = struct.Struct("<5sBB9x")
+KEY_SIZE = 64
+_ENTRY = struct.Struct(f"<{KEY_SIZE}sQI")
+
+DEFAULT_RETENTION_DAYS = 365
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_GZIP
+
+
+def _compress(raw: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to write zstd archives")
+        return zstandard.ZstdCompressor().compress(raw)
+    return gzip.compress(raw, mtime=0)
+
+
+def _decompress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd archives")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _encode_key(session_id: str) -> Optional[bytes]:
+    key = session_id.encode("utf-8")
+    if not key or len(key) > KEY_SIZE:
+        return None
+    return key.ljust(KEY_SIZE, b"\0")
+
+
+def _month_of(created_at: Any) -> Optional[str]:
+    if not isinstance(created_at, str):
+        return None
+    try:
+        return datetime.fromisoformat(created_at).strftime("%Y-%m")
+    except ValueError:
+        return None
+
+
+class LocalArchiveStore:
+    """ローカルディレクトリ上のアーカイブ置き場"""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def list_names(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_file() and not p.name.startswith("."))
+
+    def list_versions(self) -> Dict[str, Any]:
+        """ファイル名 -> 版（inode・更新時刻・大きさ）。書き換えられたファイルは版が変わる"""
+        versions: Dict[str, Any] = {}
+        for name in self.list_names():
+            try:
+                st = (self.root / name).stat()
+            except FileNotFoundError:
+                continue
+            versions[name] = (st.st_ino, st.st_mtime_ns, st.st_size)
+        return versions
+
+    def exists(self, name: str) -> bool:
+        return (self.root / name).exists()
+
+    def read_bytes(self, name: str) -> bytes:
+        return (self.root / name).read_bytes()
+
+    def read_range(self, name: str, offset: int, length: int) -> bytes:
+        with open(self.root / name, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def write_bytes(self, name: str, data: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.root / name)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def local_path(self, name: str, version: Any = None) -> Path:
+        return self.root / name
+
+    def invalidate(self) -> None:
+        """ローカルでは常に最新のファイルを参照するため何もしない"""
+
+
+class GCSArchiveStore:
+    """GCS 上のアーカイブ置き場
+
+    索引はローカルの一時ディレクトリへダウンロードして mmap し、レコード本体は
+    範囲指定ダウンロードで必要なバイトだけを取得する。ローカルの複製は Blob の
+    generation ごとに別名で保存するため、他プロセスが書き換えた古い索引を
+    読み続けることはない。
+    """
+
+    def __init__(self, bucket_name: str, prefix: str, cache_dir: str | None = None) -> None:
+        if storage is None:
+            raise RuntimeError("google-cloud-storage is required for GCS archives")
+        if not bucket_name:
+            raise ValueError("bucket_name is required")
+        self.bucket_name = bucket_name
+        self._client = None
+        self.prefix = prefix.rstrip("/") + "/"
+        digest = hashlib.sha1(f"{bucket_name}/{self.prefix}".encode("utf-8")).hexdigest()[:16]
+        self.cache_dir = Path(cache_dir or tempfile.gettempdir()) / f"session-archive-{digest}"
+
+    @property
+    def client(self):
+        # クライアントは最初のアクセス時に作る（アーカイブを使わないリクエストでは不要）
+        if self._client is None:
+            self._client = storage.Client()
+        return self._client
+
+    @property
+    def bucket(self):
+        return self.client.bucket(self.bucket_name)
+
+    def _blob(self, name: str):
+        return self.bucket.blob(f"{self.prefix}{name}")
+
+    def list_names(self) -> List[str]:
+        names = []
+        for blob in self.client.list_blobs(self.bucket, prefix=self.prefix):
+            rest = blob.name[len(self.prefix):]
+            if rest and "/" not in rest:
+                names.append(rest)
+        return sorted(names)
+
+    def list_versions(self) -> Dict[str, Any]:
+        """ファイル名 -> Blob の generation（一覧のメタデータのみで本体は読まない）"""
+        versions: Dict[str, Any] = {}
+        for blob in self.client.list_blobs(self.bucket, prefix=self.prefix):
+            rest = blob.name[len(self.prefix):]
+            if rest and "/" not in rest:
+                versions[rest] = blob.generation
+        return versions
+
+    def exists(self, name: str) -> bool:
+        return self._blob(name).exists()
+
+    def read_bytes(self, name: str) -> bytes:
+        return self._blob(name).download_as_bytes()
+
+    def read_range(self, name: str, offset: int, length: int) -> bytes:
+        return self._blob(name).download_as_bytes(start=offset, end=offset + length - 1)
+
+    def write_bytes(self, name: str, data: bytes) -> None:
+        self._blob(name).upload_from_string(data, content_type="application/octet-stream")
+
+    def local_path(self, name: str, version: Any = None) -> Path:
+        if version is None:
+            blob = self._blob(name)
+            blob.reload()
+            version = blob.generation
+        path = self.cache_dir / f"{name}.{version}"
+        if not path.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            data = self.bucket.blob(f"{self.prefix}{name}", generation=version).download_as_bytes()
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{name}.", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            # 同じファイルの古い generation の複製は不要になる
+            for old in self.cache_dir.glob(f"{name}.*"):
+                if old != path and not old.name.startswith("."):
+                    try:
+                        old.unlink()
+                    except FileNotFoundError:
+                        pass
+        return path
+
+    def invalidate(self) -> None:
+        """他プロセスが索引を更新した可能性があるためローカルの複製を捨てる"""
+        if self.cache_dir.exists():
+            for p in self.cache_dir.iterdir():
+                if p.is_file():
+                    p.unlink()
+
+
+class SessionArchive:
+    """月次アーカイブの書き込みと ID による読み出し"""
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, Tuple[int, mmap.mmap | None, int]] = {}
+        self._month_list: Optional[List[Tuple[str, int]]] = None
+        # 保存先のファイル名 -> 版（索引を開いたときの一覧）
+        self._versions: Optional[Dict[str, Any]] = None
+
+    # --- 索引 ---------------------------------------------------------------
+    def _months(self) -> List[Tuple[str, int]]:
+        """(月, コーデック) を新しい順に返す"""
+        if self._month_list is not None:
+            return self._month_list
+        if self._versions is None:
+            self._versions = self.store.list_versions()
+        names = set(self._versions)
+        months = []
+        for name in names:
+            if not name.endswith(".idx"):
+                continue
+            month = name[: -len(".idx")]
+            for codec, suffix in _CODEC_SUFFIX.items():
+                if f"{month}{suffix}" in names:
+                    months.append((month, codec))
+                    break
+        self._month_list = sorted(months, reverse=True)
+        return self._month_list
+
+    def _open_index(self, month: str) -> Tuple[int, mmap.mmap | None, int]:
+        cached = self._indexes.get(month)
+        if cached is not None:
+            return cached
+        version = (self._versions or {}).get(f"{month}.idx")
+        with open(self.store.local_path(f"{month}.idx", version), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if mm is None or size < _HEADER.size:
+            entry = (CODEC_GZIP, None, 0)
+        else:
+            magic, version, codec = _HEADER.unpack_from(mm, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError(f"invalid archive index: {month}.idx")
+            entry = (codec, mm, (size - _HEADER.size) // _ENTRY.size)
+        self._indexes[month] = entry
+        return entry
+
+    @staticmethod
+    def _search(mm: mmap.mmap, count: int, key: bytes) -> Optional[Tuple[int, int]]:
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = _HEADER.size + mid * _ENTRY.size
+            probe = mm[pos:pos + KEY_SIZE]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                _, offset, length = _ENTRY.unpack_from(mm, pos)
+                return offset, length
+        return None
+
+    def _read_entries(self, month: str) -> List[Tuple[bytes, int, int]]:
+        codec, mm, count = self._open_index(month)
+        entries = []
+        for i in range(count):
+            entries.append(_ENTRY.unpack_from(mm, _HEADER.size + i * _ENTRY.size))
+        return entries
+
+    def _reset(self) -> None:
+        for _, mm, _ in self._indexes.values():
+            if mm is not None:
+                mm.close()
+        self._indexes.clear()
+        self._month_list = None
+        self._versions = None
+        self.store.invalidate()
+
+    def _refresh(self) -> bool:
+        """保存先の一覧を取り直し、版が変わった月の索引だけを開き直す
+
+        何も変わっていなければ ``False`` を返す（索引の再取得はしない）。
+        """
+        versions = self.store.list_versions()
+        previous = self._versions or {}
+        if versions == previous:
+            return False
+        for name in set(versions) | set(previous):
+            if name.endswith(".idx") and versions.get(name) != previous.get(name):
+                cached = self._indexes.pop(name[: -len(".idx")], None)
+                if cached is not None and cached[1] is not None:
+                    cached[1].close()
+        self._versions = versions
+        self._month_list = None
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+    # --- 読み出し -------------------------------------------------------------
+    def _find(self, session_id: str) -> Optional[Tuple[str, int, int, int]]:
+        key = _encode_key(session_id)
+        if key is None:
+            return None
+        for month, _ in self._months():
+            codec, mm, count = self._open_index(month)
+            if mm is None:
+                continue
+            hit = self._search(mm, count, key)
+            if hit is not None:
+                return month, codec, hit[0], hit[1]
+        return None
+
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """アーカイブ済みセッションを読み込む（見つからなければ FileNotFoundError）"""
+        with self._lock:
+            found = self._find(session_id)
+            # 他プロセスのコンパクションで索引が更新されていれば、その月だけ読み直す
+            if found is None and self._refresh():
+                found = self._find(session_id)
+        if found is None:
+            raise FileNotFoundError(f"session {session_id} not found")
+        month, codec, offset, length = found
+        raw = self.store.read_range(f"{month}{_CODEC_SUFFIX[codec]}", offset, length)
+        return json.loads(_decompress(raw, codec))
+
+    # --- 書き込み -------------------------------------------------------------
+    def write_month(self, month: str, sessions: List[Dict[str, Any]]) -> int:
+        """月次アーカイブへセッションを追加し、追加件数を返す
+
+        既存のレコードは圧縮済みのバイト列のまま引き継ぎ、索引を作り直す。
+        """
+        with self._lock:
+            self._reset()
+            existing = next((c for m, c in self._months() if m == month), None)
+            codec = default_codec() if existing is None else existing
+            data_name = f"{month}{_CODEC_SUFFIX[codec]}"
+            entries: Dict[bytes, Tuple[int, int]] = {}
+            body = bytearray()
+            if existing is not None:
+                body += self.store.read_bytes(data_name)
+                for key, offset, length in self._read_entries(month):
+                    entries[key] = (offset, length)
+                self._reset()
+            added = 0
+            for session in sessions:
+                key = _encode_key(str(session.get("session_id", "")))
+                if key is None:
+                    continue
+                frame = _compress((json.dumps(session, ensure_ascii=False) + "\n").encode("utf-8"), codec)
+                entries[key] = (len(body), len(frame))
+                body += frame
+                added += 1
+            index = bytearray(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, codec))
+            for key in sorted(entries):
+                offset, length = entries[key]
+                index += _ENTRY.pack(key, offset, length)
+            # 本体を先に書き、索引は最後に差し替える（索引に載った範囲は常に読める）
+            self.store.write_bytes(data_name, bytes(body))
+            self.store.write_bytes(f"{month}.idx", bytes(index))
+            return added
+
+
+def compact_sessions(
+    provider,
+    archive: SessionArchive,
+    older_than_days: int = DEFAULT_RETENTION_DAYS,
+    now: datetime | None = None,
+) -> Dict[str, int]:
+    """``older_than_days`` より古いセッションをアーカイブへ移し、月ごとの件数を返す
+
+    ピン留めされたセッションは移動しない。アーカイブへの書き込みが完了した
+    月のセッションだけを保存先から削除する。読み込み後に更新されたセッションは
+    削除せず保存先に残す（次回の実行で新しい内容がアーカイブされる）。
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=older_than_days)).isoformat()
+    by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for summary in provider.list_sessions():
+        created_at = summary.get("created_at") or ""
+        if summary.get("pinned") or not created_at or created_at >= cutoff:
+            continue
+        month = _month_of(created_at)
+        sid = summary.get("session_id")
+        if month is None or not sid or _encode_key(sid) is None:
+            continue
+        by_month.setdefault(month, []).append(provider.load_session(sid))
+
+    moved: Dict[str, int] = {}
+    for month, sessions in sorted(by_month.items()):
+        archive.write_month(month, sessions)
+        moved[month] = 0
+        for session in sessions:
+            sid = session["session_id"]
+            try:
+                current = provider.load_session(sid)
+            except FileNotFoundError:
+                continue
+            if current != session:
+                continue
+            if provider.delete_session(sid):
+                moved[month] += 1
+    return moved
+
+
+def main(argv: List[str] | None = None) -> int:
+    from services.storage_service import get_session_archive, get_storage_provider
+
+    parser = argparse.ArgumentParser(description="古いセッションを月次アーカイブへ移動")
+    parser.add_argument(
+        "--older-than-days",
+        type=int,
+        default=int(os.getenv("RETENTION_DAYS", str(DEFAULT_RETENTION_DAYS))),
+    )
+    args = parser.parse_args(argv)
+    archive = get_session_archive()
+    if archive is None:
+        parser.error("archive storage is not configured")
+    moved = compact_sessions(get_storage_provider(), archive, older_than_days=args.older_than_days)
+    print(json.dumps(moved, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,17 +12,18 @@ from urllib.parse import urlparse
 from string import Template
 from core.models import AppSettings
 from providers.llm_openai import OpenAIProvider
-from providers.search_provider import WebSearchProvider
+from providers.search_provider import WebSearchProvider, normalize_url
 from services.error_handler import ErrorHandler
 from services.logger import Logger
-from services.utils import escape_braces, sanitize_for_prompt
+from services.relevance import relevance_scores
+from services.utils import escape_braces, sanitize_for_prompt, sanitize_mapping
 
 class SearchEnhancerService:
     """検索機能の高度化サービス"""
     
     def __init__(self, settings_manager=None, llm_provider=None):
         self.settings_manager = settings_manager
-        self.logger = Logger()
+        self.logger = Logger("SearchEnhancerService")
         self.error_handler = ErrorHandler(self.logger)
         self.prompts = self._load_prompts()
 
@@ -133,10 +134,7 @@ class SearchEnhancerService:
             sanitized_query = escape_braces(sanitize_for_prompt(query))
             sanitized_results: List[Dict[str, Any]] = []
             for r in search_results:
-                sanitized_r = {
-                    k: escape_braces(sanitize_for_prompt(v)) if isinstance(v, str) else v
-                    for k, v in r.items()
-                }
+                sanitized_r = sanitize_mapping(r, escape=True)
                 sanitized_results.append(sanitized_r)
 
             try:
@@ -168,9 +166,14 @@ class SearchEnhancerService:
     def _fallback_quality_assessment(self, query: str, search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """フォールバック用の品質評価"""
         quality_scores = []
+        relevances = relevance_scores(
+            query,
+            [f"{r.get('title') or ''} {r.get('snippet') or ''}" for r in search_results],
+            keys=[normalize_url(r.get("url")) for r in search_results],
+        )
         
-        for result in search_results:
-            score = self._calculate_fallback_score(result, query)
+        for result, relevance in zip(search_results, relevances):
+            score = self._calculate_fallback_score(result, query, relevance)
             quality_scores.append({
                 "url": result.get("url", ""),
                 "reliability_score": score["reliability"],
@@ -186,8 +189,10 @@ class SearchEnhancerService:
             "overall_assessment": "フォールバック処理による基本的な品質評価"
         }
     
-    def _calculate_fallback_score(self, result: Dict[str, Any], query: str) -> Dict[str, Any]:
-        """フォールバック用のスコア計算"""
+    def _calculate_fallback_score(
+        self, result: Dict[str, Any], query: str, relevance: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """フォールバック用のスコア計算（``relevance`` 省略時はこの 1 件で BM25 を求める）"""
         # 信頼性スコア（ドメイン、ソースに基づく）
         reliability_score = 0.5  # デフォルト
         if result.get("source") == "cse":
@@ -203,14 +208,11 @@ class SearchEnhancerService:
             if any(trusted in hostname for trusted in trusted_domains):
                 reliability_score = min(1.0, reliability_score + 0.2)
         
-        # 関連性スコア（キーワードマッチング）
-        relevance_score = 0.0
-        query_keywords = [w.lower() for w in re.split(r"\s+", query) if len(w) >= 2]
-        text = f"{result.get('title', '')} {result.get('snippet', '')}".lower()
-        
-        if query_keywords:
-            matches = sum(1 for k in query_keywords if k in text)
-            relevance_score = min(1.0, matches / len(query_keywords))
+        # 関連性スコア（BM25、CJK は文字 n-gram）
+        if relevance is None:
+            text = f"{result.get('title') or ''} {result.get('snippet') or ''}"
+            relevance = relevance_scores(query, [text], keys=[normalize_url(url)])[0]
+        relevance_score = relevance
         
         # 新鮮度スコア
         freshness_score = 0.5  # デフォルト
@@ -341,10 +343,7 @@ class SearchEnhancerService:
             sanitized_query = escape_braces(sanitize_for_prompt(query))
             sanitized_results: List[Dict[str, Any]] = []
             for r in search_results:
-                sanitized_r = {
-                    k: escape_braces(sanitize_for_prompt(v)) if isinstance(v, str) else v
-                    for k, v in r.items()
-                }
+                sanitized_r = sanitize_mapping(r, escape=True)
                 sanitized_results.append(sanitized_r)
 
             try:
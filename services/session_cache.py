@@ -0,0 +1,153 @@
+import threading
+from typing import Any, Dict, List
+
+from core.models import SessionSummary
+from services.metrics import counter
+
+CACHE_REQUESTS = counter("cache_requests_total", "キャッシュの参照回数", ["cache", "result"])
+
+
+class SessionCache:
+    """プロセス内で共有するセッション一覧キャッシュ
+
+    ストレージプロバイダが ``changes_since`` を持つ場合は前回のカーソル以降の
+    差分だけを取得して反映する。持たない場合は毎回 ``list_sessions`` で全件を
+    取り直す。キャッシュはプロバイダの ``cache_key`` ごとに分けて保持し、
+    一覧用の ``SessionSummary`` も変更のあったセッション分だけ作り直す。
+    一覧がサマリーのみを返すプロバイダ（Firestore）の本文は ``get_bodies`` で
+    必要な分だけまとめて取得し、変更があるまで保持する。
+    """
+
+    _entries: Dict[str, Dict[str, Any]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _key(cls, provider) -> str:
+        return getattr(provider, "cache_key", None) or f"{type(provider).__name__}:{id(provider)}"
+
+    @classmethod
+    def _refresh(cls, provider) -> Dict[str, Any]:
+        key = cls._key(provider)
+        with cls._lock:
+            entry = cls._entries.setdefault(
+                key, {"cursor": None, "sessions": {}, "summaries": {}, "bodies": {}}
+            )
+            sessions: Dict[str, Dict[str, Any]] = entry["sessions"]
+            summaries: Dict[str, SessionSummary] = entry["summaries"]
+            bodies: Dict[str, Dict[str, Any]] = entry["bodies"]
+            if hasattr(provider, "changes_since"):
+                changes, cursor = provider.changes_since(entry["cursor"])
+                entry["cursor"] = cursor
+            else:
+                changes = [{"op": "reset", "session_id": None, "session": None}]
+                changes += [
+                    {"op": "upsert", "session_id": s.get("session_id"), "session": s}
+                    for s in provider.list_sessions()
+                ]
+            full_reload = any(change.get("op") == "reset" for change in changes)
+            CACHE_REQUESTS.inc(cache="session_list", result="miss" if full_reload else "hit")
+            for change in changes:
+                op = change.get("op")
+                sid = change.get("session_id")
+                if op == "reset":
+                    sessions.clear()
+                    summaries.clear()
+                    bodies.clear()
+                elif op == "upsert" and change.get("session") is not None:
+                    sessions[sid] = change["session"]
+                    summaries[sid] = SessionSummary.from_session(change["session"])
+                    bodies.pop(sid, None)
+                elif op == "delete":
+                    sessions.pop(sid, None)
+                    summaries.pop(sid, None)
+                    bodies.pop(sid, None)
+            return entry
+
+    @classmethod
+    def get_sessions(cls, provider, refresh: bool = True) -> List[Dict[str, Any]]:
+        """セッション一覧を返す（ピン留め優先・作成日時の降順）
+
+        ``refresh=False`` の場合はストレージに問い合わせずキャッシュ済みの内容を返す。
+        """
+        entry = cls._refresh(provider) if refresh else cls._entries.get(cls._key(provider))
+        if entry is None:
+            return []
+        with cls._lock:
+            snapshot = list(entry["sessions"].values())
+        return sorted(
+            snapshot,
+            key=lambda x: (x.get("pinned", False), x.get("created_at", "")),
+            reverse=True,
+        )
+
+    @classmethod
+    def get_summaries(cls, provider, refresh: bool = True) -> List[SessionSummary]:
+        """``SessionSummary`` の一覧を返す（ピン留め優先・作成日時の降順）"""
+        entry = cls._refresh(provider) if refresh else cls._entries.get(cls._key(provider))
+        if entry is None:
+            return []
+        with cls._lock:
+            snapshot = list(entry["summaries"].values())
+        return sorted(snapshot, key=lambda s: (s.pinned, s.sort_time), reverse=True)
+
+    @classmethod
+    def get_session(cls, provider, session_id: str) -> Dict[str, Any] | None:
+        """キャッシュ済みのセッション辞書を返す（ストレージには問い合わせない）"""
+        entry = cls._entries.get(cls._key(provider))
+        session = entry["sessions"].get(session_id) if entry is not None else None
+        CACHE_REQUESTS.inc(cache="session", result="miss" if session is None else "hit")
+        return session
+
+    @classmethod
+    def get_bodies(cls, provider, session_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """セッション ID ごとの ``data``（本文）を返す
+
+        キャッシュ済みのセッションが本文を持たない場合だけストレージから取得する。
+        プロバイダが ``load_sessions`` を持てば 1 回でまとめて取得し、持たなければ
+        ``load_session`` を順に呼ぶ。取得できなかった ID は結果に含めない。
+        """
+        entry = cls._entries.get(cls._key(provider)) or {"sessions": {}, "bodies": {}}
+        result: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        seen: Dict[str, Any] = {}
+        with cls._lock:
+            for sid in session_ids:
+                seen[sid] = entry["sessions"].get(sid)
+                data = (seen[sid] or {}).get("data") or {}
+                if any(k != "type" for k in data):
+                    result[sid] = data
+                elif sid in entry["bodies"]:
+                    result[sid] = entry["bodies"][sid]
+                else:
+                    missing.append(sid)
+        CACHE_REQUESTS.inc(cache="session_body", result="miss" if missing else "hit")
+        if not missing:
+            return result
+
+        if hasattr(provider, "load_sessions"):
+            loaded = provider.load_sessions(missing)
+        else:
+            loaded = []
+            for sid in missing:
+                try:
+                    loaded.append(provider.load_session(sid))
+                except Exception:
+                    continue
+        with cls._lock:
+            for session in loaded:
+                sid = session.get("session_id")
+                data = session.get("data") or {}
+                result[sid] = data
+                # 取得中に更新されたセッションの本文は保持しない
+                if seen.get(sid) is not None and entry["sessions"].get(sid) is seen[sid]:
+                    entry["bodies"][sid] = data
+        return result
+
+    @classmethod
+    def invalidate(cls, provider=None) -> None:
+        """キャッシュを破棄する（provider 省略時は全件）"""
+        with cls._lock:
+            if provider is None:
+                cls._entries.clear()
+            else:
+                cls._entries.pop(cls._key(provider), None)
@@ -0,0 +1,117 @@
+"""SimHash による近似重複（転載記事）の検出
+
+配信元の記事が複数の媒体に転載されると、見出しの末尾（「- 日本経済新聞」
+「（共同通信）」など）や全角・半角だけが違う結果が並ぶ。見出しと抜粋を
+``services.relevance.tokenize`` で n-gram に分割し、64 ビットの SimHash を求めて
+ハミング距離が ``max_distance`` 以下のものを同じ記事とみなす。
+
+``SimHashIndex`` は 64 ビットを ``max_distance + 1`` 個の帯に分けて帯ごとの値で
+引ける表を持つ。距離が ``max_distance`` 以下なら少なくとも 1 つの帯が一致する
+（鳩の巣原理）ため、全件の総当たりをせずに候補だけを比較できる。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from services.relevance import tokenize
+
+BITS = 64
+# 転載記事どうしは 10 ビット前後、別の記事は 25 ビット以上離れることが多い
+DEFAULT_MAX_DISTANCE = 10
+
+# 各ビットの出現数を 1 つの整数にまとめて足し合わせるための 1 ビットあたりの幅
+_FIELD_BITS = 32
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+
+# 見出し末尾の配信元表記（「 - 日本経済新聞」「 | ITmedia」「（共同通信）」など）
+_SOURCE_SUFFIX_REGEX = re.compile(r"\s*(?:[-|｜–—]\s*[^-|｜–—]{1,30}|[（(][^）)]{1,20}[）)])\s*$")
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=65536)
+def _spread_hash(token: str) -> int:
+    """トークンのハッシュの各ビットを ``_FIELD_BITS`` 幅の欄に広げた整数"""
+    h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    spread = 0
+    for i in range(BITS):
+        if h >> i & 1:
+            spread |= 1 << (i * _FIELD_BITS)
+    return spread
+
+
+def fingerprint_tokens(tokens: Sequence[str]) -> int:
+    """トークン列の SimHash（過半数のトークンで立っているビットを 1 にする）"""
+    if not tokens:
+        return 0
+    # 欄ごとの和がそのままビットごとの出現数になる（整数の加算は C で行われる）
+    total = sum(map(_spread_hash, tokens))
+    n = len(tokens)
+    fp = 0
+    for i in range(BITS):
+        if 2 * ((total >> (i * _FIELD_BITS)) & _FIELD_MASK) > n:
+            fp |= 1 << i
+    return fp
+
+
+@lru_cache(maxsize=8192)
+def fingerprint(text: str) -> int:
+    """テキストの SimHash（同じ見出しは繰り返し現れるためキャッシュする）"""
+    return fingerprint_tokens(tokenize(text))
+
+
+def story_fingerprint(title: Optional[str], snippet: Optional[str] = None) -> Optional[int]:
+    """見出し（配信元表記を除く）と抜粋から記事の SimHash を求める（本文がなければ None）"""
+    text = f"{_SOURCE_SUFFIX_REGEX.sub('', title or '')} {snippet or ''}"
+    if not tokenize(text):
+        return None
+    return fingerprint(text)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex(Generic[T]):
+    """帯ごとの表で近い指紋を引く"""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE) -> None:
+        if not 0 <= max_distance < BITS:
+            raise ValueError("max_distance must be between 0 and 63")
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        # 64 ビットをできるだけ均等な幅の帯に分ける
+        widths = [BITS // bands + (1 if i < BITS % bands else 0) for i in range(bands)]
+        self._bands: List[Tuple[int, int]] = []
+        offset = 0
+        for width in widths:
+            self._bands.append((offset, (1 << width) - 1))
+            offset += width
+        self._tables: List[Dict[int, List[Tuple[int, T]]]] = [{} for _ in self._bands]
+
+    def _keys(self, fp: int) -> List[int]:
+        return [(fp >> offset) & mask for offset, mask in self._bands]
+
+    def add(self, fp: int, value: T) -> None:
+        for table, key in zip(self._tables, self._keys(fp)):
+            table.setdefault(key, []).append((fp, value))
+
+    def find(self, fp: int) -> Optional[T]:
+        """距離が ``max_distance`` 以下の登録済みの値（最も近いもの）を返す"""
+        best: Optional[Tuple[int, T]] = None
+        for table, key in zip(self._tables, self._keys(fp)):
+            for other, value in table.get(key, ()):
+                distance = hamming_distance(fp, other)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, value)
+        return best[1] if best is not None else None
+
+    def remove(self, fp: int, value: T) -> None:
+        for table, key in zip(self._tables, self._keys(fp)):
+            bucket = table.get(key)
+            if bucket:
+                bucket[:] = [(f, v) for f, v in bucket if v is not value]
@@ -0,0 +1,104 @@
+"""同じキーの処理が実行中なら、その完了を待って結果を共有する（single-flight）
+
+朝の始業時には、複数の営業担当が同じ「{業界} 最新ニュース」の検索や同じ内容の
+LLM 呼び出しをほぼ同時に行う。最初の呼び出し（リーダー）だけが実際に処理を行い、
+実行中に届いた同じキーの呼び出しは ``Future`` でその結果を待つ。
+
+    SEARCH_FLIGHTS = SingleFlight("search")
+    results = SEARCH_FLIGHTS.do(("IT 最新ニュース", 3), lambda: search(...), timeout=30)
+
+リーダーの例外は待っていた全員に同じものが送出される。待ち側だけが ``timeout`` 秒で
+``TimeoutError`` になり、リーダーの処理はそのまま続く。結果は呼び出し側で書き換え
+られることがあるため、待ち側には ``copy.deepcopy`` した値を返す。完了した結果は
+保持しない（キャッシュではない）。
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from services.metrics import counter
+from services.tracing import current_span
+
+# result: leader（実際に実行）| coalesced（実行中の結果を共有）| timeout | error（共有した結果が例外）
+SINGLEFLIGHT_CALLS = counter("singleflight_calls_total", "single-flight を通った呼び出し数", ["group", "result"])
+
+DEFAULT_TIMEOUT = 120.0
+
+T = TypeVar("T")
+
+
+def default_timeout() -> float:
+    """待ち側のタイムアウト秒数（``SINGLEFLIGHT_TIMEOUT``、既定 120 秒）"""
+    try:
+        return float(os.getenv("SINGLEFLIGHT_TIMEOUT") or DEFAULT_TIMEOUT)
+    except ValueError:
+        return DEFAULT_TIMEOUT
+
+
+class _Call:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self) -> None:
+        self.future: Future = Future()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """キーごとに実行中の呼び出しを 1 つにまとめる"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """``key`` の処理が実行中ならその結果を待ち、なければ ``fn`` を実行する"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            return self._wait(call, timeout)
+
+        SINGLEFLIGHT_CALLS.inc(group=self.name, result="leader")
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            call.future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+            waiters = call.waiters
+        # 待ち側が書き換えても呼び出し元の結果に影響しないよう、共有用の複製を 1 つ作る
+        call.future.set_result(copy.deepcopy(result) if waiters else None)
+        return result
+
+    def _wait(self, call: _Call, timeout: Optional[float]) -> Any:
+        span = current_span()
+        if span is not None:
+            span.set_attribute("singleflight.coalesced", self.name)
+        try:
+            result = call.future.result(timeout)
+        except TimeoutError:
+            SINGLEFLIGHT_CALLS.inc(group=self.name, result="timeout")
+            raise
+        except BaseException:
+            SINGLEFLIGHT_CALLS.inc(group=self.name, result="error")
+            raise
+        SINGLEFLIGHT_CALLS.inc(group=self.name, result="coalesced")
+        return copy.deepcopy(result)
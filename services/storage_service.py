@@ -1,7 +1,9 @@
 import os
+from pathlib import Path
 from typing import Any, Dict
 
 from providers.storage_local import LocalStorageProvider
+from services.retention import GCSArchiveStore, LocalArchiveStore, SessionArchive
 
 try:
     from providers.storage_gcs import GCSStorageProvider  # type: ignore
@@ -14,18 +16,57 @@ except Exception:  # pragma: no cover
     FirestoreStorageProvider = None
 
 
-def get_storage_provider():
-    """Return storage provider based on environment"""
+# アーカイブは索引の mmap を保持するため設定ごとに 1 つだけ作る
+_ARCHIVES: Dict[tuple, SessionArchive] = {}
+
+
+def _storage_provider_name() -> str:
     app_env = os.getenv("APP_ENV", "local")
     provider_name = os.getenv("STORAGE_PROVIDER")
     if provider_name:
-        provider = provider_name
-    elif app_env == "gcp":
-        provider = "firestore"
-    elif app_env != "local":
-        provider = "gcs"
+        return provider_name
+    if app_env == "gcp":
+        return "firestore"
+    if app_env != "local":
+        return "gcs"
+    return "local"
+
+
+def get_session_archive() -> SessionArchive | None:
+    """Return the retention archive for the configured storage, if any.
+
+    Local storage archives under ``DATA_DIR/archive``. GCS storage uses
+    ``{tenant}/archive/`` in the session bucket, and Firestore uses the bucket
+    given by ``ARCHIVE_GCS_BUCKET`` (no archive when unset).
+    """
+    provider = _storage_provider_name()
+    if provider == "gcs":
+        bucket = os.getenv("GCS_BUCKET_NAME")
+        tenant_id = os.getenv("GCS_TENANT_ID")
+        if not bucket or not tenant_id:
+            return None
+        key = ("gcs", bucket, tenant_id)
+    elif provider == "firestore":
+        bucket = os.getenv("ARCHIVE_GCS_BUCKET")
+        tenant_id = os.getenv("FIRESTORE_TENANT_ID")
+        if not bucket or not tenant_id:
+            return None
+        key = ("gcs", bucket, tenant_id)
     else:
-        provider = "local"
+        key = ("local", str(Path(os.getenv("DATA_DIR", "./data")).resolve() / "archive"))
+    archive = _ARCHIVES.get(key)
+    if archive is None:
+        if key[0] == "gcs":
+            store = GCSArchiveStore(bucket_name=key[1], prefix=f"{key[2]}/archive")
+        else:
+            store = LocalArchiveStore(key[1])
+        archive = _ARCHIVES[key] = SessionArchive(store)
+    return archive
+
+
+def get_storage_provider():
+    """Return storage provider based on environment"""
+    provider = _storage_provider_name()
 
     if provider == "gcs":
         if GCSStorageProvider is None:
@@ -41,7 +82,9 @@ def get_storage_provider():
             raise RuntimeError(
                 "GCS_TENANT_ID environment variable is required for GCS storage"
             )
-        return GCSStorageProvider(bucket_name=bucket, tenant_id=tenant_id, prefix=prefix)
+        gcs_provider = GCSStorageProvider(bucket_name=bucket, tenant_id=tenant_id, prefix=prefix)
+        gcs_provider.archive = get_session_archive()
+        return gcs_provider
 
     if provider == "firestore":
         if FirestoreStorageProvider is None:
@@ -52,9 +95,11 @@ def get_storage_provider():
             raise RuntimeError(
                 "FIRESTORE_TENANT_ID environment variable is required for Firestore storage",
             )
-        return FirestoreStorageProvider(tenant_id=tenant_id, credentials_path=credentials)
+        firestore_provider = FirestoreStorageProvider(tenant_id=tenant_id, credentials_path=credentials)
+        firestore_provider.archive = get_session_archive()
+        return firestore_provider
     data_dir = os.getenv("DATA_DIR", "./data")
-    return LocalStorageProvider(data_dir=data_dir)
+    return LocalStorageProvider(data_dir=data_dir, archive=get_session_archive())
 
 
 def save_session(
@@ -0,0 +1,283 @@
+"""軽量なトレーシング（コレクター不要）
+
+``contextvars`` で親子関係を引き継ぐスパンを記録し、JSONL ファイルまたは
+コンソールへ書き出す。出力のフィールド名（``traceId`` / ``spanId`` /
+``parentSpanId`` / ``startTimeUnixNano`` など）と属性名（``gen_ai.*``）は
+OpenTelemetry（OTLP/JSON とセマンティック規約）に合わせてあるため、後から
+OpenTelemetry SDK やコレクターへ置き換えても集計側をそのまま使える。
+
+    with span("pre_advice.generate", industry="IT") as s:
+        with span("prompt.build"):
+            ...
+        s.set_attribute("result.count", 3)
+
+``TRACE_EXPORTER``（``none`` | ``console`` | ``jsonl``、既定 ``none``）と
+``TRACE_FILE``（既定 ``logs/traces.jsonl``）で出力先を切り替える。JSONL は
+``python -m services.tracing logs/traces.jsonl --root pre_advice.generate`` で
+遅いリクエストから順にスパンの木として表示できる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+DEFAULT_TRACE_FILE = "logs/traces.jsonl"
+
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+
+class Span:
+    """1 つの処理区間"""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+        "status_message",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class JsonlSpanExporter:
+    """終了したスパンを 1 行 1 JSON で追記する"""
+
+    def __init__(self, path: str | Path = DEFAULT_TRACE_FILE) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class ConsoleSpanExporter:
+    """終了したスパンを 1 行の要約として出力する（既定は標準エラー）"""
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        attrs = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        line = (
+            f"[trace {span.trace_id[:8]}] {span.name} {span.duration_ms:.1f}ms "
+            f"{span.status}{' ' + attrs if attrs else ''}"
+        )
+        with self._lock:
+            print(line, file=self.stream or sys.stderr, flush=True)
+
+
+class InMemorySpanExporter:
+    """テストや集計用に終了したスパンを保持する"""
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def names(self) -> List[str]:
+        return [s.name for s in self.spans]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_exporter: Any = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+def _exporter_from_env() -> Any:
+    kind = os.getenv("TRACE_EXPORTER", "none").lower()
+    if kind == "jsonl":
+        return JsonlSpanExporter(os.getenv("TRACE_FILE", DEFAULT_TRACE_FILE))
+    if kind == "console":
+        return ConsoleSpanExporter()
+    return None
+
+
+def configure(exporter: Any = None) -> None:
+    """出力先を設定する（``None`` で無効化）。未設定なら環境変数から決める"""
+    global _exporter, _configured
+    with _config_lock:
+        _exporter = exporter
+        _configured = True
+
+
+def reset() -> None:
+    """設定を破棄し、次回のスパン終了時に環境変数から再設定させる"""
+    global _exporter, _configured
+    with _config_lock:
+        _exporter = None
+        _configured = False
+
+
+def get_exporter() -> Any:
+    global _exporter, _configured
+    if not _configured:
+        with _config_lock:
+            if not _configured:
+                _exporter = _exporter_from_env()
+                _configured = True
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    s = _current.get()
+    return s.trace_id if s is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """現在のスパンの子としてスパンを開始する（例外は記録して再送出）"""
+    s = Span(name, _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+        exporter = get_exporter()
+        if exporter is not None:
+            try:
+                exporter.export(s)
+            except Exception:
+                # トレースの失敗で本処理を止めない
+                pass
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """関数全体をスパンで囲むデコレーター（``name`` 省略時は関数の修飾名）"""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def format_trace(rows: List[Dict[str, Any]]) -> str:
+    """1 トレース分のスパン（``to_dict`` 形式）を親子の木として整形する"""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {r["spanId"] for r in rows}
+    for r in rows:
+        parent = r.get("parentSpanId") if r.get("parentSpanId") in ids else None
+        children.setdefault(parent, []).append(r)
+    lines: List[str] = []
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for r in sorted(children.get(parent, []), key=lambda x: x["startTimeUnixNano"]):
+            mark = "" if r["status"]["code"] == STATUS_OK else f" [{r['status']['message']}]"
+            lines.append(f"{'  ' * depth}{r['name']} {r['durationMs']:.1f}ms{mark}")
+            walk(r["spanId"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="JSONL のトレースを遅い順に表示する")
+    parser.add_argument("path", nargs="?", default=DEFAULT_TRACE_FILE)
+    parser.add_argument("--root", default=None, help="対象とするルートスパン名（例: pre_advice.generate）")
+    parser.add_argument("--slowest", type=int, default=5, help="表示するトレース数")
+    args = parser.parse_args(argv)
+
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(args.path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                traces.setdefault(row["traceId"], []).append(row)
+    roots = [
+        r
+        for rows in traces.values()
+        for r in rows
+        if not r.get("parentSpanId") and (args.root is None or r["name"] == args.root)
+    ]
+    for root in sorted(roots, key=lambda r: r["durationMs"], reverse=True)[: args.slowest]:
+        print(f"trace {root['traceId']}")
+        print(format_trace(traces[root["traceId"]]))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,8 @@
 import os
 from typing import Dict
 
+from services.metrics import gauge
+
 class UsageMeter:
     """Simple in-memory usage meter for tracking token usage per user or tenant."""
 
@@ -24,3 +26,12 @@ class UsageMeter:
     @classmethod
     def reset(cls):
         cls._usage.clear()
+
+
+# 取得時に集計する（UsageMeter 側の更新処理には手を入れない）
+gauge("usage_meter_tokens", "UsageMeter に記録された累計トークン数").set_function(
+    lambda: sum(UsageMeter._usage.values())
+)
+gauge("usage_meter_users", "UsageMeter にトークンが記録されているユーザー数").set_function(
+    lambda: len(UsageMeter._usage)
+)
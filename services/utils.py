@@ -1,6 +1,27 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
+from typing import Any, Mapping
+
+
+# 役割指示（``system:`` など）と HTML タグを 1 回の走査で取り除く。先読みで候補の
+# 先頭文字（大文字小文字と IGNORECASE で s に一致する U+017F を含む）以外の位置を読み飛ばす
+_PROMPT_STRIP_REGEX = re.compile(
+    r"(?=[sS\u017faAdDuU<])(?:(?i:\b(?:system|assistant|user|developer))\s*:|<[^>]*>)"
+)
+# バッククォート・ゼロ幅文字・双方向制御文字・記号/絵文字（U+2600〜U+27BF）
+_PROMPT_DELETE_REGEX = re.compile(r"[`\u200B-\u200F\u202A-\u202E\u2060\uFEFF\u2600-\u27BF]")
+# これより長い文字列（議事録の全文など）はキャッシュしない
+_SANITIZE_CACHE_MAX_LENGTH = 4096
+
+
+def _sanitize(text: str) -> str:
+    sanitized = _PROMPT_DELETE_REGEX.sub("", _PROMPT_STRIP_REGEX.sub("", text))
+    return " ".join(sanitized.split())
+
+
+_sanitize_cached = lru_cache(maxsize=1024)(_sanitize)
 
 
 def sanitize_for_prompt(text: str) -> str:
@@ -9,18 +30,30 @@ def sanitize_for_prompt(text: str) -> str:
     This helper strips role markers like ``system:``, ``assistant:``,
     ``user:``, or ``developer:``, removes HTML tags, and eliminates
     backticks or zero-width characters while preserving other text such as
-    braces or non-ASCII characters.
+    braces or non-ASCII characters. Short values that repeat across requests
+    (industry names, sales types) are served from an LRU cache.
     """
     if not isinstance(text, str):
         return text
+    if len(text) > _SANITIZE_CACHE_MAX_LENGTH:
+        return _sanitize(text)
+    return _sanitize_cached(text)
 
-    sanitized = re.sub(r"(?i)\b(?:system|assistant|user|developer)\s*:", "", text)
-    sanitized = re.sub(r"<[^>]*>", "", sanitized)
-    sanitized = sanitized.replace("`", "")
-    sanitized = re.sub(r"[\u200B-\u200F\u202A-\u202E\u2060\uFEFF]", "", sanitized)
-    sanitized = re.sub(r"[\u2600-\u27BF]", "", sanitized)
-    sanitized = re.sub(r"\s+", " ", sanitized)
-    return sanitized.strip()
+
+def sanitize_mapping(values: Mapping[str, Any], escape: bool = False) -> dict[str, Any]:
+    """Sanitise every string value of ``values`` in one call.
+
+    Non-string values are returned unchanged. With ``escape=True`` the
+    sanitised strings are also passed through :func:`escape_braces`.
+    """
+    result: dict[str, Any] = {}
+    for key, value in values.items():
+        if isinstance(value, str):
+            value = sanitize_for_prompt(value)
+            if escape:
+                value = escape_braces(value)
+        result[key] = value
+    return result
 
 
 def escape_braces(text: str) -> str:
@@ -38,6 +71,17 @@ def escape_braces(text: str) -> str:
 EMAIL_REGEX = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 PHONE_REGEX = re.compile(r"\+?\d[\d\-\s]{9,}\d")
 NAME_REGEX = re.compile(r"\b[A-Z][a-z]+\s+[A-Z][a-z]+\b|[\u4e00-\u9fff]{3,}")
+# 上の 3 つを 1 回の走査で置換するための結合パターン（左から順に試す）
+PII_REGEX = re.compile("|".join(p.pattern for p in (EMAIL_REGEX, PHONE_REGEX, NAME_REGEX)))
+PII_MASK = "***"
+
+# これより長い文字列（議事録の全文など）はキャッシュしない
+_MASK_CACHE_MAX_LENGTH = 4096
+
+
+@lru_cache(maxsize=1024)
+def _mask_pii_cached(text: str) -> str:
+    return PII_REGEX.sub(PII_MASK, text)
 
 
 def mask_pii(text: str) -> str:
@@ -45,12 +89,12 @@ def mask_pii(text: str) -> str:
 
     This function replaces email addresses, phone numbers, and personal names
     with asterisks (``***``) to prevent accidental logging of sensitive data.
+    All three patterns are applied in a single pass, and short strings that
+    repeat (log templates, labels) are served from an LRU cache.
     """
 
     if not isinstance(text, str):
         text = str(text)
-
-    text = EMAIL_REGEX.sub("***", text)
-    text = PHONE_REGEX.sub("***", text)
-    text = NAME_REGEX.sub("***", text)
-    return text
+    if len(text) > _MASK_CACHE_MAX_LENGTH:
+        return PII_REGEX.sub(PII_MASK, text)
+    return _mask_pii_cached(text)
@@ -0,0 +1,119 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+import services.advice_cache as advice_cache
+from core.models import AppSettings, SalesInput, SalesType
+from services.advice_cache import CACHE_REQUESTS, AdviceCache
+from services.pre_advisor import PreAdvisorService
+
+pytestmark = pytest.mark.skipif(advice_cache.np is None, reason="NumPy がない環境")
+
+
+def _input(purpose="新規顧客の開拓と初回訪問の設定", **overrides):
+    fields = dict(sales_type=SalesType.HUNTER, industry="IT", product="SaaS", stage="初回", purpose=purpose)
+    fields.update(overrides)
+    return SalesInput(**fields)
+
+
+def test_reworded_purpose_reuses_prior_response():
+    cache = AdviceCache()
+    cache.store(_input(), {"short_term": {"summary": "前回"}}, "team-a")
+    before = CACHE_REQUESTS.value(cache="advice_similarity", result="hit")
+
+    response, similarity = cache.lookup(_input("新規顧客の開拓と初回訪問を設定"), "team-a")
+    assert response == {"short_term": {"summary": "前回"}}
+    assert 0.75 <= similarity < 1.0
+    assert CACHE_REQUESTS.value(cache="advice_similarity", result="hit") == before + 1
+
+    # 返すのは複製
+    response["short_term"]["summary"] = "changed"
+    assert cache.lookup(_input(), "team-a")[0]["short_term"]["summary"] == "前回"
+
+
+def test_structured_fields_tenant_and_threshold_must_match():
+    cache = AdviceCache()
+    cache.store(_input(), {"a": 1}, "team-a")
+    assert cache.lookup(_input(), "team-b") is None
+    assert cache.lookup(_input(product="ERP"), "team-a") is None
+    assert cache.lookup(_input(stage="提案"), "team-a") is None
+    assert cache.lookup(_input("既存顧客へのアップセル"), "team-a") is None
+    assert cache.lookup(_input("新規顧客の開拓と初回訪問を設定"), "team-a", threshold=0.99) is None
+    # 全角・大文字小文字の違いは同じとみなす
+    assert cache.lookup(_input(product="ＳａａＳ"), "team-a") is not None
+
+
+def test_same_input_overwrites_and_lru_eviction():
+    cache = AdviceCache(max_entries=2)
+    cache.store(_input("A社の課題整理"), {"v": 1}, "t")
+    cache.store(_input("A社の課題整理"), {"v": 2}, "t")
+    assert cache.size("t") == 1
+    assert cache.lookup(_input("A社の課題整理"), "t")[0] == {"v": 2}
+
+    cache.store(_input("物流倉庫の自動化提案"), {"v": 3}, "t")
+    cache.lookup(_input("A社の課題整理"), "t")
+    cache.store(_input("医療機関向けの予約管理"), {"v": 4}, "t")
+    assert cache.size("t") == 2
+    assert cache.lookup(_input("物流倉庫の自動化提案"), "t") is None
+    assert cache.lookup(_input("A社の課題整理"), "t")[0] == {"v": 2}
+
+
+def test_expired_entries_are_not_reused(monkeypatch):
+    cache = AdviceCache(max_age=60)
+    cache.store(_input(), {"a": 1}, "t")
+    now = advice_cache.time.monotonic()
+    monkeypatch.setattr("services.advice_cache.time.monotonic", lambda: now + 61)
+    assert cache.lookup(_input(), "t") is None
+
+
+def test_pre_advisor_reuses_similar_advice(monkeypatch):
+    monkeypatch.setattr(advice_cache, "_CACHE", AdviceCache())
+    settings_manager = Mock()
+    settings_manager.load_settings.return_value = AppSettings(advice_cache_enabled=True)
+    evidence = Mock()
+    evidence.news.return_value = []
+    evidence.is_offline.return_value = False
+    with patch("services.pre_advisor.Logger"), patch("services.pre_advisor.OpenAIProvider") as provider_class:
+        provider_class.return_value.call_llm.return_value = {"short_term": {"summary": "生成"}}
+        service = PreAdvisorService(settings_manager)
+
+    first = service.generate_advice(_input(), evidence=evidence)
+    second = service.generate_advice(_input("新規顧客の開拓と初回訪問を設定"), evidence=evidence)
+
+    assert "reused" not in first
+    assert second["reused"] is True and second["short_term"] == {"summary": "生成"}
+    service.llm_provider.call_llm.assert_called_once()
+    evidence.news.assert_called_once()
+
+
+@pytest.mark.parametrize("settings", [Mock(), Mock(advice_cache_enabled=True, advice_cache_threshold=Mock())])
+def test_pre_advisor_tolerates_mock_settings(monkeypatch, settings):
+    monkeypatch.setattr(advice_cache, "_CACHE", AdviceCache())
+    settings_manager = Mock()
+    settings_manager.load_settings.return_value = settings
+    evidence = Mock()
+    evidence.news.return_value = []
+    evidence.is_offline.return_value = False
+    with patch("services.pre_advisor.Logger"), patch("services.pre_advisor.OpenAIProvider") as provider_class:
+        provider_class.return_value.call_llm.return_value = {"short_term": {"summary": "生成"}}
+        service = PreAdvisorService(settings_manager)
+
+    assert service.generate_advice(_input(), evidence=evidence)["short_term"] == {"summary": "生成"}
+
+
+def test_pre_advisor_generates_when_cache_fails(monkeypatch):
+    broken = Mock()
+    broken.lookup.side_effect = RuntimeError("cache broken")
+    monkeypatch.setattr(advice_cache, "_CACHE", broken)
+    settings_manager = Mock()
+    settings_manager.load_settings.return_value = AppSettings(advice_cache_enabled=True)
+    evidence = Mock()
+    evidence.news.return_value = []
+    evidence.is_offline.return_value = False
+    with patch("services.pre_advisor.Logger"), patch("services.pre_advisor.OpenAIProvider") as provider_class:
+        provider_class.return_value.call_llm.return_value = {"short_term": {"summary": "生成"}}
+        service = PreAdvisorService(settings_manager)
+
+    result = service.generate_advice(_input(), evidence=evidence)
+    assert result["short_term"] == {"summary": "生成"} and "reused" not in result
+    broken.store.assert_not_called()
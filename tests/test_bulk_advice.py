@@ -0,0 +1,199 @@
+import json
+import threading
+from pathlib import Path
+from unittest.mock import Mock
+
+from providers.storage_local import LocalStorageProvider
+from services.bulk_advice import BulkAdviceRunner, Checkpoint, RateLimiter, main, parse_leads
+
+CSV = """sales_type,industry,product,stage,purpose,competitor,constraints
+hunter,IT,在庫管理SaaS,初回接触,新規顧客の開拓,競合A,予算は年300万円;導入は下期
+closer,製造業,生産管理,提案,受注に向けた最終提案,,
+unknown,IT,SaaS,初回接触,新規顧客の開拓,,
+hunter,I,SaaS,初回接触,短い,,
+hunter,IT,在庫管理SaaS,初回接触,新規顧客の開拓,競合A,予算は年300万円;導入は下期
+"""
+
+
+def _leads(count):
+    rows = [
+        {"sales_type": "hunter", "industry": "IT", "product": "SaaS", "stage": "初回", "purpose": f"新規開拓の提案 {i}"}
+        for i in range(count)
+    ]
+    return parse_leads("\n".join(json.dumps(r, ensure_ascii=False) for r in rows), "jsonl").inputs
+
+
+def _service(fail_rows=()):
+    service = Mock()
+
+    def generate(sales_input, evidence=None):
+        if sales_input.purpose.endswith(tuple(f" {i}" for i in fail_rows)):
+            raise RuntimeError("LLM error")
+        return {"short_term": {"summary": sales_input.purpose}}
+
+    service.generate_advice.side_effect = generate
+    return service
+
+
+def test_parse_leads_validates_in_bulk():
+    parsed = parse_leads(CSV.encode("utf-8-sig"), "csv")
+
+    assert [lead.row for lead in parsed.inputs] == [1, 2]
+    first = parsed.inputs[0].sales_input
+    assert first.constraints == ["予算は年300万円", "導入は下期"]
+    assert parsed.inputs[1].sales_input.competitor is None
+    assert [e.row for e in parsed.errors] == [3, 4]
+    assert parsed.errors[0].messages[0].startswith("sales_type:")
+    assert "業界は2文字以上で入力してください" in parsed.errors[1].messages
+    assert "目的は5文字以上で入力してください" in parsed.errors[1].messages
+
+
+def test_parse_leads_reports_broken_jsonl_lines():
+    data = '{"sales_type": "hunter", "industry": "IT", "product": "SaaS", "stage": "初回", "purpose": "新規開拓の提案"}\n{broken\n'
+    parsed = parse_leads(data, "jsonl")
+    assert len(parsed.inputs) == 1
+    assert parsed.errors[0].row == 2
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    now = [0.0]
+    waits = []
+    limiter = RateLimiter(60, burst=2, clock=lambda: now[0], sleep=waits.append)
+
+    assert [limiter.acquire() for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+    now[0] = 10.0
+    assert limiter.acquire() == 0.0
+    assert RateLimiter(0).acquire() == 0.0
+
+
+def test_runner_saves_in_batches_and_resumes(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    checkpoint_path = tmp_path / "bulk" / "leads.jsonl"
+    leads = _leads(5)
+
+    runner = BulkAdviceRunner(_service(fail_rows=(3,)), provider, workers=3, batch_size=2, checkpoint=Checkpoint(checkpoint_path))
+    progresses = [(p.completed, p.saved) for p in runner.iter_run(leads)]
+    result = runner.run([])  # 空でも動く
+
+    assert progresses[0] == (0, 0)
+    assert progresses[-1] == (5, 4)
+    # 保存は batch_size 件ごと
+    assert {saved for _, saved in progresses} <= {0, 2, 4}
+    assert result.total == 0
+    assert len(provider.list_sessions()) == 4
+    session = provider.load_session(runner.session_id(leads[0]))
+    assert session["data"]["output"]["advice"]["short_term"]["summary"] == "新規開拓の提案 0"
+
+    resumed_service = _service()
+    resumed = BulkAdviceRunner(resumed_service, provider, checkpoint=Checkpoint(checkpoint_path)).run(leads)
+    assert (resumed.skipped, resumed.saved, resumed.failed) == (4, 1, 0)
+    assert resumed_service.generate_advice.call_count == 1
+    assert len(provider.list_sessions()) == 5
+
+
+def test_offline_stub_is_not_saved_or_checkpointed(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    checkpoint_path = tmp_path / "bulk" / "leads.jsonl"
+    leads = _leads(3)
+    service = _service()
+    service.generate_advice.side_effect = lambda sales_input, evidence=None: (
+        {"short_term": {"summary": "オフラインスタブ"}, "offline": True}
+        if sales_input.purpose.endswith(" 1")
+        else {"short_term": {"summary": sales_input.purpose}}
+    )
+
+    progress = BulkAdviceRunner(service, provider, checkpoint=Checkpoint(checkpoint_path)).run(leads)
+    assert (progress.saved, progress.failed) == (2, 1)
+    assert progress.errors[0].row == leads[1].row
+    assert len(provider.list_sessions()) == 2
+    assert leads[1].key not in Checkpoint(checkpoint_path).done
+
+    resumed_service = _service()
+    resumed = BulkAdviceRunner(resumed_service, provider, checkpoint=Checkpoint(checkpoint_path)).run(leads)
+    assert (resumed.skipped, resumed.saved) == (2, 1)
+    assert resumed_service.generate_advice.call_args.args[0] == leads[1].sales_input
+
+
+def test_runner_uses_batched_save_when_available(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    calls = []
+
+    def save_sessions(items):
+        calls.append(len(items))
+        return [provider.save_session(data, session_id=sid) for data, sid in items]
+
+    provider.save_sessions = save_sessions
+    progress = BulkAdviceRunner(_service(), provider, batch_size=2).run(_leads(5))
+    assert progress.saved == 5
+    assert sorted(calls) == [1, 2, 2]
+
+
+def test_batch_api_mode_generates_in_chunks(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    service = Mock()
+    service.generate_advice_batch.side_effect = lambda inputs, evidence=None: [
+        RuntimeError("batch line failed") if i.purpose.endswith(" 2") else {"short_term": {"summary": i.purpose}}
+        for i in inputs
+    ]
+    leads = _leads(5)
+
+    runner = BulkAdviceRunner(service, provider, batch_size=2, batch_api=True, batch_api_size=3)
+    progresses = [(p.completed, p.saved) for p in runner.iter_run(leads)]
+
+    assert progresses == [(0, 0), (3, 2), (5, 4)]
+    assert [len(c.args[0]) for c in service.generate_advice_batch.call_args_list] == [3, 2]
+    assert service.generate_advice.call_count == 0
+    assert len(provider.list_sessions()) == 4
+
+
+def test_checkpoint_ignores_torn_last_line(tmp_path: Path):
+    path = tmp_path / "cp.jsonl"
+    path.write_text('{"run_id": "r1"}\n{"key": "a", "session_id": "s-a", "row": 1}\n{"key": "b", "sess', encoding="utf-8")
+    checkpoint = Checkpoint(path)
+    assert checkpoint.run_id == "r1" and checkpoint.done == {"a": "s-a"}
+
+    lead = _leads(1)[0]
+    checkpoint.record([(lead, "s-c")])
+    assert Checkpoint(path).done == {"a": "s-a", lead.key: "s-c"}
+
+
+def test_stopping_iteration_cancels_pending_rows(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    blocked = threading.Event()
+    calls = []
+
+    def generate(sales_input, evidence=None):
+        calls.append(sales_input.purpose)
+        if len(calls) > 1:
+            blocked.wait(0.2)
+        return {"short_term": {}}
+
+    service = Mock()
+    service.generate_advice.side_effect = generate
+    runner = BulkAdviceRunner(service, provider, workers=1, batch_size=10)
+
+    iterator = runner.iter_run(_leads(5))
+    next(iterator)
+    assert next(iterator).generated == 1
+    iterator.close()
+
+    # 実行中の 1 行を待ち、未着手の行は取り消す
+    assert len(calls) <= 2
+    # 生成済みの行は中断時にも保存される
+    assert len(provider.list_sessions()) == 1
+
+
+def test_main_reports_errors_and_writes_checkpoint(tmp_path: Path, monkeypatch, capsys):
+    leads_file = tmp_path / "leads.csv"
+    leads_file.write_text(CSV, encoding="utf-8")
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    monkeypatch.setattr(
+        "services.bulk_advice.create_runner",
+        lambda checkpoint, **kwargs: BulkAdviceRunner(_service(), provider, checkpoint=checkpoint),
+    )
+
+    assert main([str(leads_file), "--checkpoint", str(tmp_path / "cp.jsonl")]) == 0
+    out = capsys.readouterr()
+    assert "保存 2 件" in out.out and "入力エラー 2 件" in out.out
+    assert "行 3:" in out.err
+    assert len(Checkpoint(tmp_path / "cp.jsonl").done) == 2
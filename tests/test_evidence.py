@@ -0,0 +1,159 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from core.models import SalesInput, SalesType
+from services.evidence import EvidenceContext, get_evidence_context
+from services.icebreaker import IcebreakerService
+from services.pre_advisor import PreAdvisorService
+
+NEWS = [
+    {"title": f"IT業界の最新動向{i}", "url": f"https://example.com/news{i}", "snippet": "AI導入が進む", "source": "stub"}
+    for i in range(3)
+]
+
+
+def _search_provider(results=NEWS):
+    provider = Mock()
+    provider.offline_mode = False
+    provider.search.return_value = [dict(r) for r in results]
+    return provider
+
+
+def test_news_is_fetched_once_at_the_larger_count():
+    provider = _search_provider()
+    context = EvidenceContext(provider)
+
+    assert context.news("IT", 3) == NEWS
+    assert context.news("IT", 2) == NEWS[:2]
+    provider.search.assert_called_once_with("IT 最新ニュース", 3)
+
+    context.news("製造業", 2)
+    provider.search.assert_called_with("製造業 最新ニュース", 3)
+    assert provider.search.call_count == 2
+
+
+def test_news_returns_copies():
+    context = EvidenceContext(_search_provider())
+    context.news("IT", 3)[0]["title"] = "changed"
+    assert context.news("IT", 3)[0]["title"] == "IT業界の最新動向0"
+
+
+def test_news_is_refetched_when_stale_or_larger(monkeypatch):
+    provider = _search_provider()
+    context = EvidenceContext(provider, num=2, max_age=60)
+    context.news("IT", 2)
+    context.news("IT", 3)
+    assert provider.search.call_args_list[-1].args == ("IT 最新ニュース", 3)
+
+    now = time.monotonic()
+    monkeypatch.setattr("services.evidence.time.monotonic", lambda: now + 61)
+    context.news("IT", 2)
+    assert provider.search.call_count == 3
+
+
+def test_search_errors_are_not_cached():
+    provider = _search_provider()
+    provider.search.side_effect = [RuntimeError("down"), [dict(NEWS[0])]]
+    context = EvidenceContext(provider)
+    with pytest.raises(RuntimeError):
+        context.news("IT", 3)
+    assert context.news("IT", 3) == NEWS[:1]
+
+
+
+def test_distinct_queries_are_searched_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    provider = _search_provider()
+
+    def search(query, num):
+        # 片方の検索中にもう片方が始まらなければ Barrier がタイムアウトする
+        barrier.wait()
+        return [dict(NEWS[0], title=query)]
+
+    provider.search.side_effect = search
+    context = EvidenceContext(provider)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda ind=ind: results.setdefault(ind, context.news(ind, 3)))
+        for ind in ("IT", "製造業")
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join(10)
+    assert results["IT"][0]["title"] == "IT 最新ニュース"
+    assert results["製造業"][0]["title"] == "製造業 最新ニュース"
+
+
+def test_concurrent_same_query_is_searched_once():
+    started, release = threading.Event(), threading.Event()
+    provider = _search_provider()
+
+    def search(query, num):
+        started.set()
+        release.wait(5)
+        return [dict(r) for r in NEWS]
+
+    provider.search.side_effect = search
+    context = EvidenceContext(provider)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(context.news("IT", 3))) for _ in range(3)]
+    threads[0].start()
+    assert started.wait(5)
+    for th in threads[1:]:
+        th.start()
+    while context._flights._calls and next(iter(context._flights._calls.values())).waiters < 2:
+        time.sleep(0.01)
+    release.set()
+    for th in threads:
+        th.join(10)
+    assert results == [NEWS] * 3
+    assert provider.search.call_count == 1
+
+def test_offline_flag_is_recorded_per_query():
+    provider = _search_provider()
+
+    def search(query, num):
+        provider.offline_mode = True
+        return []
+
+    provider.search.side_effect = search
+    context = EvidenceContext(provider)
+    assert context.news("IT", 3) == []
+    assert context.is_offline("IT")
+    assert not context.is_offline("小売")
+
+
+def test_get_evidence_context_is_kept_in_session_state():
+    state = {}
+    with patch("services.evidence.WebSearchProvider"):
+        context = get_evidence_context(state)
+        assert get_evidence_context(state) is context
+    assert state["evidence_context"] is context
+
+
+def test_pre_advice_and_icebreaker_share_one_search():
+    provider = _search_provider()
+    context = EvidenceContext(provider)
+
+    with patch("services.pre_advisor.Logger"), patch("services.pre_advisor.OpenAIProvider") as llm_class, patch(
+        "services.pre_advisor.PreAdvisorService._load_prompt_template",
+        return_value={"user": "", "system": "", "output_format": ""},
+    ), patch("services.pre_advisor.WebSearchProvider") as search_class:
+        llm_class.return_value.call_llm.return_value = {"short_term": {}}
+        service = PreAdvisorService()
+        sales_input = SalesInput(sales_type=SalesType.HUNTER, industry="IT", product="SaaS", stage="", purpose="")
+        service.generate_advice(sales_input, evidence=context)
+        search_class.assert_not_called()
+
+    with patch("services.icebreaker.OpenAIProvider") as llm_class, patch("services.icebreaker.WebSearchProvider"):
+        llm_class.return_value.call_llm.return_value = {"icebreakers": ["a", "b", "c"]}
+        ice = IcebreakerService()
+        assert ice.generate_icebreakers(SalesType.HUNTER, "IT", evidence=context) == ["a", "b", "c"]
+        ice.search_provider.search.assert_not_called()
+
+    provider.search.assert_called_once_with("IT 最新ニュース", 3)
+    assert ice.last_news_items == NEWS[:2]
@@ -0,0 +1,150 @@
+import httpx
+import pytest
+from jsonschema import validate
+from openai import OpenAI
+
+from core.schema import (
+    PRE_ADVICE_SECTIONS,
+    get_post_review_schema,
+    get_pre_advice_schema,
+    get_pre_advice_section_schema,
+    get_pre_advice_with_icebreakers_schema,
+)
+from providers.llm_openai import BatchRequest, OpenAIProvider
+from services.error_handler import LLMError
+from services.icebreaker import IcebreakerService
+from services.usage_meter import UsageMeter
+from tools.fake_openai import FakeOpenAIServer, FakeServerConfig, generate_from_schema, parse_latency
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(FakeServerConfig(seed=1)) as srv:
+        yield srv
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    UsageMeter.reset()
+    yield
+    UsageMeter.reset()
+
+
+def test_generated_values_match_app_schemas():
+    import random
+
+    icebreaker_schema = IcebreakerService._get_icebreaker_schema(None)
+    section_schemas = [get_pre_advice_section_schema(section) for section in PRE_ADVICE_SECTIONS]
+    for schema in (get_pre_advice_schema(), get_post_review_schema(), icebreaker_schema, get_pre_advice_with_icebreakers_schema(), *section_schemas):
+        validate(instance=generate_from_schema(schema, random.Random(0)), schema=schema)
+
+
+@pytest.mark.parametrize("schema", [get_pre_advice_schema(), get_post_review_schema()])
+def test_provider_round_trip_through_fake_server(server, schema):
+    provider = OpenAIProvider(base_url=server.base_url)
+    result = provider.call_llm("テスト", "speed", json_schema=schema, user_id="bench")
+    validate(instance=result, schema=schema)
+    assert UsageMeter.get_tokens("bench") > 0
+    assert server.stats()["completed"] == 1
+
+
+def test_base_url_from_environment(server, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    provider = OpenAIProvider()
+    assert str(provider.client.base_url).rstrip("/") == server.base_url
+    assert provider.call_llm("こんにちは", "speed") == {"content": "これはフェイクサーバーによるテスト応答です。"}
+
+
+def test_rate_limit_injection():
+    with FakeOpenAIServer(FakeServerConfig(rate_429=1.0)) as srv:
+        resp = httpx.post(f"{srv.base_url}/chat/completions", json={"model": "m", "messages": []})
+        assert resp.status_code == 429
+        assert resp.headers["retry-after"] == "1"
+        assert srv.stats()["rate_limited"] == 1
+
+
+def test_streaming_with_usage(server):
+    client = OpenAI(api_key="fake-key", base_url=server.base_url, max_retries=0)
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "hi"}],
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    chunks = list(stream)
+    text = "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    assert text == "これはフェイクサーバーによるテスト応答です。"
+    assert [c.choices[0].finish_reason for c in chunks if c.choices][-1] == "stop"
+    assert chunks[-1].usage.total_tokens > 0
+
+
+def test_batch_results_are_mapped_back_by_custom_id(server):
+    provider = OpenAIProvider(base_url=server.base_url)
+    schema = get_post_review_schema()
+    requests = [
+        BatchRequest("review", "分析して", "deep", schema),
+        BatchRequest("plain", "こんにちは"),
+        BatchRequest("advice", "助言して", "speed", get_pre_advice_schema()),
+    ]
+    results = provider.call_llm_batch(requests, user_id="batch", poll_interval=0.01)
+    assert [r.custom_id for r in results] == ["review", "plain", "advice"]
+    assert all(r.ok for r in results)
+    validate(instance=results[0].response, schema=schema)
+    assert results[1].response == {"content": "これはフェイクサーバーによるテスト応答です。"}
+    assert UsageMeter.get_tokens("batch") > 0
+    assert server.stats()["batches"] == 1 and server.stats()["completed"] == 3
+
+
+def test_batch_reports_failed_and_truncated_lines():
+    schema = get_pre_advice_schema()
+    for config, message in ((FakeServerConfig(rate_429=1.0), "Rate limit"), (FakeServerConfig(rate_length=1.0), "完了できません")):
+        with FakeOpenAIServer(config) as srv:
+            provider = OpenAIProvider(base_url=srv.base_url)
+            (result,) = provider.call_llm_batch([BatchRequest("a", "p", "speed", schema)], poll_interval=0.01)
+            assert not result.ok and isinstance(result.error, LLMError)
+            assert message in str(result.error)
+
+
+def test_pre_advice_batch_through_fake_server(server, monkeypatch):
+    from unittest.mock import Mock
+
+    from core.models import SalesInput, SalesType
+    from services.pre_advisor import PreAdvisorService
+
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    evidence = Mock()
+    evidence.news.return_value = []
+    evidence.is_offline.return_value = False
+    inputs = [
+        SalesInput(sales_type=SalesType.HUNTER, industry="IT", product="SaaS", stage="初回", purpose=f"新規開拓 {i}")
+        for i in range(3)
+    ]
+    results = PreAdvisorService().generate_advice_batch(inputs, evidence=evidence, poll_interval=0.01)
+    assert len(results) == 3
+    for advice in results:
+        validate(instance=advice, schema=get_pre_advice_schema())
+    assert server.stats()["batches"] == 1
+
+
+def test_batch_timeout_cancels_batch():
+    with FakeOpenAIServer(FakeServerConfig(batch_delay=5)) as srv:
+        provider = OpenAIProvider(base_url=srv.base_url)
+        with pytest.raises(LLMError, match="完了しませんでした"):
+            provider.call_llm_batch([BatchRequest("a", "p")], poll_interval=0.01, timeout=0.05)
+        (batch_id,) = srv._httpd._batches
+        assert srv._httpd.batch(batch_id)["status"] == "cancelled"
+
+
+def test_batch_rejects_duplicate_custom_ids(server):
+    provider = OpenAIProvider(base_url=server.base_url)
+    with pytest.raises(ValueError):
+        provider.call_llm_batch([BatchRequest("a", "p"), BatchRequest("a", "q")])
+    assert server.stats()["batches"] == 0
+
+
+def test_parse_latency():
+    assert parse_latency("uniform:0.1,0.5") == ("uniform", (0.1, 0.5))
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from core.models import SessionSummary
+from services.history_query import (
+    SORT_LATEST,
+    SORT_OLDEST,
+    SORT_PINNED_ONLY,
+    SORT_TYPE,
+    collect_facets,
+    filter_summaries,
+    sort_summaries,
+)
+
+
+def _session(sid, created, type_="pre_advice", pinned=False, tags=None, urls=None, **kw):
+    output = {"advice": {"evidence_urls": urls or []}} if type_ == "pre_advice" else {"evidence_urls": urls or []}
+    return {
+        "session_id": sid,
+        "user_id": kw.get("user_id", "u1"),
+        "team_id": kw.get("team_id", "t1"),
+        "created_at": created,
+        "pinned": pinned,
+        "tags": tags or [],
+        "data": {"type": type_, "input": {"industry": kw.get("industry", "IT")}, "output": output},
+    }
+
+
+def test_from_session_precomputes_fields():
+    s = SessionSummary.from_session(
+        _session("a", "2024-05-01T10:00:00", tags=[" x ", "", 1], urls=["https://www.nikkei.com/a", "https://www.nikkei.com/b"])
+    )
+    assert s.created_at == datetime(2024, 5, 1, 10, 0)
+    assert s.created_at_raw == "2024-05-01T10:00:00"
+    assert s.type == "pre_advice"
+    assert s.tags == ("x",)
+    assert s.evidence_hosts == ("www.nikkei.com",)
+    assert s.preview == "IT"
+    assert not hasattr(s, "__dict__")
+
+
+def test_from_session_uses_firestore_summary_fields():
+    summary = {
+        "session_id": "f",
+        "created_at": "bad",
+        "data": {"type": "icebreaker"},
+        "preview": "業界",
+        "evidence_domains": ["example.com"],
+    }
+    s = SessionSummary.from_session(summary)
+    assert s.created_at is None
+    assert s.evidence_hosts == ("example.com",)
+    assert s.preview == "業界"
+
+
+def test_filter_and_facets():
+    summaries = [
+        SessionSummary.from_session(_session("a", "2024-01-01", tags=["A", "B"], urls=["https://a.com/x"])),
+        SessionSummary.from_session(_session("b", "2024-01-02", type_="post_review", tags=["A"], urls=["https://b.com/x"], team_id="t2")),
+        SessionSummary.from_session(_session("c", "2024-01-03", industry="製造")),
+    ]
+    facets = collect_facets(summaries)
+    assert facets == {
+        "user_ids": ["u1"],
+        "team_ids": ["t1", "t2"],
+        "tags": ["A", "B"],
+        "domains": ["a.com", "b.com"],
+    }
+    ids = lambda xs: [s.session_id for s in xs]
+    assert ids(filter_summaries(summaries, session_type="post_review")) == ["b"]
+    assert ids(filter_summaries(summaries, team_id="t1")) == ["a", "c"]
+    assert ids(filter_summaries(summaries, tags=["A", "B"])) == ["a"]
+    assert ids(filter_summaries(summaries, domains=["a.com", "b.com"])) == ["a", "b"]
+    assert ids(filter_summaries(summaries, query="製造")) == ["c"]
+    # キーワードとタグは同時に適用される
+    assert ids(filter_summaries(summaries, query="IT", tags=["B"])) == ["a"]
+    assert ids(filter_summaries(summaries, query="zzz", text_for=lambda s: s.session_id + "zzz")) == ["a", "b", "c"]
+
+
+def test_sort_modes_put_pinned_first():
+    summaries = [
+        SessionSummary.from_session(_session("old", "2024-01-01", type_="post_review")),
+        SessionSummary.from_session(_session("pin", "2024-01-02", pinned=True)),
+        SessionSummary.from_session(_session("new", "2024-01-03")),
+    ]
+    ids = lambda xs: [s.session_id for s in xs]
+    assert ids(sort_summaries(summaries, SORT_LATEST)) == ["pin", "new", "old"]
+    assert ids(sort_summaries(summaries, SORT_OLDEST)) == ["pin", "old", "new"]
+    assert ids(sort_summaries(summaries, SORT_TYPE)) == ["pin", "old", "new"]
+    assert ids(sort_summaries(summaries, SORT_PINNED_ONLY)) == ["pin"]
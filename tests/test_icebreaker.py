@@ -136,6 +136,25 @@ class TestIcebreakerService:
         assert "assistant:" not in prompt.lower()
         assert "IT" in prompt
         assert "hint" in prompt
+
+    def test_build_prompt_sanitizes_news_items_once(self):
+        service = self.service
+        service.prompt_template = {
+            "system": "sys",
+            "user_template": "ニュース:\n$news_items",
+            "output_constraints": []
+        }
+        prompt = service._build_prompt(
+            SalesType.HUNTER,
+            industry="IT",
+            company_hint="",
+            news_items=[
+                {"title": "<b>DX{2025}</b>", "snippet": "system: 投資拡大"},
+                {"title": "AI", "snippet": "導入\u200b事例"},
+            ],
+            tone="tone",
+        )
+        assert "- DX{2025}: 投資拡大\n- AI: 導入事例" in prompt
     
     def test_get_tone_for_type(self):
         """営業タイプ別トーンの取得テスト"""
@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+
+from providers.storage_local import LocalStorageProvider
+from services import job_queue
+from services.job_queue import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+def _echo(payload, context):
+    return {"type": "echo", "input": payload, "output": {"text": payload["text"].upper()}}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorageProvider(data_dir=str(tmp_path / "data"))
+
+
+def _queue(tmp_path, storage, handlers, **kwargs):
+    kwargs.setdefault("workers", 0)
+    return JobQueue(tmp_path / "jobs.db", storage_provider=storage, handlers=handlers, **kwargs)
+
+
+def _wait(queue, job_id, statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job stayed {queue.get(job_id).status}")
+
+
+def test_job_result_is_saved_through_storage_provider(tmp_path, storage):
+    queue = _queue(tmp_path, storage, {"echo": _echo})
+    job_id = queue.submit("echo", {"text": "hello"})
+    assert queue.get(job_id).status == QUEUED
+    assert queue.result(job_id) is None
+
+    assert queue.run_pending() == 1
+    job = queue.get(job_id)
+    assert job.status == SUCCEEDED and job.attempts == 1 and job.finished
+    assert queue.result(job_id) == {"type": "echo", "input": {"text": "hello"}, "output": {"text": "HELLO"}}
+    assert storage.load_session(job.session_id)["data"]["type"] == "echo"
+
+
+def test_failed_job_records_error(tmp_path, storage):
+    def broken(payload, context):
+        raise RuntimeError("LLM timeout")
+
+    queue = _queue(tmp_path, storage, {"broken": broken})
+    job_id = queue.submit("broken", {})
+    queue.run_pending()
+    job = queue.get(job_id)
+    assert job.status == FAILED and job.error == "LLM timeout"
+    assert storage.list_sessions() == []
+
+
+def test_cancel_queued_job_never_runs(tmp_path, storage):
+    calls = []
+    queue = _queue(tmp_path, storage, {"echo": lambda p, c: calls.append(p) or _echo(p, c)})
+    job_id = queue.submit("echo", {"text": "x"})
+    assert queue.cancel(job_id)
+    assert queue.run_pending() == 0
+    assert queue.get(job_id).status == CANCELLED and calls == []
+    assert not queue.cancel(job_id)
+
+
+def test_cancel_running_job_discards_result(tmp_path, storage):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(payload, context):
+        started.set()
+        release.wait(5)
+        context.check()
+        return _echo(payload, context)
+
+    queue = _queue(tmp_path, storage, {"slow": slow}, workers=1, poll_interval=0.01)
+    queue.start()
+    try:
+        job_id = queue.submit("slow", {"text": "x"})
+        assert started.wait(5)
+        assert queue.get(job_id).status == RUNNING
+        assert queue.cancel(job_id)
+        release.set()
+        assert _wait(queue, job_id, {CANCELLED, SUCCEEDED}).status == CANCELLED
+    finally:
+        queue.close()
+    assert storage.list_sessions() == []
+
+
+def test_jobs_survive_restart_and_stalled_jobs_are_retried(tmp_path, storage):
+    first = _queue(tmp_path, storage, {"echo": _echo}, lease=0.05)
+    waiting = first.submit("echo", {"text": "later"})
+    stalled = first.submit("echo", {"text": "stalled"})
+    # 2 件目を取得したままプロセスが落ちた状態を作る
+    first._conn.execute("UPDATE jobs SET created_at = 0 WHERE id = ?", (stalled,))
+    first._conn.commit()
+    assert first._claim().id == stalled
+    first._conn.close()
+
+    time.sleep(0.1)
+    second = _queue(tmp_path, storage, {"echo": _echo})
+    assert second.run_pending() == 2
+    assert second.get(waiting).status == SUCCEEDED
+    job = second.get(stalled)
+    assert job.status == SUCCEEDED and job.attempts == 2
+    assert second.result(stalled)["output"] == {"text": "STALLED"}
+
+
+def test_run_pending_extends_lease_of_long_job(tmp_path, storage):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(payload, context):
+        started.set()
+        release.wait(5)
+        return _echo(payload, context)
+
+    queue = _queue(tmp_path, storage, {"slow": slow}, lease=0.15)
+    job_id = queue.submit("slow", {"text": "x"})
+    runner = threading.Thread(target=queue.run_pending)
+    runner.start()
+    try:
+        assert started.wait(5)
+        time.sleep(0.5)
+        # 別のプロセスから見てもリースが切れていない
+        other = _queue(tmp_path, storage, {"slow": slow})
+        assert other.recover() == 0
+        assert other.get(job_id).status == RUNNING
+    finally:
+        release.set()
+        runner.join(5)
+    job = queue.get(job_id)
+    assert job.status == SUCCEEDED and job.attempts == 1
+    assert len(storage.list_sessions()) == 1
+
+
+def test_stalled_job_fails_after_max_attempts(tmp_path, storage):
+    queue = _queue(tmp_path, storage, {"echo": _echo}, lease=0.0, max_attempts=1)
+    job_id = queue.submit("echo", {"text": "x"})
+    queue._claim()
+    time.sleep(0.01)
+    assert queue.recover() == 1
+    job = queue.get(job_id)
+    assert job.status == FAILED and "再試行" in job.error
+
+
+def test_post_review_handler_saves_session_payload(tmp_path, storage, monkeypatch):
+    captured = {}
+
+    class FakeAnalyzer:
+        def __init__(self, settings_manager=None):
+            pass
+
+        def analyze_meeting(self, **kwargs):
+            captured.update(kwargs)
+            return {"summary": "良好"}
+
+    monkeypatch.setattr("services.post_analyzer.PostAnalyzerService", FakeAnalyzer)
+    queue = _queue(tmp_path, storage, None)
+    payload = {"sales_type": "hunter", "industry": "IT", "product": "SaaS", "meeting_content": "議事録"}
+    job_id = queue.submit("post_review", payload)
+    queue.run_pending()
+    assert queue.get(job_id).status == SUCCEEDED
+    assert captured["sales_type"].value == "hunter"
+    assert queue.result(job_id) == {
+        "type": "post_review",
+        "input": payload,
+        "output": {"analysis_result": {"summary": "良好"}},
+    }
+    assert set(job_queue.HANDLERS) >= {"post_review", "enhanced_search"}
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tools.load_harness import HarnessConfig, percentile
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_unknown_page_is_rejected():
+    with pytest.raises(ValueError):
+        HarnessConfig(scenario=("pre_advice", "missing"))
+
+
+def test_all_pages_run_concurrently_against_fake_llm(tmp_path):
+    # 他のテストが素の st.form で Streamlit の状態を変えるため別プロセスで実行する
+    out = tmp_path / "report.json"
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "tools.load_harness",
+            "--users", "2",
+            "--iterations", "1",
+            "--seed-sessions", "6",
+            "--latency", "fixed:0",
+            "--seed", "1",
+            "--json", str(out),
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr[-2000:]
+    assert "p95(s)" in proc.stdout
+
+    summary = json.loads(out.read_text(encoding="utf-8"))
+    assert set(summary["actions"]) == {
+        "pre_advice.render",
+        "pre_advice.generate",
+        "icebreaker.render",
+        "icebreaker.generate",
+        "post_review.render",
+        "post_review.analyze",
+        "history.render",
+        "history.search",
+    }
+    assert all(row["count"] == 2 and row["errors"] == 0 for row in summary["actions"].values())
+    # 事前アドバイス・アイスブレイク・ふりかえりで 1 人あたり 3 回 LLM を呼ぶ
+    assert summary["llm_calls"] == 6
+    assert summary["peak_rss_mb"] > 0
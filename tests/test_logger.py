@@ -0,0 +1,161 @@
+import json
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+from services import logger as logger_module
+from services import tracing
+from services.logger import JsonFormatter, Logger, bind_request_id, configure_logging, get_logger, shutdown_logging
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    # 他のテストで起動済みの設定を止め、一時ディレクトリで作り直す
+    shutdown_logging()
+    monkeypatch.setenv("LOG_DIR", str(tmp_path))
+    yield tmp_path
+    shutdown_logging()
+
+
+def _file_records(log_dir):
+    shutdown_logging()  # キューを書き出す
+    lines = (log_dir / logger_module.LOG_FILE_NAME).read_text(encoding="utf-8").splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def test_logger_construction_is_idempotent(log_dir):
+    for _ in range(5):
+        Logger("IdempotentTest")
+    handlers = logging.getLogger("IdempotentTest").handlers
+    assert len(handlers) == 1
+    assert handlers[0] is configure_logging()
+    assert isinstance(handlers[0], logging.handlers.QueueHandler)
+    assert get_logger("IdempotentTest").handlers == handlers
+
+
+def test_file_handler_rotates_daily(log_dir):
+    configure_logging()
+    listener = logger_module._LoggingState.listener
+    file_handlers = [h for h in listener.handlers if isinstance(h, logging.handlers.TimedRotatingFileHandler)]
+    assert len(file_handlers) == 1
+    assert file_handlers[0].when == "MIDNIGHT"
+    assert file_handlers[0].baseFilename == str(log_dir / logger_module.LOG_FILE_NAME)
+
+
+def test_json_record_carries_request_and_trace_ids(log_dir):
+    tracing.configure(None)
+    try:
+        request_id = bind_request_id("req-123")
+        log = Logger("JsonTest")
+        with tracing.span("outer") as s:
+            log.info("inside span")
+        log.info("outside span")
+    finally:
+        tracing.reset()
+
+    inside, outside = [r for r in _file_records(log_dir) if r["logger"] == "JsonTest"]
+    assert inside["message"] == "inside span"
+    assert inside["severity"] == "INFO"
+    assert inside["request_id"] == request_id
+    assert inside["trace_id"] == s.trace_id
+    assert inside["span_id"] == s.span_id
+    assert outside["trace_id"] is None
+    assert outside["request_id"] == request_id
+
+
+def test_exceptions_and_extra_fields_are_serialised(log_dir):
+    log = get_logger("ExtraTest")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("failed %s", "here", extra={"session_id": "abc"})
+
+    (record,) = [r for r in _file_records(log_dir) if r["logger"] == "ExtraTest"]
+    assert record["message"] == "failed here"
+    assert record["session_id"] == "abc"
+    assert "ValueError: boom" in record["exception"]
+
+
+def test_wrapper_records_caller_location(log_dir):
+    log = Logger("CallerTest")
+
+    def place_order():
+        log.info("info")
+        log.error("error")
+        log.log_api_call("search", success=False)
+
+    place_order()
+    records = [r for r in _file_records(log_dir) if r["logger"] == "CallerTest"]
+    assert [r["function"] for r in records] == ["place_order"] * 3
+    assert all(r["module"] == "test_logger" for r in records)
+    assert records[2]["severity"] == "WARNING"
+
+
+def test_handlers_run_on_listener_thread(log_dir):
+    seen = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            seen.append((threading.current_thread(), record.getMessage()))
+
+    configure_logging()
+    listener = logger_module._LoggingState.listener
+    listener.handlers = listener.handlers + (Recorder(),)
+    get_logger("ThreadTest").warning("queued")
+    shutdown_logging()
+
+    assert seen == [(seen[0][0], "queued")]
+    assert seen[0][0] is not threading.current_thread()
+
+
+def test_json_formatter_without_context():
+    record = logging.LogRecord("plain", logging.WARNING, __file__, 1, "hello %s", ("world",), None)
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "hello world"
+    assert payload["severity"] == "WARNING"
+    assert payload["trace_id"] is None
+
+
+def test_pii_is_masked_only_for_emitted_records(log_dir, monkeypatch):
+    calls = []
+    original = logger_module.mask_pii
+    monkeypatch.setattr(logger_module, "mask_pii", lambda text: calls.append(text) or original(text))
+
+    log = Logger("MaskTest", log_level="INFO")
+    log.debug("山田太郎 debug")
+    assert calls == []
+
+    log.log_user_action("login", {"email": "taro@example.com"})
+    (record,) = [r for r in _file_records(log_dir) if r["logger"] == "MaskTest"]
+    assert record["message"] == "USER_ACTION: login - Details: {'email': '***'}"
+    assert len(calls) == 1
+
+
+def test_exception_text_and_extras_are_masked_on_a_copy(log_dir):
+    log = get_logger("MaskExtraTest")
+    seen = []
+
+    class Capture(logging.Handler):
+        def emit(self, record):
+            seen.append((record.getMessage(), record.contact, record.exc_info is not None))
+
+    capture = Capture()
+    log.addHandler(capture)
+    try:
+        try:
+            raise ValueError("taro@example.com が見つかりません")
+        except ValueError:
+            log.exception("lookup %s", "taro@example.com", extra={"contact": "taro@example.com", "lead": {"tel": "090-1234-5678"}})
+    finally:
+        log.removeHandler(capture)
+
+    (record,) = [r for r in _file_records(log_dir) if r["logger"] == "MaskExtraTest"]
+    assert record["message"] == "lookup ***"
+    assert record["contact"] == "***"
+    assert record["lead"] == {"tel": "***"}
+    assert "ValueError: *** が見つかりません" in record["exception"]
+    assert "taro@example.com" not in json.dumps(record, ensure_ascii=False)
+    # 同じレコードを受け取る他のハンドラーには元の内容が渡る
+    assert seen == [("lookup taro@example.com", "taro@example.com", True)]
@@ -0,0 +1,148 @@
+import httpx
+import pytest
+
+from providers import search_provider
+from providers.llm_openai import LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS, OpenAIProvider
+from providers.search_provider import SEARCH_BACKEND_FAILURES, SEARCH_REQUESTS, WebSearchProvider
+from providers.storage_local import LocalStorageProvider
+from services import metrics
+from services.session_cache import CACHE_REQUESTS, SessionCache
+from services.usage_meter import UsageMeter
+from tools.fake_openai import FakeOpenAIServer, FakeServerConfig
+
+
+def test_prometheus_text_format():
+    registry = metrics.Registry()
+    c = registry.get_or_create(metrics.Counter, "jobs_total", "処理件数", ["kind"])
+    h = registry.get_or_create(metrics.Histogram, "job_seconds", "所要時間", [], buckets=(0.1, 1.0))
+    g = registry.get_or_create(metrics.Gauge, "queue_depth", "待ち件数", [])
+    c.inc(kind='a"b')
+    c.inc(2, kind='a"b')
+    h.observe(0.05)
+    h.observe(0.5)
+    h.observe(3)
+    g.set_function(lambda: 7)
+
+    text = registry.render()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{kind="a\\"b"} 3.0' in text
+    assert 'job_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'job_seconds_bucket{le="1.0"} 2.0' in text
+    assert 'job_seconds_bucket{le="+Inf"} 3.0' in text
+    assert "job_seconds_count 3.0" in text
+    assert "job_seconds_sum 3.55" in text
+    assert "queue_depth 7.0" in text
+
+
+def test_registry_returns_existing_metric_and_rejects_conflicts():
+    first = metrics.counter("test_idempotent_total", "x", ["a"])
+    assert metrics.counter("test_idempotent_total", "x", ["a"]) is first
+    with pytest.raises(ValueError):
+        metrics.histogram("test_idempotent_total", "x", ["a"])
+    with pytest.raises(ValueError):
+        first.inc(b="1")
+
+
+def test_http_endpoint_serves_registry(monkeypatch):
+    monkeypatch.setenv("METRICS_PORT", "0")
+    monkeypatch.setenv("METRICS_ADDR", "127.0.0.1")
+    server = metrics.start_http_server_from_env()
+    try:
+        assert metrics.start_http_server_from_env() is server
+        host, port = server.server_address[:2]
+        resp = httpx.get(f"http://{host}:{port}/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE storage_operations_total counter" in resp.text
+        assert httpx.get(f"http://{host}:{port}/other").status_code == 404
+    finally:
+        metrics.stop_http_server()
+
+
+def test_llm_call_records_latency_and_tokens(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.delenv("OPENAI_MODEL", raising=False)
+    UsageMeter.reset()
+    labels = {"mode": "speed", "model": "gpt-4o-mini"}
+    before_count = LLM_LATENCY.count(**labels)
+    before_ok = LLM_REQUESTS.value(outcome="ok", **labels)
+    before_tokens = LLM_TOKENS.value(kind="total", **labels)
+    with FakeOpenAIServer(FakeServerConfig(seed=1)) as server:
+        OpenAIProvider(base_url=server.base_url).call_llm("テスト", "speed", user_id="metrics")
+    assert LLM_LATENCY.count(**labels) == before_count + 1
+    assert LLM_REQUESTS.value(outcome="ok", **labels) == before_ok + 1
+    used = UsageMeter.get_tokens("metrics")
+    assert used > 0
+    assert LLM_TOKENS.value(kind="total", **labels) == before_tokens + used
+    assert metrics.REGISTRY.get("usage_meter_tokens").value() == used
+    UsageMeter.reset()
+
+
+def test_search_failure_counts_fallback(monkeypatch):
+    monkeypatch.setenv("SEARCH_PROVIDER", "cse")
+    monkeypatch.setenv("CSE_API_KEY", "k")
+    monkeypatch.setenv("CSE_CX", "cx")
+    monkeypatch.delenv("NEWSAPI_KEY", raising=False)
+
+    class BrokenClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            raise httpx.ConnectError("offline")
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(httpx, "Client", BrokenClient)
+    before_fallback = SEARCH_REQUESTS.value(provider="cse", outcome="fallback")
+    before_failures = SEARCH_BACKEND_FAILURES.value(provider="cse")
+    WebSearchProvider().search("IT 最新ニュース", 2)
+    assert SEARCH_REQUESTS.value(provider="cse", outcome="fallback") == before_fallback + 1
+    assert SEARCH_BACKEND_FAILURES.value(provider="cse") == before_failures + 1
+
+
+def test_search_fallback_is_not_sticky(monkeypatch):
+    monkeypatch.setenv("SEARCH_PROVIDER", "cse")
+    provider = WebSearchProvider()
+    ok = [{"title": "t", "url": "https://www.nikkei.com/a", "snippet": "s", "source": "cse", "published_at": None}]
+
+    def broken_cse(self, query, num):
+        search_provider._call_offline.set(True)
+        return ok
+
+    monkeypatch.setattr(WebSearchProvider, "_search_cse", broken_cse)
+    assert provider.search_with_status("IT 最新ニュース", 1)[1] is True
+    assert provider.offline_mode
+
+    monkeypatch.setattr(WebSearchProvider, "_search_cse", lambda self, query, num: ok)
+    before_ok = SEARCH_REQUESTS.value(provider="cse", outcome="ok")
+    before_fallback = SEARCH_REQUESTS.value(provider="cse", outcome="fallback")
+    results, offline = provider.search_with_status("IT 最新ニュース", 1)
+    assert results[0]["url"] == "https://www.nikkei.com/a"
+    assert offline is False
+    assert not provider.offline_mode
+    assert SEARCH_REQUESTS.value(provider="cse", outcome="ok") == before_ok + 1
+    assert SEARCH_REQUESTS.value(provider="cse", outcome="fallback") == before_fallback
+
+
+def test_storage_and_session_cache_metrics(tmp_path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    labels = {"backend": "local", "operation": "save_session"}
+    before = metrics.STORAGE_LATENCY.count(**labels)
+    sid = provider.save_session({"type": "pre_advice"})
+    assert metrics.STORAGE_LATENCY.count(**labels) == before + 1
+    assert metrics.STORAGE_OPERATIONS.value(outcome="ok", **labels) >= 1
+
+    SessionCache.invalidate(provider)
+    miss = CACHE_REQUESTS.value(cache="session_list", result="miss")
+    hit = CACHE_REQUESTS.value(cache="session_list", result="hit")
+    SessionCache.get_sessions(provider)
+    SessionCache.get_sessions(provider)
+    assert CACHE_REQUESTS.value(cache="session_list", result="miss") == miss + 1
+    assert CACHE_REQUESTS.value(cache="session_list", result="hit") == hit + 1
+
+    session_hit = CACHE_REQUESTS.value(cache="session", result="hit")
+    assert SessionCache.get_session(provider, sid) is not None
+    assert CACHE_REQUESTS.value(cache="session", result="hit") == session_hit + 1
+    SessionCache.invalidate(provider)
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from core.models import AppSettings
+from providers.search_provider import WebSearchProvider
+from services import news_corpus
+from services.news_corpus import NewsCorpus, get_corpus, match_expression
+
+ARTICLES = [
+    {
+        "title": "製造業の最新のニュース：在庫管理のDXが加速",
+        "url": "https://www.nikkei.com/article/1",
+        "description": "<p>中堅メーカーで在庫管理システムの刷新が相次ぐ。</p>",
+        "publishedAt": "2026-10-01T09:00:00Z",
+    },
+    {
+        "title": "小売のＥＣ化が進展",
+        "url": "https://www.itmedia.co.jp/news/2",
+        "description": "店舗とＥＣの在庫を一元管理する動き。",
+        "publishedAt": "2026-09-20T09:00:00Z",
+    },
+    {
+        "title": "金融業界の決算まとめ",
+        "url": "https://news.example.jp/3",
+        "description": "大手各行の純利益が増加した。",
+        "publishedAt": "2026-08-01T09:00:00Z",
+    },
+]
+
+RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>feed</title>
+<item>
+  <title>物流業界で自動倉庫の導入が拡大</title>
+  <link>https://www.bloomberg.co.jp/news/4</link>
+  <description>人手不足を背景に在庫管理の自動化が進む。</description>
+  <pubDate>Mon, 05 Oct 2026 18:00:00 +0900</pubDate>
+</item>
+</channel></rss>
+"""
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    dump = tmp_path / "news.jsonl"
+    dump.write_text("\n".join(json.dumps(a, ensure_ascii=False) for a in ARTICLES) + "\n", encoding="utf-8")
+    feed = tmp_path / "feed.xml"
+    feed.write_text(RSS, encoding="utf-8")
+    corpus = NewsCorpus(tmp_path / "news_corpus.db")
+    assert corpus.ingest(dump) == 3
+    assert corpus.ingest(feed) == 1
+    yield corpus
+    corpus.close()
+
+
+def test_match_expression_splits_japanese_terms_into_trigrams():
+    assert match_expression("最新ニュース AI") == '"最新ニ" OR "新ニュ" OR "ニュー" OR "ュース"'
+    assert match_expression("製造業 inventory") == '"製造業" OR "inventory"'
+    assert match_expression("IT DX") is None
+
+
+def test_search_returns_provider_result_shape(corpus):
+    results = corpus.search("製造業 最新ニュース", 3)
+    assert results[0] == {
+        "title": "製造業の最新のニュース：在庫管理のDXが加速",
+        "url": "https://www.nikkei.com/article/1",
+        "snippet": "中堅メーカーで在庫管理システムの刷新が相次ぐ。",
+        "source": "local",
+        "published_at": "2026-10-01T09:00:00Z",
+    }
+
+
+def test_search_matches_full_width_text_and_rss_dates(corpus):
+    assert [r["url"] for r in corpus.search("EC化", 3)] == ["https://www.itmedia.co.jp/news/2"]
+    (rss,) = [r for r in corpus.search("在庫管理", 10) if r["url"].endswith("/4")]
+    assert rss["published_at"] == "2026-10-05T09:00:00Z"
+    assert corpus.search("半導体", 3) == []
+
+
+def test_ingest_overwrites_same_url(corpus, tmp_path):
+    dump = tmp_path / "update.jsonl"
+    updated = dict(ARTICLES[2], title="金融業界の決算速報")
+    dump.write_text(json.dumps(updated, ensure_ascii=False) + "\n", encoding="utf-8")
+    corpus.ingest(dump)
+    assert len(corpus) == 4
+    assert corpus.search("決算まとめ", 3) == []
+    assert corpus.search("決算速報", 3)[0]["url"] == "https://news.example.jp/3"
+
+
+def test_get_corpus_requires_existing_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEWS_CORPUS_PATH", str(tmp_path / "missing.db"))
+    assert get_corpus() is None
+    assert WebSearchProvider()._search_local("製造業", 3) == []
+
+
+def _manager(mocker, **settings):
+    manager = mocker.Mock()
+    manager.load_settings.return_value = AppSettings(**settings)
+    return manager
+
+
+def test_local_provider_searches_corpus(corpus, monkeypatch, mocker):
+    monkeypatch.setenv("NEWS_CORPUS_PATH", str(corpus.path))
+    provider = WebSearchProvider(_manager(mocker, search_provider="local"))
+    results = provider.search("在庫管理", num=2)
+    assert len(results) == 2
+    assert {r["source"] for r in results} == {"local"}
+    assert all("score" in r for r in results)
+
+
+def test_local_first_skips_external_search(corpus, monkeypatch, mocker):
+    monkeypatch.setenv("NEWS_CORPUS_PATH", str(corpus.path))
+    provider = WebSearchProvider(_manager(mocker, search_provider="hybrid", search_local_first=True))
+    cse = mocker.patch.object(provider, "_search_cse", return_value=[])
+    newsapi = mocker.patch.object(provider, "_search_newsapi", return_value=[])
+
+    assert {r["source"] for r in provider.search("在庫管理", num=2)} == {"local"}
+    cse.assert_not_called()
+
+    # コーパスだけでは件数が揃わない場合は外部検索に進む
+    provider.search("決算まとめ", num=2)
+    cse.assert_called_once()
+    newsapi.assert_called_once()
+
+
+def test_offline_fallback_prefers_corpus(corpus, monkeypatch):
+    monkeypatch.setenv("NEWS_CORPUS_PATH", str(corpus.path))
+    results = WebSearchProvider()._load_cached_results("製造業 在庫管理", 3)
+    assert results and {r["source"] for r in results} == {"local"}
+
+
+def test_main_ingests_dumps(tmp_path, capsys):
+    dump = tmp_path / "news.jsonl"
+    dump.write_text(json.dumps(ARTICLES[0], ensure_ascii=False) + "\n", encoding="utf-8")
+    assert news_corpus.main([str(dump), "--db", str(tmp_path / "cli.db")]) == 0
+    assert json.loads(capsys.readouterr().out)["total"] == 1
@@ -60,6 +60,20 @@ def test_step_titles_and_progress(monkeypatch):
     assert any("制約" in m for m in markdown_calls)
 
 
+def test_step_submit_syncs_widget_values(monkeypatch):
+    st.session_state.clear()
+    st.session_state.pre_form_step = 1
+    st.session_state.industry_input = "製造業"
+    st.session_state.product_input = "SaaS"
+    monkeypatch.setattr(st, "rerun", lambda: None)
+    monkeypatch.setattr(st, "form_submit_button", lambda label, **kwargs: True)
+
+    render_form()
+    assert st.session_state.pre_form_step == 2
+    assert st.session_state.pre_advice_form_data["industry"] == "製造業"
+    assert st.session_state.pre_advice_form_data["product"] == "SaaS"
+
+
 def test_final_submission(monkeypatch):
     st.session_state.clear()
     st.session_state.pre_form_step = 3
@@ -2,7 +2,7 @@ import pytest
 import os
 from unittest.mock import Mock, patch, mock_open
 from core.models import SalesType, SalesInput
-from services.pre_advisor import PreAdvisorService
+from services.pre_advisor import PreAdvisorService, replace_section
 from services.error_handler import ConfigurationError, ServiceError
 
 class TestPreAdvisorService:
@@ -305,3 +305,96 @@ output_format: "出力形式"
                             result = service.generate_advice(sales_input)
                             assert result == stub_data
                             mock_logger.warning.assert_any_call("オフラインモード: LLM接続に失敗しました。スタブデータを使用します。")
+
+
+def _combined_service(llm_response):
+    with patch("services.pre_advisor.Logger"), patch("services.pre_advisor.OpenAIProvider") as provider_class:
+        provider_class.return_value.call_llm.return_value = llm_response
+        service = PreAdvisorService()
+    return service
+
+
+def _sales_input():
+    return SalesInput(
+        sales_type=SalesType.RELATION, industry="IT", product="SaaS", stage="初回", purpose="関係構築"
+    )
+
+
+def test_generate_advice_with_icebreakers_makes_one_call():
+    advice = {"short_term": {"summary": "要約"}, "mid_term": {"plan_weeks_4_12": []}}
+    service = _combined_service({**advice, "icebreakers": ["一言目", "二言目", "三言目"]})
+    evidence = Mock()
+    evidence.news.return_value = [
+        {"title": "クラウド移行が進展", "url": "https://example.com/1", "snippet": "{大手} 各社が移行"},
+        {"title": "AI投資が拡大", "url": "https://example.com/2", "snippet": "生成AIの導入"},
+        {"title": "3件目", "url": "https://example.com/3", "snippet": "使わない"},
+    ]
+    evidence.is_offline.return_value = False
+
+    result, icebreakers = service.generate_advice_with_icebreakers(_sales_input(), company_hint="最近M&Aあり", evidence=evidence)
+
+    assert result == advice
+    assert icebreakers == ["一言目", "二言目", "三言目"]
+    service.llm_provider.call_llm.assert_called_once()
+    kwargs = service.llm_provider.call_llm.call_args.kwargs
+    assert kwargs["json_schema"]["required"] == ["short_term", "mid_term", "icebreakers"]
+    prompt = kwargs["prompt"]
+    assert "共感・近況・柔らかめ" in prompt
+    assert "最近M&Aあり" in prompt
+    assert "- AI投資が拡大: 生成AIの導入" in prompt
+    assert "{大手}" in prompt
+    assert "3件目" not in prompt
+
+
+def test_generate_advice_with_icebreakers_falls_back_without_icebreakers():
+    service = _combined_service({"short_term": {}, "mid_term": {}})
+    evidence = Mock()
+    evidence.news.return_value = []
+    evidence.is_offline.return_value = False
+
+    _, icebreakers = service.generate_advice_with_icebreakers(_sales_input(), search_enabled=False, evidence=evidence)
+    assert icebreakers[0] == "お忙しい中、お時間をいただきありがとうございます。"
+    assert "業界ニュース:\nなし" in service.llm_provider.call_llm.call_args.kwargs["prompt"]
+
+
+def test_regenerate_section_requests_only_the_subtree():
+    advice = {
+        "short_term": {
+            "summary": "要約",
+            "objections": [{"type": "価格", "script": "古い回答"}],
+            "kpi": {"next_meeting_rate": "30%", "poc_rate": "10%"},
+        },
+        "mid_term": {"plan_weeks_4_12": ["計画"]},
+        "evidence_urls": ["https://example.com/1"],
+    }
+    new_objections = [{"type": "導入時期", "script": "段階導入を提案"}]
+    service = _combined_service({"section": new_objections})
+
+    result = service.regenerate_section(_sales_input(), advice, "short_term.objections", "導入時期の反論も")
+
+    assert result["short_term"]["objections"] == new_objections
+    assert result["short_term"]["summary"] == "要約"
+    assert result["evidence_urls"] == advice["evidence_urls"]
+    assert advice["short_term"]["objections"][0]["script"] == "古い回答"
+    kwargs = service.llm_provider.call_llm.call_args.kwargs
+    assert kwargs["mode"] == "speed"
+    assert kwargs["json_schema"]["properties"]["section"]["type"] == "array"
+    prompt = kwargs["prompt"]
+    # 残りの項目は簡潔な JSON の文脈として渡し、全体の出力形式は含めない
+    assert '"kpi":{"next_meeting_rate":"30%","poc_rate":"10%"}' in prompt
+    assert '現在の内容: [{"type":"価格","script":"古い回答"}]' in prompt
+    assert "導入時期の反論も" in prompt
+    assert "evidence_urls" not in prompt
+    assert "plan_weeks_4_12" in prompt and "電話での開幕スクリプト" not in prompt
+
+
+def test_regenerate_section_rejects_unknown_section_and_bad_response():
+    service = _combined_service({"short_term": {}})
+    with pytest.raises(ValueError):
+        service.regenerate_section(_sales_input(), {}, "short_term.unknown")
+    with pytest.raises(ServiceError):
+        service.regenerate_section(_sales_input(), {}, "short_term.summary")
+
+
+def test_replace_section_creates_missing_parents():
+    assert replace_section({}, "mid_term.plan_weeks_4_12", ["a"]) == {"mid_term": {"plan_weeks_4_12": ["a"]}}
@@ -0,0 +1,75 @@
+import pytest
+
+from providers.search_provider import WebSearchProvider
+from services import relevance
+from services.relevance import BM25, IdfTable, index_documents, relevance_scores, tokenize
+from services.search_enhancer import SearchEnhancerService
+
+
+@pytest.fixture(autouse=True)
+def fresh_idf_table():
+    relevance.IDF_TABLE.clear()
+    yield
+    relevance.IDF_TABLE.clear()
+
+
+def test_tokenize_cjk_ngrams_and_words():
+    assert tokenize("製造業 ＡＩ活用") == ("製造", "造業", "製造業", "ai", "活用")
+    assert tokenize("の") == ("の",)
+    assert tokenize(None) == ()
+
+
+def test_japanese_query_matches_unsegmented_titles():
+    docs = ["製造業の最新ニュースまとめ", "小売業界の動向", "製造業DXの導入事例", "最新の決算発表"]
+    scores = relevance_scores("製造業 最新ニュース", docs)
+    assert scores.index(max(scores)) == 0
+    assert scores[1] == 0.0
+    assert all(0.0 <= s <= 1.0 for s in scores)
+
+
+def test_idf_table_counts_each_key_once_and_caches():
+    table = IdfTable()
+    index_documents(["製造業の動向", "小売の動向"], keys=["a", "b"], table=table)
+    index_documents(["製造業の動向"], keys=["a"], table=table)
+    assert table.document_count == 2
+    rare, common = table.idf("製造"), table.idf("動向")
+    assert rare > common > 0
+    assert table.idf("製造") is rare
+
+    index_documents(["物流の動向"], keys=["c"], table=table)
+    assert table.idf("製造") > rare
+
+
+def test_idf_table_decays_when_full():
+    table = IdfTable(max_documents=4)
+    index_documents([f"製造業 {i}" for i in range(5)], table=table)
+    assert table.document_count == 2
+
+
+def test_bm25_without_query_terms_scores_zero():
+    scorer = BM25("!?", IdfTable())
+    assert scorer.normalized(tokenize("製造業"), 3.0) == 0.0
+
+
+def test_rank_results_orders_japanese_titles_by_relevance():
+    items = [
+        {"title": "小売業界の年末商戦の見通しについて", "url": "https://a.example/1", "snippet": "", "source": "cse"},
+        {"title": "製造業で進む在庫管理のDX最新事例", "url": "https://b.example/2", "snippet": "", "source": "cse"},
+        {"title": "金融機関のクラウド移行が加速する背景", "url": "https://c.example/3", "snippet": "", "source": "cse"},
+    ]
+    ranked = WebSearchProvider()._rank_results(items, "製造業 在庫管理", 3)
+    assert ranked[0]["url"] == "https://b.example/2"
+    assert ranked[0]["detailed_scoring"]["relevance"] > 0
+    assert ranked[1]["detailed_scoring"]["relevance"] == 0
+
+
+def test_fallback_quality_assessment_uses_bm25():
+    service = SearchEnhancerService(llm_provider=None)
+    results = [
+        {"title": "製造業の最新ニュース", "snippet": "在庫管理の見直し", "url": "https://a.example/1"},
+        {"title": "小売の動向", "snippet": "年末商戦", "url": "https://b.example/2"},
+    ]
+    output = service._fallback_quality_assessment("製造業 最新ニュース", results)
+    first, second = output["quality_scores"]
+    assert first["relevance_score"] > 0.5
+    assert second["relevance_score"] == 0.0
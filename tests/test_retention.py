@@ -0,0 +1,142 @@
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from providers.storage_local import LocalStorageProvider
+from services import retention
+from services.retention import LocalArchiveStore, SessionArchive, compact_sessions
+
+NOW = datetime(2025, 6, 1)
+
+
+def _save(provider: LocalStorageProvider, created_at: str, pinned: bool = False) -> str:
+    sid = provider.save_session({"type": "pre_advice", "input": {"industry": created_at}, "output": {}})
+    path = provider.sessions_dir / f"{sid}.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["created_at"] = created_at
+    data["pinned"] = pinned
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return sid
+
+
+@pytest.fixture
+def setup(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(retention, "zstandard", None)
+    archive = SessionArchive(LocalArchiveStore(tmp_path / "archive"))
+    provider = LocalStorageProvider(data_dir=str(tmp_path), archive=archive)
+    yield provider, archive
+    archive.close()
+
+
+def test_compaction_moves_old_sessions_and_load_falls_back(setup):
+    provider, archive = setup
+    old1 = _save(provider, "2023-01-05T10:00:00")
+    old2 = _save(provider, "2023-01-20T10:00:00")
+    old3 = _save(provider, "2023-03-01T10:00:00")
+    pinned = _save(provider, "2023-01-06T10:00:00", pinned=True)
+    recent = _save(provider, "2025-05-01T10:00:00")
+
+    moved = compact_sessions(provider, archive, older_than_days=365, now=NOW)
+    assert moved == {"2023-01": 2, "2023-03": 1}
+
+    listed = {s["session_id"] for s in provider.list_sessions()}
+    assert listed == {pinned, recent}
+    for sid, created in ((old1, "2023-01-05T10:00:00"), (old3, "2023-03-01T10:00:00")):
+        loaded = provider.load_session(sid)
+        assert loaded["session_id"] == sid
+        assert loaded["data"]["input"]["industry"] == created
+    assert provider.load_session(old2)["created_at"] == "2023-01-20T10:00:00"
+    with pytest.raises(FileNotFoundError):
+        provider.load_session("missing")
+
+
+def test_compaction_merges_into_existing_month(setup):
+    provider, archive = setup
+    first = _save(provider, "2023-01-05T10:00:00")
+    compact_sessions(provider, archive, older_than_days=365, now=NOW)
+    second = _save(provider, "2023-01-25T10:00:00")
+    assert compact_sessions(provider, archive, older_than_days=365, now=NOW) == {"2023-01": 1}
+
+    assert provider.load_session(first)["session_id"] == first
+    assert provider.load_session(second)["session_id"] == second
+    # gzip アーカイブは全体を展開すると JSONL として読める
+    with gzip.open(archive.store.local_path("2023-01.jsonl.gz"), "rt", encoding="utf-8") as f:
+        ids = [json.loads(line)["session_id"] for line in f]
+    assert ids == [first, second]
+
+
+def test_index_lookup_with_many_entries(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(retention, "zstandard", None)
+    archive = SessionArchive(LocalArchiveStore(tmp_path))
+    sessions = [{"session_id": f"s{i:04d}", "n": i} for i in range(500)]
+    assert archive.write_month("2022-12", sessions) == 500
+    # 索引は固定長エントリで、ID 順に並ぶ
+    index_size = (tmp_path / "2022-12.idx").stat().st_size
+    assert index_size == retention._HEADER.size + 500 * retention._ENTRY.size
+    for i in (0, 1, 250, 498, 499):
+        assert archive.load(f"s{i:04d}")["n"] == i
+    with pytest.raises(FileNotFoundError):
+        archive.load("s9999")
+    archive.close()
+
+
+def test_new_months_written_elsewhere_are_found(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(retention, "zstandard", None)
+    reader = SessionArchive(LocalArchiveStore(tmp_path))
+    writer = SessionArchive(LocalArchiveStore(tmp_path))
+    writer.write_month("2022-01", [{"session_id": "a"}])
+    assert reader.load("a") == {"session_id": "a"}
+    writer.write_month("2022-02", [{"session_id": "b"}])
+    assert reader.load("b") == {"session_id": "b"}
+    reader.close()
+    writer.close()
+
+
+def test_missing_id_does_not_reopen_unchanged_indexes(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(retention, "zstandard", None)
+    store = LocalArchiveStore(tmp_path)
+    SessionArchive(store).write_month("2022-01", [{"session_id": "a"}])
+    archive = SessionArchive(store)
+    opened = []
+    original = store.local_path
+    monkeypatch.setattr(store, "local_path", lambda name, version=None: opened.append(name) or original(name, version))
+    monkeypatch.setattr(store, "invalidate", lambda: pytest.fail("indexes should not be invalidated"))
+
+    assert archive.load("a") == {"session_id": "a"}
+    for _ in range(3):
+        with pytest.raises(FileNotFoundError):
+            archive.load("missing")
+    assert opened == ["2022-01.idx"]
+
+    # 他プロセスが月を追加・更新した場合は、変わった索引だけを開き直す
+    monkeypatch.undo()
+    monkeypatch.setattr(retention, "zstandard", None)
+    writer = SessionArchive(LocalArchiveStore(tmp_path))
+    writer.write_month("2022-02", [{"session_id": "b"}])
+    writer.write_month("2022-01", [{"session_id": "c"}])
+    assert archive.load("b") == {"session_id": "b"}
+    assert archive.load("c") == {"session_id": "c"}
+    archive.close()
+    writer.close()
+
+
+def test_compaction_keeps_sessions_updated_during_archiving(setup, monkeypatch):
+    provider, archive = setup
+    stale = _save(provider, "2023-01-05T10:00:00")
+    untouched = _save(provider, "2023-01-06T10:00:00")
+    write_month = archive.write_month
+
+    def write_then_update(month, sessions):
+        added = write_month(month, sessions)
+        # アーカイブ中に別のワーカーがセッションを更新した
+        provider.update_tags(stale, ["重要"])
+        return added
+
+    monkeypatch.setattr(archive, "write_month", write_then_update)
+    assert compact_sessions(provider, archive, older_than_days=365, now=NOW) == {"2023-01": 1}
+    assert {s["session_id"] for s in provider.list_sessions()} == {stale}
+    assert provider.load_session(stale)["tags"] == ["重要"]
+    assert provider.load_session(untouched)["session_id"] == untouched
@@ -45,3 +45,18 @@ def test_assess_quality_sanitizes_result_fields():
     assert "{{bad}}" in llm.last_prompt
     assert "{{braces}}" in llm.last_prompt
     assert "braces" in llm.last_prompt
+
+
+def test_fallback_assessment_shares_idf_keys_with_ranking(monkeypatch):
+    from services import relevance
+
+    table = relevance.IdfTable()
+    monkeypatch.setattr(relevance, "IDF_TABLE", table)
+    url = "https://www.Nikkei.com/article/1"
+    # 検索時のランキングで同じ記事が正規化した URL をキーに登録済み
+    relevance.index_documents(["製造業 ニュース"], ["www.nikkei.com/article/1"])
+
+    service = SearchEnhancerService(llm_provider=DummyLLM())
+    output = service._fallback_quality_assessment("製造業", [{"title": "製造業", "snippet": "ニュース", "url": url}])
+    assert output["quality_scores"][0]["url"] == url
+    assert table.document_count == 1
@@ -4,6 +4,8 @@ from urllib.parse import urlparse
 
 import pytest
 
+from core.models import AppSettings, SearchRankingWeights
+from providers import search_provider as search_provider_module
 from providers.search_provider import WebSearchProvider
 
 
@@ -105,3 +107,99 @@ def test_newsapi_with_fallback_uses_stub(mocker):
     mocker.patch.object(provider, "_rank_results", side_effect=lambda items, q, n: items[:n])
     results = provider._search_newsapi_with_fallback("q", 1)
     assert results[0]["source"] == "stub"
+
+
+def _candidates(count: int):
+    hosts = ["www.nikkei.com", "www.bloomberg.co.jp", "techcrunch.com", "example.com", "news.example.jp"]
+    items = []
+    for i in range(count):
+        item = _make_item(f"https://{hosts[i % len(hosts)]}/{i}", days_old=(i * 7) % 200)
+        item["title"] = f"AI 投資の最新動向 {i} " + ("<b>速報</b>" if i % 4 == 0 else "DX")
+        item["snippet"] = "在庫管理と AI の導入事例。" * (i % 6)
+        item["source"] = ["newsapi", "cse", "stub"][i % 3]
+        items.append(item)
+    return items
+
+
+@pytest.mark.skipif(search_provider_module.np is None, reason="NumPy がない環境")
+def test_rank_results_numpy_path_matches_python(monkeypatch):
+    items = _candidates(200)
+    vectorised = WebSearchProvider()._rank_results([dict(it) for it in items], "AI 在庫管理", 10)
+    monkeypatch.setattr(search_provider_module, "NUMPY_RANK_THRESHOLD", 10**9)
+    scalar = WebSearchProvider()._rank_results([dict(it) for it in items], "AI 在庫管理", 10)
+    assert vectorised == scalar
+    assert all(type(r["detailed_scoring"]["relevance"]) is float for r in vectorised)
+
+
+def test_rank_results_fills_with_duplicate_domains_in_score_order():
+    items = [_make_item(f"https://www.nikkei.com/{i}", i) for i in range(4)]
+    ranked = WebSearchProvider()._rank_results(items, "AI", 3)
+    assert [r["url"] for r in ranked] == [
+        "https://www.nikkei.com/0",
+        "https://www.nikkei.com/1",
+        "https://www.nikkei.com/2",
+    ]
+    assert [("diversity_bonus" in r["reasons"]) for r in ranked] == [True, False, False]
+
+
+def test_ranking_weights_come_from_settings(mocker):
+    settings = AppSettings(search_trusted_domains=["www.nikkei.com"])
+    manager = mocker.Mock()
+    manager.load_settings.return_value = settings
+    item = _make_item("https://www.nikkei.com/a", 0)
+
+    default = WebSearchProvider(manager)._rank_results([dict(item)], "AI", 1)[0]
+    assert default["score"] == WebSearchProvider()._rank_results([dict(item)], "AI", 1)[0]["score"]
+
+    settings.search_ranking_weights = SearchRankingWeights(high_trust=0.0, freshness=0.0)
+    reweighted = WebSearchProvider(manager)._rank_results([dict(item)], "AI", 1)[0]
+    assert reweighted["score"] == pytest.approx(default["score"] - 1.0 - 1.2)
+
+
+def test_search_loads_settings_once(mocker):
+    manager = mocker.Mock()
+    manager.load_settings.return_value = AppSettings(search_provider="cse")
+    provider = WebSearchProvider(manager)
+    mocker.patch.object(provider, "_search_cse", return_value=[])
+    mocker.patch.object(provider, "_search_newsapi", return_value=[])
+    random.seed(0)
+    results = provider.search("IT", num=2)
+    assert len(results) == 2
+    assert manager.load_settings.call_count == 1
+
+
+def _story(url: str, title: str, snippet: str, source: str):
+    return {"title": title, "url": url, "snippet": snippet, "source": source, "published_at": None}
+
+
+def test_merge_dedupe_collapses_syndicated_copies():
+    provider = WebSearchProvider()
+    body = "トヨタ自動車は19日、米国に新たな工場を建設すると発表した。投資額は1兆円規模。"
+    cse = [
+        _story("https://www.itmedia.co.jp/b", "生成AIの導入が中小企業で加速", "業務効率化の事例が増えている。", "cse"),
+        _story("https://blog.example.com/c", "トヨタ、米国に新工場 | 地方紙", body, "cse"),
+    ]
+    newsapi = [
+        _story("https://www.nikkei.com/d", "トヨタ、米国に新工場 - 日本経済新聞", body, "newsapi"),
+        _story("https://www.nikkei.com/a", "半導体の設備投資が過去最高に", "国内メーカー各社が増産に動く。", "newsapi"),
+        _story("https://news.example.jp/e", "トヨタ、米国に新工場（共同通信）", body, "newsapi"),
+    ]
+    merged = provider._merge_dedupe(cse, newsapi, limit=3)
+
+    # 転載は件数に数えず、プロバイダ内の順位が高い NewsAPI 1 位の記事を残す
+    assert [m["url"] for m in merged] == [
+        "https://www.itmedia.co.jp/b",
+        "https://www.nikkei.com/d",
+        "https://www.nikkei.com/a",
+    ]
+    assert merged[1]["duplicates"] == ["https://blog.example.com/c", "https://news.example.jp/e"]
+    assert "duplicates" not in merged[0] and "duplicates" not in merged[2]
+
+
+def test_merge_dedupe_keeps_distinct_stories_with_similar_titles():
+    provider = WebSearchProvider()
+    random.seed(0)
+    stub = provider._get_stub_results("IT", 3)
+    merged = provider._merge_dedupe(stub, [], limit=5)
+    assert len(merged) == 3
+    assert all("duplicates" not in m for m in merged)
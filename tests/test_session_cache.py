@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+
+from providers.storage_local import LocalStorageProvider
+from services.session_cache import SessionCache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    SessionCache.invalidate()
+    yield
+    SessionCache.invalidate()
+
+
+def test_cache_applies_incremental_changes(tmp_path: Path, monkeypatch):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    first = provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+    assert [s["session_id"] for s in SessionCache.get_sessions(provider)] == [first]
+
+    # 2回目以降は全件取得しない
+    def fail():
+        raise AssertionError("list_sessions should not be called")
+
+    monkeypatch.setattr(provider, "list_sessions", fail)
+    second = provider.save_session({"type": "icebreaker", "input": {}, "output": {}})
+    provider.set_pinned(first, True)
+    sessions = SessionCache.get_sessions(provider)
+    assert [s["session_id"] for s in sessions] == [first, second]
+
+    provider.delete_session(second)
+    assert [s["session_id"] for s in SessionCache.get_sessions(provider)] == [first]
+
+
+def test_cache_is_shared_by_cache_key(tmp_path: Path):
+    a = LocalStorageProvider(data_dir=str(tmp_path / "a"))
+    b = LocalStorageProvider(data_dir=str(tmp_path / "b"))
+    sid = a.save_session({"type": "pre_advice", "input": {}, "output": {}})
+    assert len(SessionCache.get_sessions(a)) == 1
+    assert SessionCache.get_sessions(b) == []
+    # 別インスタンスでも同じデータディレクトリならキャッシュを共有する
+    again = LocalStorageProvider(data_dir=str(tmp_path / "a"))
+    assert [s["session_id"] for s in SessionCache.get_sessions(again)] == [sid]
+
+
+def test_cache_falls_back_to_list_sessions():
+    class Plain:
+        def list_sessions(self):
+            return [{"session_id": "x"}]
+
+    assert SessionCache.get_sessions(Plain()) == [{"session_id": "x"}]
+
+
+def test_cache_returns_summaries(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    sid = provider.save_session({"type": "pre_advice", "input": {"industry": "IT"}, "output": {}})
+    summaries = SessionCache.get_summaries(provider)
+    assert [s.session_id for s in summaries] == [sid]
+    assert summaries[0].preview == "IT"
+    assert SessionCache.get_session(provider, sid)["data"]["input"] == {"industry": "IT"}
+    provider.update_tags(sid, ["x"])
+    assert SessionCache.get_summaries(provider)[0].tags == ("x",)
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from services.simhash import (
+    SimHashIndex,
+    fingerprint,
+    fingerprint_tokens,
+    hamming_distance,
+    story_fingerprint,
+)
+
+
+def _reference_simhash(tokens):
+    import hashlib
+
+    counts = [0] * 64
+    for token in tokens:
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        for i in range(64):
+            counts[i] += 1 if h >> i & 1 else -1
+    return sum(1 << i for i in range(64) if counts[i] > 0)
+
+
+def test_fingerprint_matches_bitwise_definition():
+    tokens = ["製造", "造業", "製造業", "dx", "dx", "推進"]
+    assert fingerprint_tokens(tokens) == _reference_simhash(tokens)
+    assert fingerprint_tokens([]) == 0
+
+
+def test_syndicated_copies_are_close_and_other_stories_far():
+    original = story_fingerprint("トヨタ、米国に新工場 2026年稼働へ（共同通信）", "トヨタ自動車は19日、米国に新たな工場を建設すると発表した。")
+    copy = story_fingerprint("トヨタ、米国に新工場　２０２６年稼働へ - 日本経済新聞", "トヨタ自動車は19日、米国に新たな工場を建設すると発表した")
+    other = story_fingerprint("IT業界の最新動向2", "クラウド移行が業界全体で進展")
+    assert hamming_distance(original, copy) <= 10
+    assert hamming_distance(original, other) > 10
+    assert story_fingerprint("", None) is None
+
+
+def test_index_finds_within_distance_only():
+    rng = random.Random(41)
+    index: SimHashIndex[str] = SimHashIndex(max_distance=3)
+    base = rng.getrandbits(64)
+    index.add(base, "base")
+    for _ in range(200):
+        flipped = base
+        for bit in rng.sample(range(64), 3):
+            flipped ^= 1 << bit
+        assert index.find(flipped) == "base"
+    far = base ^ 0b1111
+    assert index.find(far) is None
+    index.remove(base, "base")
+    assert index.find(base) is None
+
+
+def test_index_rejects_invalid_distance():
+    with pytest.raises(ValueError):
+        SimHashIndex(max_distance=64)
+
+
+def test_fingerprint_is_cached():
+    assert fingerprint("同じ見出し") == fingerprint("同じ見出し")
+    assert fingerprint.cache_info().hits >= 1
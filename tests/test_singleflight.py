@@ -0,0 +1,177 @@
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from providers import search_provider
+from providers.llm_openai import LLM_FLIGHTS, OpenAIProvider
+from providers.search_provider import SEARCH_FLIGHTS, WebSearchProvider
+from services.error_handler import LLMError
+from services.singleflight import SINGLEFLIGHT_CALLS, SingleFlight
+
+
+def _run_concurrently(fn, count):
+    results, errors = [None] * count, [None] * count
+
+    def worker(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def _wait_for_waiters(flight, key, count):
+    for _ in range(1000):
+        with flight._lock:
+            call = flight._calls.get(key)
+            if call is not None and call.waiters == count:
+                return
+        threading.Event().wait(0.001)
+    raise AssertionError("waiters did not join")
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test-share")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"items": [1, 2]}
+
+    before = SINGLEFLIGHT_CALLS.value(group="test-share", result="coalesced")
+    threads, results, errors = _run_concurrently(lambda: flight.do("k", work, timeout=5), 4)
+    _wait_for_waiters(flight, "k", 3)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert errors == [None] * 4
+    assert all(r == {"items": [1, 2]} for r in results)
+    # 待ち側には複製を返す
+    assert len({id(r) for r in results}) == 4
+    assert SINGLEFLIGHT_CALLS.value(group="test-share", result="coalesced") == before + 3
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_to_all_waiters():
+    flight = SingleFlight("test-error")
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("boom")
+
+    threads, _, errors = _run_concurrently(lambda: flight.do("k", work, timeout=5), 3)
+    _wait_for_waiters(flight, "k", 2)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert [type(e) for e in errors] == [ValueError] * 3
+    # 完了後の呼び出しは改めて実行される
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_waiter_times_out_while_leader_continues():
+    flight = SingleFlight("test-timeout")
+    release = threading.Event()
+    before = SINGLEFLIGHT_CALLS.value(group="test-timeout", result="timeout")
+    leader = threading.Thread(target=lambda: flight.do("k", lambda: release.wait(5) and "done"))
+    leader.start()
+    while flight.in_flight() == 0:
+        threading.Event().wait(0.001)
+
+    with pytest.raises(TimeoutError):
+        flight.do("k", lambda: "unused", timeout=0.01)
+    assert flight.in_flight() == 1
+    release.set()
+    leader.join()
+    assert SINGLEFLIGHT_CALLS.value(group="test-timeout", result="timeout") == before + 1
+
+
+def test_call_llm_coalesces_identical_prompts():
+    with patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"}):
+        with patch("providers.llm_openai.OpenAI") as mock_openai:
+            release = threading.Event()
+            message = Mock(content="共有された応答", refusal=None)
+            response = Mock(choices=[Mock(message=message, finish_reason="stop")])
+            client = mock_openai.return_value
+            client.chat.completions.create.side_effect = lambda **_: release.wait(5) and response
+
+            provider = OpenAIProvider()
+            threads, results, errors = _run_concurrently(lambda: provider.call_llm("同じプロンプト", "speed"), 3)
+            key = provider._flight_key("同じプロンプト", "speed", None)
+            _wait_for_waiters(LLM_FLIGHTS, key, 2)
+            release.set()
+            for t in threads:
+                t.join()
+
+            assert errors == [None] * 3
+            assert results == [{"content": "共有された応答"}] * 3
+            client.chat.completions.create.assert_called_once()
+            assert provider._flight_key("別のプロンプト", "speed", None) != key
+            assert provider._flight_key("同じプロンプト", "deep", None) != key
+
+
+def test_call_llm_waiter_timeout_is_llm_error(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("SINGLEFLIGHT_TIMEOUT", "0.01")
+    with patch("providers.llm_openai.OpenAI"):
+        provider = OpenAIProvider()
+    key = provider._flight_key("遅いプロンプト", "speed", None)
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: LLM_FLIGHTS.do(key, lambda: release.wait(5)))
+    leader.start()
+    while LLM_FLIGHTS.in_flight() == 0:
+        threading.Event().wait(0.001)
+    try:
+        with pytest.raises(LLMError) as exc:
+            provider.call_llm("遅いプロンプト", "speed")
+        assert exc.value.error_code == "timeout"
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_search_coalesces_and_shares_offline_mode(mocker, monkeypatch):
+    monkeypatch.setenv("SEARCH_PROVIDER", "cse")
+    release = threading.Event()
+    providers = [WebSearchProvider() for _ in range(3)]
+    leader_calls = []
+
+    def slow_cse(self, query, num):
+        leader_calls.append(query)
+        release.wait(5)
+        search_provider._call_offline.set(True)
+        return [{"title": "t", "url": "https://www.nikkei.com/a", "snippet": "s", "source": "cse", "published_at": None}]
+
+    mocker.patch.object(WebSearchProvider, "_search_cse", slow_cse)
+    iterator = iter(providers)
+    lock = threading.Lock()
+
+    def search():
+        with lock:
+            provider = next(iterator)
+        return provider.search("IT 最新ニュース", 1)
+
+    threads, results, errors = _run_concurrently(search, 3)
+    while not SEARCH_FLIGHTS._calls:
+        threading.Event().wait(0.001)
+    (key,) = list(SEARCH_FLIGHTS._calls)
+    _wait_for_waiters(SEARCH_FLIGHTS, key, 2)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert errors == [None] * 3
+    assert leader_calls == ["IT 最新ニュース"]
+    assert [r[0]["url"] for r in results] == ["https://www.nikkei.com/a"] * 3
+    assert all(p.offline_mode for p in providers)
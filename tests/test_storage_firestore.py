@@ -0,0 +1,370 @@
+import copy
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import pytest
+
+from providers import storage_firestore
+from providers.storage_firestore import FirestoreStorageProvider
+from services.session_cache import SessionCache
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocRef:
+    def __init__(self, store: Dict[str, Any], path: str, parent=None):
+        self.store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+        self.parent = parent
+
+    def collection(self, name: str):
+        return FakeCollection(self.store, f"{self.path}/{name}", parent=self)
+
+    def set(self, data):
+        self.store[self.path] = copy.deepcopy(data)
+
+    def update(self, data):
+        self.store[self.path].update(copy.deepcopy(data))
+
+    def delete(self):
+        self.store.pop(self.path, None)
+
+    def get(self):
+        return FakeSnapshot(self, self.store.get(self.path))
+
+
+def _project(data: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for f in fields:
+        head, _, rest = f.partition(".")
+        if head not in data:
+            continue
+        if rest:
+            if isinstance(data[head], dict) and rest in data[head]:
+                out.setdefault(head, {})[rest] = data[head][rest]
+        else:
+            out[head] = data[head]
+    return out
+
+
+class FakeQuery:
+    def __init__(self, collection, fields=None, orders=None, cursor=None, limit_n=None, filters=None):
+        self.collection = collection
+        self.fields = fields
+        self.orders = orders or []
+        self.cursor = cursor
+        self.limit_n = limit_n
+        self.filters = filters or []
+
+    def _copy(self, **kw):
+        params = dict(
+            fields=self.fields,
+            orders=list(self.orders),
+            cursor=self.cursor,
+            limit_n=self.limit_n,
+            filters=list(self.filters),
+        )
+        params.update(kw)
+        return FakeQuery(self.collection, **params)
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self.orders + [(field, direction)])
+
+    def start_after(self, values):
+        return self._copy(cursor=values)
+
+    def limit(self, n):
+        return self._copy(limit_n=n)
+
+    def where(self, filter):
+        assert filter.op_string in (">", "<")
+        return self._copy(filters=self.filters + [(filter.field_path, filter.op_string, filter.value)])
+
+    def stream(self):
+        docs = self.collection._docs()
+        for field, op, value in self.filters:
+            if op == ">":
+                docs = [d for d in docs if d[1].get(field, "") > value]
+            else:
+                docs = [d for d in docs if d[1].get(field, "") < value]
+        for field, direction in reversed(self.orders):
+            docs.sort(key=lambda d: d[1].get(field), reverse=direction == "DESCENDING")
+        if self.cursor is not None:
+            key_fields = [f for f, _ in self.orders]
+            cursor_key = [self.cursor[f] for f in key_fields]
+            for idx, (_, data) in enumerate(docs):
+                if [data.get(f) for f in key_fields] == cursor_key:
+                    docs = docs[idx + 1:]
+                    break
+        if self.limit_n is not None:
+            docs = docs[: self.limit_n]
+        for ref, data in docs:
+            yield FakeSnapshot(ref, data if self.fields is None else _project(data, self.fields))
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store, path, parent=None):
+        self.store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+        self.parent = parent
+        super().__init__(self)
+
+    def document(self, doc_id):
+        return FakeDocRef(self.store, f"{self.path}/{doc_id}", parent=self)
+
+    def _docs(self):
+        prefix = self.path + "/"
+        out = []
+        for key, data in self.store.items():
+            if not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if "/" in rest:
+                continue
+            out.append((self.document(rest), copy.deepcopy(data)))
+        return out
+
+
+class FakeBatch:
+    commits = 0
+
+    def __init__(self):
+        self.ops = []
+
+    def set(self, ref, data):
+        self.ops.append(lambda: ref.set(data))
+
+    def delete(self, ref):
+        self.ops.append(ref.delete)
+
+    def update(self, ref, data):
+        self.ops.append(lambda: ref.update(data))
+
+    def commit(self):
+        FakeBatch.commits += 1
+        for op in self.ops:
+            op()
+
+
+class FakeClient:
+    def __init__(self):
+        self.store: Dict[str, Any] = {}
+        self.get_all_calls = 0
+
+    def collection(self, name):
+        return FakeCollection(self.store, name)
+
+    def batch(self):
+        return FakeBatch()
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        for ref in refs:
+            yield ref.get()
+
+
+@pytest.fixture
+def provider():
+    p = FirestoreStorageProvider.__new__(FirestoreStorageProvider)
+    p.client = FakeClient()
+    p.tenant_id = "tenant"
+    p.archive = None
+    return p
+
+
+def _payload(industry: str = "IT") -> Dict[str, Any]:
+    return {
+        "type": "pre_advice",
+        "input": {"industry": industry, "purpose": "新規開拓"},
+        "output": {"advice": {"evidence_urls": ["https://www.nikkei.com/a"], "big": "x" * 1000}},
+    }
+
+
+def test_save_splits_summary_and_body(provider):
+    sid = provider.save_session(_payload(), user_id="u1", team_id="t1")
+    store = provider.client.store
+    summary = store[f"tenants/tenant/sessions/{sid}"]
+    body = store[f"tenants/tenant/sessions/{sid}/body/content"]
+    assert "output" not in summary["data"]
+    assert summary["data"] == {"type": "pre_advice"}
+    assert summary["preview"] == "IT 新規開拓"
+    assert summary["evidence_domains"] == ["www.nikkei.com"]
+    assert body["data"] == _payload()
+
+
+def test_save_sessions_commits_in_batches(provider, monkeypatch):
+    monkeypatch.setattr(storage_firestore, "BATCH_WRITE_SESSIONS", 2)
+    monkeypatch.setattr(FakeBatch, "commits", 0)
+    ids = provider.save_sessions([(_payload(f"I{i}"), f"s{i}") for i in range(3)] + [(_payload(), None)])
+    assert ids[:3] == ["s0", "s1", "s2"] and len(ids) == 4
+    assert FakeBatch.commits == 2
+    assert provider.load_session("s2")["data"] == _payload("I2")
+    assert provider.client.store["tenants/tenant/sessions/s0"]["preview"] == "I0 新規開拓"
+
+
+def test_list_sessions_uses_projection_and_pages(provider):
+    ids = [provider.save_session(_payload(f"I{i}")) for i in range(3)]
+    for i, sid in enumerate(ids):
+        provider.client.store[f"tenants/tenant/sessions/{sid}"]["created_at"] = f"2024-01-0{i + 1}T00:00:00"
+    provider.set_pinned(ids[0], True)
+
+    first = provider.list_sessions(limit=2)
+    assert [s["session_id"] for s in first] == [ids[0], ids[2]]
+    assert all("output" not in s["data"] for s in first)
+    assert all("has_body" not in s for s in first)
+
+    second = provider.list_sessions(limit=2, start_after=first[-1])
+    assert [s["session_id"] for s in second] == [ids[1]]
+
+
+def test_load_session_fetches_body(provider):
+    sid = provider.save_session(_payload(), user_id="u1")
+    loaded = provider.load_session(sid)
+    assert loaded["data"] == _payload()
+    assert loaded["user_id"] == "u1"
+    assert "preview" not in loaded
+
+
+def test_load_legacy_inline_document(provider):
+    legacy = {"session_id": "old", "created_at": "2023", "pinned": False, "tags": [], "data": _payload()}
+    provider.client.store["tenants/tenant/sessions/old"] = legacy
+    assert provider.load_session("old")["data"] == _payload()
+    listed = provider.list_sessions()
+    assert listed[0]["data"] == {"type": "pre_advice"}
+
+
+def test_update_session_data_replaces_body_and_summary(provider):
+    sid = provider.save_session(_payload())
+    provider.set_pinned(sid, True)
+    updated = _payload("製造業")
+    updated["output"]["advice"]["evidence_urls"] = ["https://example.com/x"]
+
+    assert provider.update_session_data(sid, updated) is True
+    summary = provider.client.store[f"tenants/tenant/sessions/{sid}"]
+    assert summary["preview"] == "製造業 新規開拓"
+    assert summary["evidence_domains"] == ["example.com"]
+    assert summary["pinned"] is True
+    assert provider.load_session(sid)["data"] == updated
+    assert provider.update_session_data("missing", updated) is False
+
+
+def test_delete_removes_body(provider):
+    sid = provider.save_session(_payload())
+    assert provider.delete_session(sid) is True
+    assert not any(k.startswith(f"tenants/tenant/sessions/{sid}") for k in provider.client.store)
+
+
+def test_export_json_includes_bodies(provider):
+    provider.save_session(_payload())
+    exported = json.loads(provider.export_sessions("json"))
+    assert exported[0]["data"]["output"]["advice"]["big"] == "x" * 1000
+
+
+def test_export_from_history_page_includes_bodies(provider):
+    SessionCache.invalidate(provider)
+    sid = provider.save_session(_payload())
+    legacy = {"session_id": "old", "created_at": "2023", "pinned": False, "tags": [], "data": _payload("旧")}
+    provider.client.store["tenants/tenant/sessions/old"] = legacy
+    # 履歴ページと同じく SessionCache のサマリー一覧を渡す
+    sessions = SessionCache.get_sessions(provider)
+    assert all("output" not in s["data"] for s in sessions)
+
+    exported = {s["session_id"]: s for s in json.loads(provider.export_sessions("json", sessions))}
+    assert exported[sid]["data"] == _payload()
+    assert exported["old"]["data"] == _payload("旧")
+    assert provider.client.get_all_calls == 1
+    SessionCache.invalidate(provider)
+
+
+def test_load_sessions_batches_bodies(provider, monkeypatch):
+    monkeypatch.setattr(storage_firestore, "GET_ALL_CHUNK", 2)
+    ids = [provider.save_session(_payload(f"I{i}")) for i in range(3)]
+    loaded = provider.load_sessions([ids[2], "missing", ids[0], ids[1]])
+    assert [s["session_id"] for s in loaded] == [ids[2], ids[0], ids[1]]
+    assert loaded[0]["data"] == _payload("I2")
+    assert provider.client.get_all_calls == 2
+
+
+def test_session_cache_fetches_missing_bodies_once(provider):
+    SessionCache.invalidate(provider)
+    ids = [provider.save_session(_payload(f"I{i}")) for i in range(2)]
+    SessionCache.get_sessions(provider)
+    bodies = SessionCache.get_bodies(provider, ids)
+    assert bodies[ids[1]] == _payload("I1")
+    assert SessionCache.get_bodies(provider, ids) == bodies
+    assert provider.client.get_all_calls == 1
+
+    provider.update_session_data(ids[0], _payload("更新"))
+    SessionCache.get_sessions(provider)
+    assert SessionCache.get_bodies(provider, ids)[ids[0]] == _payload("更新")
+    assert provider.client.get_all_calls == 2
+    SessionCache.invalidate(provider)
+
+
+def test_initial_snapshot_reads_pages(provider, monkeypatch):
+    monkeypatch.setattr(storage_firestore, "LIST_PAGE_SIZE", 2)
+    ids = [provider.save_session(_payload(f"I{i}")) for i in range(5)]
+    for i, sid in enumerate(ids):
+        provider.client.store[f"tenants/tenant/sessions/{sid}"]["created_at"] = f"2024-01-0{i + 1}T00:00:00"
+    calls = []
+    original = provider.list_sessions
+    monkeypatch.setattr(provider, "list_sessions", lambda **kw: calls.append(kw) or original(**kw))
+    changes, _ = provider.changes_since(None)
+    assert [c["session_id"] for c in changes[1:]] == ids[::-1]
+    assert [kw["limit"] for kw in calls] == [2, 2, 2]
+
+
+def test_changes_since_reports_updates_and_deletes(provider):
+    first = provider.save_session(_payload("A"))
+    changes, cursor = provider.changes_since(None)
+    assert changes[0]["op"] == "reset"
+    assert [c["session_id"] for c in changes[1:]] == [first]
+
+    store = provider.client.store
+    # カーソルより十分古い更新は返さない
+    store[f"tenants/tenant/sessions/{first}"]["updated_at"] = "2000-01-01T00:00:00+00:00"
+    assert provider.changes_since(cursor)[0] == []
+
+    second = provider.save_session(_payload("B"))
+    provider.delete_session(first)
+    changes, _ = provider.changes_since(cursor)
+    assert [(c["op"], c["session_id"]) for c in changes] == [("upsert", second), ("delete", first)]
+    assert "output" not in changes[0]["session"]["data"]
+
+
+def test_stale_cursor_gets_full_snapshot(provider):
+    sid = provider.save_session(_payload("A"))
+    stale = (datetime.now(timezone.utc) - timedelta(days=storage_firestore.TOMBSTONE_TTL_DAYS + 1)).isoformat()
+    changes, cursor = provider.changes_since(stale)
+    assert changes[0]["op"] == "reset"
+    assert [c["session_id"] for c in changes[1:]] == [sid]
+    assert cursor > stale
+
+
+def test_delete_prunes_expired_tombstones(provider):
+    store = provider.client.store
+    old = (datetime.now(timezone.utc) - timedelta(days=storage_firestore.TOMBSTONE_TTL_DAYS + 1)).isoformat()
+    store["tenants/tenant/deleted_sessions/old"] = {"session_id": "old", "updated_at": old}
+    sid = provider.save_session(_payload("A"))
+    assert provider.delete_session(sid)
+    assert "tenants/tenant/deleted_sessions/old" not in store
+    tomb = store[f"tenants/tenant/deleted_sessions/{sid}"]
+    assert tomb["expire_at"] > datetime.now(timezone.utc)
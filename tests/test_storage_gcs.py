@@ -0,0 +1,92 @@
+from typing import Any, Dict
+
+import pytest
+
+from providers.storage_gcs import GCSStorageProvider
+
+
+class FakeBlob:
+    def __init__(self, store: Dict[str, Any], name: str):
+        self.store = store
+        self.name = name
+        self.metadata = None
+
+    def upload_from_string(self, data, content_type=None):
+        self.store[self.name] = (data, dict(self.metadata or {}))
+
+    def download_as_text(self):
+        self.store.setdefault("_downloads", []).append(self.name)
+        return self.store[self.name][0]
+
+    def exists(self):
+        return self.name in self.store
+
+    def delete(self):
+        self.store.pop(self.name, None)
+
+
+class FakeBucket:
+    name = "bucket"
+
+    def __init__(self):
+        self.store: Dict[str, Any] = {}
+
+    def blob(self, name):
+        return FakeBlob(self.store, name)
+
+
+class FakeClient:
+    def __init__(self, bucket):
+        self._bucket = bucket
+
+    def list_blobs(self, bucket, prefix=""):
+        for name, value in list(bucket.store.items()):
+            if name.startswith(prefix):
+                blob = FakeBlob(bucket.store, name)
+                blob.metadata = value[1] or None
+                yield blob
+
+
+@pytest.fixture
+def provider():
+    p = GCSStorageProvider.__new__(GCSStorageProvider)
+    p.bucket = FakeBucket()
+    p.client = FakeClient(p.bucket)
+    p.prefix = "tenant/sessions/"
+    p.deleted_prefix = f"{p.prefix}_deleted/"
+    p.archive = None
+    return p
+
+
+def _payload(industry: str = "IT") -> Dict[str, Any]:
+    return {
+        "type": "pre_advice",
+        "input": {"industry": industry, "purpose": "新規開拓"},
+        "output": {"advice": {"evidence_urls": ["https://www.nikkei.com/a"], "big": "x" * 1000}},
+    }
+
+
+def test_list_summaries_reads_blob_metadata_only(provider):
+    first = provider.save_session(_payload("A"), user_id="u1")
+    second = provider.save_session(_payload("B"))
+    provider.set_pinned(first, True)
+    provider.update_tags(second, ["重要"])
+    provider.bucket.store.pop("_downloads", None)
+
+    summaries = provider.list_summaries()
+    assert [s.session_id for s in summaries] == [first, second]
+    assert summaries[0].pinned and summaries[0].user_id == "u1"
+    assert summaries[1].tags == ("重要",)
+    assert summaries[1].preview == "B 新規開拓"
+    assert summaries[1].evidence_hosts == ("www.nikkei.com",)
+    assert "_downloads" not in provider.bucket.store
+
+
+def test_list_summaries_reads_body_of_blobs_without_summary(provider):
+    sid = provider.save_session(_payload())
+    name = f"{provider.prefix}{sid}.json"
+    body, _ = provider.bucket.store[name]
+    provider.bucket.store[name] = (body, {})
+    (summary,) = provider.list_summaries()
+    assert summary.session_id == sid and summary.preview == "IT 新規開拓"
+    assert provider.bucket.store["_downloads"] == [name]
@@ -64,6 +64,22 @@ def test_update_tags_normalize(tmp_path: Path):
     assert loaded.get("tags") == ["顧客A", "優先"]
 
 
+def test_update_session_data_keeps_metadata(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    session_id = provider.save_session({"type": "pre_advice", "input": {}, "output": {"advice": {"a": 1}}})
+    provider.set_pinned(session_id, True)
+    provider.update_tags(session_id, ["顧客A"])
+    created_at = provider.load_session(session_id)["created_at"]
+
+    updated = {"type": "pre_advice", "input": {}, "output": {"advice": {"a": 2}}}
+    assert provider.update_session_data(session_id, updated) is True
+    data = provider.load_session(session_id)
+    assert data["data"] == updated
+    assert data["pinned"] is True and data["tags"] == ["顧客A"]
+    assert data["created_at"] == created_at
+    assert provider.update_session_data("missing", updated) is False
+
+
 def test_delete_session(tmp_path: Path):
     provider = LocalStorageProvider(data_dir=str(tmp_path))
     session_id = provider.save_session({"type": "post_review", "input": {}, "output": {}})
@@ -111,3 +127,91 @@ def test_save_data_invalid_filename(tmp_path: Path):
         provider.save_data("bad/name.json", {})
 
 
+
+
+def test_writes_are_atomic_and_leave_no_temp_files(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    session_id = provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+    assert provider.set_pinned(session_id, True) is True
+    assert provider.update_tags(session_id, ["a"]) is True
+
+    leftovers = [p.name for p in (tmp_path / "sessions").iterdir() if p.name.endswith(".tmp")]
+    assert leftovers == []
+    assert provider.load_session(session_id)["tags"] == ["a"]
+
+
+def test_list_sessions_retries_torn_read(tmp_path: Path, monkeypatch):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    session_id = provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+
+    real_load = json.load
+    calls = {"n": 0}
+
+    def flaky_load(f):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise json.JSONDecodeError("torn", "", 0)
+        return real_load(f)
+
+    monkeypatch.setattr("providers.storage_local.json.load", flaky_load)
+    monkeypatch.setattr("providers.storage_local.READ_RETRY_DELAY", 0)
+
+    sessions = provider.list_sessions()
+    assert [s["session_id"] for s in sessions] == [session_id]
+    assert calls["n"] == 2
+
+
+def test_concurrent_tag_updates_keep_file_valid(tmp_path: Path):
+    import threading
+
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    session_id = provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+
+    def worker(i: int):
+        for j in range(10):
+            other = LocalStorageProvider(data_dir=str(tmp_path))
+            assert other.update_tags(session_id, [f"w{i}-{j}"]) is True
+            provider.list_sessions()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    loaded = provider.load_session(session_id)
+    assert len(loaded["tags"]) == 1
+    assert loaded["tags"][0].startswith("w")
+
+
+def test_changes_since_returns_incremental_changes(tmp_path: Path):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    first = provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+
+    changes, cursor = provider.changes_since(None)
+    assert changes[0]["op"] == "reset"
+    assert [c["session_id"] for c in changes[1:]] == [first]
+
+    # 変更が無ければ空
+    assert provider.changes_since(cursor) == ([], cursor)
+
+    second = provider.save_session({"type": "icebreaker", "input": {}, "output": {}})
+    provider.set_pinned(second, True)
+    provider.delete_session(first)
+    changes, cursor = provider.changes_since(cursor)
+    ops = {c["session_id"]: c["op"] for c in changes}
+    assert ops == {second: "upsert", first: "delete"}
+    upsert = next(c for c in changes if c["op"] == "upsert")
+    assert upsert["session"]["pinned"] is True
+
+
+def test_changes_since_resets_after_journal_rotation(tmp_path: Path, monkeypatch):
+    provider = LocalStorageProvider(data_dir=str(tmp_path))
+    provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+    _, cursor = provider.changes_since(None)
+
+    monkeypatch.setattr("providers.storage_local.JOURNAL_MAX_BYTES", 1)
+    provider.save_session({"type": "pre_advice", "input": {}, "output": {}})
+    changes, _ = provider.changes_since(cursor)
+    assert changes[0]["op"] == "reset"
+    assert len(changes) == 3
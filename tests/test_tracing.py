@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from core.models import SalesInput, SalesType
+from providers.storage_local import LocalStorageProvider
+from services import tracing
+from services.pre_advisor import PreAdvisorService
+from services.usage_meter import UsageMeter
+from tools.fake_openai import FakeOpenAIServer, FakeServerConfig
+
+
+@pytest.fixture
+def exporter():
+    exp = tracing.InMemorySpanExporter()
+    tracing.configure(exp)
+    yield exp
+    tracing.reset()
+
+
+def test_nested_spans_share_trace_and_link_parent(exporter):
+    with tracing.span("outer", kind="test") as outer:
+        assert tracing.current_trace_id() == outer.trace_id
+        with tracing.span("inner") as inner:
+            inner.set_attribute("n", 1)
+    assert tracing.current_span() is None
+
+    inner_span, outer_span = exporter.spans
+    assert [inner_span.name, outer_span.name] == ["inner", "outer"]
+    assert inner_span.trace_id == outer_span.trace_id
+    assert inner_span.parent_id == outer_span.span_id
+    assert outer_span.parent_id is None
+    assert outer_span.attributes == {"kind": "test"}
+    assert outer_span.end_ns >= inner_span.end_ns >= inner_span.start_ns
+
+
+def test_exception_marks_span_as_error(exporter):
+    @tracing.traced("failing")
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        fail()
+    (s,) = exporter.spans
+    assert s.status == tracing.STATUS_ERROR
+    assert "boom" in s.status_message
+
+
+def test_jsonl_exporter_from_env(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("TRACE_EXPORTER", "jsonl")
+    monkeypatch.setenv("TRACE_FILE", str(path))
+    tracing.reset()
+    try:
+        with tracing.span("a"):
+            with tracing.span("b"):
+                pass
+    finally:
+        tracing.reset()
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["name"] for r in rows] == ["b", "a"]
+    assert rows[0]["parentSpanId"] == rows[1]["spanId"]
+    assert rows[0]["traceId"] == rows[1]["traceId"]
+    assert rows[1]["status"]["code"] == "OK"
+    assert rows[1]["endTimeUnixNano"] >= rows[1]["startTimeUnixNano"]
+
+
+def test_pre_advice_request_produces_span_tree(exporter, monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("SEARCH_PROVIDER", "stub")
+    UsageMeter.reset()
+    sales_input = SalesInput(
+        sales_type=SalesType.HUNTER,
+        industry="IT",
+        product="SaaS",
+        stage="初期接触",
+        purpose="新規顧客獲得",
+    )
+    with FakeOpenAIServer(FakeServerConfig(seed=1)) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        PreAdvisorService().generate_advice(sales_input)
+    UsageMeter.reset()
+
+    by_name = {s.name: s for s in exporter.spans}
+    root = by_name["pre_advice.generate"]
+    for name in ("prompt.build", "search", "search.stub", "search.rank", "llm.call", "llm.validate_schema"):
+        assert by_name[name].trace_id == root.trace_id, name
+    assert by_name["prompt.build"].parent_id == root.span_id
+    assert by_name["search.stub"].parent_id == by_name["search"].span_id
+    assert by_name["llm.validate_schema"].parent_id == by_name["llm.call"].span_id
+    llm = by_name["llm.call"].attributes
+    assert llm["gen_ai.request.model"] == "gpt-4o-mini"
+    assert llm["gen_ai.usage.total_tokens"] == llm["gen_ai.usage.input_tokens"] + llm["gen_ai.usage.output_tokens"]
+    assert by_name["llm.validate_schema"].attributes["schema.valid"] is True
+
+    exporter.clear()
+    LocalStorageProvider(data_dir=str(tmp_path)).save_session({"type": "pre_advice"})
+    (save,) = exporter.spans
+    assert save.name == "storage.save_session"
+    assert save.attributes["db.system"] == "local"
+
+
+def test_format_trace_renders_tree(exporter):
+    with tracing.span("root"):
+        with tracing.span("child"):
+            with tracing.span("grandchild"):
+                pass
+    text = tracing.format_trace([s.to_dict() for s in exporter.spans])
+    assert [line.split()[0] for line in text.splitlines()] == ["root", "child", "grandchild"]
+    assert text.splitlines()[2].startswith("    grandchild")
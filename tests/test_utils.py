@@ -1,4 +1,7 @@
-from services.utils import escape_braces, mask_pii, sanitize_for_prompt
+import random
+import re
+
+from services.utils import escape_braces, mask_pii, sanitize_for_prompt, sanitize_mapping
 
 
 def test_escape_braces():
@@ -44,3 +47,35 @@ def test_sanitize_for_prompt_whitelists_ascii():
     text = "Hello\u263a\u4e16\u754c!"  # Hello🙂世界!
     result = sanitize_for_prompt(text)
     assert result == "Hello世界!"
+
+
+def _reference_sanitize(text):
+    # 1 パス化する前の実装（出力が一致することを確認する）
+    sanitized = re.sub(r"(?i)\b(?:system|assistant|user|developer)\s*:", "", text)
+    sanitized = re.sub(r"<[^>]*>", "", sanitized)
+    sanitized = sanitized.replace("`", "")
+    sanitized = re.sub(r"[\u200B-\u200F\u202A-\u202E\u2060\uFEFF]", "", sanitized)
+    sanitized = re.sub(r"[\u2600-\u27BF]", "", sanitized)
+    sanitized = re.sub(r"\s+", " ", sanitized)
+    return sanitized.strip()
+
+
+def test_sanitize_for_prompt_matches_reference():
+    pieces = [
+        "system", "System", "\u017fystem", "user", "USER:", "developer", "assistant", ":",
+        "<", ">", "<b>", "`", "\u200b", "\u202a", "\u2060", "\ufeff", "\u263a", "\u27bf",
+        " ", "\n", "\t", "\u3000", "\xa0", "\x1c", "a", "世界", "{", "}", "_", "1",
+    ]
+    rng = random.Random(38)
+    for _ in range(5000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        assert sanitize_for_prompt(text) == _reference_sanitize(text), repr(text)
+    long_text = "system: <b>山田</b> `code`\u200b\u263a\n" * 500
+    assert sanitize_for_prompt(long_text) == _reference_sanitize(long_text)
+
+
+def test_sanitize_mapping():
+    values = {"industry": "<b>IT</b>", "note": "system: {x}", "count": 3, "missing": None}
+    assert sanitize_mapping(values) == {"industry": "IT", "note": "{x}", "count": 3, "missing": None}
+    assert sanitize_mapping(values, escape=True)["note"] == "{{x}}"
+    assert values["industry"] == "<b>IT</b>"
@@ -0,0 +1,538 @@
+"""ローカルで動く OpenAI Chat Completions 互換のフェイクサーバー
+
+実際の API クォータを消費せずに ``OpenAIProvider`` やアプリ全体の負荷試験・
+レイテンシ計測を行うためのもの。``response_format`` の JSON スキーマに適合する
+JSON を生成して返し、``usage`` / ``finish_reason`` / SSE ストリーミング、
+レイテンシ分布、429 の注入に対応する。Batch API（``/v1/files`` と ``/v1/batches``）も
+受け付け、入力ファイルの各行を同じ方法で処理して出力ファイル・エラーファイルを作る。
+
+    python -m tools.fake_openai --port 8089 --latency lognormal:-1.2,0.4 --rate-429 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake streamlit run app/ui.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import email.parser
+import email.policy
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+PLAIN_TEXT_REPLY = "これはフェイクサーバーによるテスト応答です。"
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """``fixed:0.2`` / ``uniform:0.1,0.5`` / ``normal:0.3,0.05`` / ``lognormal:mu,sigma`` を解釈"""
+    kind, _, raw = spec.partition(":")
+    params = tuple(float(p) for p in raw.split(",") if p.strip())
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in expected or len(params) != expected[kind]:
+        raise ValueError(f"invalid latency spec: {spec}")
+    return kind, params
+
+
+@dataclass
+class FakeServerConfig:
+    """フェイクサーバーの挙動設定"""
+
+    latency: str = "fixed:0"
+    rate_429: float = 0.0
+    rate_length: float = 0.0
+    stream_chunks: int = 8
+    # バッチを受け付けてから完了するまでの秒数
+    batch_delay: float = 0.0
+    seed: Optional[int] = None
+    model: str = "gpt-4o-mini"
+    _latency: Tuple[str, Tuple[float, ...]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._latency = parse_latency(self.latency)
+
+    def sample_latency(self, rng: random.Random) -> float:
+        kind, params = self._latency
+        if kind == "fixed":
+            value = params[0]
+        elif kind == "uniform":
+            value = rng.uniform(*params)
+        elif kind == "normal":
+            value = rng.gauss(*params)
+        else:
+            value = rng.lognormvariate(*params)
+        return max(0.0, value)
+
+
+def generate_from_schema(schema: Dict[str, Any], rng: random.Random, path: str = "value") -> Any:
+    """JSON スキーマに適合するダミー値を生成"""
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return rng.choice(schema["enum"])
+    for key in ("anyOf", "oneOf"):
+        if schema.get(key):
+            return generate_from_schema(schema[key][0], rng, path)
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {name: generate_from_schema(sub, rng, name) for name, sub in props.items()}
+    if kind == "array":
+        lo = int(schema.get("minItems", 3))
+        hi = int(schema.get("maxItems", max(lo, 3)))
+        count = max(lo, min(hi, 3))
+        item_schema = schema.get("items", {"type": "string"})
+        return [generate_from_schema(item_schema, rng, f"{path}_{i + 1}") for i in range(count)]
+    if kind == "string":
+        text = f"{path} のサンプル文章{rng.randint(1, 999)}"
+        min_len = int(schema.get("minLength", 0))
+        if len(text) < min_len:
+            text = text + "。" * (min_len - len(text))
+        if "maxLength" in schema:
+            text = text[: int(schema["maxLength"])]
+        return text
+    if kind == "integer":
+        return rng.randint(int(schema.get("minimum", 0)), int(schema.get("maximum", 100)))
+    if kind == "number":
+        return round(rng.uniform(float(schema.get("minimum", 0)), float(schema.get("maximum", 1))), 3)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return None
+
+
+def _extract_schema(response_format: Any) -> Optional[Dict[str, Any]]:
+    """``response_format`` から JSON スキーマを取り出す
+
+    公式の ``{"name": ..., "schema": {...}}`` 形式と、スキーマを直接渡す形式の両方を受け付ける。
+    """
+    if not isinstance(response_format, dict):
+        return None
+    if response_format.get("type") == "json_object":
+        return {"type": "object", "properties": {"content": {"type": "string"}}}
+    if response_format.get("type") != "json_schema":
+        return None
+    spec = response_format.get("json_schema") or {}
+    if isinstance(spec.get("schema"), dict):
+        return spec["schema"]
+    return spec
+
+
+_RATE_LIMITED = {"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}}
+
+
+def _count_tokens(text: str) -> int:
+    # 日本語混じりのテキストをおおまかに見積もる（2 文字 ≒ 1 トークン）
+    return max(1, len(text) // 2)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_FakeHTTPServer"
+    protocol_version = "HTTP/1.1"
+    # ヘッダと本文を別々に書くため、Nagle による遅延を避ける
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 親クラスの引数名
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_not_found(self) -> None:
+        self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self) -> Dict[str, Any]:
+        return json.loads(self._read_body() or b"{}")
+
+    def _read_form(self) -> Dict[str, Tuple[Optional[str], bytes]]:
+        """multipart/form-data を項目名 → (ファイル名, 内容) にする"""
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode("latin-1")
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + self._read_body())
+        return {
+            part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+            for part in message.iter_parts()
+        }
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server の規約
+        path = self.path.split("?", 1)[0].rstrip("/")
+        parts = path.split("/")
+        if path.endswith("/models"):
+            model = self.server.config.model
+            self._send_json(200, {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "fake"}]})
+        elif path == "/_stats":
+            self._send_json(200, self.server.stats())
+        elif "files" in parts[-3:-1] and path.endswith("/content"):
+            content = self.server.file_content(parts[-2])
+            if content is None:
+                self._send_not_found()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        elif len(parts) >= 2 and parts[-2] == "batches":
+            batch = self.server.batch(parts[-1])
+            if batch is None:
+                self._send_not_found()
+                return
+            self._send_json(200, batch)
+        else:
+            self._send_not_found()
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server の規約
+        path = self.path.split("?", 1)[0].rstrip("/")
+        parts = path.split("/")
+        if path.endswith("/files"):
+            form = self._read_form()
+            filename, content = form.get("file", (None, None))
+            if content is None:
+                self._send_json(400, {"error": {"message": "file is required", "type": "invalid_request_error"}})
+                return
+            purpose = (form.get("purpose") or (None, b""))[1].decode("utf-8")
+            self._send_json(200, self.server.create_file(filename or "upload.jsonl", content, purpose))
+            return
+        if len(parts) >= 3 and parts[-3] == "batches" and parts[-1] == "cancel":
+            batch = self.server.cancel_batch(parts[-2])
+            if batch is None:
+                self._send_not_found()
+                return
+            self._send_json(200, batch)
+            return
+        if not (path.endswith("/chat/completions") or path.endswith("/batches")):
+            self._send_not_found()
+            return
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+            return
+        if path.endswith("/batches"):
+            batch = self.server.create_batch(request)
+            if batch is None:
+                self._send_json(400, {"error": {"message": "input file not found", "type": "invalid_request_error"}})
+                return
+            self._send_json(200, batch)
+            return
+        self.server.handle_chat(self, request)
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: FakeServerConfig) -> None:
+        super().__init__(address, _Handler)
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "completed": 0, "rate_limited": 0, "streamed": 0, "tokens": 0, "batches": 0}
+        # Batch API のファイルとバッチ（ID → 内容）
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    def _draw(self) -> Tuple[float, bool, bool, int]:
+        # 乱数生成器はスレッド間で共有するためロック内でまとめて引く
+        with self._lock:
+            latency = self.config.sample_latency(self._rng)
+            limited = self._rng.random() < self.config.rate_429
+            truncated = self._rng.random() < self.config.rate_length
+            seed = self._rng.getrandbits(32)
+        return latency, limited, truncated, seed
+
+    def _count(self, **delta: int) -> None:
+        with self._lock:
+            for key, value in delta.items():
+                self._stats[key] += value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def handle_chat(self, handler: _Handler, request: Dict[str, Any]) -> None:
+        latency, limited, truncated, seed = self._draw()
+        self._count(requests=1)
+        if limited:
+            self._count(rate_limited=1)
+            handler._send_json(429, _RATE_LIMITED, headers={"retry-after": "1"})
+            return
+
+        if request.get("stream"):
+            completion_id, model, content, finish_reason, usage = self._generate(request, truncated, seed)
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self._stream(handler, completion_id, model, content, finish_reason, usage if include_usage else None, latency)
+            self._count(completed=1, streamed=1, tokens=usage["total_tokens"])
+            return
+
+        time.sleep(latency)
+        completion = self._completion(request, truncated, seed)
+        handler._send_json(200, completion)
+        self._count(completed=1, tokens=completion["usage"]["total_tokens"])
+
+    def _generate(self, request: Dict[str, Any], truncated: bool, seed: int) -> Tuple[str, str, str, str, Dict[str, int]]:
+        """応答の ID・モデル・本文・終了理由・使用量を作る"""
+        rng = random.Random(seed)
+        schema = _extract_schema(request.get("response_format"))
+        content = (
+            json.dumps(generate_from_schema(schema, rng), ensure_ascii=False)
+            if schema is not None
+            else PLAIN_TEXT_REPLY
+        )
+        finish_reason = "stop"
+        if truncated:
+            content = content[: max(1, len(content) // 2)]
+            finish_reason = "length"
+        prompt_text = "".join(
+            m.get("content") or "" for m in request.get("messages", []) if isinstance(m.get("content"), str)
+        )
+        usage = {
+            "prompt_tokens": _count_tokens(prompt_text),
+            "completion_tokens": _count_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:24]}"
+        model = request.get("model") or self.config.model
+        return completion_id, model, content, finish_reason, usage
+
+    def _completion(self, request: Dict[str, Any], truncated: bool, seed: int) -> Dict[str, Any]:
+        completion_id, model, content, finish_reason, usage = self._generate(request, truncated, seed)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content, "refusal": None},
+                    "logprobs": None,
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": usage,
+        }
+
+    def create_file(self, filename: str, content: bytes, purpose: str) -> Dict[str, Any]:
+        file = {
+            "id": f"file-fake-{uuid.uuid4().hex[:24]}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self._files[file["id"]] = {**file, "content": content}
+        return file
+
+    def file_content(self, file_id: str) -> Optional[bytes]:
+        with self._lock:
+            file = self._files.get(file_id)
+        return file["content"] if file else None
+
+    def batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return dict(batch) if batch else None
+
+    def create_batch(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """入力ファイルの各行を処理するバッチを作り、``batch_delay`` 秒後に完了させる"""
+        content = self.file_content(request.get("input_file_id", ""))
+        if content is None:
+            return None
+        now = int(time.time())
+        batch = {
+            "id": f"batch_fake_{uuid.uuid4().hex[:24]}",
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "errors": None,
+            "input_file_id": request["input_file_id"],
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": now,
+            "in_progress_at": now,
+            "expires_at": now + 24 * 60 * 60,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": request.get("metadata"),
+        }
+        with self._lock:
+            self._batches[batch["id"]] = batch
+        self._count(batches=1)
+        threading.Thread(
+            target=self._run_batch, args=(batch["id"], content), name="fake-openai-batch", daemon=True
+        ).start()
+        return dict(batch)
+
+    def _run_batch(self, batch_id: str, content: bytes) -> None:
+        outputs: List[str] = []
+        errors: List[str] = []
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            _, limited, truncated, seed = self._draw()
+            self._count(requests=1)
+            record: Dict[str, Any] = {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": item.get("custom_id")}
+            if limited:
+                self._count(rate_limited=1)
+                record.update(response={"status_code": 429, "request_id": uuid.uuid4().hex, "body": _RATE_LIMITED}, error=None)
+                errors.append(json.dumps(record, ensure_ascii=False))
+                continue
+            completion = self._completion(item.get("body") or {}, truncated, seed)
+            self._count(completed=1, tokens=completion["usage"]["total_tokens"])
+            record.update(response={"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion}, error=None)
+            outputs.append(json.dumps(record, ensure_ascii=False))
+
+        time.sleep(self.config.batch_delay)
+        output = self.create_file("batch_output.jsonl", "\n".join(outputs).encode("utf-8"), "batch_output") if outputs else None
+        error = self.create_file("batch_errors.jsonl", "\n".join(errors).encode("utf-8"), "batch_output") if errors else None
+        with self._lock:
+            batch = self._batches[batch_id]
+            if batch["status"] != "in_progress":
+                return
+            now = int(time.time())
+            batch.update(
+                status="completed",
+                completed_at=now,
+                finalizing_at=now,
+                output_file_id=output and output["id"],
+                error_file_id=error and error["id"],
+                request_counts={"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)},
+            )
+
+    def cancel_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """実行中のバッチを取り消す（結果ファイルは作らない）"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch["status"] == "in_progress":
+                batch.update(status="cancelled", cancelled_at=int(time.time()))
+            return dict(batch)
+
+    def _stream(
+        self,
+        handler: _Handler,
+        completion_id: str,
+        model: str,
+        content: str,
+        finish_reason: str,
+        usage: Dict[str, int] | None,
+        latency: float,
+    ) -> None:
+        chunks = max(1, self.config.stream_chunks)
+        size = max(1, -(-len(content) // chunks))
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+        delay = latency / (len(pieces) + 1)
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+
+        def emit(payload: Any) -> None:
+            data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+            handler.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+
+        time.sleep(delay)
+        emit({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+        for piece in pieces:
+            time.sleep(delay)
+            emit({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        emit({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+        if usage is not None:
+            emit({**base, "choices": [], "usage": usage})
+        emit("[DONE]")
+
+
+class FakeOpenAIServer:
+    """バックグラウンドスレッドで動くフェイクサーバー
+
+    ``with FakeOpenAIServer(FakeServerConfig(...)) as server:`` のように使い、
+    ``server.base_url`` を ``OpenAIProvider(base_url=...)`` や ``OPENAI_BASE_URL`` に渡す。
+    """
+
+    def __init__(self, config: FakeServerConfig | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or FakeServerConfig()
+        self._httpd = _FakeHTTPServer((host, port), self.config)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def stats(self) -> Dict[str, int]:
+        return self._httpd.stats()
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="OpenAI Chat Completions 互換のフェイクサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:A,B | normal:MU,SD | lognormal:MU,SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="429 を返す確率")
+    parser.add_argument("--rate-length", type=float, default=0.0, help="finish_reason=length で打ち切る確率")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="バッチが完了するまでの秒数")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = FakeServerConfig(
+        latency=args.latency,
+        rate_429=args.rate_429,
+        rate_length=args.rate_length,
+        stream_chunks=args.stream_chunks,
+        batch_delay=args.batch_delay,
+        seed=args.seed,
+    )
+    server = FakeOpenAIServer(config, host=args.host, port=args.port)
+    print(f"fake OpenAI server listening on {server.base_url}", flush=True)
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
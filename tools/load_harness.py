@@ -0,0 +1,386 @@
+"""Streamlit ページを同時に操作する負荷試験ハーネス
+
+実際のページ関数（``show_pre_advice_page`` / ``show_icebreaker_page`` /
+``show_post_review_page`` / ``show_history_page``）を Streamlit の ``AppTest`` で
+実行し、N 人の営業担当が同時に操作する状況を 1 プロセス内で再現する。LLM は
+``tools.fake_openai`` のフェイクサーバー、検索は ``SEARCH_PROVIDER=stub`` を使うため
+外部 API には接続しない。ページ操作ごとの p50/p95/p99、ピーク RSS、1 秒あたりの
+LLM 呼び出し数を出力する。
+
+Streamlit サーバーもセッションごとにスクリプトをスレッドで実行するため、1 プロセス
+内のスレッド並行は Cloud Run の 1 インスタンスに近い負荷になる。
+
+    python -m tools.load_harness --users 8 --iterations 5 --latency lognormal:-0.7,0.4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+try:  # Windows には resource モジュールが無い
+    import resource
+except ImportError:  # pragma: no cover - 環境依存
+    resource = None
+
+from streamlit.testing.v1 import AppTest
+
+from tools.fake_openai import FakeOpenAIServer, FakeServerConfig
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+
+# ページ名 -> (モジュール, 表示関数)
+PAGES = {
+    "pre_advice": ("pages.pre_advice", "show_pre_advice_page"),
+    "icebreaker": ("pages.icebreaker", "show_icebreaker_page"),
+    "post_review": ("pages.post_review", "show_post_review_page"),
+    "history": ("pages.history", "show_history_page"),
+}
+DEFAULT_SCENARIO = ("pre_advice", "icebreaker", "post_review", "history")
+
+INDUSTRIES = ["IT", "製造業", "金融業", "医療", "小売", "物流"]
+PRODUCTS = ["SaaS", "コンサルティング", "クラウド基盤", "業務改善ツール"]
+PURPOSES = ["新規顧客獲得のための初回提案", "既存顧客のアップセル提案", "競合からのリプレース提案"]
+MEETING_NOTES = (
+    "先方は在庫管理の属人化に課題を感じている。価格には慎重だが導入効果には関心が高い。"
+    "来週までに概算見積もりと導入事例を送付し、次回は部長同席で再提案する。"
+)
+
+
+def page_script(page: str) -> str:
+    """``AppTest.from_string`` に渡すページ実行スクリプトを返す"""
+    module, func = PAGES[page]
+    return (
+        "import sys\n"
+        f"sys.path[:0] = [{str(ROOT)!r}, {str(APP_DIR)!r}]\n"
+        f"from {module} import {func}\n"
+        f"{func}()\n"
+    )
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル（``values`` が空なら 0.0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> float:
+    """プロセスのピーク RSS（MB）。取得できない環境では 0.0"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / divisor
+
+
+@dataclass
+class HarnessConfig:
+    """負荷試験の設定"""
+
+    users: int = 4
+    iterations: int = 3
+    scenario: Sequence[str] = DEFAULT_SCENARIO
+    think_time: float = 0.0
+    seed_sessions: int = 200
+    latency: str = "fixed:0.05"
+    rate_429: float = 0.0
+    timeout: float = 60.0
+    seed: Optional[int] = None
+    data_dir: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        unknown = [p for p in self.scenario if p not in PAGES]
+        if unknown:
+            raise ValueError(f"unknown page: {', '.join(unknown)}")
+        if self.users < 1 or self.iterations < 1:
+            raise ValueError("users and iterations must be positive")
+
+
+@dataclass
+class ActionResult:
+    """1 回のページ操作の計測結果"""
+
+    action: str
+    seconds: float
+    ok: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadReport:
+    """負荷試験の結果"""
+
+    users: int
+    wall_seconds: float
+    results: List[ActionResult]
+    llm_stats: Dict[str, int]
+    peak_rss_mb: float
+    errors: Dict[str, List[str]] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        """操作ごとの件数・エラー数・パーセンタイルと全体の集計を返す"""
+        actions: Dict[str, Dict[str, Any]] = {}
+        for name in dict.fromkeys(r.action for r in self.results):
+            rows = [r for r in self.results if r.action == name]
+            timings = [r.seconds for r in rows]
+            actions[name] = {
+                "count": len(rows),
+                "errors": sum(1 for r in rows if not r.ok),
+                "p50": percentile(timings, 50),
+                "p95": percentile(timings, 95),
+                "p99": percentile(timings, 99),
+                "max": max(timings),
+            }
+        wall = self.wall_seconds or 1e-9
+        return {
+            "users": self.users,
+            "wall_seconds": self.wall_seconds,
+            "actions": actions,
+            "actions_per_second": len(self.results) / wall,
+            "llm_calls": self.llm_stats.get("requests", 0),
+            "llm_calls_per_second": self.llm_stats.get("requests", 0) / wall,
+            "llm_rate_limited": self.llm_stats.get("rate_limited", 0),
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+
+def format_report(report: LoadReport) -> str:
+    """結果を表形式の文字列にする"""
+    summary = report.summary()
+    lines = [
+        f"{'action':<22}{'count':>7}{'errors':>8}{'p50(s)':>9}{'p95(s)':>9}{'p99(s)':>9}{'max(s)':>9}",
+    ]
+    for name, row in summary["actions"].items():
+        lines.append(
+            f"{name:<22}{row['count']:>7}{row['errors']:>8}"
+            f"{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}{row['max']:>9.3f}"
+        )
+    lines.append("")
+    lines.append(f"users: {summary['users']}  wall: {summary['wall_seconds']:.1f}s")
+    lines.append(
+        f"actions/s: {summary['actions_per_second']:.2f}  "
+        f"LLM calls/s: {summary['llm_calls_per_second']:.2f} "
+        f"(total {summary['llm_calls']}, 429: {summary['llm_rate_limited']})"
+    )
+    lines.append(f"peak RSS: {summary['peak_rss_mb']:.1f} MB")
+    for action, messages in report.errors.items():
+        lines.append(f"errors in {action}: {messages[0]}")
+    return "\n".join(lines)
+
+
+def _app_error(at: AppTest) -> Optional[str]:
+    """スクリプトの例外または ``st.error`` の表示があればその内容を返す"""
+    if at.exception:
+        return at.exception[0].message
+    if at.error:
+        return str(at.error[0].value)
+    return None
+
+
+class SimulatedRep:
+    """1 人の営業担当のページ操作を順に実行する"""
+
+    def __init__(self, rep_id: int, config: HarnessConfig, record: Callable[[ActionResult], None]) -> None:
+        self.rep_id = rep_id
+        self.config = config
+        self.record = record
+        self.rng = random.Random(None if config.seed is None else config.seed + rep_id)
+
+    def _app(self, page: str) -> AppTest:
+        return AppTest.from_string(page_script(page), default_timeout=self.config.timeout)
+
+    def _timed(self, action: str, step: Callable[[], AppTest]) -> Optional[AppTest]:
+        start = time.perf_counter()
+        try:
+            at = step()
+            error = _app_error(at)
+        except Exception as e:  # タイムアウトや AppTest 自体の失敗も計測対象にする
+            at, error = None, f"{type(e).__name__}: {e}"
+        self.record(ActionResult(action, time.perf_counter() - start, error is None, error))
+        return at if error is None else None
+
+    def pre_advice(self) -> None:
+        at = self._app("pre_advice")
+        if self._timed("pre_advice.render", at.run) is None:
+            return
+        at.session_state["pre_advice_form_data"] = {
+            "sales_type": "hunter",
+            "industry": self.rng.choice(INDUSTRIES),
+            "product": self.rng.choice(PRODUCTS),
+            "description": "中堅企業向けの業務効率化サービス",
+            "stage": "初期接触",
+            "purpose": self.rng.choice(PURPOSES),
+            "constraints_input": "予算は年内確定\n導入は3か月以内",
+        }
+        at.session_state["pre_advice_autorun"] = True
+        self._timed("pre_advice.generate", at.run)
+
+    def icebreaker(self) -> None:
+        at = self._app("icebreaker")
+        if self._timed("icebreaker.render", at.run) is None:
+            return
+        at.text_input[0].set_value(self.rng.choice(INDUSTRIES))
+        self._timed("icebreaker.generate", at.button[0].click().run)
+
+    def post_review(self) -> None:
+        at = self._app("post_review")
+        if self._timed("post_review.render", at.run) is None:
+            return
+        at.text_input(key="post_review_industry").set_value(self.rng.choice(INDUSTRIES))
+        at.text_input(key="post_review_product").set_value(self.rng.choice(PRODUCTS))
+        at.text_area(key="post_review_content").set_value(MEETING_NOTES)
+        self._timed("post_review.analyze", at.button[0].click().run)
+
+    def history(self) -> None:
+        at = self._app("history")
+        if self._timed("history.render", at.run) is None:
+            return
+        at.text_input(key="history_query").set_value(self.rng.choice(INDUSTRIES))
+        self._timed("history.search", at.run)
+
+    def run(self) -> None:
+        for _ in range(self.config.iterations):
+            for page in self.config.scenario:
+                getattr(self, page)()
+                if self.config.think_time:
+                    time.sleep(self.rng.uniform(0, 2 * self.config.think_time))
+
+
+@contextmanager
+def _patched_env(values: Dict[str, str]) -> Iterator[None]:
+    previous = {k: os.environ.get(k) for k in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def seed_history(count: int, seed: Optional[int] = None) -> None:
+    """履歴ページ用のセッションを現在のストレージに保存する"""
+    from services.storage_service import get_storage_provider
+
+    rng = random.Random(seed)
+    provider = get_storage_provider()
+    kinds = ["pre_advice", "post_review", "icebreaker"]
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        industry = rng.choice(INDUSTRIES)
+        data = {
+            "type": kind,
+            "input": {"sales_type": "hunter", "industry": industry, "product": rng.choice(PRODUCTS)},
+            "output": {"summary": f"{industry} 向けの提案メモ {i}"},
+        }
+        provider.save_session(
+            data,
+            user_id=f"rep-{i % 20:02d}",
+            team_id=f"team-{i % 4}",
+        )
+
+
+def run_load_test(config: HarnessConfig) -> LoadReport:
+    """フェイク LLM を起動し、設定どおりの同時操作を実行して結果を返す"""
+    results: List[ActionResult] = []
+    lock = threading.Lock()
+
+    def record(result: ActionResult) -> None:
+        with lock:
+            results.append(result)
+
+    fake_config = FakeServerConfig(latency=config.latency, rate_429=config.rate_429, seed=config.seed)
+    with tempfile.TemporaryDirectory(prefix="load_harness_") as tmp, FakeOpenAIServer(fake_config) as server:
+        env = {
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_BASE_URL": server.base_url,
+            "SEARCH_PROVIDER": "stub",
+            "STORAGE_PROVIDER": "local",
+            "DATA_DIR": config.data_dir or tmp,
+        }
+        with _patched_env(env):
+            seed_history(config.seed_sessions, config.seed)
+            reps = [SimulatedRep(i, config, record) for i in range(config.users)]
+            threads = [
+                threading.Thread(target=rep.run, name=f"rep-{rep.rep_id}", daemon=True)
+                for rep in reps
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - start
+            llm_stats = server.stats()
+
+    errors: Dict[str, List[str]] = {}
+    for r in results:
+        if not r.ok:
+            errors.setdefault(r.action, []).append(r.error or "")
+    return LoadReport(
+        users=config.users,
+        wall_seconds=wall,
+        results=results,
+        llm_stats=llm_stats,
+        peak_rss_mb=peak_rss_mb(),
+        errors=errors,
+    )
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Streamlit ページの同時操作による負荷試験")
+    parser.add_argument("--users", type=int, default=4, help="同時に操作する営業担当の数")
+    parser.add_argument("--iterations", type=int, default=3, help="1 人あたりのシナリオ繰り返し回数")
+    parser.add_argument(
+        "--pages",
+        default=",".join(DEFAULT_SCENARIO),
+        help=f"シナリオのページ順（{','.join(PAGES)} から選択）",
+    )
+    parser.add_argument("--think-time", type=float, default=0.0, help="ページ間の平均待ち時間（秒）")
+    parser.add_argument("--seed-sessions", type=int, default=200, help="履歴ページ用に事前保存するセッション数")
+    parser.add_argument("--latency", default="fixed:0.05", help="フェイク LLM のレイテンシ分布")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="フェイク LLM が 429 を返す確率")
+    parser.add_argument("--timeout", type=float, default=60.0, help="1 回のスクリプト実行のタイムアウト（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", default=None, help="集計結果を JSON で書き出すパス")
+    args = parser.parse_args(argv)
+
+    config = HarnessConfig(
+        users=args.users,
+        iterations=args.iterations,
+        scenario=tuple(p.strip() for p in args.pages.split(",") if p.strip()),
+        think_time=args.think_time,
+        seed_sessions=args.seed_sessions,
+        latency=args.latency,
+        rate_429=args.rate_429,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+    report = run_load_test(config)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report.summary(), f, ensure_ascii=False, indent=2)
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())